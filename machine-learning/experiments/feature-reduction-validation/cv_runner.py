@@ -53,7 +53,9 @@ if str(_SRC) not in sys.path:
 if str(_HERE) not in sys.path:
     sys.path.insert(0, str(_HERE))
 
-from preprocessing.preprocessor import build_preprocessor
+from inference.hybrid import HybridEngine, hybrid_labels, model_outputs
+from preprocessing.preprocessor import build_preprocessor, compact_frame
+from training.xgb_fit import fit_xgb_pipeline
 import config as cfg
 
 # ============================================================================
@@ -73,8 +75,12 @@ def _build_and_fit_xgb(
     y: pd.Series,
     best_params: dict,
     scale_pos_weight: float,
-) -> Pipeline:
-    """Build and fit XGBoost pipeline from tuned params."""
+) -> tuple[Pipeline, dict]:
+    """
+    Build and fit XGBoost pipeline from tuned params.  The tuned
+    n_estimators is the upper bound for early stopping (training.xgb_fit);
+    returns (pipeline, fit telemetry).
+    """
     # best_params has pipeline-prefixed keys like "model__n_estimators"
     model_params = {
         k.replace("model__", ""): v
@@ -88,10 +94,7 @@ def _build_and_fit_xgb(
         tree_method="hist",
         random_state=cfg.RANDOM_SEED,
     )
-    preprocessor = build_preprocessor(X)
-    pipe = Pipeline(steps=[("preprocess", preprocessor), ("model", xgb)])
-    pipe.fit(X, y)
-    return pipe
+    return fit_xgb_pipeline(build_preprocessor(X), xgb, X, y, random_state=cfg.RANDOM_SEED)
 
 
 def _build_and_fit_dt(
@@ -127,29 +130,9 @@ def _sha256(path: Path) -> str:
 
 
 # ============================================================================
-# HYBRID INFERENCE
+# METRICS
 # ============================================================================
 
-def _run_hybrid(
-    xgb_pipe: Pipeline,
-    dt_pipe: Pipeline,
-    X: pd.DataFrame,
-    threshold: float,
-    conf_margin: float,
-) -> tuple[np.ndarray, np.ndarray]:
-    """Apply the upgrade-only hybrid rule."""
-    xgb_probs = xgb_pipe.predict_proba(X)[:, 1]
-    xgb_pred  = (xgb_probs >= threshold).astype(int)
-    dt_pred   = dt_pipe.predict(X)
-
-    hybrid = xgb_pred.copy()
-    low_conf_mask = np.abs(xgb_probs - threshold) < conf_margin
-    upgrade_mask  = low_conf_mask & (dt_pred == 1) & (xgb_pred == 0)
-    hybrid[upgrade_mask] = 1
-
-    return hybrid, xgb_probs
-
-
 def _compute_metrics(
     y_true: pd.Series,
     preds: np.ndarray,
@@ -205,8 +188,11 @@ def select_threshold(
     best_score  = -1.0
     best_recall = 0.0
 
+    # Model outputs do not depend on the threshold — score once, sweep on arrays
+    outputs = model_outputs(xgb_pipe, dt_pipe, X_val)
+
     for t in thresholds:
-        preds, _ = _run_hybrid(xgb_pipe, dt_pipe, X_val, t, conf_margin)
+        preds = hybrid_labels(outputs.xgb_prob, outputs.dt_pred, t, conf_margin)
         score = float(fbeta_score(y_val, preds, beta=cfg.FBETA_BETA, zero_division=0))
         if score > best_score:
             best_score  = score
@@ -297,7 +283,7 @@ def _run_cv_for_set(
         scale_pos_weight = _compute_scale_pos_weight(y_inner_train)
 
         # Fit on inner_train for threshold selection
-        xgb_inner = _build_and_fit_xgb(
+        xgb_inner, _ = _build_and_fit_xgb(
             X_inner_train, y_inner_train,
             tuned_params["xgb"]["best_params"],
             scale_pos_weight,
@@ -317,7 +303,7 @@ def _run_cv_for_set(
         # ------------------------------------------------------------------
         scale_pos_weight_full = _compute_scale_pos_weight(y_fold_train)
 
-        xgb_full = _build_and_fit_xgb(
+        xgb_full, xgb_telemetry = _build_and_fit_xgb(
             X_fold_train, y_fold_train,
             tuned_params["xgb"]["best_params"],
             scale_pos_weight_full,
@@ -328,9 +314,9 @@ def _run_cv_for_set(
         )
 
         # Evaluate on held-out fold test
-        preds, probs = _run_hybrid(
-            xgb_full, dt_full, X_fold_test, best_thresh, cfg.CONF_MARGIN
-        )
+        preds, probs = HybridEngine(
+            xgb_full, dt_full, best_thresh, cfg.CONF_MARGIN
+        ).labels(X_fold_test)
         metrics = _compute_metrics(y_fold_test, preds, probs)
 
         fold_row = {
@@ -339,6 +325,8 @@ def _run_cv_for_set(
             "n_test":             len(y_fold_test),
             "threshold":          best_thresh,
             "target_met_on_val":  target_met_on_val,
+            "xgb_n_estimators":   xgb_telemetry["n_estimators"],
+            "xgb_fit_seconds":    xgb_telemetry["fit_seconds"] + xgb_telemetry["refit_seconds"],
             **metrics,
         }
         existing_rows.append(fold_row)
@@ -398,6 +386,7 @@ def run_cv(
     # ------------------------------------------------------------------
     print("[Task 03] Loading train split ...", flush=True)
     X_train, y_train = joblib.load(train_pkl)
+    X_train = compact_frame(X_train)
     print(f"[Task 03] Train set: {len(y_train)} rows, "
           f"class_1_frac={y_train.mean():.4f}", flush=True)
 
@@ -52,7 +52,8 @@ if str(_SRC) not in sys.path:
 if str(_HERE) not in sys.path:
     sys.path.insert(0, str(_HERE))
 
-from preprocessing.preprocessor import build_preprocessor
+from inference.hybrid import HybridEngine
+from preprocessing.preprocessor import build_preprocessor, compact_frame
 import config as cfg
 
 # ============================================================================
@@ -105,16 +106,6 @@ def _build_and_fit_dt(X, y, best_params) -> Pipeline:
     return pipe
 
 
-def _run_hybrid(xgb_pipe, dt_pipe, X, threshold, conf_margin):
-    xgb_probs = xgb_pipe.predict_proba(X)[:, 1]
-    xgb_pred  = (xgb_probs >= threshold).astype(int)
-    dt_pred   = dt_pipe.predict(X)
-    hybrid = xgb_pred.copy()
-    mask = np.abs(xgb_probs - threshold) < conf_margin
-    hybrid[mask & (dt_pred == 1) & (xgb_pred == 0)] = 1
-    return hybrid, xgb_probs
-
-
 def _compute_metrics(y_true, preds, probs) -> dict:
     recall    = float(recall_score(y_true, preds, zero_division=0))
     precision = float(precision_score(y_true, preds, zero_division=0))
@@ -343,6 +334,7 @@ def run_report(
     print("[Task 05] Loading train and test splits ...", flush=True)
     X_train, y_train = joblib.load(train_pkl)
     X_test,  y_test  = joblib.load(test_pkl)
+    X_train, X_test  = compact_frame(X_train), compact_frame(X_test)
 
     print(f"[Task 05] Train: {len(y_train)} rows | "
           f"Test: {len(y_test)} rows (locked)", flush=True)
@@ -387,9 +379,9 @@ def run_report(
         )
 
         # Evaluate on locked test set
-        preds, probs = _run_hybrid(
-            xgb_pipe, dt_pipe, X_test_sub, threshold, cfg.CONF_MARGIN
-        )
+        preds, probs = HybridEngine(
+            xgb_pipe, dt_pipe, threshold, cfg.CONF_MARGIN
+        ).labels(X_test_sub)
         metrics = _compute_metrics(y_test, preds, probs)
         metrics["threshold"]    = threshold
         metrics["fold_recalls"] = fold_recalls
@@ -45,7 +45,7 @@ if str(_SRC) not in sys.path:
 if str(_HERE) not in sys.path:
     sys.path.insert(0, str(_HERE))
 
-from preprocessing.preprocessor import build_preprocessor
+from preprocessing.preprocessor import build_preprocessor, compact_frame
 import config as cfg
 
 # ============================================================================
@@ -248,6 +248,7 @@ def run_tuning(
     # ------------------------------------------------------------------
     print("[Task 02] Loading train split ...", flush=True)
     X_train, y_train = joblib.load(train_pkl)
+    X_train = compact_frame(X_train)
     print(f"[Task 02] Train set: {len(y_train)} rows, "
           f"class_1_frac={y_train.mean():.4f}", flush=True)
 
@@ -7,7 +7,8 @@ Public API
 ----------
 load_data(feature_cols)
     Load discontinuation_design1_data_v2.pkl and subset to the requested
-    feature columns. Returns (X_train, X_test, y_train, y_test).
+    feature columns. Returns (X_train, X_test, y_train, y_test) with compact
+    dtypes (categoricals + float32, ``preprocessor.compact_frame``).
 """
 
 from __future__ import annotations
@@ -17,6 +18,9 @@ import pandas as pd
 from pathlib import Path
 from typing import TYPE_CHECKING
 
+# src/ is on sys.path (set up by run_experiment.py)
+from preprocessing.preprocessor import compact_frame
+
 if TYPE_CHECKING:
     import numpy as np
 
@@ -69,8 +73,8 @@ def load_data(feature_cols: list[str], data_path: Path) -> DataSplit:
     _validate_columns(feature_cols, X_train.columns.tolist(), data_path)
 
     return (
-        X_train[feature_cols].copy(),
-        X_test[feature_cols].copy(),
+        compact_frame(X_train[feature_cols]),
+        compact_frame(X_test[feature_cols]),
         y_train.copy(),
         y_test.copy(),
     )
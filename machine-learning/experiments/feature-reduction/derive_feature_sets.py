@@ -55,7 +55,8 @@ if str(_SRC) not in sys.path:
 if str(_HERE) not in sys.path:
     sys.path.insert(0, str(_HERE))
 
-from preprocessing.preprocessor import build_preprocessor  # noqa: E402
+from preprocessing.preprocessor import build_preprocessor, compact_frame  # noqa: E402
+from training.xgb_fit import fit_xgb_pipeline               # noqa: E402
 import config as cfg                                        # noqa: E402
 
 # ============================================================================
@@ -96,8 +97,8 @@ EXCLUDE_FEATURES = {"REGION"}
 # HELPERS
 # ============================================================================
 
-def _build_xgb_pipeline(X_fit, y_fit) -> Pipeline:
-    """Build and fit an XGBoost pipeline using v3/config XGB_PARAMS."""
+def _build_xgb_pipeline(X_fit, y_fit) -> tuple[Pipeline, dict]:
+    """Build and fit an early-stopped XGBoost pipeline using v3/config XGB_PARAMS."""
     n_pos = int((y_fit == 1).sum())
     n_neg = int((y_fit == 0).sum())
     if n_pos == 0:
@@ -108,10 +109,7 @@ def _build_xgb_pipeline(X_fit, y_fit) -> Pipeline:
         **cfg.XGB_PARAMS,
         scale_pos_weight=scale_pos_weight,
     )
-    preprocessor = build_preprocessor(X_fit)
-    pipe = Pipeline(steps=[("preprocess", preprocessor), ("model", xgb)])
-    pipe.fit(X_fit, y_fit)
-    return pipe
+    return fit_xgb_pipeline(build_preprocessor(X_fit), xgb, X_fit, y_fit, random_state=RANDOM_STATE)
 
 
 def _elbow_features(
@@ -164,6 +162,7 @@ def main() -> None:
 
     print(f"Loading train split from:\n  {TRAIN_PKL} ...", flush=True)
     X_train, y_train = joblib.load(TRAIN_PKL)
+    X_train = compact_frame(X_train)
     print(f"  X_train shape : {X_train.shape}", flush=True)
     print(f"  y_train dist  : {dict(y_train.value_counts().sort_index())}",
           flush=True)
@@ -199,8 +198,9 @@ def main() -> None:
     # 3. Fit XGBoost pipeline on inner fit set
     # ------------------------------------------------------------------
     print("\nFitting XGBoost pipeline on inner fit set ...", flush=True)
-    pipe = _build_xgb_pipeline(X_fit, y_fit)
-    print("  Fit complete.", flush=True)
+    pipe, xgb_telemetry = _build_xgb_pipeline(X_fit, y_fit)
+    print(f"  Fit complete ({xgb_telemetry['n_estimators']} of "
+          f"{xgb_telemetry['max_rounds']} trees after early stopping).", flush=True)
 
     # ------------------------------------------------------------------
     # 4. Permutation importance on inner val set
@@ -1,10 +1,10 @@
 """
 evaluator.py
 
-Hybrid inference logic, metric computation, and threshold sweep for the
-feature-reduction experiment.
+Metric computation and threshold sweep for the feature-reduction experiment.
 
-The hybrid rule mirrors the v3 production model exactly:
+The hybrid rule is the production one from src/inference/hybrid.py
+(model_outputs / hybrid_labels):
   1. XGBoost predicts P(y=1).
   2. Base prediction = 1 if P >= threshold, else 0.
   3. If |P - threshold| < conf_margin  AND  DT predicts 1  →  upgrade to 1.
@@ -12,16 +12,13 @@ The hybrid rule mirrors the v3 production model exactly:
 
 Public API
 ----------
-run_hybrid(xgb_pipeline, dt_pipeline, X_test, threshold, conf_margin)
-    Apply the hybrid rule and return (predictions, probabilities).
-
 compute_metrics(y_test, predictions, probabilities)
     Return a dict of recall, precision, f1, roc_auc, confusion_matrix.
 
 threshold_sweep(xgb_pipeline, dt_pipeline, X_test, y_test, thresholds, conf_margin)
-    Run run_hybrid + compute_metrics for every threshold.
-    Returns a list of result dicts sorted by recall (desc), each flagged
-    with whether it meets RECALL_TARGET.
+    Score both models once, then hybrid_labels + compute_metrics for
+    every threshold.  Returns a list of result dicts sorted by recall
+    (desc), each flagged with whether it meets RECALL_TARGET.
 """
 
 from __future__ import annotations
@@ -39,6 +36,7 @@ from sklearn.metrics import (
 from sklearn.pipeline import Pipeline
 
 from config import RECALL_TARGET
+from inference.hybrid import hybrid_labels, model_outputs
 
 # ============================================================================
 # TYPE ALIAS
@@ -51,42 +49,6 @@ SweepResult = list[MetricsDict]
 # PUBLIC API
 # ============================================================================
 
-def run_hybrid(
-    xgb_pipeline: Pipeline,
-    dt_pipeline: Pipeline,
-    X_test: pd.DataFrame,
-    threshold: float,
-    conf_margin: float,
-) -> tuple[np.ndarray, np.ndarray]:
-    """
-    Apply the upgrade-only hybrid rule.
-
-    Parameters
-    ----------
-    xgb_pipeline : fitted sklearn Pipeline
-    dt_pipeline  : fitted sklearn Pipeline
-    X_test       : pd.DataFrame  (same feature columns as training)
-    threshold    : float         Decision threshold for XGBoost probability
-    conf_margin  : float         Low-confidence band half-width
-
-    Returns
-    -------
-    predictions  : np.ndarray, shape (n,)  Final binary predictions
-    probabilities: np.ndarray, shape (n,)  XGBoost P(y=1)
-    """
-    xgb_probs = xgb_pipeline.predict_proba(X_test)[:, 1]
-    xgb_pred  = (xgb_probs >= threshold).astype(int)
-    dt_pred   = dt_pipeline.predict(X_test)
-
-    hybrid_pred = xgb_pred.copy()
-
-    low_conf_mask = np.abs(xgb_probs - threshold) < conf_margin
-    upgrade_mask  = low_conf_mask & (dt_pred == 1) & (xgb_pred == 0)
-    hybrid_pred[upgrade_mask] = 1
-
-    return hybrid_pred, xgb_probs
-
-
 def compute_metrics(
     y_test: pd.Series,
     predictions: np.ndarray,
@@ -157,13 +119,14 @@ def threshold_sweep(
     List of metric dicts (one per threshold), sorted by recall descending.
     Each dict includes a ``threshold`` key.
     """
+    # Model outputs do not depend on the threshold — score once, sweep on arrays
+    outputs = model_outputs(xgb_pipeline, dt_pipeline, X_test)
+
     results: SweepResult = []
 
     for thresh in thresholds:
-        preds, probs = run_hybrid(
-            xgb_pipeline, dt_pipeline, X_test, thresh, conf_margin
-        )
-        metrics = compute_metrics(y_test, preds, probs)
+        preds   = hybrid_labels(outputs.xgb_prob, outputs.dt_pred, thresh, conf_margin)
+        metrics = compute_metrics(y_test, preds, outputs.xgb_prob)
         metrics["threshold"] = thresh
         results.append(metrics)
 
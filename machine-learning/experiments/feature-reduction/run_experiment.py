@@ -127,7 +127,9 @@ def _evaluate_reduced_set(set_name: str, feature_cols: list[str]) -> dict:
     X_train, X_test, y_train, y_test = data_loader.load_data(feature_cols, cfg.DATA_PKL)
 
     print("  Fitting XGBoost pipeline ...", flush=True)
-    xgb_pipeline = trainer.build_and_fit_xgb(X_train, y_train)
+    xgb_pipeline, xgb_telemetry = trainer.build_and_fit_xgb(X_train, y_train)
+    print(f"  Early stopping: {xgb_telemetry['n_estimators']} of "
+          f"{xgb_telemetry['max_rounds']} trees", flush=True)
 
     print("  Fitting Decision Tree pipeline ...", flush=True)
     dt_pipeline = trainer.build_and_fit_dt(X_train, y_train)
@@ -152,6 +154,7 @@ def _evaluate_reduced_set(set_name: str, feature_cols: list[str]) -> dict:
         "sweep":       sweep,
         "best":        best,
         "is_baseline": False,
+        "xgb_training": {k: v for k, v in xgb_telemetry.items() if k != "round_seconds"},
     }
 
 
@@ -13,11 +13,14 @@ Design decisions
 - The preprocessor is built from the project's shared
   ``src/preprocessing/preprocessor.py::build_preprocessor``.  The caller is
   responsible for adding ``src/`` to sys.path before importing this module.
+- XGBoost early-stops on an internal validation split and keeps the trees
+  it needs (``src/training/xgb_fit.py``, no full-data refit);
+  ``n_estimators`` in XGB_PARAMS is only the upper bound.
 - No file I/O is performed here; saving models is the caller's responsibility.
 
 Public API
 ----------
-build_and_fit_xgb(X_train, y_train)  -> fitted sklearn Pipeline
+build_and_fit_xgb(X_train, y_train)  -> (fitted sklearn Pipeline, fit telemetry)
 build_and_fit_dt(X_train, y_train)   -> fitted sklearn Pipeline
 """
 
@@ -33,6 +36,7 @@ from xgboost import XGBClassifier
 # sys.path must include the project's src/ directory before this module is
 # imported — that is handled in run_experiment.py.
 from preprocessing.preprocessor import build_preprocessor
+from training.xgb_fit import fit_xgb_pipeline
 
 from config import DT_PARAMS, XGB_PARAMS
 
@@ -43,7 +47,7 @@ from config import DT_PARAMS, XGB_PARAMS
 def build_and_fit_xgb(
     X_train: pd.DataFrame,
     y_train: pd.Series,
-) -> Pipeline:
+) -> tuple[Pipeline, dict]:
     """
     Build the preprocessor + XGBoost pipeline and fit it on training data.
 
@@ -61,6 +65,8 @@ def build_and_fit_xgb(
     -------
     sklearn.pipeline.Pipeline
         A fitted pipeline with steps ``["preprocess", "model"]``.
+    dict
+        Early-stopping telemetry (best iteration, timings, peak memory).
     """
     scale_pos_weight = _compute_scale_pos_weight(y_train)
 
@@ -69,15 +75,7 @@ def build_and_fit_xgb(
         scale_pos_weight=scale_pos_weight,
     )
 
-    preprocessor = build_preprocessor(X_train)
-
-    pipeline = Pipeline(steps=[
-        ("preprocess", preprocessor),
-        ("model",      xgb),
-    ])
-
-    pipeline.fit(X_train, y_train)
-    return pipeline
+    return fit_xgb_pipeline(build_preprocessor(X_train), xgb, X_train, y_train)
 
 
 def build_and_fit_dt(
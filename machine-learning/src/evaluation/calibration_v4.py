@@ -12,22 +12,33 @@ What this script computes
 - Calibration curve (reliability diagram) using sklearn's calibration_curve
   with n_bins=10, strategy='uniform'.  Raw XGBoost probabilities are used
   (not the hybrid binary predictions) so the full probability range is visible.
+  They are read from the prediction store (prediction_store.py), so no model
+  inference runs here.
 - Brier score: mean squared error between predicted probabilities and true
   binary labels.  Lower is better; < 0.25 is the accepted threshold for a
   useful binary classifier.
 
+With ``--input`` the curve and Brier score are computed for an arbitrary
+labelled scoring file (CSV / parquet) streamed in row chunks through
+streaming_eval.py: the calibration bins and the squared-error sum are
+accumulated per chunk, so memory stays constant and the result equals the
+in-memory computation.
+
 Output
 ------
   machine-learning/src/evaluation/outputs/calibration_plot_v4.png  (300 DPI)
+  machine-learning/src/evaluation/outputs/calibration_plot_v4_<input>.png  (--input)
 
 Usage
 -----
     cd machine-learning
     python src/evaluation/calibration_v4.py
+    python src/evaluation/calibration_v4.py --input clinic_export.csv
 """
 
 from __future__ import annotations
 
+import argparse
 import sys
 from pathlib import Path
 
@@ -38,13 +49,13 @@ import numpy as np
 from sklearn.calibration import calibration_curve
 from sklearn.metrics import brier_score_loss
 
-# ── Import shared helpers from evaluate_v4 ───────────────────────────────────
+# ── Import shared helpers from the prediction store ──────────────────────────
 # Both scripts live in the same package directory; a direct sibling import works
 # regardless of whether the package has an __init__.py.
 _HERE = Path(__file__).resolve().parent
 sys.path.insert(0, str(_HERE))
 
-from evaluate_v4 import load_artifacts, hybrid_predict  # noqa: E402
+from prediction_store import load_predictions  # noqa: E402
 
 # ============================================================================
 # CONFIG
@@ -62,36 +73,54 @@ DPI              = 300
 # CALIBRATION ANALYSIS
 # ============================================================================
 
-def run_calibration() -> None:
+def _streamed_calibration(input_path: Path, chunksize: int) -> tuple[np.ndarray, np.ndarray, float, int, int]:
+    """Calibration curve + Brier score accumulated chunk by chunk over ``input_path``."""
+    from streaming_eval import N_CAL_BINS, run
+
+    print(f"\nStreaming {input_path} in chunks of {chunksize} rows ...", flush=True)
+    metrics, stats, _ = run(input_path, "v4", chunksize=chunksize)
+    if not metrics["n_labelled"]:
+        sys.exit(f"[ERROR] {input_path} has no HIGH_RISK_DISCONTINUE column")
+    print(f"  {stats['rows']} rows in {stats['chunks']} chunk(s), peak RSS {stats['peak_rss_mb']} MB")
+    if N_CAL_BINS != N_BINS:
+        sys.exit(f"[ERROR] streaming_eval bins ({N_CAL_BINS}) differ from N_BINS ({N_BINS})")
+    curve = metrics["calibration"]
+    return (np.array(curve["prob_true"]), np.array(curve["prob_pred"]), metrics["brier"],
+            metrics["n_labelled"], metrics["n_pos"])
+
+
+def run_calibration(input_path: Path | None = None, chunksize: int = 20_000) -> None:
     print("=" * 62)
     print("  ContraceptIQ — Calibration Analysis (V4 Hybrid Model)")
     print("=" * 62)
 
-    # ── Load artifacts ────────────────────────────────────────────────────────
-    print("\nLoading artifacts ...", flush=True)
-    X_test, y_test, xgb_pipe, dt_pipe, cfg = load_artifacts()
-
-    threshold   = cfg["threshold_v4"]
-    conf_margin = cfg["conf_margin_v4"]
-    n_test      = len(y_test)
-    n_pos       = int(y_test.sum())
-
-    # ── Run hybrid inference to get raw XGBoost probabilities ─────────────────
-    print(f"Running hybrid inference on {n_test} rows ...", flush=True)
-    _, xgb_probs = hybrid_predict(xgb_pipe, dt_pipe, X_test, threshold, conf_margin)
-
-    # ── Calibration curve ─────────────────────────────────────────────────────
-    print(f"Computing calibration curve (n_bins={N_BINS}, strategy='{STRATEGY}') ...",
-          flush=True)
-    fraction_of_positives, mean_predicted_prob = calibration_curve(
-        y_test,
-        xgb_probs,
-        n_bins=N_BINS,
-        strategy=STRATEGY,
-    )
+    if input_path is not None:
+        fraction_of_positives, mean_predicted_prob, brier, n_test, n_pos = (
+            _streamed_calibration(input_path, chunksize))
+        output_png = OUTPUT_PNG.with_name(f"{OUTPUT_PNG.stem}_{input_path.name.split('.')[0]}.png")
+    else:
+        # ── Load stored test-set predictions ──────────────────────────────────
+        print("\nLoading prediction store ...", flush=True)
+        preds     = load_predictions("v4", "test")
+        y_test    = preds["y_true"]
+        xgb_probs = preds["xgb_prob"]
+        n_test    = len(y_test)
+        n_pos     = int(y_test.sum())
+
+        # ── Calibration curve ─────────────────────────────────────────────────
+        print(f"Computing calibration curve (n_bins={N_BINS}, strategy='{STRATEGY}') ...",
+              flush=True)
+        fraction_of_positives, mean_predicted_prob = calibration_curve(
+            y_test,
+            xgb_probs,
+            n_bins=N_BINS,
+            strategy=STRATEGY,
+        )
+
+        # ── Brier score ───────────────────────────────────────────────────────
+        brier = float(brier_score_loss(y_test, xgb_probs))
+        output_png = OUTPUT_PNG
 
-    # ── Brier score ───────────────────────────────────────────────────────────
-    brier = float(brier_score_loss(y_test, xgb_probs))
     well_calibrated = brier < BRIER_THRESHOLD
 
     # ── Plot ──────────────────────────────────────────────────────────────────
@@ -131,9 +160,9 @@ def run_calibration() -> None:
     ax.grid(True, linestyle=":", alpha=0.5)
     fig.tight_layout()
 
-    fig.savefig(OUTPUT_PNG, dpi=DPI)
+    fig.savefig(output_png, dpi=DPI)
     plt.close(fig)
-    print(f"\nPlot saved: {OUTPUT_PNG}")
+    print(f"\nPlot saved: {output_png}")
 
     # ── Summary ───────────────────────────────────────────────────────────────
     calibration_verdict = (
@@ -160,4 +189,9 @@ def run_calibration() -> None:
 # ============================================================================
 
 if __name__ == "__main__":
-    run_calibration()
+    parser = argparse.ArgumentParser(description="Calibration analysis of the v4 hybrid model.")
+    parser.add_argument("--input", type=Path, default=None,
+                        help="stream this labelled CSV / parquet instead of the stored test split")
+    parser.add_argument("--chunksize", type=int, default=20_000, help="rows per chunk with --input")
+    args = parser.parse_args()
+    run_calibration(args.input, args.chunksize)
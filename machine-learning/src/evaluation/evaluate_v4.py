@@ -3,19 +3,28 @@ evaluate_v4.py
 
 Standalone evaluation script for the v4 hybrid XGBoost + Decision Tree model.
 
-Loads the production joblib pipelines and the 30% held-out test split from
-`discontinuation_design1_data_v2.pkl`, runs hybrid inference, and prints:
+Reads the held-out test predictions of the production joblib pipelines from
+the prediction store (`prediction_store.py`, built on first use from the 30%
+held-out split of `discontinuation_design1_data_v2.pkl`), applies the hybrid
+rule as an array operation, and prints:
 
   - Recall
   - Precision
   - F-beta  (β=2, recall-weighted — consistent with the tuning objective)
   - ROC-AUC
   - Confusion matrix  (TP / FP / TN / FN)
+  - 95% bootstrap CI for recall
 
 Inference configuration (threshold, conf_margin, feature list) is read from
 `hybrid_v4_config.json` at runtime so the script stays in sync with whatever
 is currently deployed.
 
+With ``--input`` the same report is produced for an arbitrary scoring file
+(CSV / parquet with the 9 features and HIGH_RISK_DISCONTINUE), streamed in
+row chunks through streaming_eval.py so memory stays constant however large
+the file is.  ROC-AUC is then the histogram approximation and there is no
+bootstrap CI (it needs every row in memory).
+
 Usage
 -----
     # From any working directory:
@@ -23,12 +32,15 @@ Usage
 
     # Or from the machine-learning/ root:
     python src/evaluation/evaluate_v4.py
+    python src/evaluation/evaluate_v4.py --input clinic_export.csv --chunksize 50000
 
-No files are written.  No models are trained.  All inputs are read-only.
+No models are trained.  The only file ever written is the prediction store,
+and only when it is missing or stale.
 """
 
 from __future__ import annotations
 
+import argparse
 import json
 import sys
 from pathlib import Path
@@ -45,6 +57,14 @@ from sklearn.metrics import (
 )
 from sklearn.pipeline import Pipeline
 
+# Sibling import (same pattern as calibration_v4.py); src/ for the shared hybrid rule
+_HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(_HERE))
+sys.path.insert(0, str(_HERE.parent))
+
+from inference.hybrid import hybrid_labels  # noqa: E402
+from prediction_store import bootstrap_ci, load_predictions  # noqa: E402
+
 # ============================================================================
 # PATHS
 # ============================================================================
@@ -53,7 +73,6 @@ from sklearn.pipeline import Pipeline
 # parents[0] = evaluation/
 # parents[1] = src/
 # parents[2] = machine-learning/
-_HERE    = Path(__file__).resolve().parent
 _ML_ROOT = _HERE.parents[1]
 
 DATA_PKL    = _ML_ROOT / "data" / "processed" / "discontinuation_design1_data_v2.pkl"
@@ -111,49 +130,6 @@ def load_artifacts() -> tuple[pd.DataFrame, pd.Series, Pipeline, Pipeline, dict]
     return X_test, y_test, xgb_pipe, dt_pipe, cfg
 
 
-# ============================================================================
-# HYBRID INFERENCE
-# ============================================================================
-
-def hybrid_predict(
-    xgb_pipe:   Pipeline,
-    dt_pipe:    Pipeline,
-    X:          pd.DataFrame,
-    threshold:  float,
-    conf_margin: float,
-) -> tuple[np.ndarray, np.ndarray]:
-    """Apply the upgrade-only hybrid inference rule.
-
-    XGBoost is the primary classifier.  Where its probability falls within the
-    low-confidence band  (|p − threshold| < conf_margin)  and the Decision
-    Tree independently predicts HIGH (1), the label is upgraded to HIGH.
-    XGBoost predictions already at or above the threshold are never downgraded.
-
-    Parameters
-    ----------
-    xgb_pipe    : fitted XGBoost Pipeline
-    dt_pipe     : fitted Decision Tree Pipeline
-    X           : feature DataFrame (9 reduced_C columns)
-    threshold   : XGBoost classification threshold
-    conf_margin : half-width of the low-confidence band
-
-    Returns
-    -------
-    hybrid_preds : (n,) int array  — final binary predictions
-    xgb_probs    : (n,) float array — raw XGBoost probabilities (used for AUC)
-    """
-    xgb_probs: np.ndarray = xgb_pipe.predict_proba(X)[:, 1]
-    xgb_preds: np.ndarray = (xgb_probs >= threshold).astype(int)
-    dt_preds:  np.ndarray = dt_pipe.predict(X)
-
-    hybrid_preds = xgb_preds.copy()
-    low_conf_mask = np.abs(xgb_probs - threshold) < conf_margin
-    upgrade_mask  = low_conf_mask & (dt_preds == 1) & (xgb_preds == 0)
-    hybrid_preds[upgrade_mask] = 1
-
-    return hybrid_preds, xgb_probs
-
-
 # ============================================================================
 # METRIC COMPUTATION
 # ============================================================================
@@ -212,6 +188,7 @@ def print_report(
     cfg:       dict,
     n_test:    int,
     n_pos:     int,
+    dataset:   str | None = None,
 ) -> None:
     """Print a formatted evaluation report to stdout.
 
@@ -221,6 +198,10 @@ def print_report(
     cfg     : parsed hybrid_v4_config.json
     n_test  : total number of test rows
     n_pos   : number of positive (class-1) examples in the test set
+    dataset : label of the scored data (default: the data pickle)
+
+    ``metrics`` may carry ``recall_ci`` (lo, hi) from the bootstrap and
+    ``brier`` from the streaming evaluation.
     """
     threshold   = cfg["threshold_v4"]
     conf_margin = cfg["conf_margin_v4"]
@@ -232,14 +213,19 @@ def print_report(
     print()
     print(divider)
     print("  V4 Hybrid Model - Evaluation Report")
-    print(f"  Dataset    : {DATA_PKL.relative_to(_ML_ROOT)}")
+    print(f"  Dataset    : {dataset or DATA_PKL.relative_to(_ML_ROOT)}")
     print(f"  Test set   : {n_test} rows  |  Positives: {n_pos}  ({pos_pct:.2f}%)")
     print(f"  Threshold  : {threshold}  |  Conf margin: {conf_margin}  |  F-beta b={FBETA_BETA:.1f}")
     print(divider)
     print(f"  Recall              :  {metrics['recall']:.4f}")
+    if "recall_ci" in metrics:
+        lo, hi = metrics["recall_ci"]
+        print(f"  Recall 95% CI       :  [{lo:.4f}, {hi:.4f}]")
     print(f"  Precision           :  {metrics['precision']:.4f}")
     print(f"  F-beta  (b={FBETA_BETA:.2f})    :  {metrics['fbeta']:.4f}")
     print(f"  ROC-AUC             :  {metrics['roc_auc']:.4f}")
+    if "brier" in metrics:
+        print(f"  Brier score         :  {metrics['brier']:.6f}")
     print()
     print("  Confusion Matrix")
     print("  +-----------------------------+")
@@ -256,22 +242,52 @@ def print_report(
 # MAIN
 # ============================================================================
 
+def main_streaming(input_path: Path, chunksize: int) -> None:
+    """Stream ``input_path`` through the hybrid engine and print the same report."""
+    from streaming_eval import run
+
+    print(f"[evaluate_v4] Streaming {input_path} in chunks of {chunksize} rows ...", flush=True)
+    metrics, stats, cfg = run(input_path, "v4", chunksize=chunksize)
+    if not metrics["n_labelled"]:
+        sys.exit(f"[ERROR] {input_path} has no HIGH_RISK_DISCONTINUE column to evaluate against")
+    print(f"[evaluate_v4] Scored {stats['rows']} rows in {stats['chunks']} chunk(s), "
+          f"{stats['seconds']:.1f}s, peak RSS {stats['peak_rss_mb']} MB", flush=True)
+
+    print_report(metrics, cfg, metrics["n_labelled"], metrics["n_pos"], dataset=str(input_path))
+
+
 def main() -> None:
-    """Load artifacts, run hybrid inference, compute metrics, print report."""
-    print("[evaluate_v4] Loading artifacts ...", flush=True)
-    X_test, y_test, xgb_pipe, dt_pipe, cfg = load_artifacts()
+    """Load stored predictions, apply the hybrid rule, compute metrics, print report."""
+    parser = argparse.ArgumentParser(description="Evaluate the v4 hybrid model.")
+    parser.add_argument("--input", type=Path, default=None,
+                        help="stream this CSV / parquet instead of the stored test split")
+    parser.add_argument("--chunksize", type=int, default=20_000, help="rows per chunk with --input")
+    args = parser.parse_args()
+    if args.input is not None:
+        main_streaming(args.input, args.chunksize)
+        return
+
+    print("[evaluate_v4] Loading prediction store ...", flush=True)
+    if not CONFIG_JSON.exists():
+        sys.exit(f"[ERROR] Config not found: {CONFIG_JSON}")
+    with CONFIG_JSON.open() as f:
+        cfg = json.load(f)
+
+    preds = load_predictions("v4", "test")
+    y_true = preds["y_true"]
 
-    n_test = len(y_test)
-    n_pos  = int(y_test.sum())
+    n_test = len(y_true)
+    n_pos  = int(y_true.sum())
 
     threshold   = cfg["threshold_v4"]
     conf_margin = cfg["conf_margin_v4"]
 
-    print(f"[evaluate_v4] Running hybrid inference on {n_test} rows ...", flush=True)
-    preds, probs = hybrid_predict(xgb_pipe, dt_pipe, X_test, threshold, conf_margin)
+    print(f"[evaluate_v4] Applying hybrid rule to {n_test} stored rows ...", flush=True)
+    hybrid = hybrid_labels(preds["xgb_prob"], preds["dt_pred"], threshold, conf_margin)
 
     print("[evaluate_v4] Computing metrics ...", flush=True)
-    metrics = compute_metrics(y_test, preds, probs)
+    metrics = compute_metrics(y_true, hybrid, preds["xgb_prob"])
+    metrics["recall_ci"] = bootstrap_ci(y_true, hybrid, "recall")
 
     print_report(metrics, cfg, n_test, n_pos)
 
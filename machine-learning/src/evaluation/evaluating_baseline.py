@@ -1,5 +1,6 @@
+import sys
+
 import joblib
-import numpy as np
 from sklearn.metrics import (
     classification_report,
     confusion_matrix,
@@ -9,6 +10,10 @@ from sklearn.metrics import (
     roc_auc_score
 )
 
+# Shared hybrid rule (machine-learning/src/inference/hybrid.py)
+sys.path.insert(0, "src")
+from inference.hybrid import HybridEngine
+
 # --------------------------
 # LOAD DATA
 # --------------------------
@@ -40,20 +45,6 @@ except Exception:
     THRESH_XGB = 0.20
     CONF_MARGIN = 0.15
 
-# --------------------------
-# HELPER FUNCTION FOR HYBRID
-# --------------------------
-def hybrid_predict(xgb_pipeline, dt_pipeline, X):
-    """Apply the upgrade-only hybrid rule"""
-    xgb_probs = xgb_pipeline.predict_proba(X)[:, 1]
-    xgb_pred = (xgb_probs >= THRESH_XGB).astype(int)
-    dt_pred = dt_pipeline.predict(X)
-    hybrid_pred = xgb_pred.copy()
-    low_conf_mask = np.abs(xgb_probs - THRESH_XGB) < CONF_MARGIN
-    upgrade_mask = (low_conf_mask) & (dt_pred == 1)
-    hybrid_pred[upgrade_mask] = 1
-    return hybrid_pred
-
 # --------------------------
 # EVALUATE MODELS
 # --------------------------
@@ -81,8 +72,7 @@ for name, model in models.items():
     })
 
 # Evaluate Hybrid (upgrade-only rule)
-hybrid_pred = hybrid_predict(xgb_pipeline, dt_pipeline, X_test)
-hybrid_probs = xgb_pipeline.predict_proba(X_test)[:, 1]
+hybrid_pred, hybrid_probs = HybridEngine(xgb_pipeline, dt_pipeline, THRESH_XGB, CONF_MARGIN).labels(X_test)
 
 hybrid_precision = precision_score(y_test, hybrid_pred)
 hybrid_recall = recall_score(y_test, hybrid_pred)
@@ -0,0 +1,436 @@
+"""
+prediction_store.py
+
+Persistent out-of-fold (OOF) and held-out prediction store for the hybrid
+XGBoost + Decision Tree models.
+
+Every analysis of the hybrid model (threshold sweeps, calibration, bootstrap
+confidence intervals, evaluation reports) only needs three columns per row:
+the raw XGBoost probability, the Decision Tree label and the true label.
+This module computes those columns ONCE per model version and split and
+persists them, so downstream scripts run as pure array operations with no
+model inference.
+
+Storage layout
+--------------
+One columnar ``.npz`` file per (model version, split):
+
+    machine-learning/data/predictions/<version>_<split>.npz
+
+Columns (one array each, aligned by position):
+    row_id   : int64    index label of the row in the source DataFrame
+    y_true   : int8     HIGH_RISK_DISCONTINUE
+    xgb_prob : float64  XGBoost P(y=1)
+    dt_pred  : int8     Decision Tree label
+    fold     : int16    outer CV fold for "oof", -1 for "test"
+
+plus a ``meta`` entry holding a JSON string (model fingerprints, fold
+settings, creation timestamp).
+
+Splits
+------
+test : the 30% held-out split of discontinuation_design1_data_v2.pkl scored
+       with the deployed pipelines.
+oof  : stratified 10-fold out-of-fold predictions over the training split.
+       Each fold refits clones of the deployed pipelines, so the OOF
+       columns describe exactly the production model specification.
+
+Usage
+-----
+    cd machine-learning
+    python src/evaluation/prediction_store.py                 # v4, all splits
+    python src/evaluation/prediction_store.py --split test
+    python src/evaluation/prediction_store.py --rebuild
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+# This file lives at:  machine-learning/src/evaluation/prediction_store.py
+_HERE    = Path(__file__).resolve().parent
+_ML_ROOT = _HERE.parents[1]
+
+DATA_PKL  = _ML_ROOT / "data" / "processed" / "discontinuation_design1_data_v2.pkl"
+STORE_DIR = _ML_ROOT / "data" / "predictions"
+
+if str(_HERE.parent) not in sys.path:
+    sys.path.insert(0, str(_HERE.parent))
+
+from inference.hybrid import hybrid_labels, model_outputs  # noqa: E402
+
+# ============================================================================
+# MODEL REGISTRY
+# ============================================================================
+
+MODEL_VERSIONS: dict[str, dict] = {
+    "v4": {
+        "model_dir":       _ML_ROOT / "src" / "models" / "models_high_risk_v4",
+        "config_file":     "hybrid_v4_config.json",
+        "threshold_key":   "threshold_v4",
+        "conf_margin_key": "conf_margin_v4",
+    },
+}
+
+SPLITS = ("test", "oof")
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+OOF_FOLDS:   int = 10
+RANDOM_SEED: int = 42
+BOOTSTRAP_N: int = 1000
+
+COLUMNS = ("row_id", "y_true", "xgb_prob", "dt_pred", "fold")
+
+
+# ============================================================================
+# REGISTRY HELPERS
+# ============================================================================
+
+def _version_spec(version: str) -> dict:
+    if version not in MODEL_VERSIONS:
+        raise ValueError(
+            f"Unknown model version '{version}'. "
+            f"Known versions: {sorted(MODEL_VERSIONS)}"
+        )
+    return MODEL_VERSIONS[version]
+
+
+def load_config(version: str) -> dict:
+    """Return the parsed hybrid config JSON for ``version``."""
+    spec = _version_spec(version)
+    with open(spec["model_dir"] / spec["config_file"]) as f:
+        return json.load(f)
+
+
+def operating_point(version: str) -> tuple[float, float]:
+    """Return the deployed (threshold, conf_margin) for ``version``."""
+    spec = _version_spec(version)
+    cfg  = load_config(version)
+    return float(cfg[spec["threshold_key"]]), float(cfg[spec["conf_margin_key"]])
+
+
+def store_path(version: str, split: str) -> Path:
+    if split not in SPLITS:
+        raise ValueError(f"Unknown split '{split}'. Expected one of {SPLITS}")
+    return STORE_DIR / f"{version}_{split}.npz"
+
+
+def _model_paths(version: str) -> tuple[Path, Path]:
+    spec = _version_spec(version)
+    cfg  = load_config(version)
+    model_dir = spec["model_dir"]
+    return (
+        model_dir / cfg.get("xgb_model_file", "xgb_high_recall.joblib"),
+        model_dir / cfg.get("dt_model_file",  "dt_high_recall.joblib"),
+    )
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _fingerprint(version: str) -> dict[str, str]:
+    """sha256 of every input the stored columns depend on."""
+    xgb_path, dt_path = _model_paths(version)
+    return {
+        "xgb_model": _sha256(xgb_path),
+        "dt_model":  _sha256(dt_path),
+        "data":      _sha256(DATA_PKL),
+    }
+
+
+# ============================================================================
+# BUILDING
+# ============================================================================
+
+def _load_split_data(version: str):
+    features = load_config(version)["features"]
+    X_train_full, X_test_full, y_train, y_test = joblib.load(DATA_PKL)
+    return (
+        X_train_full[features].copy(),
+        X_test_full[features].copy(),
+        y_train,
+        y_test,
+    )
+
+
+def _write(version: str, split: str, columns: dict[str, np.ndarray], meta: dict) -> Path:
+    path = store_path(version, split)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.stem + ".tmp.npz")
+    np.savez_compressed(tmp_path, meta=np.array(json.dumps(meta)), **columns)
+    tmp_path.replace(path)
+    return path
+
+
+def build_test(version: str = "v4") -> Path:
+    """Score the held-out test split with the deployed pipelines and persist it."""
+    xgb_path, dt_path = _model_paths(version)
+    xgb_pipe = joblib.load(xgb_path)
+    dt_pipe  = joblib.load(dt_path)
+
+    _, X_test, _, y_test = _load_split_data(version)
+
+    print(f"[store] {version}/test: scoring {len(y_test)} rows ...", flush=True)
+    outputs = model_outputs(xgb_pipe, dt_pipe, X_test)
+    columns = {
+        "row_id":   np.asarray(X_test.index, dtype=np.int64),
+        "y_true":   np.asarray(y_test, dtype=np.int8),
+        "xgb_prob": outputs.xgb_prob.astype(np.float64),
+        "dt_pred":  outputs.dt_pred.astype(np.int8),
+        "fold":     np.full(len(y_test), -1, dtype=np.int16),
+    }
+    meta = {
+        "version":      version,
+        "split":        "test",
+        "n_rows":       len(y_test),
+        "fingerprint":  _fingerprint(version),
+        "created":      datetime.now(timezone.utc).isoformat(),
+    }
+    path = _write(version, "test", columns, meta)
+    print(f"[store] Saved -> {path}", flush=True)
+    return path
+
+
+def build_oof(version: str = "v4", n_folds: int = OOF_FOLDS,
+              seed: int = RANDOM_SEED) -> Path:
+    """
+    Stratified K-fold out-of-fold predictions over the training split.
+
+    Each fold fits unfitted clones of the deployed pipelines, so the
+    preprocessing and hyperparameters are exactly those in production.
+    XGBoost's ``scale_pos_weight`` is recomputed from each fold's labels,
+    matching how the production model was trained.
+    """
+    from sklearn.base import clone
+    from sklearn.model_selection import StratifiedKFold
+
+    xgb_path, dt_path = _model_paths(version)
+    xgb_template = joblib.load(xgb_path)
+    dt_template  = joblib.load(dt_path)
+
+    X_train, _, y_train, _ = _load_split_data(version)
+    y_arr = np.asarray(y_train)
+    n = len(y_arr)
+
+    xgb_prob = np.empty(n, dtype=np.float64)
+    dt_pred  = np.empty(n, dtype=np.int8)
+    fold_id  = np.empty(n, dtype=np.int16)
+
+    kf = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    for fold_idx, (fit_idx, oof_idx) in enumerate(kf.split(X_train, y_arr)):
+        X_fit, y_fit = X_train.iloc[fit_idx], y_train.iloc[fit_idx]
+        X_oof        = X_train.iloc[oof_idx]
+
+        n_pos = int((y_fit == 1).sum())
+        n_neg = int((y_fit == 0).sum())
+
+        xgb_pipe = clone(xgb_template)
+        xgb_pipe.set_params(model__scale_pos_weight=n_neg / n_pos)
+        xgb_pipe.fit(X_fit, y_fit)
+
+        dt_pipe = clone(dt_template)
+        dt_pipe.fit(X_fit, y_fit)
+
+        outputs = model_outputs(xgb_pipe, dt_pipe, X_oof)
+        xgb_prob[oof_idx] = outputs.xgb_prob
+        dt_pred[oof_idx]  = outputs.dt_pred
+        fold_id[oof_idx]  = fold_idx
+
+        print(f"[store] {version}/oof: fold {fold_idx:02d} done "
+              f"({len(oof_idx)} rows)", flush=True)
+
+    columns = {
+        "row_id":   np.asarray(X_train.index, dtype=np.int64),
+        "y_true":   y_arr.astype(np.int8),
+        "xgb_prob": xgb_prob,
+        "dt_pred":  dt_pred,
+        "fold":     fold_id,
+    }
+    meta = {
+        "version":     version,
+        "split":       "oof",
+        "n_rows":      n,
+        "n_folds":     n_folds,
+        "seed":        seed,
+        "fingerprint": _fingerprint(version),
+        "created":     datetime.now(timezone.utc).isoformat(),
+    }
+    path = _write(version, "oof", columns, meta)
+    print(f"[store] Saved -> {path}", flush=True)
+    return path
+
+
+_BUILDERS = {"test": build_test, "oof": build_oof}
+
+
+# ============================================================================
+# LOADING
+# ============================================================================
+
+def load_predictions(
+    version: str = "v4",
+    split: str = "test",
+    build_if_missing: bool = True,
+) -> dict[str, np.ndarray]:
+    """
+    Load the stored prediction columns for ``version`` / ``split``.
+
+    The store is (re)built when it is missing or its fingerprint no longer
+    matches the model files and data pickle, unless ``build_if_missing`` is
+    False, in which case FileNotFoundError is raised instead.
+
+    Returns
+    -------
+    dict mapping each name in COLUMNS to its array, plus ``"meta"`` (dict).
+    """
+    path = store_path(version, split)
+
+    if path.exists():
+        preds = _read(path)
+        if preds["meta"].get("fingerprint") == _fingerprint(version):
+            return preds
+        reason = "stale (model or data changed)"
+    else:
+        reason = "missing"
+
+    if not build_if_missing:
+        raise FileNotFoundError(
+            f"Prediction store {path} is {reason}. "
+            "Run src/evaluation/prediction_store.py to rebuild it."
+        )
+
+    print(f"[store] {path.name} is {reason} — rebuilding ...", flush=True)
+    _BUILDERS[split](version)
+    return _read(path)
+
+
+def _read(path: Path) -> dict:
+    with np.load(path, allow_pickle=False) as npz:
+        preds = {name: npz[name] for name in COLUMNS}
+        preds["meta"] = json.loads(str(npz["meta"]))
+    return preds
+
+
+# ============================================================================
+# ARRAY OPERATIONS
+# ============================================================================
+
+def confusion_counts(y_true: np.ndarray, y_pred: np.ndarray) -> dict[str, int]:
+    y_true = y_true.astype(bool)
+    y_pred = y_pred.astype(bool)
+    return {
+        "tp": int(np.count_nonzero(y_true & y_pred)),
+        "fp": int(np.count_nonzero(~y_true & y_pred)),
+        "tn": int(np.count_nonzero(~y_true & ~y_pred)),
+        "fn": int(np.count_nonzero(y_true & ~y_pred)),
+    }
+
+
+def sweep_thresholds(
+    preds: dict[str, np.ndarray],
+    thresholds: list[float],
+    conf_margin: float,
+    beta: float = 2.0,
+) -> list[dict]:
+    """
+    Recall / precision / F-beta of the hybrid rule at every threshold.
+
+    Pure array operation over the stored columns — no model inference.
+    """
+    y = preds["y_true"]
+    results = []
+    for t in thresholds:
+        c = confusion_counts(y, hybrid_labels(preds["xgb_prob"], preds["dt_pred"], t, conf_margin))
+        recall    = c["tp"] / (c["tp"] + c["fn"]) if c["tp"] + c["fn"] else 0.0
+        precision = c["tp"] / (c["tp"] + c["fp"]) if c["tp"] + c["fp"] else 0.0
+        b2 = beta * beta
+        denom = b2 * precision + recall
+        fbeta = (1 + b2) * precision * recall / denom if denom else 0.0
+        results.append({
+            "threshold": t,
+            "recall":    recall,
+            "precision": precision,
+            "fbeta":     fbeta,
+            **c,
+        })
+    return results
+
+
+def bootstrap_ci(
+    y_true: np.ndarray,
+    y_pred: np.ndarray,
+    metric: str = "recall",
+    n: int = BOOTSTRAP_N,
+    seed: int = RANDOM_SEED,
+    alpha: float = 0.05,
+) -> tuple[float, float]:
+    """
+    Row-level bootstrap CI for recall or precision.
+
+    All ``n`` resamples are drawn as one (n, n_rows) index matrix and the
+    confusion counts are reduced along axis 1, so the whole bootstrap is a
+    handful of vectorised NumPy calls.
+    """
+    if metric not in ("recall", "precision"):
+        raise ValueError("metric must be 'recall' or 'precision'")
+
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(y_true), size=(n, len(y_true)))
+    yt  = y_true.astype(bool)[idx]
+    yp  = y_pred.astype(bool)[idx]
+
+    tp = np.count_nonzero(yt & yp, axis=1)
+    if metric == "recall":
+        denom = np.count_nonzero(yt, axis=1)
+    else:
+        denom = np.count_nonzero(yp, axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = np.where(denom > 0, tp / np.maximum(denom, 1), 0.0)
+
+    lo = float(np.percentile(values, 100 * alpha / 2))
+    hi = float(np.percentile(values, 100 * (1 - alpha / 2)))
+    return lo, hi
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the hybrid prediction store")
+    parser.add_argument("--version", default="v4", choices=sorted(MODEL_VERSIONS))
+    parser.add_argument("--split", default="all", choices=("all",) + SPLITS)
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Rebuild even if an up-to-date store exists")
+    args = parser.parse_args()
+
+    splits = SPLITS if args.split == "all" else (args.split,)
+    for split in splits:
+        path = store_path(args.version, split)
+        if path.exists() and not args.rebuild:
+            preds = load_predictions(args.version, split)
+            print(f"[store] {path.name} up to date "
+                  f"({preds['meta']['n_rows']} rows)", flush=True)
+            continue
+        _BUILDERS[split](args.version)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+streaming_eval.py
+
+Chunked, constant-memory evaluation of a hybrid model version on scoring sets
+of any size (a full national survey, a multi-year clinic export, ...).
+
+The input is read in row chunks; every chunk is scored with the shared hybrid
+engine (src/inference/hybrid.py) and folded into fixed-size accumulators,
+then dropped.  Nothing grows with the number of rows:
+
+    confusion counts   tp / fp / tn / fn of the hybrid labels   (4 ints)
+    calibration bins   N_CAL_BINS uniform bins of the XGBoost probability:
+                       row count, sum of probabilities, sum of labels
+                       (binned exactly like sklearn's calibration_curve)
+    Brier score        running sum of (p - y)^2
+    ROC-AUC            per-class histograms over AUC_BINS probability bins;
+                       pairs in the same bin count as ties, so the error is
+                       bounded by the fraction of pos/neg pairs sharing a bin
+                       (1e-4 wide by default)
+
+Recall / precision / F-beta / confusion matrix / Brier are exact; ROC-AUC is
+the histogram approximation.  Inputs without the target column are scored
+without the label-dependent metrics (predicted-positive rate and mean
+probability only).
+
+Inputs
+------
+    --input data.csv[.gz]    read with pandas.read_csv(chunksize=...)
+    --input data.parquet     read by row batches (needs pyarrow)
+    (no --input)             the held-out test split of the data pickle,
+                             sliced into chunks (for checking against
+                             evaluate_v4.py)
+
+Usage
+-----
+    cd machine-learning
+    python src/evaluation/streaming_eval.py
+    python src/evaluation/streaming_eval.py --input clinic_export.csv --chunksize 50000
+    python src/evaluation/streaming_eval.py --input survey.parquet --backend compiled --output eval.json
+    python src/evaluation/streaming_eval.py --check-csv     # CSV round trip of the data pickle scores identically
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Sibling import (same pattern as calibration_v4.py); src/ for the shared engine
+_HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(_HERE))
+sys.path.insert(0, str(_HERE.parent))
+
+from inference import FeatureSchema, load_hybrid  # noqa: E402
+from inference.hybrid import HybridEngine  # noqa: E402
+from prediction_store import DATA_PKL, MODEL_VERSIONS, load_config, operating_point  # noqa: E402
+from training.xgb_fit import peak_rss_mb  # noqa: E402
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+TARGET            = "HIGH_RISK_DISCONTINUE"
+DEFAULT_CHUNKSIZE = 20_000
+N_CAL_BINS        = 10          # as calibration_v4.py (strategy='uniform')
+AUC_BINS          = 10_000
+FBETA_BETA        = 2.0
+RECALL_TARGET     = 0.90
+BACKENDS          = ("joblib", "compiled")
+# CSV cells read as missing.  Categorical answers only treat an empty cell as
+# missing: the fitted categories include whitespace-only answers (' ', '  ' =
+# not applicable) that pandas' default NA handling and skipinitialspace lose.
+CATEGORICAL_NA    = [""]
+NUMERIC_NA        = ["", "NA", "N/A", "NaN", "nan", "null", "NULL"]
+
+
+# ============================================================================
+# ACCUMULATOR
+# ============================================================================
+
+class StreamingMetrics:
+    """
+    Fixed-size accumulators for the hybrid metrics.
+
+    ``update`` folds one chunk in; ``merge`` combines accumulators built on
+    disjoint parts of the input; ``result`` turns the counts into metrics.
+    """
+
+    def __init__(self, n_cal_bins: int = N_CAL_BINS, auc_bins: int = AUC_BINS):
+        self.n_cal_bins = int(n_cal_bins)
+        self.auc_bins   = int(auc_bins)
+        self._cal_edges = np.linspace(0.0, 1.0, self.n_cal_bins + 1)[1:-1]
+
+        self.n_rows      = 0
+        self.n_labelled  = 0
+        self.n_predicted = 0                                  # hybrid positives
+        self.prob_sum    = 0.0
+        self.confusion   = np.zeros(4, dtype=np.int64)        # tp, fp, tn, fn
+        self.brier_sum   = 0.0
+        self.cal_count   = np.zeros(self.n_cal_bins, dtype=np.int64)
+        self.cal_prob    = np.zeros(self.n_cal_bins, dtype=np.float64)
+        self.cal_pos     = np.zeros(self.n_cal_bins, dtype=np.int64)
+        self.prob_hist   = np.zeros((2, self.auc_bins), dtype=np.int64)   # rows: y=0, y=1
+
+    def _auc_bin(self, prob: np.ndarray) -> np.ndarray:
+        return np.minimum((prob * self.auc_bins).astype(np.intp), self.auc_bins - 1)
+
+    def update(self, prob: np.ndarray, pred: np.ndarray, y_true: np.ndarray | None = None) -> None:
+        """Fold one chunk: XGBoost probabilities, hybrid labels, optional true labels."""
+        prob = np.asarray(prob, dtype=np.float64)
+        pred = np.asarray(pred).astype(bool)
+        self.n_rows      += len(prob)
+        self.n_predicted += int(np.count_nonzero(pred))
+        self.prob_sum    += float(prob.sum())
+        if y_true is None:
+            return
+
+        y = np.asarray(y_true).astype(bool)
+        self.n_labelled += len(y)
+        self.confusion += (
+            np.count_nonzero(y & pred), np.count_nonzero(~y & pred),
+            np.count_nonzero(~y & ~pred), np.count_nonzero(y & ~pred),
+        )
+        self.brier_sum += float(np.square(prob - y).sum())
+
+        cal_bin = np.searchsorted(self._cal_edges, prob)      # == calibration_curve binning
+        self.cal_count += np.bincount(cal_bin, minlength=self.n_cal_bins)
+        self.cal_prob  += np.bincount(cal_bin, weights=prob, minlength=self.n_cal_bins)
+        self.cal_pos   += np.bincount(cal_bin, weights=y, minlength=self.n_cal_bins).astype(np.int64)
+
+        auc_bin = self._auc_bin(prob)
+        self.prob_hist += np.bincount(
+            auc_bin + self.auc_bins * y, minlength=2 * self.auc_bins,
+        ).reshape(2, self.auc_bins)
+
+    def merge(self, other: "StreamingMetrics") -> "StreamingMetrics":
+        """Add ``other``'s counts into this accumulator (same bin settings)."""
+        if (other.n_cal_bins, other.auc_bins) != (self.n_cal_bins, self.auc_bins):
+            raise ValueError("cannot merge accumulators with different bins")
+        for name in ("n_rows", "n_labelled", "n_predicted", "prob_sum", "brier_sum"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name in ("confusion", "cal_count", "cal_prob", "cal_pos", "prob_hist"):
+            getattr(self, name).__iadd__(getattr(other, name))
+        return self
+
+    def roc_auc(self) -> float:
+        """Histogram ROC-AUC: P(score_pos > score_neg) + 0.5 P(same bin)."""
+        neg, pos = self.prob_hist.astype(np.float64)
+        n_neg, n_pos = neg.sum(), pos.sum()
+        if n_neg == 0 or n_pos == 0:
+            return float("nan")
+        neg_below = np.cumsum(neg) - neg
+        return float((pos * (neg_below + 0.5 * neg)).sum() / (n_pos * n_neg))
+
+    def calibration(self) -> dict[str, list]:
+        """Non-empty calibration bins, as calibration_curve returns them."""
+        keep = self.cal_count > 0
+        return {
+            "prob_true": (self.cal_pos[keep] / self.cal_count[keep]).tolist(),
+            "prob_pred": (self.cal_prob[keep] / self.cal_count[keep]).tolist(),
+            "count":     self.cal_count[keep].tolist(),
+        }
+
+    def result(self, beta: float = FBETA_BETA) -> dict:
+        """Metrics dict (the keys of evaluate_v4.compute_metrics, plus streaming extras)."""
+        tp, fp, tn, fn = (int(v) for v in self.confusion)
+        out = {
+            "n_rows":        self.n_rows,
+            "n_labelled":    self.n_labelled,
+            "positive_rate": self.n_predicted / self.n_rows if self.n_rows else 0.0,
+            "mean_prob":     self.prob_sum / self.n_rows if self.n_rows else 0.0,
+        }
+        if not self.n_labelled:
+            return out
+
+        recall    = tp / (tp + fn) if tp + fn else 0.0
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        b2        = beta * beta
+        fbeta     = ((1 + b2) * precision * recall / (b2 * precision + recall)
+                     if precision + recall else 0.0)
+        out.update({
+            "n_pos":               tp + fn,
+            "recall":              recall,
+            "precision":           precision,
+            "fbeta":               fbeta,
+            "roc_auc":             self.roc_auc(),
+            "brier":               self.brier_sum / self.n_labelled,
+            "tp": tp, "fp": fp, "tn": tn, "fn": fn,
+            "meets_recall_target": recall > RECALL_TARGET,
+            "calibration":         self.calibration(),
+        })
+        return out
+
+
+# ============================================================================
+# INPUT
+# ============================================================================
+
+def _coerce(chunk: pd.DataFrame, features: list[str], categorical: list[str]) -> pd.DataFrame:
+    """Categorical answers as strings (NaN kept), numeric features as numbers (junk -> NaN)."""
+    for col in features:
+        values = chunk[col]
+        if col in categorical:
+            if values.dtype != object:
+                chunk[col] = values.astype(object).where(values.isna(), values.astype(str))
+        elif values.dtype.kind not in "iuf":
+            chunk[col] = pd.to_numeric(values, errors="coerce")
+    return chunk
+
+
+def iter_chunks(
+    path: Path | None,
+    features: list[str],
+    categorical: list[str],
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    keep: Sequence[str] = (TARGET,),
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield DataFrames of at most ``chunksize`` rows with ``features`` plus the
+    ``keep`` columns the input has (TARGET by default).  Categorical answers
+    are read as strings, the way the pipelines were fitted, whitespace
+    included; only empty cells are missing (CATEGORICAL_NA).
+    """
+    if path is None:
+        _, X_test, _, y_test = joblib.load(DATA_PKL)
+        frame = X_test[features].assign(**{TARGET: np.asarray(y_test)})
+        for start in range(0, len(frame), chunksize):
+            yield frame.iloc[start:start + chunksize]
+        return
+
+    suffixes = path.suffixes
+    if ".parquet" in suffixes:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("[ERROR] Reading parquet needs pyarrow (pip install pyarrow)")
+        reader = pq.ParquetFile(path)
+        header = reader.schema_arrow.names
+    elif ".csv" in suffixes:
+        header = pd.read_csv(path, nrows=0).columns
+    else:
+        sys.exit(f"[ERROR] Unsupported input format: {path.name} (expected .csv or .parquet)")
+
+    missing = [c for c in features if c not in header]
+    if missing:
+        sys.exit(f"[ERROR] {path} is missing feature columns: {missing}")
+    columns = features + [c for c in keep if c in header and c not in features]
+
+    if ".parquet" in suffixes:
+        for batch in reader.iter_batches(batch_size=chunksize, columns=columns):
+            yield _coerce(batch.to_pandas(), features, categorical)
+    else:
+        na_values = {c: CATEGORICAL_NA if c in categorical else NUMERIC_NA for c in columns}
+        for chunk in pd.read_csv(path, usecols=columns, dtype={c: str for c in categorical},
+                                 keep_default_na=False, na_values=na_values, chunksize=chunksize):
+            yield _coerce(chunk[columns], features, categorical)
+
+
+def load_engine(version: str, backend: str) -> tuple[HybridEngine, FeatureSchema]:
+    """Hybrid engine over the deployed models of ``version``, and their feature schema."""
+    spec = MODEL_VERSIONS[version]
+    cfg  = load_config(version)
+    threshold, conf_margin = operating_point(version)
+
+    if backend == "compiled":
+        bundle = spec["model_dir"] / "hybrid_compiled.npz"
+        if not bundle.exists():
+            sys.exit(f"[ERROR] Compiled bundle not found: {bundle} (run export_compiled.py)")
+        xgb_model, dt_model, _ = load_hybrid(bundle)
+        schema = xgb_model.schema
+    else:
+        xgb_model = joblib.load(spec["model_dir"] / cfg.get("xgb_model_file", "xgb_high_recall.joblib"))
+        dt_model  = joblib.load(spec["model_dir"] / cfg.get("dt_model_file", "dt_high_recall.joblib"))
+        schema    = FeatureSchema.from_pipeline(xgb_model)
+    return HybridEngine(xgb_model, dt_model, threshold, conf_margin), schema
+
+
+# ============================================================================
+# EVALUATION
+# ============================================================================
+
+def evaluate_stream(
+    engine: HybridEngine,
+    chunks: Iterator[pd.DataFrame],
+    features: list[str],
+    metrics: StreamingMetrics | None = None,
+) -> tuple[StreamingMetrics, dict]:
+    """
+    Score every chunk and fold it into ``metrics``.
+
+    Returns
+    -------
+    (metrics, run stats: chunks, rows, seconds, rows_per_second, peak_rss_mb)
+    """
+    metrics = metrics or StreamingMetrics()
+    n_chunks = 0
+    t0 = time.perf_counter()
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        result = engine.predict(chunk[features])
+        y_true = chunk[TARGET].to_numpy() if TARGET in chunk else None
+        if y_true is not None and pd.isna(y_true).any():
+            sys.exit(f"[ERROR] {TARGET} has missing values in chunk {n_chunks}")
+        metrics.update(result["xgb_probabilities"], result["predictions"], y_true)
+        n_chunks += 1
+    seconds = time.perf_counter() - t0
+    stats = {
+        "chunks":          n_chunks,
+        "rows":            metrics.n_rows,
+        "seconds":         round(seconds, 3),
+        "rows_per_second": round(metrics.n_rows / seconds, 1) if seconds else None,
+        "peak_rss_mb":     peak_rss_mb(),
+    }
+    return metrics, stats
+
+
+def run(input_path: Path | None, version: str = "v4", backend: str = "joblib",
+        chunksize: int = DEFAULT_CHUNKSIZE) -> tuple[dict, dict, dict]:
+    """Evaluate ``input_path`` (None: the held-out test split); returns (metrics, stats, config)."""
+    if input_path is not None and not input_path.exists():
+        sys.exit(f"[ERROR] Input not found: {input_path}")
+    cfg      = load_config(version)
+    features = cfg["features"]
+    engine, schema = load_engine(version, backend)
+    categorical = [c["name"] for c in schema.columns if c["kind"] == "cat"]
+
+    metrics, stats = evaluate_stream(
+        engine, iter_chunks(input_path, features, categorical, chunksize), features,
+    )
+    return metrics.result(), stats, cfg
+
+
+def check_csv_roundtrip(version: str = "v4", backend: str = "joblib",
+                        chunksize: int = DEFAULT_CHUNKSIZE) -> int:
+    """
+    Write every row of the data pickle to a CSV, read it back with
+    ``iter_chunks`` and score both; returns the number of rows whose XGBoost
+    probability or hybrid label differs (0 = the CSV path is lossless).
+    """
+    import tempfile
+
+    X_train, X_test, _, _ = joblib.load(DATA_PKL)
+    features = load_config(version)["features"]
+    engine, schema = load_engine(version, backend)
+    categorical = [c["name"] for c in schema.columns if c["kind"] == "cat"]
+    frame = pd.concat([X_train, X_test], ignore_index=True)[features]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "roundtrip.csv"
+        frame.to_csv(path, index=False)
+        read_back = pd.concat(iter_chunks(path, features, categorical, chunksize), ignore_index=True)
+
+    expected = engine.predict(frame)
+    actual   = engine.predict(read_back[features])
+    differs  = ((expected["xgb_probabilities"] != actual["xgb_probabilities"])
+                | (expected["predictions"] != actual["predictions"]))
+    return int(differs.sum())
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def print_summary(result: dict, stats: dict, source: str) -> None:
+    divider = "=" * 62
+    print()
+    print(divider)
+    print("  Streaming Evaluation")
+    print(f"  Input      : {source}")
+    print(f"  Rows       : {stats['rows']}  in {stats['chunks']} chunk(s)  "
+          f"({stats['rows_per_second']} rows/s, peak RSS {stats['peak_rss_mb']} MB)")
+    print(divider)
+    print(f"  Predicted HIGH rate :  {result['positive_rate']:.4f}")
+    print(f"  Mean XGB probability:  {result['mean_prob']:.4f}")
+    if not result["n_labelled"]:
+        print(f"  ({TARGET} not in input: label metrics skipped)")
+        print(divider)
+        return
+    print(f"  Positives           :  {result['n_pos']}")
+    print(f"  Recall              :  {result['recall']:.4f}")
+    print(f"  Precision           :  {result['precision']:.4f}")
+    print(f"  F-beta  (b={FBETA_BETA:.2f})    :  {result['fbeta']:.4f}")
+    print(f"  ROC-AUC (histogram) :  {result['roc_auc']:.4f}")
+    print(f"  Brier score         :  {result['brier']:.6f}")
+    print(f"  Confusion           :  TP {result['tp']}  FP {result['fp']}  "
+          f"TN {result['tn']}  FN {result['fn']}")
+    print(divider)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Constant-memory chunked evaluation of the hybrid model.")
+    parser.add_argument("--input", type=Path, default=None, help=".csv[.gz] or .parquet (default: test split)")
+    parser.add_argument("--version", default="v4", choices=sorted(MODEL_VERSIONS))
+    parser.add_argument("--backend", default="joblib", choices=BACKENDS)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--output", type=Path, default=None, help="write metrics + run stats as JSON")
+    parser.add_argument("--check-csv", action="store_true",
+                        help="check that the data pickle scores identically after a CSV round trip, then exit")
+    args = parser.parse_args()
+    if args.chunksize < 1:
+        parser.error("--chunksize must be >= 1")
+
+    if args.check_csv:
+        n_diff = check_csv_roundtrip(args.version, args.backend, args.chunksize)
+        print(f"[streaming_eval] CSV round trip ({args.version} / {args.backend}): "
+              f"{n_diff} row(s) scored differently")
+        sys.exit(1 if n_diff else 0)
+
+    source = str(args.input) if args.input else f"{DATA_PKL.name} (test split)"
+    print(f"[streaming_eval] {args.version} / {args.backend}: scoring {source} "
+          f"in chunks of {args.chunksize} ...", flush=True)
+    result, stats, _ = run(args.input, args.version, args.backend, args.chunksize)
+    print_summary(result, stats, source)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"input": source, "version": args.version, "backend": args.backend,
+                       "chunksize": args.chunksize, "metrics": result, "run": stats}, f, indent=2)
+        print(f"\n  Saved -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
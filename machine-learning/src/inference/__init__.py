@@ -0,0 +1,35 @@
+"""
+Shared inference runtime for the hybrid XGBoost + Decision Tree models.
+
+Import with ``machine-learning/src`` on sys.path:
+
+    from inference import CompiledPipeline, FeatureSchema, HybridEngine, load_hybrid
+
+Only NumPy is needed at import time; sklearn / xgboost are touched only by
+the exporters (``CompiledPipeline.from_pipeline``).
+"""
+
+from inference.compiled_trees import (
+    CompiledPipeline,
+    CompiledTrees,
+    load_hybrid,
+    save_hybrid,
+)
+from inference.encoding import DictionaryColumn, FeatureSchema
+from inference.hybrid import HybridEngine, ModelOutputs, hybrid_labels, hybrid_rule, model_outputs
+from inference.single_row import HybridRowScorer
+
+__all__ = [
+    "CompiledPipeline",
+    "CompiledTrees",
+    "DictionaryColumn",
+    "FeatureSchema",
+    "HybridEngine",
+    "HybridRowScorer",
+    "ModelOutputs",
+    "hybrid_labels",
+    "hybrid_rule",
+    "load_hybrid",
+    "model_outputs",
+    "save_hybrid",
+]
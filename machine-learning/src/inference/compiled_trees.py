@@ -0,0 +1,580 @@
+"""
+compiled_trees.py
+
+Compact compiled evaluator for the hybrid XGBoost + Decision Tree models.
+
+The exporter flattens every tree of a fitted XGBClassifier booster (and the
+single sklearn DecisionTreeClassifier) into a few contiguous NumPy arrays:
+
+    cond_feature    (n_conds,)           int32    split feature
+    cond_threshold  (n_conds,)           float32 (XGBoost) / float64 (sklearn)
+    cond_default    (n_conds,)           bool     missing value goes right
+    cond_categories (n_conds, C)         bool     categorical splits: category
+                                                  index goes right (C = 0 when
+                                                  the model has none)
+    node_cond       (n_trees, 2**D - 1)  int32    condition id of every node
+    leaf_value      (n_trees, 2**D)      float32  leaf output (XGBoost margin,
+                                                  or DT class label)
+
+Every tree is padded to a perfect binary tree of depth D stored in heap
+order, so the children of node ``h`` are ``2h+1`` / ``2h+2`` and no child
+pointers are needed; a leaf above depth D becomes a chain of "always go
+left" nodes.  Distinct (feature, threshold, default) split conditions are
+shared across trees — the v4 booster's ~4.5k internal nodes reduce to ~100
+conditions — so a batch is scored by
+
+    1. evaluating every condition once per row          (n, n_conds) bits
+    2. walking all trees for all rows one level at a time (D - 1 rounds
+       of vectorised gathers into preallocated buffers)
+    3. summing the reached leaf values.
+
+Outputs are identical to the source libraries:
+
+* XGBoost: ``x < threshold`` in float32 goes left, NaN (and zeros, when the
+  pipeline's preprocessor emits a sparse matrix) follow ``default_left``;
+  on native categorical splits (enable_categorical, index-layout input) the
+  categories in the node's set go right, every other value -- including the
+  -1 of unknown categories -- goes left; leaf values are summed sequentially in float32 starting from the base
+  margin, then passed through XGBoost's float32 sigmoid.
+* sklearn: ``float32(x) <= threshold`` (float64) goes left; the prediction
+  is ``classes_[argmax(value)]`` of the reached leaf.
+
+Usage
+-----
+    from inference.compiled_trees import CompiledPipeline, save_hybrid, load_hybrid
+
+    xgb_c = CompiledPipeline.from_pipeline(xgb_pipeline)
+    dt_c  = CompiledPipeline.from_pipeline(dt_pipeline)
+    save_hybrid("hybrid_compiled.npz", xgb_c, dt_c, config)
+
+    xgb_c, dt_c, config = load_hybrid("hybrid_compiled.npz")
+    probs = xgb_c.predict_proba(df)[:, 1]      # same as xgb_pipeline
+    dt    = dt_c.predict(df)                   # same as dt_pipeline
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from inference.encoding import FeatureSchema
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+KIND_XGB = "xgb"
+KIND_DT  = "dt"
+
+# Heap padding doubles the node count per level; refuse absurdly deep trees
+MAX_DEPTH = 12
+
+# XGBoost clamps the sigmoid argument (src/common/math.h)
+_SIGMOID_CLAMP = np.float32(88.7)
+
+# glibc expf (sysdeps/ieee754/flt-32/e_expf.c) — XGBoost's sigmoid calls expf,
+# whose result is not always correctly rounded, so reproduce it bit for bit.
+# tab[i] = bits(2^(i/32)) - (i << 47)
+_EXPF_TAB = np.array([
+    0x3ff0000000000000, 0x3fefd9b0d3158574, 0x3fefb5586cf9890f, 0x3fef9301d0125b51,
+    0x3fef72b83c7d517b, 0x3fef54873168b9aa, 0x3fef387a6e756238, 0x3fef1e9df51fdee1,
+    0x3fef06fe0a31b715, 0x3feef1a7373aa9cb, 0x3feedea64c123422, 0x3feece086061892d,
+    0x3feebfdad5362a27, 0x3feeb42b569d4f82, 0x3feeab07dd485429, 0x3feea47eb03a5585,
+    0x3feea09e667f3bcd, 0x3fee9f75e8ec5f74, 0x3feea11473eb0187, 0x3feea589994cce13,
+    0x3feeace5422aa0db, 0x3feeb737b0cdc5e5, 0x3feec49182a3f090, 0x3feed503b23e255d,
+    0x3feee89f995ad3ad, 0x3feeff76f2fb5e47, 0x3fef199bdd85529c, 0x3fef3720dcef9069,
+    0x3fef5818dcfba487, 0x3fef7c97337b9b5f, 0x3fefa4afa2a490da, 0x3fefd0765b6e4540,
+], dtype=np.uint64)
+_EXPF_N      = 32
+_EXPF_SHIFT  = float.fromhex("0x1.8p+52")
+_EXPF_INVLN2 = float.fromhex("0x1.71547652b82fep+0") * _EXPF_N
+_EXPF_POLY   = (
+    float.fromhex("0x1.c6af84b912394p-5") / _EXPF_N ** 3,
+    float.fromhex("0x1.ebfce50fac4f3p-3") / _EXPF_N ** 2,
+    float.fromhex("0x1.62e42ff0c52d6p-1") / _EXPF_N,
+)
+_EXPF_UNDERFLOW = np.float32(float.fromhex("-0x1.9fe368p6"))
+# 2^(i/32) as floats, for the scalar path: s = ldexp(_EXPF_POW2[k % 32], k // 32)
+_EXPF_POW2 = (_EXPF_TAB + (np.arange(_EXPF_N, dtype=np.uint64) << np.uint64(47))).view(np.float64).tolist()
+
+# Batches at least this large sum tree by tree (one vector add per tree);
+# smaller ones use a single row-wise accumulate.  Both are sequential.
+_LOOP_SUM_MIN_ROWS = 32
+
+# Condition 0 is reserved: "always go left" (padding below shallow leaves)
+_NEVER = 0
+
+_ARRAY_FIELDS = ("cond_feature", "cond_threshold", "cond_default", "node_cond", "leaf_value")
+_OPTIONAL_ARRAY_FIELDS = ("cond_categories",)
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def _parse_base_score(raw: str) -> float:
+    # xgboost >= 2.1 stores e.g. "[5E-1]"; older versions "5E-1"
+    return float(str(raw).strip("[]"))
+
+
+def _expf(x: np.ndarray) -> np.ndarray:
+    """float32 exp with glibc's rounding, for x <= 88.7 (no overflow path)."""
+    z  = _EXPF_INVLN2 * x.astype(np.float64)
+    kd = z + _EXPF_SHIFT
+    ki = kd.view(np.uint64)
+    r  = z - (kd - _EXPF_SHIFT)
+    s  = (_EXPF_TAB[ki % np.uint64(_EXPF_N)] + (ki << np.uint64(47))).view(np.float64)
+    c0, c1, c2 = _EXPF_POLY
+    y  = ((c0 * r + c1) * (r * r) + (c2 * r + 1.0)) * s
+    return np.where(x < _EXPF_UNDERFLOW, np.float32(0.0), y.astype(np.float32))
+
+
+def _xgb_sigmoid(margin: np.ndarray) -> np.ndarray:
+    """XGBoost's float32 logistic transform: 1 / (expf(min(-x, 88.7)) + 1)."""
+    z = np.minimum(-margin, _SIGMOID_CLAMP)
+    return np.float32(1.0) / (_expf(z) + np.float32(1.0))
+
+
+def _xgb_sigmoid_scalar(margin: np.float32) -> np.float32:
+    """Single-value ``_xgb_sigmoid`` on Python floats (no array temporaries)."""
+    z = min(-margin, _SIGMOID_CLAMP)
+    if z < _EXPF_UNDERFLOW:
+        return np.float32(1.0)
+    zd = _EXPF_INVLN2 * float(z)
+    kd = (zd + _EXPF_SHIFT) - _EXPF_SHIFT                # round(zd), exactly
+    k  = int(kd)
+    r  = zd - kd
+    s  = math.ldexp(_EXPF_POW2[k % _EXPF_N], k // _EXPF_N)
+    c0, c1, c2 = _EXPF_POLY
+    e  = np.float32(((c0 * r + c1) * (r * r) + (c2 * r + 1.0)) * s)
+    return np.float32(1.0) / (e + np.float32(1.0))
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray, root: int = 0) -> int:
+    depth, frontier = 0, [root]
+    while True:
+        nxt = [c for n in frontier for c in (left[n], right[n]) if c >= 0]
+        if not nxt:
+            return depth
+        depth += 1
+        frontier = nxt
+
+
+# ============================================================================
+# COMPILED TREES
+# ============================================================================
+
+class CompiledTrees:
+    """
+    Tree ensemble compiled to the padded heap layout described above.
+
+    Parameters
+    ----------
+    cond_feature, cond_threshold, cond_default : np.ndarray, shape (n_conds,)
+    cond_categories : np.ndarray, shape (n_conds, C) or None
+                             go-right category table of categorical splits
+                             (all-False rows for numeric splits)
+    node_cond       : np.ndarray, shape (n_trees, 2**depth - 1)
+    leaf_value      : np.ndarray, shape (n_trees, 2**depth)
+    depth           : int    padded tree depth (number of evaluation levels)
+    strict          : bool   True -> ``x < thr`` goes left (XGBoost),
+                             False -> ``x <= thr`` (sklearn)
+    zero_as_missing : bool   treat 0.0 as missing (XGBoost on sparse input)
+    base_margin     : float  added to the leaf sum (XGBoost only)
+    """
+
+    def __init__(
+        self,
+        cond_feature: np.ndarray,
+        cond_threshold: np.ndarray,
+        cond_default: np.ndarray,
+        node_cond: np.ndarray,
+        leaf_value: np.ndarray,
+        depth: int,
+        strict: bool,
+        zero_as_missing: bool = False,
+        base_margin: float = 0.0,
+        cond_categories: np.ndarray | None = None,
+    ):
+        self.cond_feature    = np.ascontiguousarray(cond_feature, dtype=np.int32)
+        self.cond_threshold  = np.ascontiguousarray(cond_threshold)
+        self.cond_default    = np.ascontiguousarray(cond_default, dtype=bool)
+        self.node_cond       = np.ascontiguousarray(node_cond, dtype=np.int32)
+        self.leaf_value      = np.ascontiguousarray(leaf_value, dtype=np.float32)
+        self.depth           = int(depth)
+        self.strict          = bool(strict)
+        self.zero_as_missing = bool(zero_as_missing)
+        self.base_margin     = np.float32(base_margin)
+        if cond_categories is None:
+            cond_categories = np.zeros((len(self.cond_feature), 0), dtype=bool)
+        self.cond_categories = np.ascontiguousarray(cond_categories, dtype=bool)
+
+        # Flat views / per-tree offsets used by the evaluation loop
+        n_trees = self.node_cond.shape[0]
+        self._feat       = self.cond_feature.astype(np.intp)
+        self._node_flat  = self.node_cond.ravel().astype(np.intp)
+        self._leaf_flat  = self.leaf_value.ravel()
+        self._node_base  = np.arange(n_trees, dtype=np.intp) * self.node_cond.shape[1]
+        self._leaf_base  = (np.arange(n_trees, dtype=np.intp) * self.leaf_value.shape[1]
+                            - self.node_cond.shape[1])
+        self._cat_conds  = np.flatnonzero(self.cond_categories.any(axis=1)).astype(np.intp)
+        self._cat_table  = self.cond_categories[self._cat_conds]
+
+    @property
+    def n_trees(self) -> int:
+        return self.node_cond.shape[0]
+
+    @property
+    def n_conds(self) -> int:
+        return len(self.cond_feature)
+
+    @property
+    def has_categorical(self) -> bool:
+        """True if any split is a native categorical (set membership) split."""
+        return len(self._cat_conds) > 0
+
+    # ------------------------------------------------------------------
+    # Exporters
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _compile(cls, trees: list[dict], strict: bool, **params) -> "CompiledTrees":
+        """
+        Pad node-list trees into the heap layout.  Each tree dict holds
+        ``left``, ``right`` (-1 for leaves), ``feature``, ``threshold``,
+        ``default_left`` and ``value`` arrays indexed by node id, and
+        optionally ``categories``: {node id: categories going right} for
+        categorical splits.
+        """
+        # At least one level, so a stump still has a root condition to read
+        depth = max(1, max(_tree_depth(t["left"], t["right"]) for t in trees))
+        if depth > MAX_DEPTH:
+            raise ValueError(f"Tree depth {depth} exceeds MAX_DEPTH={MAX_DEPTH}")
+
+        n_inner = 2 ** depth - 1
+        conds: dict[tuple, int] = {(0, np.inf, False): _NEVER}
+        node_cond  = np.zeros((len(trees), n_inner), dtype=np.int32)
+        leaf_value = np.zeros((len(trees), n_inner + 1), dtype=np.float32)
+
+        for t, tree in enumerate(trees):
+            stack = [(0, 0, 0)]                      # (node id, heap index, level)
+            while stack:
+                node, h, level = stack.pop()
+                is_leaf = tree["left"][node] < 0
+                if level == depth:
+                    leaf_value[t, h - n_inner] = tree["value"][node]
+                    continue
+                if is_leaf:
+                    node_cond[t, h] = _NEVER
+                    stack.append((node, 2 * h + 1, level + 1))
+                    stack.append((node, 2 * h + 2, level + 1))
+                    continue
+                categories = tree.get("categories", {}).get(node)
+                key = (
+                    int(tree["feature"][node]),
+                    tuple(categories) if categories is not None else tree["threshold"][node],
+                    not bool(tree["default_left"][node]),
+                )
+                node_cond[t, h] = conds.setdefault(key, len(conds))
+                stack.append((int(tree["left"][node]),  2 * h + 1, level + 1))
+                stack.append((int(tree["right"][node]), 2 * h + 2, level + 1))
+
+        keys = list(conds)
+        is_cat = [isinstance(k[1], tuple) for k in keys]
+        n_categories = max((max(k[1], default=-1) + 1 for k, c in zip(keys, is_cat) if c), default=0)
+        cond_categories = np.zeros((len(keys), n_categories), dtype=bool)
+        for i, (k, c) in enumerate(zip(keys, is_cat)):
+            if c:
+                cond_categories[i, list(k[1])] = True
+        return cls(
+            cond_feature=np.array([k[0] for k in keys]),
+            cond_threshold=np.array(
+                # categorical splits never read their threshold
+                [np.inf if c else k[1] for k, c in zip(keys, is_cat)],
+                dtype=np.float32 if strict else np.float64,
+            ),
+            cond_default=np.array([k[2] for k in keys]),
+            node_cond=node_cond,
+            leaf_value=leaf_value,
+            depth=depth,
+            strict=strict,
+            cond_categories=cond_categories if n_categories else None,
+            **params,
+        )
+
+    @classmethod
+    def from_xgboost(cls, model, zero_as_missing: bool = False) -> "CompiledTrees":
+        """Compile a fitted binary:logistic XGBClassifier (or Booster)."""
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        dump    = json.loads(booster.save_raw("json"))
+        learner = dump["learner"]
+
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"Unsupported XGBoost objective '{objective}'")
+
+        raw_trees = learner["gradient_booster"]["model"]["trees"]
+        best      = booster.attributes().get("best_iteration")
+        if best is not None:
+            raw_trees = raw_trees[: int(best) + 1]
+
+        trees = []
+        for tree in raw_trees:
+            # Categorical splits: the categories listed for the node go right
+            segments, sizes = tree.get("categories_segments", []), tree.get("categories_sizes", [])
+            categories = {
+                int(node): [int(c) for c in tree["categories"][seg:seg + size]]
+                for node, seg, size in zip(tree.get("categories_nodes", []), segments, sizes)
+            }
+            cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+            trees.append({
+                "categories":   categories,
+                "left":         np.asarray(tree["left_children"]),
+                "right":        np.asarray(tree["right_children"]),
+                "feature":      np.asarray(tree["split_indices"]),
+                "threshold":    cond,                 # leaves: value, never read
+                "default_left": np.asarray(tree["default_left"], dtype=bool),
+                "value":        cond,
+            })
+
+        # ProbToMargin in float32, as XGBoost does: -log(1/p - 1)
+        base_score  = np.float32(_parse_base_score(learner["learner_model_param"]["base_score"]))
+        ratio       = np.float32(1.0) / base_score - np.float32(1.0)
+        base_margin = -np.float32(np.log(np.float64(ratio)))
+
+        return cls._compile(
+            trees, strict=True, zero_as_missing=zero_as_missing, base_margin=base_margin,
+        )
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledTrees":
+        """Compile a fitted sklearn DecisionTreeClassifier; leaf value = class label."""
+        tree = model.tree_
+        # classes_[argmax] of the per-leaf class weights, exactly as predict()
+        labels = model.classes_.take(np.argmax(tree.value[:, 0, :], axis=1))
+        return cls._compile([{
+            "left":         tree.children_left,
+            "right":        tree.children_right,
+            "feature":      tree.feature,
+            "threshold":    tree.threshold,
+            "default_left": np.ones(tree.node_count, dtype=bool),
+            "value":        labels,
+        }], strict=False)
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+
+    def condition_bits(self, X: np.ndarray) -> np.ndarray:
+        """
+        Evaluate every split condition for every row.
+
+        Returns an (n, n_conds) uint8 matrix holding 1 (go left) or 2 (go
+        right), i.e. the heap step ``h -> 2h + bit``.
+        """
+        Xc = np.asarray(X, dtype=np.float32)[:, self._feat]
+        go_right = Xc >= self.cond_threshold if self.strict else Xc > self.cond_threshold
+        if len(self._cat_conds):
+            go_right[:, self._cat_conds] = self._categorical_right(Xc[:, self._cat_conds])
+
+        missing = np.isnan(Xc)
+        if self.zero_as_missing:
+            missing |= Xc == 0
+        if missing.any():
+            go_right = np.where(missing, self.cond_default, go_right)
+
+        go_right[:, _NEVER] = False
+        return go_right.view(np.uint8) + np.uint8(1)
+
+    def _categorical_right(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Go-right bits of the categorical conditions for category indices
+        ``codes`` (n, n_cat_conds) or (n_cat_conds,).  Values outside the
+        table (unknown -1, unseen indices) go left; NaN is handled by the
+        caller's missing-value rule.
+        """
+        width = self._cat_table.shape[1]
+        with np.errstate(invalid="ignore"):
+            valid = (codes >= 0) & (codes < width)
+        idx = np.where(valid, codes, 0).astype(np.intp)
+        rows = np.arange(len(self._cat_conds))
+        return valid & self._cat_table[rows, idx]
+
+    def leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """
+        Reached leaf value of every tree for every row, shape (n_trees, n).
+
+        Tree-major, so per-tree columns are contiguous for the margin sum.
+        """
+        bits = np.ascontiguousarray(self.condition_bits(X).T)   # (n_conds, n)
+        n    = bits.shape[1]
+        flat = bits.ravel()
+        cond_offset = self._node_flat * n                       # cond id -> row of bits
+        col  = np.arange(n, dtype=np.intp)
+        node_base = self._node_base[:, None]
+
+        # Level 0: every tree starts at its root, h = 2*0 + bit
+        h   = bits.take(self._node_flat[self._node_base], axis=0).astype(np.intp)
+        idx = np.empty_like(h)
+        bit = np.empty(h.shape, dtype=np.uint8)
+
+        for _ in range(self.depth - 1):
+            np.add(h, node_base, out=idx)
+            cond_offset.take(idx, out=idx, mode="clip")
+            np.add(idx, col, out=idx)
+            flat.take(idx, out=bit, mode="clip")                # 1 left / 2 right
+            np.add(h, h, out=h)
+            np.add(h, bit, out=h)
+
+        np.add(h, self._leaf_base[:, None], out=h)
+        return self._leaf_flat.take(h, mode="clip")
+
+    def margin(self, X: np.ndarray) -> np.ndarray:
+        """XGBoost raw margin: base + sequential float32 sum of leaf values."""
+        leaves = self.leaf_values(X)
+        n = leaves.shape[1]
+
+        if n >= _LOOP_SUM_MIN_ROWS:
+            out = np.full(n, self.base_margin, dtype=np.float32)
+            for tree_leaves in leaves:
+                out += tree_leaves
+            return out
+
+        acc = np.empty((n, leaves.shape[0] + 1), dtype=np.float32)
+        acc[:, 0]  = self.base_margin
+        acc[:, 1:] = leaves.T
+        np.add.accumulate(acc, axis=1, out=acc)
+        return acc[:, -1].copy()
+
+    # ------------------------------------------------------------------
+    # Serialisation
+    # ------------------------------------------------------------------
+
+    def to_arrays(self, prefix: str) -> dict[str, np.ndarray]:
+        arrays = {f"{prefix}{k}": getattr(self, k) for k in _ARRAY_FIELDS}
+        if self.has_categorical:
+            arrays[f"{prefix}cond_categories"] = self.cond_categories
+        arrays[f"{prefix}params"] = np.array(json.dumps({
+            "depth":           self.depth,
+            "strict":          self.strict,
+            "zero_as_missing": self.zero_as_missing,
+            "base_margin":     float(self.base_margin),
+        }))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str) -> "CompiledTrees":
+        params = json.loads(str(arrays[f"{prefix}params"]))
+        fields = {k: arrays[f"{prefix}{k}"] for k in _ARRAY_FIELDS}
+        fields.update({k: arrays[f"{prefix}{k}"] for k in _OPTIONAL_ARRAY_FIELDS
+                       if f"{prefix}{k}" in arrays})
+        return cls(**fields, **params)
+
+
+# ============================================================================
+# COMPILED PIPELINE
+# ============================================================================
+
+class CompiledPipeline:
+    """
+    Drop-in replacement for a fitted ``preprocess`` + ``model`` Pipeline.
+
+    ``predict_proba`` / ``predict`` accept a pandas DataFrame (like the
+    sklearn Pipeline) or an already-encoded float32 matrix from
+    ``schema.encode_*``.
+    """
+
+    def __init__(self, schema: FeatureSchema, trees: CompiledTrees, kind: str,
+                 classes: np.ndarray | None = None):
+        if kind not in (KIND_XGB, KIND_DT):
+            raise ValueError(f"Unknown compiled model kind '{kind}'")
+        self.schema  = schema
+        self.trees   = trees
+        self.kind    = kind
+        self.classes_ = np.asarray([0, 1] if classes is None else classes)
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "CompiledPipeline":
+        schema = FeatureSchema.from_pipeline(pipeline)
+        model  = pipeline.named_steps["model"]
+
+        if hasattr(model, "get_booster"):
+            trees = CompiledTrees.from_xgboost(model, zero_as_missing=schema.sparse)
+            return cls(schema, trees, KIND_XGB, getattr(model, "classes_", None))
+        if hasattr(model, "tree_"):
+            return cls(schema, CompiledTrees.from_sklearn(model), KIND_DT, model.classes_)
+        raise ValueError(f"Unsupported model type {type(model).__name__}")
+
+    def _encode(self, X) -> np.ndarray:
+        if isinstance(X, np.ndarray):
+            return X
+        return self.schema.encode_frame(X)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities, shape (n, 2).  XGBoost models only."""
+        if self.kind != KIND_XGB:
+            raise ValueError("predict_proba is only compiled for XGBoost models")
+        p = _xgb_sigmoid(self.trees.margin(self._encode(X)))
+        return np.column_stack([np.float32(1.0) - p, p])
+
+    def predict(self, X) -> np.ndarray:
+        """Class labels, shape (n,)."""
+        if self.kind == KIND_DT:
+            labels = self.trees.leaf_values(self._encode(X))[0]
+            return labels.astype(self.classes_.dtype)
+        return self.classes_.take((self.predict_proba(X)[:, 1] > 0.5).astype(int))
+
+
+# ============================================================================
+# HYBRID BUNDLE  (one .npz per model directory)
+# ============================================================================
+
+def save_hybrid(
+    path: str | Path,
+    xgb: CompiledPipeline,
+    dt: CompiledPipeline,
+    config: dict[str, Any] | None = None,
+) -> Path:
+    """
+    Write both compiled models (plus their shared feature schema and the
+    hybrid config) to a single ``.npz``.  No pickles are involved, so the
+    file loads with ``allow_pickle=False``.
+    """
+    if xgb.schema != dt.schema:
+        raise ValueError("XGBoost and Decision Tree pipelines use different preprocessors")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {
+        "schema":      xgb.schema.to_dict(),
+        "xgb_classes": xgb.classes_.tolist(),
+        "dt_classes":  dt.classes_.tolist(),
+        "config":      config or {},
+    }
+    tmp_path = path.with_name(path.stem + ".tmp.npz")
+    np.savez(
+        tmp_path,
+        meta=np.array(json.dumps(meta)),
+        **xgb.trees.to_arrays("xgb__"),
+        **dt.trees.to_arrays("dt__"),
+    )
+    tmp_path.replace(path)
+    return path
+
+
+def load_hybrid(path: str | Path) -> tuple[CompiledPipeline, CompiledPipeline, dict]:
+    """Load a bundle written by save_hybrid -> (xgb, dt, config)."""
+    with np.load(path, allow_pickle=False) as arrays:
+        meta   = json.loads(str(arrays["meta"]))
+        schema = FeatureSchema.from_dict(meta["schema"])
+        xgb = CompiledPipeline(
+            schema, CompiledTrees.from_arrays(arrays, "xgb__"), KIND_XGB, meta["xgb_classes"],
+        )
+        dt = CompiledPipeline(
+            schema, CompiledTrees.from_arrays(arrays, "dt__"), KIND_DT, meta["dt_classes"],
+        )
+    return xgb, dt, meta.get("config", {})
@@ -0,0 +1,294 @@
+"""
+compression.py
+
+Size / latency compression passes for a compiled XGBoost ensemble
+(CompiledTrees from compiled_trees.py).
+
+Passes, in the order they are applied (``compress`` runs the first three;
+leaf quantization happens in save_compressed):
+
+prune_trees(trees, X, n_keep)
+    Keep the ``n_keep`` trees with the largest marginal contribution, i.e.
+    mean |leaf(x) - E[leaf]| over the reference rows.  A dropped tree is
+    replaced by its expected output, which is folded into the base margin.
+
+quantize_thresholds(trees, X)
+    Snap split thresholds on integer-valued columns (one-hot indicators,
+    AGE, PARITY) up to the next integer.  ``x < t`` and ``x < ceil(t)``
+    agree for every integer x, so this is lossless for such inputs and
+    merges split conditions that differed only in the threshold digits.
+
+merge_trees(trees)
+    Sum the leaves of trees that route every row identically (same padded
+    node layout), and fold constant trees into the base margin.
+
+quantize_leaves(trees, bits=8)
+    Symmetric per-tree integer quantization of the leaf values.
+
+The compressed ensemble is stored with integer leaves / thresholds
+(save_compressed) and dequantized on load, so it is evaluated by the same
+CompiledTrees code path.
+
+Usage
+-----
+    from inference.compression import compress, save_compressed, load_compressed
+
+    small, stats = compress(xgb_c.trees, X_train_encoded, n_keep=150)
+    save_compressed("xgb_compressed.npz", small, xgb_c.schema, leaf_bits=8)
+    model = load_compressed("xgb_compressed.npz")      # CompiledPipeline
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from inference.compiled_trees import KIND_XGB, CompiledPipeline, CompiledTrees
+from inference.encoding import FeatureSchema
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+DEFAULT_LEAF_BITS = 8
+
+# Condition id reserved for "always go left" padding (see compiled_trees.py)
+_NEVER = 0
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def _rebuild(trees: CompiledTrees, **changes) -> CompiledTrees:
+    """Copy of ``trees`` with some arrays / params replaced; unused split
+    conditions are dropped and the remaining ones renumbered."""
+    fields = {
+        "cond_feature":    trees.cond_feature,
+        "cond_threshold":  trees.cond_threshold,
+        "cond_default":    trees.cond_default,
+        "node_cond":       trees.node_cond,
+        "leaf_value":      trees.leaf_value,
+        "depth":           trees.depth,
+        "strict":          trees.strict,
+        "zero_as_missing": trees.zero_as_missing,
+        "base_margin":     trees.base_margin,
+    }
+    fields.update(changes)
+
+    # Deduplicate conditions (thresholds may now coincide), keeping _NEVER at 0
+    keys = list(zip(
+        fields["cond_feature"].tolist(),
+        fields["cond_threshold"].tolist(),
+        fields["cond_default"].tolist(),
+    ))
+    used  = np.unique(fields["node_cond"])
+    remap = np.zeros(len(keys), dtype=np.int32)
+    kept: dict[tuple, int] = {keys[_NEVER]: _NEVER}
+    for c in used:
+        remap[c] = kept.setdefault(keys[c], len(kept))
+
+    order = list(kept)
+    fields["cond_feature"]   = np.array([k[0] for k in order], dtype=np.int32)
+    fields["cond_threshold"] = np.array([k[1] for k in order],
+                                        dtype=trees.cond_threshold.dtype)
+    fields["cond_default"]   = np.array([k[2] for k in order], dtype=bool)
+    fields["node_cond"]      = remap[fields["node_cond"]]
+    return CompiledTrees(**fields)
+
+
+def tree_contributions(trees: CompiledTrees, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Per-tree marginal contribution on reference rows ``X``.
+
+    Returns
+    -------
+    contribution : np.ndarray, shape (n_trees,)  mean |leaf(x) - E[leaf]|
+    expected     : np.ndarray, shape (n_trees,)  E[leaf(x)]
+    """
+    leaves   = trees.leaf_values(X).astype(np.float64)          # (n_trees, n)
+    expected = leaves.mean(axis=1)
+    contribution = np.abs(leaves - expected[:, None]).mean(axis=1)
+    return contribution, expected
+
+
+# ============================================================================
+# PASSES
+# ============================================================================
+
+def prune_trees(trees: CompiledTrees, X: np.ndarray, n_keep: int) -> CompiledTrees:
+    """Keep the ``n_keep`` highest-contribution trees (original order)."""
+    if n_keep >= trees.n_trees:
+        return trees
+    contribution, expected = tree_contributions(trees, X)
+    keep = np.sort(np.argsort(-contribution, kind="stable")[:n_keep])
+    drop = np.setdiff1d(np.arange(trees.n_trees), keep)
+    return _rebuild(
+        trees,
+        node_cond=trees.node_cond[keep],
+        leaf_value=trees.leaf_value[keep],
+        base_margin=np.float32(trees.base_margin + expected[drop].sum()),
+    )
+
+
+def quantize_thresholds(trees: CompiledTrees, X: np.ndarray) -> CompiledTrees:
+    """Round thresholds up to integers on columns that are integer-valued in ``X``."""
+    X = np.asarray(X, dtype=np.float64)
+    finite = np.where(np.isfinite(X), X, 0.0)
+    integral_cols = np.all(finite == np.round(finite), axis=0)
+
+    thr  = trees.cond_threshold.astype(np.float64)
+    snap = integral_cols[trees.cond_feature] & np.isfinite(thr)
+    snap[_NEVER] = False
+    new_thr = np.where(snap, np.ceil(thr), thr).astype(trees.cond_threshold.dtype)
+    return _rebuild(trees, cond_threshold=new_thr)
+
+
+def merge_trees(trees: CompiledTrees) -> CompiledTrees:
+    """Merge trees with identical routing; fold constant trees into the base."""
+    constant = np.all(trees.node_cond == _NEVER, axis=1)
+    base = np.float32(trees.base_margin + trees.leaf_value[constant, 0].sum(dtype=np.float64))
+
+    node_cond  = trees.node_cond[~constant]
+    leaf_value = trees.leaf_value[~constant]
+    if len(node_cond) == 0:
+        node_cond  = trees.node_cond[:1]
+        leaf_value = np.zeros_like(trees.leaf_value[:1])
+
+    layouts, first, group = np.unique(node_cond, axis=0, return_index=True, return_inverse=True)
+    group  = group.ravel()
+    merged = np.zeros((len(layouts), leaf_value.shape[1]), dtype=np.float64)
+    np.add.at(merged, group, leaf_value.astype(np.float64))
+
+    # Keep the original order of first appearance
+    order = np.argsort(first, kind="stable")
+    return _rebuild(
+        trees,
+        node_cond=layouts[order],
+        leaf_value=merged[order].astype(np.float32),
+        base_margin=base,
+    )
+
+
+def quantize_leaves(trees: CompiledTrees, bits: int = DEFAULT_LEAF_BITS) -> tuple[CompiledTrees, np.ndarray, np.ndarray]:
+    """
+    Symmetric per-tree integer quantization of leaf values.
+
+    Returns
+    -------
+    trees  : CompiledTrees with dequantized (float32) leaf values
+    codes  : np.ndarray, shape (n_trees, n_leaves)  int8 / int16 codes
+    scales : np.ndarray, shape (n_trees,)           float32 per-tree scale
+    """
+    if not 2 <= bits <= 16:
+        raise ValueError(f"bits must be in [2, 16], got {bits}")
+    q_max  = 2 ** (bits - 1) - 1
+    dtype  = np.int8 if bits <= 8 else np.int16
+
+    max_abs = np.abs(trees.leaf_value).max(axis=1)
+    scales  = np.where(max_abs > 0, max_abs / q_max, 1.0).astype(np.float32)
+    codes   = np.round(trees.leaf_value / scales[:, None]).astype(dtype)
+    values  = codes.astype(np.float32) * scales[:, None]
+    return _rebuild(trees, leaf_value=values), codes, scales
+
+
+def compress(
+    trees: CompiledTrees,
+    X: np.ndarray,
+    n_keep: int | None = None,
+) -> tuple[CompiledTrees, dict]:
+    """
+    Run prune -> quantize thresholds -> merge (``n_keep=None`` skips
+    pruning).  Leaf values stay float32; quantize them with
+    quantize_leaves, or let save_compressed do it.
+
+    Returns
+    -------
+    (compressed trees, stats dict with tree / condition counts per pass)
+    """
+    if trees.has_categorical:
+        raise ValueError("Native categorical splits are not supported by the compressor")
+    stats = {"n_trees_in": trees.n_trees, "n_conds_in": trees.n_conds}
+
+    if n_keep is not None:
+        trees = prune_trees(trees, X, n_keep)
+    stats["n_trees_pruned"] = trees.n_trees
+
+    trees = quantize_thresholds(trees, X)
+    trees = merge_trees(trees)
+    stats["n_trees_merged"] = trees.n_trees
+    stats["n_conds_out"]    = trees.n_conds
+    return trees, stats
+
+
+# ============================================================================
+# STORAGE
+# ============================================================================
+
+def save_compressed(
+    path: str | Path,
+    trees: CompiledTrees,
+    schema: FeatureSchema,
+    leaf_bits: int = DEFAULT_LEAF_BITS,
+    meta: dict | None = None,
+) -> Path:
+    """
+    Write an XGBoost ensemble with integer leaf codes (and integer
+    thresholds when they are all integral) to a compressed ``.npz``.
+    Loading it gives exactly ``quantize_leaves(trees, leaf_bits)[0]``.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    _, codes, scales = quantize_leaves(trees, leaf_bits)
+    thr = trees.cond_threshold
+    finite = np.isfinite(thr)
+    if np.all(thr[finite] == np.round(thr[finite])) and np.abs(thr[finite]).max(initial=0) < 2 ** 15 - 1:
+        # +inf only appears on the reserved _NEVER condition
+        thr = np.where(finite, thr, 2 ** 15 - 1).astype(np.int16)
+
+    info = {
+        "schema":          schema.to_dict(),
+        "depth":           trees.depth,
+        "strict":          trees.strict,
+        "zero_as_missing": trees.zero_as_missing,
+        "base_margin":     float(trees.base_margin),
+        "leaf_bits":       leaf_bits,
+        "meta":            meta or {},
+    }
+    tmp_path = path.with_name(path.stem + ".tmp.npz")
+    np.savez_compressed(
+        tmp_path,
+        info=np.array(json.dumps(info)),
+        cond_feature=trees.cond_feature.astype(np.int16),
+        cond_threshold=thr,
+        cond_default=trees.cond_default,
+        node_cond=trees.node_cond.astype(np.int16 if trees.n_conds < 2 ** 15 else np.int32),
+        leaf_codes=codes,
+        leaf_scales=scales,
+    )
+    tmp_path.replace(path)
+    return path
+
+
+def load_compressed(path: str | Path) -> CompiledPipeline:
+    """Load a save_compressed bundle as an XGBoost CompiledPipeline."""
+    with np.load(path, allow_pickle=False) as arrays:
+        info = json.loads(str(arrays["info"]))
+        thr  = arrays["cond_threshold"]
+        if thr.dtype.kind == "i":
+            thr = np.where(thr == 2 ** 15 - 1, np.inf, thr)
+        trees = CompiledTrees(
+            cond_feature=arrays["cond_feature"],
+            cond_threshold=thr.astype(np.float32),
+            cond_default=arrays["cond_default"],
+            node_cond=arrays["node_cond"],
+            leaf_value=arrays["leaf_codes"].astype(np.float32) * arrays["leaf_scales"][:, None],
+            depth=info["depth"],
+            strict=info["strict"],
+            zero_as_missing=info["zero_as_missing"],
+            base_margin=info["base_margin"],
+        )
+    return CompiledPipeline(FeatureSchema.from_dict(info["schema"]), trees, KIND_XGB)
@@ -0,0 +1,443 @@
+"""
+encoding.py
+
+Pandas-free re-implementation of the fitted ``preprocess`` ColumnTransformer
+used by every hybrid pipeline (SimpleImputer + OneHotEncoder on the
+categorical columns, median SimpleImputer on AGE / PARITY).
+
+A FeatureSchema is extracted ONCE from a fitted pipeline and then encodes
+raw records straight into the float32 design matrix the tree models see,
+with exactly the semantics of the fitted transformers:
+
+* categorical values are matched by plain equality against the fitted
+  ``categories_`` (so ``"1"`` and ``1`` are different categories, as they
+  are for OneHotEncoder on object columns);
+* unknown categories encode to all-zero blocks (``handle_unknown="ignore"``);
+* a float NaN categorical value is replaced by the imputer's most-frequent
+  category, numeric None/NaN by the imputer's median.
+
+The schema is a plain dict of lists, so it can be stored as JSON next to the
+compiled tree arrays (see compiled_trees.py) and loaded without sklearn.
+
+Besides the one-hot design matrix, records can be encoded in the compact
+*index* layout used by the indexed ONNX models (tree_onnx.py): one float32
+column per raw feature, holding the category index (``-1`` for unknown
+categories) for categorical columns and the imputed value for numeric ones.
+
+Pipelines whose categorical step is an OrdinalEncoder(handle_unknown=
+"use_encoded_value", unknown_value=-1) (the native-categorical XGBoost
+variant, preprocessor.build_index_preprocessor) emit exactly that index
+layout; their schema has ``layout == "index"`` and every ``encode_*`` method
+then produces index rows.
+
+Usage
+-----
+    from inference.encoding import FeatureSchema
+
+    schema = FeatureSchema.from_pipeline(joblib.load(".../xgb_high_recall.joblib"))
+    X = schema.encode_frame(df)              # (n, n_outputs) float32
+    x = schema.encode_record(record_dict)    # (1, n_outputs) float32
+    xi = schema.encode_index_frame(df)       # (n, n_columns) float32 indices
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+LAYOUT_ONEHOT = "onehot"
+LAYOUT_INDEX  = "index"
+
+UNKNOWN_INDEX = -1
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def _to_builtin(value: Any) -> Any:
+    """numpy scalar -> Python scalar (JSON-serialisable, same hash/equality)."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _is_nan(value: Any) -> bool:
+    # Only float NaN counts as missing for the categorical imputer
+    # (SimpleImputer(missing_values=np.nan) on object arrays tests x != x).
+    return isinstance(value, float) and value != value
+
+
+def _to_float(value: Any) -> float:
+    if value is None:
+        return float("nan")
+    return float(value)
+
+
+class DictionaryColumn:
+    """
+    Dictionary-encoded column, as in Arrow dictionary arrays: row ``i``
+    holds ``dictionary[codes[i]]``, code ``-1`` is a missing value (NaN).
+
+    The encoders map the (small) dictionary to output columns once and then
+    gather by code, so such columns encode without per-row Python work.
+    """
+
+    __slots__ = ("codes", "dictionary")
+
+    def __init__(self, codes: np.ndarray, dictionary: Iterable):
+        self.codes      = np.asarray(codes)
+        self.dictionary = [_to_builtin(v) for v in dictionary]
+        if self.codes.dtype.kind not in "iu":
+            raise ValueError(f"dictionary codes must be integers, got {self.codes.dtype}")
+        if len(self.codes) and (self.codes.max() >= len(self.dictionary) or self.codes.min() < -1):
+            raise ValueError("dictionary code out of range")
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def take(self, rows: np.ndarray) -> "DictionaryColumn":
+        return DictionaryColumn(self.codes[rows], self.dictionary)
+
+    def decode(self) -> np.ndarray:
+        """Values per row: float64 (NaN for missing) for numeric dictionaries, else object."""
+        numeric = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in self.dictionary)
+        if numeric:
+            table = np.array(self.dictionary + [float("nan")], dtype=np.float64)
+        else:
+            table = np.empty(len(self.dictionary) + 1, dtype=object)
+            table[:-1] = self.dictionary
+            table[-1] = float("nan")
+        return table[self.codes]                  # code -1 picks the trailing NaN
+
+
+def factorize(values: Any) -> tuple[list, np.ndarray] | None:
+    """
+    (distinct values, code per row) of a dictionary or typed NumPy column,
+    None for lists / object arrays (those are looked up value by value).
+    Code -1 marks a missing dictionary entry.
+    """
+    if isinstance(values, DictionaryColumn):
+        return values.dictionary, values.codes
+    if isinstance(values, np.ndarray) and values.dtype.kind in "biufU":
+        uniques, codes = np.unique(values, return_inverse=True)
+        return uniques.tolist(), codes.reshape(-1)
+    return None
+
+
+# ============================================================================
+# FEATURE SCHEMA
+# ============================================================================
+
+class FeatureSchema:
+    """
+    Column layout of a fitted ``preprocess`` ColumnTransformer.
+
+    Attributes
+    ----------
+    columns : list[dict]
+        One entry per raw input column, in output order.  Numeric entries:
+        ``{"name", "kind": "num", "offset", "fill"}``.  Categorical entries:
+        ``{"name", "kind": "cat", "offset", "fill", "categories"}``.
+    n_outputs : int
+        Width of the encoded design matrix.
+    sparse : bool
+        True when the fitted transformer emits a sparse matrix.  XGBoost then
+        treats every zero as *missing*; see CompiledTrees.zero_as_missing.
+    layout : str
+        "onehot" (OneHotEncoder, one output per category) or "index"
+        (OrdinalEncoder, one output per raw column; ``n_outputs == n_columns``).
+    """
+
+    def __init__(self, columns: list[dict], n_outputs: int, sparse: bool = False,
+                 layout: str = LAYOUT_ONEHOT):
+        if layout not in (LAYOUT_ONEHOT, LAYOUT_INDEX):
+            raise ValueError(f"Unknown schema layout '{layout}'")
+        self.columns   = columns
+        self.n_outputs = int(n_outputs)
+        self.sparse    = bool(sparse)
+        self.layout    = layout
+
+        # Lookup tables: category value -> absolute output column
+        self._lookups: dict[str, dict[Any, int]] = {}
+        for col in columns:
+            if col["kind"] == "cat":
+                self._lookups[col["name"]] = {
+                    cat: col["offset"] + i for i, cat in enumerate(col["categories"])
+                }
+
+        # Output column -> (raw column position, category index or -1 for numerics)
+        # (one-hot layout only; index outputs are the raw columns themselves)
+        self.output_source: list[tuple[int, int]] = [(-1, -1)] * self.n_outputs
+        for i, col in enumerate(columns):
+            if layout == LAYOUT_INDEX:
+                break
+            if col["kind"] == "cat":
+                for k in range(len(col["categories"])):
+                    self.output_source[col["offset"] + k] = (i, k)
+            else:
+                self.output_source[col["offset"]] = (i, -1)
+
+    # ------------------------------------------------------------------
+    # Construction / serialisation
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "FeatureSchema":
+        """Extract the schema from a fitted sklearn Pipeline's ``preprocess`` step."""
+        return cls.from_column_transformer(pipeline.named_steps["preprocess"])
+
+    @classmethod
+    def from_column_transformer(cls, ct) -> "FeatureSchema":
+        columns: list[dict] = []
+        offset = 0
+        layouts = set()
+
+        for name, transformer, cols in ct.transformers_:
+            if transformer == "drop" or name == "remainder":
+                continue
+            steps = dict(transformer.steps) if hasattr(transformer, "steps") else {name: transformer}
+            imputer = next((s for s in steps.values() if hasattr(s, "statistics_")), None)
+            encoder = next((s for s in steps.values() if hasattr(s, "categories_")), None)
+
+            if encoder is not None and hasattr(encoder, "unknown_value"):
+                # OrdinalEncoder: one output column holding the category index
+                if encoder.handle_unknown != "use_encoded_value" or encoder.unknown_value != UNKNOWN_INDEX:
+                    raise ValueError(
+                        f"Transformer '{name}': only OrdinalEncoder(handle_unknown="
+                        f"'use_encoded_value', unknown_value={UNKNOWN_INDEX}) is supported"
+                    )
+                layouts.add(LAYOUT_INDEX)
+                for j, col in enumerate(cols):
+                    cats = [_to_builtin(c) for c in encoder.categories_[j]]
+                    fill = _to_builtin(imputer.statistics_[j]) if imputer is not None else None
+                    columns.append({
+                        "name": col, "kind": "cat", "offset": offset,
+                        "fill": fill, "categories": cats,
+                    })
+                    offset += 1
+            elif encoder is not None:
+                layouts.add(LAYOUT_ONEHOT)
+                if encoder.handle_unknown != "ignore" or encoder.drop is not None:
+                    raise ValueError(
+                        f"Transformer '{name}': only OneHotEncoder(handle_unknown='ignore', "
+                        f"drop=None) is supported"
+                    )
+                for j, col in enumerate(cols):
+                    cats = [_to_builtin(c) for c in encoder.categories_[j]]
+                    fill = _to_builtin(imputer.statistics_[j]) if imputer is not None else None
+                    columns.append({
+                        "name": col, "kind": "cat", "offset": offset,
+                        "fill": fill, "categories": cats,
+                    })
+                    offset += len(cats)
+            else:
+                if imputer is None or len(steps) != 1:
+                    raise ValueError(
+                        f"Transformer '{name}': numeric columns must be a bare SimpleImputer"
+                    )
+                for j, col in enumerate(cols):
+                    columns.append({
+                        "name": col, "kind": "num", "offset": offset,
+                        "fill": float(imputer.statistics_[j]),
+                    })
+                    offset += 1
+
+        if len(layouts) > 1:
+            raise ValueError("Mixing OneHotEncoder and OrdinalEncoder columns is not supported")
+        layout = layouts.pop() if layouts else LAYOUT_ONEHOT
+        return cls(columns, offset, sparse=bool(getattr(ct, "sparse_output_", False)), layout=layout)
+
+    def to_dict(self) -> dict:
+        d = {"columns": self.columns, "n_outputs": self.n_outputs, "sparse": self.sparse}
+        if self.layout != LAYOUT_ONEHOT:
+            d["layout"] = self.layout
+        return d
+
+    @classmethod
+    def from_dict(cls, d: Mapping) -> "FeatureSchema":
+        return cls(list(d["columns"]), d["n_outputs"], d.get("sparse", False),
+                   d.get("layout", LAYOUT_ONEHOT))
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, s: str) -> "FeatureSchema":
+        return cls.from_dict(json.loads(s))
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, FeatureSchema) and self.to_dict() == other.to_dict()
+
+    @property
+    def feature_names(self) -> list[str]:
+        """Raw input column names, in the order the transformer consumes them."""
+        return [col["name"] for col in self.columns]
+
+    @property
+    def n_columns(self) -> int:
+        """Width of the index layout (one column per raw feature)."""
+        return len(self.columns)
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+
+    def encode_columns(self, data: Mapping[str, Iterable], n_rows: int) -> np.ndarray:
+        """
+        Encode column-oriented input (``{name: sequence}``) into a float32
+        design matrix of shape (n_rows, n_outputs).
+
+        Columns may be lists, NumPy arrays or DictionaryColumns; typed
+        arrays and dictionary columns are encoded without per-row Python
+        work (each distinct category is looked up once).
+        """
+        if self.layout == LAYOUT_INDEX:
+            return self.encode_index_columns(data, n_rows)
+        X = np.zeros((n_rows, self.n_outputs), dtype=np.float32)
+        rows = np.arange(n_rows)
+
+        for col in self.columns:
+            name   = col["name"]
+            values = data[name]
+
+            if col["kind"] == "num":
+                v = self._numeric(values, n_rows)
+                X[:, col["offset"]] = np.where(np.isnan(v), col["fill"], v)
+            else:
+                idx = self._category_outputs(col, values, n_rows)
+                known = idx >= 0
+                X[rows[known], idx[known]] = 1.0
+
+        return X
+
+    @staticmethod
+    def _numeric(values: Any, n_rows: int) -> np.ndarray:
+        if isinstance(values, DictionaryColumn):
+            values = values.decode()
+        return np.asarray(values, dtype=np.float64).reshape(n_rows)
+
+    def _category_outputs(self, col: dict, values: Any, n_rows: int) -> np.ndarray:
+        """Absolute output column of every row's category, -1 if unknown."""
+        lookup = self._lookups[col["name"]]
+        fill   = col["fill"]
+        factorized = factorize(values)
+        if factorized is None:
+            return np.fromiter(
+                (lookup.get(fill if _is_nan(v) else v, -1) for v in values),
+                dtype=np.int64, count=n_rows,
+            )
+        # Look each distinct value up once, then gather by code
+        # (code -1, a missing dictionary entry, picks the imputed fill)
+        uniques, codes = factorized
+        table = np.fromiter(
+            (lookup.get(fill if _is_nan(v) else v, -1) for v in uniques + [fill]),
+            dtype=np.int64, count=len(uniques) + 1,
+        )
+        return table[codes]
+
+    def encode_frame(self, df) -> np.ndarray:
+        """Encode a pandas DataFrame (extra columns are ignored)."""
+        data = {
+            name: df[name].to_numpy(dtype=object) for name in self.feature_names
+        }
+        return self.encode_columns(data, len(df))
+
+    def encode_records(self, records: list[Mapping[str, Any]]) -> np.ndarray:
+        """Encode a list of dicts (one per row)."""
+        data = {name: [r[name] for r in records] for name in self.feature_names}
+        for col in self.columns:
+            if col["kind"] == "num":
+                data[col["name"]] = [_to_float(v) for v in data[col["name"]]]
+        return self.encode_columns(data, len(records))
+
+    def encode_record(self, record: Mapping[str, Any], out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Encode a single dict into a (1, n_outputs) float32 row.
+
+        ``out`` may be a preallocated (1, n_outputs) float32 buffer; it is
+        zeroed and filled in place.
+        """
+        if self.layout == LAYOUT_INDEX:
+            return self.encode_index_record(record, out=out)
+        if out is None:
+            out = np.zeros((1, self.n_outputs), dtype=np.float32)
+        else:
+            out.fill(0.0)
+        row = out[0]
+
+        for col in self.columns:
+            v = record[col["name"]]
+            if col["kind"] == "num":
+                v = _to_float(v)
+                row[col["offset"]] = col["fill"] if v != v else v
+            else:
+                j = self._lookups[col["name"]].get(col["fill"] if _is_nan(v) else v, -1)
+                if j >= 0:
+                    row[j] = 1.0
+        return out
+
+    # ------------------------------------------------------------------
+    # Index layout
+    # ------------------------------------------------------------------
+
+    def encode_index_columns(self, data: Mapping[str, Iterable], n_rows: int) -> np.ndarray:
+        """
+        Encode column-oriented input into the index layout, shape
+        (n_rows, n_columns): category index (-1 if unknown) or numeric value.
+        """
+        X = np.empty((n_rows, self.n_columns), dtype=np.float32)
+
+        for i, col in enumerate(self.columns):
+            name   = col["name"]
+            values = data[name]
+
+            if col["kind"] == "num":
+                v = self._numeric(values, n_rows)
+                X[:, i] = np.where(np.isnan(v), col["fill"], v)
+            else:
+                idx = self._category_outputs(col, values, n_rows)
+                X[:, i] = np.where(idx >= 0, idx - col["offset"], UNKNOWN_INDEX)
+
+        return X
+
+    def encode_index_frame(self, df) -> np.ndarray:
+        """Index layout of a pandas DataFrame (extra columns are ignored)."""
+        data = {
+            name: df[name].to_numpy(dtype=object) for name in self.feature_names
+        }
+        return self.encode_index_columns(data, len(df))
+
+    def encode_index_record(self, record: Mapping[str, Any], out: np.ndarray | None = None) -> np.ndarray:
+        """Index layout of a single dict, shape (1, n_columns) (``out``: optional buffer)."""
+        if out is None:
+            out = np.empty((1, self.n_columns), dtype=np.float32)
+        for i, col in enumerate(self.columns):
+            v = record[col["name"]]
+            if col["kind"] == "num":
+                v = _to_float(v)
+                out[0, i] = col["fill"] if v != v else v
+            else:
+                j = self._lookups[col["name"]].get(col["fill"] if _is_nan(v) else v, -1)
+                out[0, i] = j - col["offset"] if j >= 0 else UNKNOWN_INDEX
+        return out
+
+    def expand_indices(self, X_index: np.ndarray) -> np.ndarray:
+        """Index layout -> one-hot design matrix (inverse of the index encoding)."""
+        X_index = np.asarray(X_index, dtype=np.float32)
+        n_rows  = X_index.shape[0]
+        X    = np.zeros((n_rows, self.n_outputs), dtype=np.float32)
+        rows = np.arange(n_rows)
+
+        for i, col in enumerate(self.columns):
+            if col["kind"] == "num":
+                X[:, col["offset"]] = X_index[:, i]
+            else:
+                k = X_index[:, i].astype(np.int64)
+                known = (k >= 0) & (k < len(col["categories"]))
+                X[rows[known], col["offset"] + k[known]] = 1.0
+
+        return X
@@ -0,0 +1,301 @@
+"""
+hybrid.py
+
+The upgrade-only hybrid rule, shared by the training / evaluation scripts,
+the experiments and the backend:
+
+    xgb_pred = P(y=1) >= threshold
+    upgrade  = |P(y=1) - threshold| < conf_margin  and  DT predicts 1
+    hybrid   = xgb_pred or upgrade            (a positive is never downgraded)
+
+Layers:
+
+    model_outputs                 scores both members once (ModelOutputs)
+    hybrid_rule / hybrid_labels   the vectorized rule on precomputed model
+                                  outputs (threshold sweeps, stored OOF
+                                  predictions) -- no inference
+    HybridEngine                  scores any XGBoost / Decision Tree pair
+                                  exposing predict_proba / predict (fitted
+                                  sklearn pipelines, CompiledPipeline, the
+                                  backend's OnnxModel) and applies the rule;
+                                  already computed ModelOutputs can be passed
+                                  in to skip inference
+    HybridEngine.stream           the same over fixed-size row batches or an
+                                  iterable of chunks (e.g. read_csv chunks)
+    hybrid_row                    the rule on one (probability, DT label) pair,
+                                  used by HybridRowScorer
+    risk_confidence               the API's threshold-relative confidence
+
+Stage timings: an engine built with ``stage_observer`` times its members
+separately and calls ``stage_observer({"xgb": s, "dt": s})`` (seconds) once
+per outputs() call; HybridRowScorer reports "encoding" / "xgb" / "dt" the
+same way.  Pipeline members encode inside predict, so there the XGBoost and
+DT timings include their preprocessing.
+
+Every variant produces the same labels; the ``upgrade_flags`` / "upgraded_by_dt"
+mask is the low-confidence AND DT-positive mask, whether or not XGBoost was
+already positive.
+
+Usage
+-----
+    from inference.hybrid import HybridEngine, hybrid_labels, model_outputs
+
+    engine  = HybridEngine(xgb_pipeline, dt_pipeline, threshold=0.25, conf_margin=0.05)
+    result  = engine.predict(X)                              # dict of per-row arrays
+    outputs = model_outputs(xgb_pipeline, dt_pipeline, X)    # score once ...
+    for t in (0.2, 0.25, 0.3):                               # ... re-threshold for free
+        labels = hybrid_labels(outputs.xgb_prob, outputs.dt_pred, t, 0.05)
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Iterable, Iterator, Mapping, NamedTuple, Protocol
+
+import numpy as np
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+DEFAULT_BATCH_SIZE = 8192
+
+RESULT_KEYS = ("predictions", "xgb_probabilities", "xgb_predictions", "dt_predictions", "upgrade_flags")
+
+
+# ============================================================================
+# MODEL INTERFACE
+# ============================================================================
+
+class ProbabilityModel(Protocol):
+    """XGBoost member: sklearn Pipeline, CompiledPipeline or OnnxModel."""
+
+    def predict_proba(self, X: Any) -> np.ndarray: ...
+
+
+class LabelModel(Protocol):
+    """Decision Tree member: sklearn Pipeline, CompiledPipeline or OnnxModel."""
+
+    def predict(self, X: Any) -> np.ndarray: ...
+
+
+class ModelOutputs(NamedTuple):
+    """Raw member outputs for n rows; everything the rule needs."""
+
+    xgb_prob: np.ndarray     # (n,) XGBoost P(y=1)
+    dt_pred:  np.ndarray     # (n,) Decision Tree labels
+
+
+def model_outputs(xgb_model: ProbabilityModel, dt_model: LabelModel, X: Any) -> ModelOutputs:
+    """Score both members once (no rule applied)."""
+    return ModelOutputs(
+        xgb_prob=np.asarray(xgb_model.predict_proba(X))[:, 1],
+        dt_pred=np.asarray(dt_model.predict(X)),
+    )
+
+
+# ============================================================================
+# RULE
+# ============================================================================
+
+def hybrid_rule(
+    xgb_prob: np.ndarray,
+    dt_pred: np.ndarray,
+    threshold: float,
+    conf_margin: float,
+) -> dict[str, np.ndarray]:
+    """
+    Upgrade-only hybrid rule on precomputed model outputs.
+
+    Returns
+    -------
+    dict of per-row arrays:
+        predictions (int8), xgb_probabilities, xgb_predictions (int8),
+        dt_predictions, upgrade_flags (bool)
+    """
+    xgb_prob = np.asarray(xgb_prob)
+    dt_pred  = np.asarray(dt_pred)
+
+    xgb_pred = xgb_prob >= threshold
+    upgrade  = np.abs(xgb_prob - threshold) < conf_margin
+    upgrade &= dt_pred == 1
+    return {
+        "predictions":       (xgb_pred | upgrade).view(np.int8),
+        "xgb_probabilities": xgb_prob,
+        "xgb_predictions":   xgb_pred.view(np.int8),
+        "dt_predictions":    dt_pred,
+        "upgrade_flags":     upgrade,
+    }
+
+
+def hybrid_labels(
+    xgb_prob: np.ndarray,
+    dt_pred: np.ndarray,
+    threshold: float,
+    conf_margin: float,
+) -> np.ndarray:
+    """Hybrid labels only (int8, shape (n,)); the hot loop of threshold sweeps."""
+    xgb_prob = np.asarray(xgb_prob)
+    labels   = np.abs(xgb_prob - threshold) < conf_margin
+    labels  &= np.asarray(dt_pred) == 1
+    labels  |= xgb_prob >= threshold
+    return labels.view(np.int8)
+
+
+def risk_confidence(xgb_prob, prediction, threshold: float):
+    """
+    Threshold-relative confidence in [0, 1] (0 = borderline, 1 = maximally
+    certain), as reported by the API and onDeviceRiskService.ts:
+    |p - threshold| / (1 - threshold) for HIGH, / threshold for LOW.
+    Works on scalars and arrays.
+    """
+    xgb_prob = np.asarray(xgb_prob, dtype=np.float64)
+    max_dist = np.where(np.asarray(prediction) == 1, 1.0 - threshold, threshold)
+    dist     = np.abs(xgb_prob - threshold)
+    return np.divide(dist, max_dist, out=np.zeros_like(dist), where=max_dist > 0)
+
+
+def hybrid_row(prob: float, dt_pred: int, threshold: float, conf_margin: float) -> dict:
+    """The rule on one row, as Python scalars (keys as HybridRowScorer.score)."""
+    xgb_pred = int(prob >= threshold)
+    upgraded = bool(abs(prob - threshold) < conf_margin and dt_pred == 1)
+    return {
+        "prediction":      1 if (xgb_pred or upgraded) else 0,
+        "xgb_probability": float(prob),
+        "xgb_prediction":  xgb_pred,
+        "dt_prediction":   int(dt_pred),
+        "upgraded_by_dt":  upgraded,
+    }
+
+
+def row_result(result: Mapping[str, np.ndarray], i: int) -> dict:
+    """Row ``i`` of a hybrid_rule / HybridEngine.predict result as Python scalars."""
+    return {
+        "prediction":      int(result["predictions"][i]),
+        "xgb_probability": float(result["xgb_probabilities"][i]),
+        "xgb_prediction":  int(result["xgb_predictions"][i]),
+        "dt_prediction":   int(result["dt_predictions"][i]),
+        "upgraded_by_dt":  bool(result["upgrade_flags"][i]),
+    }
+
+
+def concat_results(results: Iterable[Mapping[str, np.ndarray]]) -> dict[str, np.ndarray]:
+    """Concatenate per-batch results row-wise."""
+    results = list(results)
+    if not results:
+        raise ValueError("no results to concatenate")
+    return {key: np.concatenate([r[key] for r in results]) for key in RESULT_KEYS}
+
+
+# ============================================================================
+# ENGINE
+# ============================================================================
+
+class HybridEngine:
+    """
+    Hybrid XGBoost + Decision Tree scorer over any model backend.
+
+    Parameters
+    ----------
+    xgb_model   : object with predict_proba(X) -> (n, 2)
+    dt_model    : object with predict(X) -> (n,)
+    threshold   : float  XGBoost decision threshold
+    conf_margin : float  low-confidence band in which a DT positive upgrades
+    stage_observer : optional callable receiving {"xgb": s, "dt": s} per outputs() call
+
+    Both members receive X unchanged, so X is whatever the backend accepts
+    (a DataFrame of raw features for pipelines / compiled / ONNX models).
+    """
+
+    def __init__(
+        self,
+        xgb_model: ProbabilityModel,
+        dt_model: LabelModel,
+        threshold: float,
+        conf_margin: float,
+        stage_observer: Callable[[dict], None] | None = None,
+    ):
+        self.xgb_model      = xgb_model
+        self.dt_model       = dt_model
+        self.threshold      = float(threshold)
+        self.conf_margin    = float(conf_margin)
+        self.stage_observer = stage_observer
+
+    @classmethod
+    def from_config(
+        cls,
+        xgb_model: ProbabilityModel,
+        dt_model: LabelModel,
+        config: Mapping,
+        stage_observer: Callable[[dict], None] | None = None,
+    ) -> "HybridEngine":
+        """Build from a normalized config ('threshold' / 'conf_margin' keys)."""
+        return cls(xgb_model, dt_model, config["threshold"], config["conf_margin"], stage_observer)
+
+    def outputs(self, X: Any) -> ModelOutputs:
+        """Score both members once (no rule applied)."""
+        if self.stage_observer is None:
+            return model_outputs(self.xgb_model, self.dt_model, X)
+        t0       = time.perf_counter()
+        xgb_prob = np.asarray(self.xgb_model.predict_proba(X))[:, 1]
+        t1       = time.perf_counter()
+        dt_pred  = np.asarray(self.dt_model.predict(X))
+        t2       = time.perf_counter()
+        self.stage_observer({"xgb": t1 - t0, "dt": t2 - t1})
+        return ModelOutputs(xgb_prob=xgb_prob, dt_pred=dt_pred)
+
+    def predict(
+        self,
+        X: Any = None,
+        outputs: ModelOutputs | None = None,
+        threshold: float | None = None,
+        conf_margin: float | None = None,
+    ) -> dict[str, np.ndarray]:
+        """
+        Hybrid prediction for X, or for cached ``outputs`` without inference.
+
+        ``threshold`` / ``conf_margin`` override the engine's operating point
+        for this call only.
+
+        Returns
+        -------
+        dict of per-row arrays (see hybrid_rule)
+        """
+        if outputs is None:
+            if X is None:
+                raise ValueError("predict needs X or precomputed outputs")
+            outputs = self.outputs(X)
+        return hybrid_rule(
+            outputs.xgb_prob,
+            outputs.dt_pred,
+            self.threshold if threshold is None else threshold,
+            self.conf_margin if conf_margin is None else conf_margin,
+        )
+
+    def labels(self, X: Any = None, outputs: ModelOutputs | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """(hybrid labels, XGBoost probabilities) -- the pair the evaluation scripts use."""
+        result = self.predict(X, outputs)
+        return result["predictions"], result["xgb_probabilities"]
+
+    def stream(self, source: Any, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[dict[str, np.ndarray]]:
+        """
+        Yield one result per batch.
+
+        ``source`` is either a DataFrame / array, scored ``batch_size`` rows
+        at a time, or an iterable of chunks (e.g. ``pd.read_csv(..., chunksize=n)``)
+        scored chunk by chunk.
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be >= 1, got {batch_size}")
+        if hasattr(source, "iloc") or isinstance(source, np.ndarray):
+            rows = source.iloc if hasattr(source, "iloc") else source
+            for start in range(0, len(source), batch_size):
+                yield self.predict(rows[start:start + batch_size])
+        else:
+            for chunk in source:
+                if len(chunk):
+                    yield self.predict(chunk)
+
+    def predict_batched(self, source: Any, batch_size: int = DEFAULT_BATCH_SIZE) -> dict[str, np.ndarray]:
+        """stream() concatenated into one result (bounded peak memory per batch)."""
+        return concat_results(self.stream(source, batch_size))
@@ -0,0 +1,356 @@
+"""
+risk_table.py
+
+Precomputed lookup table of the hybrid model's outputs, served by direct
+indexing instead of tree evaluation.
+
+The model's input space is finite once every column is reduced to the
+buckets the trees can tell apart (split_index.py): tested categories plus
+one "other" class for categorical columns, piecewise-constant bins between
+split points for numeric ones, so the whole real line is covered.
+
+A cell is (categorical classes, numeric bins).  The table stores the XGBoost
+probability (float32) and the Decision Tree label (int8) of one
+representative input per cell, computed with the compiled models, so every
+input of a cell gets bit-identical outputs; the hybrid rule is applied on
+top as usual (threshold-free table).
+
+Storage is dense over the numeric bins and indexed over the categorical
+combinations: ``keys`` holds the mixed-radix codes of the enumerated
+combinations (all of them, or only those observed in a dataset), and rows
+whose combination is not in the table are scored by the fallback models.
+
+    record / DataFrame --encode_index--> category indices + numeric values
+                       --class_of / searchsorted(cuts)--> combo key, numeric bin
+                       --searchsorted(keys)--> cell --> (xgb_prob, dt_pred)
+
+Usage
+-----
+    from inference.risk_table import RiskTable
+
+    table = RiskTable.build(xgb_c, dt_c, combos=RiskTable.combos_of(xgb_c, dt_c, X_train))
+    table.save("risk_table.npz")
+
+    table = RiskTable.load("risk_table.npz")
+    outputs, covered = table.lookup(df)                   # ModelOutputs + bool mask
+    xgb_t, dt_t = table.members(fallback=(xgb_c, dt_c))   # for HybridEngine
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+
+from inference.compiled_trees import CompiledPipeline
+from inference.encoding import LAYOUT_INDEX, FeatureSchema
+from inference.hybrid import ModelOutputs, hybrid_row
+from inference.split_index import SplitIndex
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+# Representative rows scored per compiled-model call while building
+BUILD_BLOCK_ROWS = 1 << 16
+
+# Refuse to allocate tables beyond this many cells unless asked to
+DEFAULT_MAX_CELLS = 50_000_000
+
+
+# ============================================================================
+# TABLE
+# ============================================================================
+
+class RiskTable:
+    """
+    Hybrid model outputs for every cell of a (partially) enumerated input space.
+
+    Parameters
+    ----------
+    index    : SplitIndex     bucket layout of the models' inputs
+    keys     : np.ndarray     sorted int64 mixed-radix codes of the enumerated
+                              categorical combinations
+    xgb_prob : np.ndarray     (len(keys) * n_bins,) float32 XGBoost P(y=1)
+    dt_pred  : np.ndarray     (len(keys) * n_bins,) int8 Decision Tree labels
+    config   : dict           hybrid config of the source bundle
+    """
+
+    def __init__(
+        self,
+        index: SplitIndex,
+        keys: np.ndarray,
+        xgb_prob: np.ndarray,
+        dt_pred: np.ndarray,
+        config: dict | None = None,
+    ):
+        self.index    = index
+        self.schema   = index.schema
+        self.keys     = np.ascontiguousarray(keys, dtype=np.int64)
+        self.xgb_prob = np.ascontiguousarray(xgb_prob, dtype=np.float32)
+        self.dt_pred  = np.ascontiguousarray(dt_pred, dtype=np.int8)
+        self.config   = config or {}
+
+        self._cat_cols = index.cat_cols
+        self._num_cols = index.num_cols
+        self.cat_sizes = [index.sizes[i] for i in self._cat_cols]
+        self.num_sizes = [index.sizes[i] for i in self._num_cols]
+        if math.prod(self.cat_sizes) > np.iinfo(np.int64).max:
+            raise ValueError("Too many categorical combinations to index with int64 keys")
+        self._cat_radix = _radix(self.cat_sizes)
+        self._num_radix = _radix(self.num_sizes)
+        self.n_bins = math.prod(self.num_sizes)
+        self._full  = len(self.keys) == self.n_combos_total
+
+        if len(self.xgb_prob) != len(self.keys) * self.n_bins or len(self.dt_pred) != len(self.xgb_prob):
+            raise ValueError("Table arrays do not match the domain size")
+
+        self._x    = np.empty((1, self.schema.n_columns), dtype=np.float32)
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Domain
+    # ------------------------------------------------------------------
+
+    @property
+    def n_combos_total(self) -> int:
+        """Number of categorical combinations in the full input space."""
+        return math.prod(self.cat_sizes)
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.xgb_prob)
+
+    @property
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.xgb_prob.nbytes + self.dt_pred.nbytes
+
+    def _combo_keys(self, buckets: np.ndarray) -> np.ndarray:
+        """Mixed-radix code of the categorical buckets of every row."""
+        return buckets[:, self._cat_cols] @ self._cat_radix
+
+    def cells(self, X_index: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Cell of every row of an index-layout matrix (schema.encode_index_*).
+
+        Returns (cell index, covered mask); uncovered rows get cell 0.
+        """
+        buckets = self.index.buckets(X_index)
+        key = self._combo_keys(buckets)
+        if self._full:
+            row, covered = key, np.ones(len(key), dtype=bool)
+        else:
+            row = np.searchsorted(self.keys, key)
+            np.minimum(row, len(self.keys) - 1, out=row)
+            covered = self.keys[row] == key
+            row[~covered] = 0
+        return row * self.n_bins + buckets[:, self._num_cols] @ self._num_radix, covered
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def combos_of(cls, xgb: CompiledPipeline, dt: CompiledPipeline, X) -> np.ndarray:
+        """Distinct categorical combinations of a DataFrame (e.g. the training data)."""
+        index = SplitIndex.from_models(xgb, dt)
+        probe = cls(index, np.zeros(0, dtype=np.int64), np.zeros(0, np.float32), np.zeros(0, np.int8))
+        return np.unique(probe._combo_keys(index.buckets_frame(X)))
+
+    @classmethod
+    def build(
+        cls,
+        xgb: CompiledPipeline,
+        dt: CompiledPipeline,
+        combos: Iterable[int] | None = None,
+        config: dict | None = None,
+        max_cells: int = DEFAULT_MAX_CELLS,
+    ) -> "RiskTable":
+        """
+        Score one representative input per cell with the compiled models.
+
+        ``combos``: mixed-radix codes of the categorical combinations to
+        enumerate (see combos_of); None enumerates all of them.
+        """
+        index  = SplitIndex.from_models(xgb, dt)
+        schema = index.schema
+        empty  = cls(index, np.zeros(0, dtype=np.int64), np.zeros(0, np.float32), np.zeros(0, np.int8), config)
+
+        keys = (np.arange(empty.n_combos_total, dtype=np.int64) if combos is None
+                else np.unique(np.asarray(list(combos), dtype=np.int64)))
+        n_cells = len(keys) * empty.n_bins
+        if n_cells > max_cells:
+            raise ValueError(f"Table would have {n_cells:,} cells (max_cells={max_cells:,})")
+
+        # Representative category index per class, and value per numeric bin
+        reps     = index.representatives()
+        cat_reps = [reps[i] for i in empty._cat_cols]
+        num_reps = [reps[i] for i in empty._num_cols]
+
+        # Numeric grid (n_bins, n_num_cols), the same block for every combination
+        grid = np.stack(np.meshgrid(*num_reps, indexing="ij"), axis=-1).reshape(-1, len(num_reps)) \
+            if num_reps else np.zeros((1, 0), dtype=np.float32)
+
+        xgb_prob = np.empty(n_cells, dtype=np.float32)
+        dt_pred  = np.empty(n_cells, dtype=np.int8)
+        combos_per_block = max(1, BUILD_BLOCK_ROWS // empty.n_bins)
+        for start in range(0, len(keys), combos_per_block):
+            block = keys[start:start + combos_per_block]
+            X_index = np.empty((len(block) * empty.n_bins, schema.n_columns), dtype=np.float32)
+            digits = (block[:, None] // empty._cat_radix) % np.asarray(empty.cat_sizes)
+            for j, i in enumerate(empty._cat_cols):
+                X_index[:, i] = np.repeat(cat_reps[j][digits[:, j]], empty.n_bins)
+            for j, i in enumerate(empty._num_cols):
+                X_index[:, i] = np.tile(grid[:, j], len(block))
+            X = X_index if schema.layout == LAYOUT_INDEX else schema.expand_indices(X_index)
+            lo, hi = start * empty.n_bins, (start + len(block)) * empty.n_bins
+            xgb_prob[lo:hi] = xgb.predict_proba(X)[:, 1]
+            dt_pred[lo:hi]  = dt.predict(X)
+
+        return cls(index, keys, xgb_prob, dt_pred, config)
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def _encode(self, X) -> np.ndarray:
+        if isinstance(X, np.ndarray):
+            return X
+        return self.schema.encode_index_frame(X)
+
+    def lookup(self, X, fallback: tuple[Any, Any] | None = None) -> tuple[ModelOutputs, np.ndarray]:
+        """
+        Model outputs for a DataFrame (or index-layout matrix) by direct indexing.
+
+        Rows outside the table are scored by ``fallback`` = (xgb, dt)
+        CompiledPipelines when given, otherwise a ValueError is raised.
+
+        Returns (ModelOutputs, covered mask).
+        """
+        X_index = self._encode(X)
+        cell, covered = self.cells(X_index)
+        xgb_prob = self.xgb_prob.take(cell)
+        dt_pred  = self.dt_pred.take(cell)
+        if not covered.all():
+            if fallback is None:
+                raise ValueError(f"{int((~covered).sum())} row(s) outside the risk table")
+            missed = X_index[~covered]
+            if self.schema.layout != LAYOUT_INDEX:
+                missed = self.schema.expand_indices(missed)
+            xgb_prob[~covered] = fallback[0].predict_proba(missed)[:, 1]
+            dt_pred[~covered]  = fallback[1].predict(missed)
+        return ModelOutputs(xgb_prob=xgb_prob, dt_pred=dt_pred), covered
+
+    def lookup_record(self, record: Mapping[str, Any]) -> tuple[np.float32, int] | None:
+        """(XGBoost probability, DT label) of one raw record, or None if outside the table."""
+        with self._lock:
+            x = self.schema.encode_index_record(record, out=self._x)
+            cell, covered = self.cells(x)
+        if not covered[0]:
+            return None
+        return self.xgb_prob[cell[0]], int(self.dt_pred[cell[0]])
+
+    def members(self, fallback: tuple[Any, Any] | None = None) -> tuple["TableMember", "TableMember"]:
+        """(XGBoost, Decision Tree) predict_proba / predict views for HybridEngine."""
+        return TableMember(self, "xgb", fallback), TableMember(self, "dt", fallback)
+
+    # ------------------------------------------------------------------
+    # Serialisation
+    # ------------------------------------------------------------------
+
+    def save(self, path: str | Path) -> Path:
+        """Write the table to a compressed ``.npz`` (no pickles)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        class_of, cuts = self.index.to_arrays()
+        meta = {
+            "schema":   self.schema.to_dict(),
+            "class_of": class_of,
+            "cuts":     cuts,
+            "config":   self.config,
+        }
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez_compressed(
+            tmp_path,
+            meta=np.array(json.dumps(meta)),
+            keys=self.keys,
+            xgb_prob=self.xgb_prob,
+            dt_pred=self.dt_pred,
+        )
+        tmp_path.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path: str | Path) -> "RiskTable":
+        with np.load(path, allow_pickle=False) as arrays:
+            meta = json.loads(str(arrays["meta"]))
+            index = SplitIndex(FeatureSchema.from_dict(meta["schema"]), meta["class_of"], meta["cuts"])
+            return cls(
+                index,
+                arrays["keys"],
+                arrays["xgb_prob"],
+                arrays["dt_pred"],
+                meta.get("config", {}),
+            )
+
+
+def _radix(sizes: list[int]) -> np.ndarray:
+    """Mixed-radix place values (last column varies fastest)."""
+    radix = np.ones(len(sizes), dtype=np.int64)
+    for j in range(len(sizes) - 2, -1, -1):
+        radix[j] = radix[j + 1] * sizes[j + 1]
+    return radix
+
+
+# ============================================================================
+# SERVING ADAPTERS
+# ============================================================================
+
+class TableMember:
+    """
+    One member of a RiskTable behind the predict_proba / predict interface
+    HybridEngine expects, so the table drops in for a model pair.
+    """
+
+    def __init__(self, table: RiskTable, kind: str, fallback: tuple[Any, Any] | None = None):
+        if kind not in ("xgb", "dt"):
+            raise ValueError(f"Unknown table member '{kind}'")
+        self.table    = table
+        self.kind     = kind
+        self.fallback = fallback
+        self.classes_ = np.array([0, 1])
+
+    def predict_proba(self, X) -> np.ndarray:
+        p = self.table.lookup(X, self.fallback)[0].xgb_prob
+        return np.column_stack([np.float32(1.0) - p, p])
+
+    def predict(self, X) -> np.ndarray:
+        if self.kind == "dt":
+            return self.table.lookup(X, self.fallback)[0].dt_pred
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(np.int64)
+
+
+class TableRowScorer:
+    """
+    Single-record scorer on a RiskTable (same results as HybridRowScorer);
+    records outside the table go to ``fallback`` (a HybridRowScorer).
+    """
+
+    def __init__(self, table: RiskTable, threshold: float, conf_margin: float, fallback: Any = None):
+        self.table       = table
+        self.threshold   = float(threshold)
+        self.conf_margin = float(conf_margin)
+        self.fallback    = fallback
+
+    def score(self, record: Mapping[str, Any]) -> dict:
+        hit = self.table.lookup_record(record)
+        if hit is None:
+            if self.fallback is None:
+                raise ValueError("record outside the risk table")
+            return self.fallback.score(record)
+        prob, dt_pred = hit
+        return hybrid_row(prob, dt_pred, self.threshold, self.conf_margin)
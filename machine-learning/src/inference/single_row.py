@@ -0,0 +1,194 @@
+"""
+single_row.py
+
+Single-record fast path for the hybrid XGBoost + Decision Tree model.
+
+The API serves one record per request.  Going through ``pd.DataFrame([data])``
+and the sklearn pipelines costs several milliseconds of pandas / validation
+overhead for a few hundred tree lookups.  HybridRowScorer goes straight from
+the validated JSON dict to the encoded float32 row and walks both compiled
+ensembles on buffers allocated once at construction:
+
+    record dict --encode_record--> x (1, n_outputs)          [reused buffer]
+                --take / compare--> condition bits (n_conds)  [reused buffer]
+                --level walk-----> reached leaves (n_trees)   [reused buffer]
+                --accumulate-----> margin -> scalar sigmoid
+
+Per call only the result dict (and Python scalars) is created.  Results are
+bit-identical to CompiledPipeline / the sklearn pipelines on the same record.
+
+Setting ``scorer.stage_observer`` to a callable makes score() time the
+encoding, XGBoost and DT steps and pass ``{"encoding": s, "xgb": s, "dt": s}``
+(seconds) to it after each call.
+
+Usage
+-----
+    from inference.single_row import HybridRowScorer
+
+    scorer = HybridRowScorer.from_models(xgb_model, dt_model, threshold=0.25, conf_margin=0.05)
+    result = scorer.score(record)     # {"prediction": 1, "xgb_probability": 0.31, ...}
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Mapping
+
+import numpy as np
+
+from inference.compiled_trees import (
+    _NEVER, KIND_DT, KIND_XGB, CompiledPipeline, CompiledTrees, _xgb_sigmoid_scalar,
+)
+from inference.hybrid import hybrid_row
+
+# ============================================================================
+# ROW EVALUATOR
+# ============================================================================
+
+class RowEvaluator:
+    """
+    Evaluates one CompiledTrees ensemble on a single encoded row, writing
+    into preallocated buffers.  Not thread-safe on its own; HybridRowScorer
+    serialises access.
+    """
+
+    def __init__(self, trees: CompiledTrees):
+        self.trees = trees
+        n_trees    = trees.n_trees
+
+        self._x_cond   = np.empty(trees.n_conds, dtype=np.float32)
+        self._right    = np.empty(trees.n_conds, dtype=bool)
+        self._missing  = np.empty(trees.n_conds, dtype=bool)
+        self._zero     = np.empty(trees.n_conds, dtype=bool)
+        self._bits     = np.empty(trees.n_conds, dtype=np.intp)
+        self._root     = np.ascontiguousarray(trees.node_cond[:, 0], dtype=np.intp)
+        self._h        = np.empty(n_trees, dtype=np.intp)
+        self._idx      = np.empty(n_trees, dtype=np.intp)
+        self._step     = np.empty(n_trees, dtype=np.intp)
+        # acc[0] = base margin, acc[1:] = reached leaves; accumulate = float32 sequential sum
+        self._acc      = np.empty(n_trees + 1, dtype=np.float32)
+
+    def _condition_bits(self, x: np.ndarray) -> np.ndarray:
+        """1 (go left) / 2 (go right) per condition, as in CompiledTrees.condition_bits."""
+        t = self.trees
+        x.take(t._feat, out=self._x_cond, mode="clip")
+        if t.strict:
+            np.greater_equal(self._x_cond, t.cond_threshold, out=self._right)
+        else:
+            np.greater(self._x_cond, t.cond_threshold, out=self._right)
+        if t.has_categorical:
+            self._right[t._cat_conds] = t._categorical_right(self._x_cond[t._cat_conds])
+
+        np.isnan(self._x_cond, out=self._missing)
+        if t.zero_as_missing:
+            np.equal(self._x_cond, 0.0, out=self._zero)
+            np.logical_or(self._missing, self._zero, out=self._missing)
+        np.copyto(self._right, t.cond_default, where=self._missing)
+
+        self._right[_NEVER] = False
+        np.add(self._right, 1, out=self._bits)
+        return self._bits
+
+    def leaves(self, x: np.ndarray) -> np.ndarray:
+        """Reached leaf value of every tree (a view into the reused buffer)."""
+        t    = self.trees
+        bits = self._condition_bits(x)
+        h, idx, step = self._h, self._idx, self._step
+
+        bits.take(self._root, out=h, mode="clip")       # level 0: h = 2*0 + bit
+        for _ in range(t.depth - 1):
+            np.add(h, t._node_base, out=idx)
+            t._node_flat.take(idx, out=idx, mode="clip")
+            bits.take(idx, out=step, mode="clip")
+            np.add(h, h, out=h)
+            np.add(h, step, out=h)
+
+        np.add(h, t._leaf_base, out=idx)
+        leaves = self._acc[1:]
+        t._leaf_flat.take(idx, out=leaves, mode="clip")
+        return leaves
+
+    def margin(self, x: np.ndarray) -> np.float32:
+        """XGBoost raw margin, summed exactly like CompiledTrees.margin."""
+        self.leaves(x)
+        self._acc[0] = self.trees.base_margin
+        np.add.accumulate(self._acc, out=self._acc)
+        return self._acc[-1]
+
+
+# ============================================================================
+# HYBRID SCORER
+# ============================================================================
+
+class HybridRowScorer:
+    """
+    Scores one raw record with the upgrade-only hybrid rule.
+
+    Parameters
+    ----------
+    xgb, dt     : CompiledPipeline  (same feature schema)
+    threshold   : float  XGBoost decision threshold
+    conf_margin : float  low-confidence band in which a DT positive upgrades
+    """
+
+    def __init__(self, xgb: CompiledPipeline, dt: CompiledPipeline, threshold: float, conf_margin: float):
+        if xgb.kind != KIND_XGB or dt.kind != KIND_DT:
+            raise ValueError("HybridRowScorer needs an XGBoost and a Decision Tree model")
+        if xgb.schema != dt.schema:
+            raise ValueError("XGBoost and Decision Tree pipelines use different preprocessors")
+
+        self.schema      = xgb.schema
+        self.threshold   = float(threshold)
+        self.conf_margin = float(conf_margin)
+
+        self._xgb  = RowEvaluator(xgb.trees)
+        self._dt   = RowEvaluator(dt.trees)
+        self._x    = np.zeros((1, self.schema.n_outputs), dtype=np.float32)
+        self._lock = threading.Lock()
+
+        # Optional per-stage timing callback (see module docstring)
+        self.stage_observer: Callable[[dict], None] | None = None
+
+    @classmethod
+    def from_models(cls, xgb_model: Any, dt_model: Any, threshold: float, conf_margin: float) -> "HybridRowScorer":
+        """Build from CompiledPipelines or fitted sklearn pipelines (compiled here)."""
+        if not isinstance(xgb_model, CompiledPipeline):
+            xgb_model = CompiledPipeline.from_pipeline(xgb_model)
+        if not isinstance(dt_model, CompiledPipeline):
+            dt_model = CompiledPipeline.from_pipeline(dt_model)
+        return cls(xgb_model, dt_model, threshold, conf_margin)
+
+    def score(self, record: Mapping[str, Any]) -> dict:
+        """
+        Hybrid prediction for one record (extra keys are ignored).
+
+        Returns
+        -------
+        dict with Python scalars:
+            prediction, xgb_probability, xgb_prediction, dt_prediction, upgraded_by_dt
+        """
+        observer = self.stage_observer
+        if observer is not None:
+            return self._score_timed(record, observer)
+        with self._lock:
+            x = self.schema.encode_record(record, out=self._x)[0]
+            prob    = _xgb_sigmoid_scalar(self._xgb.margin(x))
+            dt_leaf = self._dt.leaves(x)[0]
+
+        # DT leaves hold the class label
+        return hybrid_row(prob, int(dt_leaf), self.threshold, self.conf_margin)
+
+    def _score_timed(self, record: Mapping[str, Any], observer: Callable[[dict], None]) -> dict:
+        """score() with per-stage timings reported to stage_observer."""
+        with self._lock:
+            t0      = time.perf_counter()
+            x       = self.schema.encode_record(record, out=self._x)[0]
+            t1      = time.perf_counter()
+            prob    = _xgb_sigmoid_scalar(self._xgb.margin(x))
+            t2      = time.perf_counter()
+            dt_leaf = self._dt.leaves(x)[0]
+            t3      = time.perf_counter()
+
+        observer({"encoding": t1 - t0, "xgb": t2 - t1, "dt": t3 - t2})
+        return hybrid_row(prob, int(dt_leaf), self.threshold, self.conf_margin)
@@ -0,0 +1,297 @@
+"""
+split_index.py
+
+Split-point discretization of the hybrid model's inputs.
+
+Tree models only see which side of each split threshold a value falls on,
+so every raw column reduces to a small set of buckets:
+
+    numeric column       bins between the split points of both models on
+                         that column (XGBoost ``x >= t`` and sklearn
+                         ``float32(x) > t`` both become ``x >= cut`` on
+                         float32 cuts); bucket = searchsorted(cuts, x, "right")
+    categorical column   one bucket per category some split tests, plus
+                         bucket 0 shared by every untested category and
+                         unknown values (index-layout pipelines keep one
+                         bucket per category)
+
+Two inputs with the same bucket in every column reach the same leaves in
+every tree, so they get bit-identical model outputs.  The bucket tuple of a
+record is therefore an exact memoization key (MemoizedRowScorer), and the
+bucket grid is the domain of the precomputed risk table (risk_table.py).
+
+The index is plain JSON (``to_dict``), so the mobile encoder can bucket
+form answers the same way (split_index_v4.json).
+
+Usage
+-----
+    from inference.split_index import MemoizedRowScorer, SplitIndex
+
+    index  = SplitIndex.from_models(xgb_c, dt_c)
+    index.split_points["AGE"]                  # [19.0, 20.0, ..., 45.0]
+    key    = index.key(record)                 # (3, 17, 0, ..., 12, 1)
+    scorer = MemoizedRowScorer(HybridRowScorer(xgb_c, dt_c, 0.25, 0.05), index)
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+from collections import OrderedDict
+from typing import Any, Mapping
+
+import numpy as np
+
+from inference.compiled_trees import _NEVER, CompiledPipeline
+from inference.encoding import LAYOUT_INDEX, UNKNOWN_INDEX, FeatureSchema, _is_nan, _to_float
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+DEFAULT_CACHE_SIZE = 4096
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def _float32_above(threshold: float) -> np.float32:
+    """Smallest float32 strictly greater than ``threshold``."""
+    f = np.float32(threshold)
+    if float(f) <= threshold:
+        f = np.nextafter(f, np.float32(np.inf))
+    return f
+
+
+# ============================================================================
+# SPLIT INDEX
+# ============================================================================
+
+class SplitIndex:
+    """
+    Bucket layout of every raw input column.
+
+    Parameters
+    ----------
+    schema   : FeatureSchema  the models' shared feature schema
+    class_of : list           per column: category index -> bucket, last entry
+                              for unknown values (categorical) or None
+    cuts     : list           per column: sorted float32 bucket edges (numeric) or None
+    """
+
+    def __init__(self, schema: FeatureSchema, class_of: list, cuts: list):
+        self.schema   = schema
+        self.class_of = [None if c is None else np.asarray(c, dtype=np.int32) for c in class_of]
+        self.cuts     = [None if c is None else np.asarray(c, dtype=np.float32) for c in cuts]
+        self.cat_cols = [i for i, c in enumerate(self.class_of) if c is not None]
+        self.num_cols = [i for i, c in enumerate(self.cuts) if c is not None]
+        self.sizes    = [
+            int(self.class_of[i].max()) + 1 if self.class_of[i] is not None else len(self.cuts[i]) + 1
+            for i in range(len(schema.columns))
+        ]
+
+        # Pure-Python views for key(): category value -> bucket, cut lists
+        self._cat_buckets: dict[str, dict[Any, int]] = {}
+        for i in self.cat_cols:
+            col = schema.columns[i]
+            self._cat_buckets[col["name"]] = {
+                cat: int(self.class_of[i][k]) for k, cat in enumerate(col["categories"])
+            }
+        self._cut_lists = [None if c is None else c.astype(float).tolist() for c in self.cuts]
+
+    @classmethod
+    def from_models(cls, xgb: CompiledPipeline, dt: CompiledPipeline) -> "SplitIndex":
+        """Collect the split points / tested categories of both compiled models."""
+        if xgb.schema != dt.schema:
+            raise ValueError("XGBoost and Decision Tree pipelines use different preprocessors")
+        schema = xgb.schema
+        index_layout = schema.layout == LAYOUT_INDEX
+
+        # Split points per encoded column, as "x >= cut goes right" in float32
+        tested: set[int] = set()
+        cuts_by_output: dict[int, set] = {}
+        for model in (xgb, dt):
+            trees = model.trees
+            for c in range(trees.n_conds):
+                if c == _NEVER:
+                    continue
+                feature   = int(trees.cond_feature[c])
+                threshold = float(trees.cond_threshold[c])
+                tested.add(feature)
+                if np.isfinite(threshold):
+                    cut = np.float32(threshold) if trees.strict else _float32_above(threshold)
+                    cuts_by_output.setdefault(feature, set()).add(float(cut))
+            if trees.zero_as_missing:
+                # 0.0 is "missing" for sparse-input XGBoost: give it its own bucket
+                for col in schema.columns:
+                    if col["kind"] == "num":
+                        cuts_by_output.setdefault(col["offset"], set()).update(
+                            (0.0, float(np.nextafter(np.float32(0), np.float32(1)))))
+
+        class_of, cuts = [], []
+        for i, col in enumerate(schema.columns):
+            if col["kind"] == "num":
+                key = i if index_layout else col["offset"]
+                class_of.append(None)
+                cuts.append(np.array(sorted(cuts_by_output.get(key, ())), dtype=np.float32))
+                continue
+            n_cat = len(col["categories"])
+            mapping = np.zeros(n_cat + 1, dtype=np.int32)     # last entry: unknown
+            if index_layout:
+                mapping[:n_cat] = np.arange(1, n_cat + 1)
+            else:
+                next_class = 1
+                for k in range(n_cat):
+                    if col["offset"] + k in tested:
+                        mapping[k] = next_class
+                        next_class += 1
+            class_of.append(mapping)
+            cuts.append(None)
+        return cls(schema, class_of, cuts)
+
+    # ------------------------------------------------------------------
+    # Layout
+    # ------------------------------------------------------------------
+
+    @property
+    def split_points(self) -> dict[str, list[float]]:
+        """Numeric column name -> sorted bucket edges."""
+        return {self.schema.columns[i]["name"]: self._cut_lists[i] for i in self.num_cols}
+
+    @property
+    def n_combinations(self) -> int:
+        """Number of distinct bucket tuples."""
+        n = 1
+        for size in self.sizes:
+            n *= size
+        return n
+
+    def representatives(self) -> list[np.ndarray]:
+        """
+        Per column, one index-layout value per bucket (float32): a category
+        index (-1 for bucket 0 of one-hot columns) or a value inside the bin.
+        """
+        reps = []
+        for i, col in enumerate(self.schema.columns):
+            if self.class_of[i] is not None:
+                r = np.full(self.sizes[i], UNKNOWN_INDEX, dtype=np.float32)
+                for k, c in enumerate(self.class_of[i][:-1]):
+                    if c and r[c] == UNKNOWN_INDEX:
+                        r[c] = k
+            elif len(self.cuts[i]) == 0:
+                r = np.array([col["fill"]], dtype=np.float32)
+            else:
+                below = np.nextafter(self.cuts[i][0], np.float32(-np.inf))
+                r = np.concatenate([[below], self.cuts[i]]).astype(np.float32)
+            reps.append(r)
+        return reps
+
+    # ------------------------------------------------------------------
+    # Bucketing
+    # ------------------------------------------------------------------
+
+    def buckets(self, X_index: np.ndarray) -> np.ndarray:
+        """(n, n_columns) bucket of every value of an index-layout matrix."""
+        X_index = np.asarray(X_index, dtype=np.float32)
+        out = np.empty(X_index.shape, dtype=np.int64)
+        for i in self.cat_cols:
+            k = X_index[:, i].astype(np.int64)
+            k[k == UNKNOWN_INDEX] = len(self.class_of[i]) - 1
+            out[:, i] = self.class_of[i][k]
+        for i in self.num_cols:
+            out[:, i] = np.searchsorted(self.cuts[i], X_index[:, i], side="right")
+        return out
+
+    def buckets_frame(self, df) -> np.ndarray:
+        """Buckets of a pandas DataFrame (extra columns are ignored)."""
+        return self.buckets(self.schema.encode_index_frame(df))
+
+    def key(self, record: Mapping[str, Any]) -> tuple[int, ...]:
+        """Bucket tuple of one raw record (pure Python, no arrays allocated)."""
+        key = []
+        for i, col in enumerate(self.schema.columns):
+            v = record[col["name"]]
+            if col["kind"] == "num":
+                v = _to_float(v)
+                x = float(np.float32(col["fill"] if v != v else v))
+                key.append(bisect.bisect_right(self._cut_lists[i], x))
+            else:
+                if _is_nan(v):
+                    v = col["fill"]
+                key.append(self._cat_buckets[col["name"]].get(v, int(self.class_of[i][-1])))
+        return tuple(key)
+
+    # ------------------------------------------------------------------
+    # Serialisation
+    # ------------------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        """JSON-ready layout: per column name, kind and class_of / cuts."""
+        columns = []
+        for i, col in enumerate(self.schema.columns):
+            entry = {"name": col["name"], "kind": col["kind"], "n_buckets": self.sizes[i]}
+            if self.class_of[i] is not None:
+                entry["categories"] = list(col["categories"])
+                entry["class_of"]   = self.class_of[i].tolist()
+            else:
+                entry["cuts"] = self._cut_lists[i]
+            columns.append(entry)
+        return {"layout": self.schema.layout, "columns": columns}
+
+    def to_arrays(self) -> tuple[list, list]:
+        """(class_of, cuts) as JSON lists, for bundles that embed the index."""
+        return ([None if c is None else c.tolist() for c in self.class_of],
+                [None if c is None else c.tolist() for c in self.cuts])
+
+
+# ============================================================================
+# MEMOIZATION
+# ============================================================================
+
+class MemoizedRowScorer:
+    """
+    LRU cache in front of a row scorer, keyed by the record's bucket tuple.
+
+    Records in the same buckets get bit-identical results, so a hit returns
+    exactly what the wrapped scorer would (as a fresh dict).
+    """
+
+    def __init__(self, scorer: Any, index: SplitIndex, maxsize: int = DEFAULT_CACHE_SIZE):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be >= 1, got {maxsize}")
+        self.scorer  = scorer
+        self.index   = index
+        self.maxsize = int(maxsize)
+        self.hits    = 0
+        self.misses  = 0
+        self._cache: OrderedDict[tuple, dict] = OrderedDict()
+        self._lock   = threading.Lock()
+
+    def score(self, record: Mapping[str, Any]) -> dict:
+        key = self.index.key(record)
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return dict(result)
+            self.misses += 1
+
+        result = self.scorer.score(record)
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return dict(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size":     len(self._cache),
+                "maxsize":  self.maxsize,
+                "hits":     self.hits,
+                "misses":   self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+            }
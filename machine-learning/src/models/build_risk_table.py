@@ -0,0 +1,230 @@
+"""
+build_risk_table.py
+
+Precompute the hybrid model's outputs over its (partially) enumerated input
+space into a lookup table (src/inference/risk_table.py) and validate it
+against the model.
+
+The v4 input space, reduced to what the trees can distinguish (categories
+some split tests + one "other" class, numeric bins between split points),
+has ~0.9M categorical combinations x 224 AGE / PARITY bins ~ 209M cells --
+too large to ship.  By default only the categorical combinations observed in
+the processed dataset (train + test) are enumerated, over every numeric bin;
+inputs with an unseen combination are scored by the compiled models.
+``--domain full`` enumerates everything (bounded by --max-cells).
+
+Validation:
+    every dataset row        table vs joblib pipelines, bit-identical
+    --probes random inputs   any category / unknown value / missing, numerics
+                             at and next to every bin edge -- table (with
+                             fallback) vs compiled models, bit-identical
+The table is validated from a staged file and replaces risk_table.npz only
+if it passes; on any mismatch the existing table is left untouched and the
+script exits with code 1.  Then prints table size and lookup vs compiled
+latencies.
+
+Usage:
+    python src/models/build_risk_table.py                  # v4, observed combinations
+    python src/models/build_risk_table.py --domain full --max-cells 300000000
+    python src/models/build_risk_table.py --no-bench
+
+Output:
+    src/models/models_high_risk_<version>/risk_table.npz
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+_HERE      = Path(__file__).resolve().parent          # machine-learning/src/models/
+_SRC       = _HERE.parent                             # machine-learning/src/
+_ML        = _SRC.parent                              # machine-learning/
+
+DATA_PKL   = _ML / "data" / "processed" / "discontinuation_design1_data_v2.pkl"
+
+sys.path.insert(0, str(_HERE))
+
+from export_compiled import OUTPUT_NAME as COMPILED_NAME, VERSIONS, _load, _model_dir, _time_ms  # noqa: E402
+from inference.compiled_trees import load_hybrid  # noqa: E402
+from inference.hybrid import HybridEngine  # noqa: E402
+from inference.risk_table import DEFAULT_MAX_CELLS, RiskTable, TableRowScorer  # noqa: E402
+from inference.single_row import HybridRowScorer  # noqa: E402
+from inference.split_index import SplitIndex  # noqa: E402
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+OUTPUT_NAME   = "risk_table.npz"
+DEFAULT_PROBES = 200_000
+RANDOM_STATE  = 42
+BENCH_ROWS    = 1000
+
+
+# ============================================================================
+# VALIDATION
+# ============================================================================
+
+def _dataset(features: list[str]) -> pd.DataFrame:
+    X_train, X_test, _, _ = joblib.load(DATA_PKL)
+    return pd.concat([X_train, X_test])[features]
+
+
+def _compare(name: str, ref_prob, ref_dt, got_prob, got_dt) -> bool:
+    n_prob = int((np.asarray(ref_prob) != np.asarray(got_prob)).sum())
+    n_dt   = int((np.asarray(ref_dt) != np.asarray(got_dt)).sum())
+    print(f"  {name:<24} XGB prob mismatches {n_prob}, DT label mismatches {n_dt}")
+    return n_prob == 0 and n_dt == 0
+
+
+def probe_frame(index: SplitIndex, X: pd.DataFrame, n: int, seed: int = RANDOM_STATE) -> pd.DataFrame:
+    """
+    Random raw inputs over the whole input space.  Categoricals: half of the
+    rows copy the categorical answers of a random row of X (combinations in
+    the table), the rest draw any fitted category, an unknown value or
+    missing per column.  Numerics: missing, a bin edge / its float32
+    neighbours, or a uniform (half of them whole) value.
+    """
+    rng  = np.random.default_rng(seed)
+    data = {}
+    from_X = rng.random(n) < 0.5
+    rows   = rng.integers(0, len(X), n)
+    for col, cuts in zip(index.schema.columns, index.cuts):
+        if col["kind"] == "cat":
+            values = np.array(list(col["categories"]) + ["<unknown>", np.nan], dtype=object)
+            drawn  = values[rng.integers(0, len(values), n)]
+            data[col["name"]] = np.where(from_X, X[col["name"]].to_numpy(dtype=object)[rows], drawn)
+            continue
+        edges = cuts if len(cuts) else np.array([col["fill"]], dtype=np.float32)
+        below = np.nextafter(edges, np.float32(-np.inf))
+        above = np.nextafter(edges, np.float32(np.inf))
+        span  = (float(edges.min()) - 10.0, float(edges.max()) + 10.0)
+        candidates = np.concatenate([edges, below, above]).astype(np.float64)
+        uniform = rng.uniform(*span, n)
+        uniform = np.where(rng.random(n) < 0.5, uniform.round(), uniform)
+        v = np.where(rng.random(n) < 0.5, candidates[rng.integers(0, len(candidates), n)], uniform)
+        v[rng.random(n) < 0.02] = np.nan
+        data[col["name"]] = v
+    return pd.DataFrame(data)
+
+
+def validate(table: RiskTable, xgb_pipeline, dt_pipeline, xgb_c, dt_c, n_probes: int) -> bool:
+    X = _dataset(table.schema.feature_names)
+    outputs, covered = table.lookup(X, fallback=(xgb_c, dt_c))
+    print(f"\n  Dataset rows           : {len(X)}  ({covered.mean():.1%} in table)")
+    ok = _compare("dataset vs joblib", xgb_pipeline.predict_proba(X)[:, 1], dt_pipeline.predict(X),
+                  outputs.xgb_prob, outputs.dt_pred)
+
+    P = probe_frame(table.index, X, n_probes)
+    outputs, covered = table.lookup(P, fallback=(xgb_c, dt_c))
+    print(f"  Random probes          : {len(P)}  ({covered.mean():.1%} in table)")
+    ok &= _compare("probes vs compiled", xgb_c.predict_proba(P)[:, 1], dt_c.predict(P),
+                   outputs.xgb_prob, outputs.dt_pred)
+    return ok
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark(table: RiskTable, xgb_c, dt_c, config: dict) -> None:
+    X      = _dataset(table.schema.feature_names)
+    batch  = X.iloc[:BENCH_ROWS]
+    record = X.iloc[0].to_dict()
+
+    row_c = HybridRowScorer(xgb_c, dt_c, config["threshold"], config["conf_margin"])
+    row_t = TableRowScorer(table, config["threshold"], config["conf_margin"], fallback=row_c)
+    eng_c = HybridEngine(xgb_c, dt_c, config["threshold"], config["conf_margin"])
+    eng_t = HybridEngine(*table.members(fallback=(xgb_c, dt_c)), config["threshold"], config["conf_margin"])
+
+    rows = [
+        ("single record",       lambda: row_c.score(record), lambda: row_t.score(record)),
+        (f"{len(batch)} rows",  lambda: eng_c.predict(batch), lambda: eng_t.predict(batch)),
+    ]
+    print(f"\n  {'Case':<16} {'compiled ms':>12} {'table ms':>10} {'speed-up':>9}")
+    print(f"  {'-'*16} {'-'*12} {'-'*10} {'-'*9}")
+    for name, ref_fn, table_fn in rows:
+        t_ref   = _time_ms(ref_fn)
+        t_table = _time_ms(table_fn)
+        print(f"  {name:<16} {t_ref:>12.3f} {t_table:>10.3f} {t_ref / t_table:>8.1f}x")
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build and validate the hybrid risk lookup table.")
+    parser.add_argument("--version", choices=VERSIONS, default="v4")
+    parser.add_argument("--domain", choices=("observed", "full"), default="observed",
+                        help="categorical combinations to enumerate")
+    parser.add_argument("--max-cells", type=int, default=DEFAULT_MAX_CELLS)
+    parser.add_argument("--probes", type=int, default=DEFAULT_PROBES, help="random validation inputs")
+    parser.add_argument("--no-bench", action="store_true", help="skip the latency benchmark")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"ContraceptIQ -- Risk lookup table ({args.version}, {args.domain} domain)")
+    print("=" * 60)
+
+    bundle = _model_dir(args.version) / COMPILED_NAME
+    if not bundle.exists():
+        sys.exit(f"[ERROR] {bundle} not found -- run src/models/export_compiled.py first")
+    xgb_pipeline, dt_pipeline, _ = _load(args.version)
+    xgb_c, dt_c, config = load_hybrid(bundle)
+
+    combos = None
+    if args.domain == "observed":
+        combos = RiskTable.combos_of(xgb_c, dt_c, _dataset(xgb_c.schema.feature_names))
+
+    t0 = time.perf_counter()
+    try:
+        table = RiskTable.build(xgb_c, dt_c, combos, config, max_cells=args.max_cells)
+    except ValueError as e:
+        sys.exit(f"[ERROR] {e}")
+    build_s = time.perf_counter() - t0
+
+    print("\n  Domain (classes / bins per column):")
+    for col, class_of, cuts in zip(table.schema.columns, table.index.class_of, table.index.cuts):
+        if class_of is not None:
+            n_cat = len(col["categories"])
+            print(f"    {col['name']:<26} {int(class_of.max()) + 1:>4} classes  ({n_cat} categories + unknown)")
+        else:
+            print(f"    {col['name']:<26} {len(cuts) + 1:>4} bins     (split points {len(cuts)})")
+    print(f"\n  Categorical combinations : {len(table.keys):,} of {table.n_combos_total:,}")
+    print(f"  Numeric bins / combination: {table.n_bins:,}")
+    print(f"  Cells                    : {table.n_cells:,}  (built in {build_s:.2f}s)")
+
+    # Validate what was written, not what is in memory, and only then
+    # replace the table the backend loads
+    out_path    = _model_dir(args.version) / OUTPUT_NAME
+    staged_path = table.save(out_path.with_name(out_path.stem + ".staged.npz"))
+    try:
+        table = RiskTable.load(staged_path)
+        if not validate(table, xgb_pipeline, dt_pipeline, xgb_c, dt_c, args.probes):
+            print(f"\n[FAIL] Risk table does not reproduce the model; {out_path.name} left unchanged.")
+            sys.exit(1)
+        staged_path.replace(out_path)
+    finally:
+        staged_path.unlink(missing_ok=True)
+    print("\n[PASS] Risk table is bit-identical to the model.")
+    print(f"  Saved to {out_path}  ({out_path.stat().st_size / 1024:.1f} KB on disk, "
+          f"{table.nbytes / 1024:.1f} KB in memory)")
+
+    if not args.no_bench:
+        operating_point = {"threshold": config[f"threshold_{args.version}"],
+                           "conf_margin": config[f"conf_margin_{args.version}"]}
+        benchmark(table, xgb_c, dt_c, operating_point)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+bulk_score.py
+
+Offline bulk scoring of a CSV / parquet file of patients with the deployed
+hybrid model -- population-level risk screening without going through the
+Flask API one row at a time.
+
+    main process   reads the input in row chunks (streaming_eval.iter_chunks:
+                   categorical answers as strings, blanks as missing) and
+                   writes each scored chunk out as soon as it is its turn
+    workers        ``--workers`` processes, each loading the models ONCE
+                   (initializer) and scoring whole chunks through the shared
+                   HybridEngine
+
+At most 2 x workers chunks are in flight, so memory stays bounded by the
+chunk size however large the input is, and the output rows keep the input
+order.  ``--workers 0`` scores in the main process (no pool).
+
+Output columns (per input row):
+    <--id-cols>        passed through unchanged (default: CASEID if present)
+    risk_level         HIGH / LOW (hybrid prediction)
+    xgb_probability    XGBoost P(y=1)
+    upgraded_by_dt     low-confidence XGBoost + Decision Tree positive
+    confidence         threshold-relative confidence in [0, 1], as the API
+    unknown_category   (--unknown-categories warn) the row has an answer the
+                       fitted encoder does not know, scored as all zeros
+
+Unknown categories are checked against the fitted encoder's categories like
+the backend's RequestValidator, with the same policies as its
+UNKNOWN_CATEGORIES: ``warn`` (default) scores and flags the rows, ``reject``
+leaves them out of the output, ``ignore`` does not check.  Either way the
+unknown values are counted per column and printed.
+
+Usage:
+    python src/models/bulk_score.py --input data/interim/merged_dataset.csv --output risk_scores.csv
+    python src/models/bulk_score.py --input survey.parquet --output scores.parquet --workers 8
+    python src/models/bulk_score.py --input big.csv --output out.csv --backend joblib --chunksize 50000
+    python src/models/bulk_score.py --input export.csv --output out.csv --unknown-categories reject
+    python src/models/bulk_score.py --check-csv     # data pickle rows score the same through a CSV
+
+Output:
+    the --output file (.csv or .parquet), written to a temporary file and
+    renamed when complete
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+_HERE = Path(__file__).resolve().parent          # machine-learning/src/models/
+_SRC  = _HERE.parent                             # machine-learning/src/
+
+sys.path.insert(0, str(_SRC))
+sys.path.insert(0, str(_SRC / "evaluation"))
+
+from inference.hybrid import risk_confidence  # noqa: E402
+from streaming_eval import (  # noqa: E402
+    BACKENDS, DATA_PKL, DEFAULT_CHUNKSIZE, MODEL_VERSIONS, iter_chunks, load_config, load_engine,
+)
+
+DEFAULT_ID_COLS = ["CASEID"]
+UNKNOWN_POLICIES = ("warn", "reject", "ignore")     # as the backend's UNKNOWN_CATEGORIES
+
+
+# ============================================================================
+# WORKER
+# ============================================================================
+
+_engine     = None    # per-process HybridEngine, set by _init_worker
+_features   = None
+_categories = None    # categorical feature -> fitted encoder categories
+
+
+def _init_worker(version: str, backend: str) -> None:
+    """Load the models once per worker process."""
+    global _engine, _features, _categories
+    _engine, schema = load_engine(version, backend)
+    _features   = load_config(version)["features"]
+    _categories = {c["name"]: list(c["categories"]) for c in schema.columns
+                   if c["kind"] == "cat" and c["name"] in _features}
+
+
+def unknown_categories(chunk: pd.DataFrame) -> tuple[np.ndarray, dict[str, dict]]:
+    """
+    Rows with an answer the fitted encoder does not know (missing values are
+    imputed, not unknown), and the unknown values per column with their counts.
+    """
+    flags  = np.zeros(len(chunk), dtype=bool)
+    counts = {}
+    for col, cats in _categories.items():
+        values  = chunk[col]
+        unknown = (~values.isin(cats) & values.notna()).to_numpy()
+        if unknown.any():
+            flags |= unknown
+            counts[col] = values[unknown].value_counts().to_dict()
+    return flags, counts
+
+
+def score_chunk(chunk: pd.DataFrame, id_cols: list[str], unknown_policy: str = "warn") -> tuple[pd.DataFrame, dict]:
+    """
+    Score one chunk; returns (the id columns plus the output columns above,
+    unknown values per column with their counts).
+    """
+    flags, counts = (None, {}) if unknown_policy == "ignore" else unknown_categories(chunk)
+    if unknown_policy == "reject" and flags.any():
+        chunk = chunk[~flags]
+    out = chunk[id_cols].reset_index(drop=True)
+    if not len(chunk):
+        return out, counts
+    result = _engine.predict(chunk[_features])
+    pred   = result["predictions"]
+    out["risk_level"]      = np.where(pred == 1, "HIGH", "LOW")
+    out["xgb_probability"] = result["xgb_probabilities"]
+    out["upgraded_by_dt"]  = result["upgrade_flags"]
+    out["confidence"]      = risk_confidence(result["xgb_probabilities"], pred, _engine.threshold)
+    if unknown_policy == "warn":
+        out["unknown_category"] = flags
+    return out, counts
+
+
+# ============================================================================
+# OUTPUT
+# ============================================================================
+
+class ChunkWriter:
+    """Appends scored chunks to a .csv or .parquet file (temp file, renamed on close)."""
+
+    def __init__(self, path: Path, float_format: str | None = "%.6f"):
+        if not path.suffixes or path.suffixes[-1] not in (".csv", ".parquet"):
+            sys.exit(f"[ERROR] Unsupported output format: {path.name} (expected .csv or .parquet)")
+        self.path         = path
+        self.tmp_path     = path.with_name(f".{path.name}.partial")
+        self.parquet      = path.suffix == ".parquet"
+        self.float_format = float_format
+        self.rows         = 0
+        self._file        = None
+        self._writer      = None
+
+        if self.parquet:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                sys.exit("[ERROR] Writing parquet needs pyarrow (pip install pyarrow)")
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write(self, frame: pd.DataFrame) -> None:
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.tmp_path, table.schema)
+            self._writer.write_table(table)
+        else:
+            if self._file is None:
+                self._file = open(self.tmp_path, "w", newline="")
+            frame.to_csv(self._file, header=self.rows == 0, index=False, float_format=self.float_format)
+        self.rows += len(frame)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        for handle in (self._writer, self._file):
+            if handle is not None:
+                handle.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def score_file(
+    input_path: Path,
+    output_path: Path,
+    version: str = "v4",
+    backend: str = "compiled",
+    workers: int = 0,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    id_cols: list[str] | None = None,
+    unknown_policy: str = "warn",
+) -> dict:
+    """
+    Score ``input_path`` into ``output_path``; returns run stats.
+
+    ``workers`` = 0 scores in this process, otherwise chunks are sharded over
+    a pool of ``workers`` processes.  ``unknown_policy`` is one of
+    UNKNOWN_POLICIES.
+    """
+    if unknown_policy not in UNKNOWN_POLICIES:
+        raise ValueError(f"Unknown category policy '{unknown_policy}'. Expected one of {UNKNOWN_POLICIES}")
+    features    = load_config(version)["features"]
+    _, schema   = load_engine(version, backend)
+    categorical = [c["name"] for c in schema.columns if c["kind"] == "cat"]
+
+    explicit = id_cols is not None
+    id_cols  = list(id_cols) if explicit else DEFAULT_ID_COLS
+    chunks   = iter_chunks(input_path, features, categorical, chunksize, keep=id_cols)
+    first    = next(chunks, None)
+    if first is None:
+        sys.exit(f"[ERROR] {input_path} has no rows")
+    missing = [c for c in id_cols if c not in first]
+    if explicit and missing:
+        sys.exit(f"[ERROR] {input_path} has no id column(s) {missing}")
+    id_cols = [c for c in id_cols if c in first]
+    chunks  = itertools.chain([first], chunks)
+
+    writer  = ChunkWriter(output_path)
+    n_high  = n_input = n_unknown = 0
+    unknown = {}                          # column -> {value: rows}
+
+    def collect(chunk_rows, scored, counts):
+        nonlocal n_high, n_input, n_unknown
+        n_input += chunk_rows
+        if unknown_policy == "reject":
+            n_unknown += chunk_rows - len(scored)
+        elif "unknown_category" in scored:
+            n_unknown += int(scored["unknown_category"].sum())
+        for col, values in counts.items():
+            totals = unknown.setdefault(col, {})
+            for value, n in values.items():
+                totals[value] = totals.get(value, 0) + n
+        if len(scored):
+            n_high += int((scored["risk_level"] == "HIGH").sum())
+            writer.write(scored)
+
+    t0 = time.perf_counter()
+    try:
+        if workers == 0:
+            _init_worker(version, backend)
+            for chunk in chunks:
+                collect(len(chunk), *score_chunk(chunk, id_cols, unknown_policy))
+        else:
+            ctx = get_context()
+            with ctx.Pool(workers, initializer=_init_worker, initargs=(version, backend)) as pool:
+                inflight = deque()
+                for chunk in chunks:
+                    inflight.append((len(chunk), pool.apply_async(score_chunk, (chunk, id_cols, unknown_policy))))
+                    if len(inflight) >= 2 * workers:
+                        n_rows, pending = inflight.popleft()
+                        collect(n_rows, *pending.get())
+                while inflight:
+                    n_rows, pending = inflight.popleft()
+                    collect(n_rows, *pending.get())
+        if not writer.rows:
+            sys.exit(f"[ERROR] Every row of {input_path} has unknown categories (--unknown-categories reject)")
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+    seconds = time.perf_counter() - t0
+    return {
+        "input_rows":     n_input,
+        "rows":           writer.rows,
+        "high_risk":      n_high,
+        "unknown_rows":   n_unknown,
+        "unknown_categories": {col: dict(sorted(values.items(), key=lambda kv: -kv[1]))
+                               for col, values in unknown.items()},
+        "unknown_policy": unknown_policy,
+        "seconds":        round(seconds, 3),
+        "rows_per_minute": round(n_input / seconds * 60) if seconds else None,
+        "workers":        workers,
+        "backend":        backend,
+    }
+
+
+def check_csv(
+    version: str = "v4",
+    backend: str = "compiled",
+    workers: int = 0,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> int:
+    """
+    Bulk-score every row of the data pickle (data/processed) written out as a
+    CSV and compare with scoring the pickle's frame directly; returns the
+    number of rows that differ (risk level, DT upgrade, or probability beyond
+    the output's 6 decimals).
+    """
+    import tempfile
+
+    import joblib
+
+    X_train, X_test, _, _ = joblib.load(DATA_PKL)
+    features = load_config(version)["features"]
+    frame    = pd.concat([X_train, X_test], ignore_index=True)[features]
+    engine, _ = load_engine(version, backend)
+    expected = engine.predict(frame)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path, output_path = Path(tmp) / "rows.csv", Path(tmp) / "scores.csv"
+        frame.assign(ROW=np.arange(len(frame))).to_csv(input_path, index=False)
+        score_file(input_path, output_path, version, backend, workers, chunksize, ["ROW"])
+        scored = pd.read_csv(output_path)
+
+    if len(scored) != len(frame) or not (scored["ROW"].to_numpy() == np.arange(len(frame))).all():
+        return len(frame)
+    differs = ((scored["risk_level"].to_numpy() != np.where(expected["predictions"] == 1, "HIGH", "LOW"))
+               | (scored["upgraded_by_dt"].to_numpy() != expected["upgrade_flags"])
+               | (np.abs(scored["xgb_probability"].to_numpy() - expected["xgb_probabilities"]) > 5e-7))
+    return int(differs.sum())
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-score a CSV / parquet file with the hybrid model.")
+    parser.add_argument("--input", type=Path, help=".csv[.gz] or .parquet with the model features")
+    parser.add_argument("--output", type=Path, help=".csv or .parquet")
+    parser.add_argument("--version", default="v4", choices=sorted(MODEL_VERSIONS))
+    parser.add_argument("--backend", default="compiled", choices=BACKENDS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="scoring processes (0: score in the main process)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--id-cols", nargs="*", default=None,
+                        help=f"columns copied to the output (default: {' '.join(DEFAULT_ID_COLS)} if present)")
+    parser.add_argument("--unknown-categories", default="warn", choices=UNKNOWN_POLICIES,
+                        help="answers the fitted encoder does not know: flag the row (warn), "
+                             "leave it out (reject) or do not check (ignore), as the backend's UNKNOWN_CATEGORIES")
+    parser.add_argument("--check-csv", action="store_true",
+                        help="check that the data pickle's rows score the same through a CSV, then exit")
+    args = parser.parse_args()
+    if args.chunksize < 1:
+        parser.error("--chunksize must be >= 1")
+    if args.workers < 0:
+        parser.error("--workers must be >= 0")
+
+    if args.check_csv:
+        n_diff = check_csv(args.version, args.backend, args.workers, args.chunksize)
+        print(f"[bulk_score] CSV -> score parity ({args.version} / {args.backend}): "
+              f"{n_diff} row(s) scored differently")
+        sys.exit(1 if n_diff else 0)
+    if args.input is None or args.output is None:
+        parser.error("--input and --output are required")
+    if not args.input.exists():
+        sys.exit(f"[ERROR] Input not found: {args.input}")
+
+    print("=" * 60)
+    print(f"ContraceptIQ -- Bulk scoring ({args.version}, {args.backend}, "
+          f"{args.workers or 'no'} worker process(es))")
+    print("=" * 60)
+    print(f"\n  {args.input} -> {args.output}  (chunks of {args.chunksize} rows)")
+
+    stats = score_file(args.input, args.output, args.version, args.backend,
+                       args.workers, args.chunksize, args.id_cols, args.unknown_categories)
+
+    rate = stats["high_risk"] / stats["rows"] if stats["rows"] else 0.0
+    print(f"\n  Scored {stats['rows']} rows in {stats['seconds']:.2f}s "
+          f"({stats['rows_per_minute']:,} rows/min)")
+    print(f"  HIGH risk: {stats['high_risk']} ({rate:.2%})")
+    if stats["unknown_categories"]:
+        action = {"warn": "scored as all zeros, flagged in unknown_category",
+                  "reject": "left out of the output"}[args.unknown_categories]
+        print(f"\n  WARNING: {stats['unknown_rows']} of {stats['input_rows']} rows have categories "
+              f"the model was not fitted on ({action}):")
+        for col, values in stats["unknown_categories"].items():
+            shown = ", ".join(f"{value!r} x{n}" for value, n in list(values.items())[:8])
+            more  = f", ... ({len(values) - 8} more)" if len(values) > 8 else ""
+            print(f"    {col:<28} {sum(values.values()):>7} rows  {shown}{more}")
+    print(f"  Saved -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
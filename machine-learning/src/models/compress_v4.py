@@ -0,0 +1,310 @@
+"""
+compress_v4.py
+
+Pruned / quantized variant of the v4 XGBoost model, with an accuracy vs
+size vs latency report against the deployed formats.
+
+Compression (src/inference/compression.py):
+    1. prune   -- keep the N trees with the largest marginal contribution on
+                  the training rows; dropped trees fold into the base margin
+    2. thresholds snapped to integers (all v4 inputs are one-hot / integer)
+    3. merge   -- trees with identical routing are summed
+    4. leaves  -- per-tree 8-bit quantization (--leaf-bits)
+
+N is chosen WITHOUT looking at the test split: a clone of the deployed
+pipeline is refit on 80% of the training split, every candidate N is
+compressed and scored on the remaining 20%, and the smallest N whose
+validation recall and ROC-AUC stay within RECALL_TOLERANCE / AUC_TOLERANCE of
+the uncompressed clone wins.  The chosen N is then applied to the deployed
+model.  The test split is only used for the report.
+
+Usage:
+    python src/models/compress_v4.py
+    python src/models/compress_v4.py --n-keep 150        # skip the selection
+    python src/models/compress_v4.py --leaf-bits 16
+
+Output:
+    src/models/models_high_risk_v4/
+        xgb_compressed.npz             compiled NumPy bundle (inference.compression)
+        xgb_compressed_flat.onnx       drop-in for xgb_high_recall_flat.onnx
+        compression_report_v4.json     candidate sweep + format comparison
+
+Mobile latency is approximated by onnxruntime on this machine's CPU running
+the flat ONNX graphs the app ships (same TreeEnsembleClassifier kernel as
+onnxruntime-react-native); absolute numbers on a phone will differ.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import onnx
+import onnxruntime as ort
+from sklearn.base import clone
+from sklearn.metrics import recall_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+_HERE      = Path(__file__).resolve().parent          # machine-learning/src/models/
+_SRC       = _HERE.parent                             # machine-learning/src/
+_ML        = _SRC.parent                              # machine-learning/
+
+DATA_PKL   = _ML / "data" / "processed" / "discontinuation_design1_data_v2.pkl"
+MODEL_DIR  = _HERE / "models_high_risk_v4"
+
+XGB_JOBLIB     = MODEL_DIR / "xgb_high_recall.joblib"
+DT_JOBLIB      = MODEL_DIR / "dt_high_recall.joblib"
+XGB_FLAT_ONNX  = MODEL_DIR / "xgb_high_recall_flat.onnx"
+OUT_NPZ        = MODEL_DIR / "xgb_compressed.npz"
+OUT_ONNX       = MODEL_DIR / "xgb_compressed_flat.onnx"
+OUT_REPORT     = MODEL_DIR / "compression_report_v4.json"
+
+sys.path.insert(0, str(_SRC))
+sys.path.insert(0, str(_HERE))
+
+from evaluation.prediction_store import operating_point  # noqa: E402
+from inference.compiled_trees import CompiledPipeline  # noqa: E402
+from inference.compression import (  # noqa: E402
+    DEFAULT_LEAF_BITS, compress, load_compressed, quantize_leaves, save_compressed,
+)
+from inference.hybrid import hybrid_labels  # noqa: E402
+from tree_onnx import trees_to_onnx  # noqa: E402
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+VERSION = "v4"
+
+CANDIDATES        = [300, 250, 200, 150, 100, 75, 50]
+VALIDATION_SIZE   = 0.2
+RANDOM_STATE      = 42
+RECALL_TOLERANCE  = 0.0      # compressed model may not lose validation recall
+AUC_TOLERANCE     = 0.005
+
+BENCH_ROWS   = 1000
+BENCH_REPEAT = 50
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def _time_ms(fn, repeat: int = BENCH_REPEAT) -> float:
+    fn()                                              # warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e3
+
+
+def _compressed(trees, X_ref: np.ndarray, n_keep: int, leaf_bits: int):
+    small, stats = compress(trees, X_ref, n_keep=n_keep)
+    return quantize_leaves(small, leaf_bits)[0], stats
+
+
+def _scores(prob: np.ndarray, y: np.ndarray, threshold: float) -> dict:
+    return {
+        "recall":  float(recall_score(y, (prob >= threshold).astype(int))),
+        "roc_auc": float(roc_auc_score(y, prob)),
+    }
+
+
+# ============================================================================
+# SELECTION
+# ============================================================================
+
+def select_n_keep(xgb_pipeline, X_train, y_train, threshold: float, leaf_bits: int) -> tuple[int, list]:
+    """Pick the tree budget on a validation split carved out of the training split."""
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=VALIDATION_SIZE,
+        stratify=y_train, random_state=RANDOM_STATE,
+    )
+    print(f"\n[select] Refitting a clone on {len(X_fit)} rows, validating on {len(X_val)} ...", flush=True)
+    xgb_c  = CompiledPipeline.from_pipeline(clone(xgb_pipeline).fit(X_fit, y_fit))
+    E_fit  = xgb_c.schema.encode_frame(X_fit)
+    E_val  = xgb_c.schema.encode_frame(X_val)
+    y_val  = np.asarray(y_val)
+
+    base = _scores(xgb_c.predict_proba(E_val)[:, 1], y_val, threshold)
+    rows = []
+    for n_keep in CANDIDATES:
+        trees, _ = _compressed(xgb_c.trees, E_fit, n_keep, leaf_bits)
+        prob     = CompiledPipeline(xgb_c.schema, trees, "xgb").predict_proba(E_val)[:, 1]
+        scores   = _scores(prob, y_val, threshold)
+        scores["accepted"] = (
+            scores["recall"] >= base["recall"] - RECALL_TOLERANCE
+            and scores["roc_auc"] >= base["roc_auc"] - AUC_TOLERANCE
+        )
+        rows.append({"n_keep": n_keep, **scores})
+        print(f"  n_keep={n_keep:>3}  val recall={scores['recall']:.4f}  "
+              f"val auc={scores['roc_auc']:.4f}  {'ok' if scores['accepted'] else '--'}", flush=True)
+
+    accepted = [r["n_keep"] for r in rows if r["accepted"]]
+    n_keep   = min(accepted) if accepted else max(CANDIDATES)
+    print(f"  uncompressed clone: recall={base['recall']:.4f}  auc={base['roc_auc']:.4f}")
+    print(f"  selected n_keep = {n_keep}")
+    return n_keep, rows
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def compare_formats(xgb_pipeline, variants: dict, X_test, y_test, dt_test, threshold, conf_margin) -> list:
+    """Accuracy, size and latency for every deployable format."""
+    E_test = variants["compiled"]["model"].schema.encode_frame(X_test)
+    y_test = np.asarray(y_test)
+    batch  = np.ascontiguousarray(np.resize(E_test, (BENCH_ROWS, E_test.shape[1])))
+    X_rows = X_test.iloc[np.arange(BENCH_ROWS) % len(X_test)]
+
+    def onnx_prob(session, E):
+        return session.run(None, {"float_input": E})[1][:, 1]
+
+    rows = []
+    for name, spec in variants.items():
+        if spec["runtime"] == "sklearn":
+            prob = xgb_pipeline.predict_proba(X_test)[:, 1]
+            one  = lambda: xgb_pipeline.predict_proba(X_test.iloc[:1])          # noqa: E731
+            many = lambda: xgb_pipeline.predict_proba(X_rows)                   # noqa: E731
+        elif spec["runtime"] == "onnxruntime":
+            sess = ort.InferenceSession(str(spec["path"]), providers=["CPUExecutionProvider"])
+            prob = onnx_prob(sess, E_test)
+            one  = lambda s=sess: onnx_prob(s, E_test[:1])                      # noqa: E731
+            many = lambda s=sess: onnx_prob(s, batch)                           # noqa: E731
+        else:
+            model = spec["model"]
+            prob  = model.predict_proba(E_test)[:, 1]
+            one   = lambda m=model: m.predict_proba(E_test[:1])                 # noqa: E731
+            many  = lambda m=model: m.predict_proba(batch)                      # noqa: E731
+
+        hybrid = hybrid_labels(prob, dt_test, threshold, conf_margin)
+        rows.append({
+            "format":        name,
+            "runtime":       spec["runtime"],
+            "n_trees":       spec["n_trees"],
+            "size_kb":       round(spec["path"].stat().st_size / 1024, 1),
+            **_scores(prob, y_test, threshold),
+            "hybrid_recall": float(recall_score(y_test, hybrid)),
+            "latency_1_ms":  round(_time_ms(one), 4),
+            f"latency_{BENCH_ROWS}_ms": round(_time_ms(many), 3),
+        })
+    return rows
+
+
+def print_table(rows: list) -> None:
+    print(f"\n  {'Format':<22} {'trees':>5} {'KB':>8} {'recall':>7} {'hybrid':>7} "
+          f"{'AUC':>7} {'1 row ms':>9} {f'{BENCH_ROWS} rows ms':>12}")
+    print(f"  {'-'*22} {'-'*5} {'-'*8} {'-'*7} {'-'*7} {'-'*7} {'-'*9} {'-'*12}")
+    for r in rows:
+        print(f"  {r['format']:<22} {r['n_trees']:>5} {r['size_kb']:>8.1f} {r['recall']:>7.4f} "
+              f"{r['hybrid_recall']:>7.4f} {r['roc_auc']:>7.4f} {r['latency_1_ms']:>9.3f} "
+              f"{r[f'latency_{BENCH_ROWS}_ms']:>12.2f}")
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prune / quantize the v4 XGBoost model.")
+    parser.add_argument("--n-keep", type=int, default=None, help="tree budget (default: select on validation)")
+    parser.add_argument("--leaf-bits", type=int, default=DEFAULT_LEAF_BITS)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ContraceptIQ -- XGBoost compression (v4)")
+    print("=" * 60)
+
+    X_train, X_test, y_train, y_test = joblib.load(DATA_PKL)
+    xgb_pipeline = joblib.load(XGB_JOBLIB)
+    dt_pipeline  = joblib.load(DT_JOBLIB)
+    threshold, conf_margin = operating_point(VERSION)
+
+    xgb_c    = CompiledPipeline.from_pipeline(xgb_pipeline)
+    features = xgb_c.schema.feature_names
+    X_train, X_test = X_train[features], X_test[features]
+    E_train  = xgb_c.schema.encode_frame(X_train)
+    E_test   = xgb_c.schema.encode_frame(X_test)
+    y_test   = np.asarray(y_test)
+    print(f"  threshold={threshold}, conf_margin={conf_margin}, leaf_bits={args.leaf_bits}")
+
+    if args.n_keep is None:
+        n_keep, selection = select_n_keep(xgb_pipeline, X_train, y_train, threshold, args.leaf_bits)
+    else:
+        n_keep, selection = args.n_keep, []
+
+    # Test-split sweep of the deployed model (reported, never used for selection)
+    sweep = []
+    for candidate in CANDIDATES:
+        trees, stats = _compressed(xgb_c.trees, E_train, candidate, args.leaf_bits)
+        prob = CompiledPipeline(xgb_c.schema, trees, "xgb").predict_proba(E_test)[:, 1]
+        sweep.append({"n_keep": candidate, **stats, **_scores(prob, y_test, threshold)})
+
+    trees, stats = compress(xgb_c.trees, E_train, n_keep=n_keep)
+    print(f"\n  Compressed: {stats['n_trees_in']} -> {stats['n_trees_pruned']} trees (pruned) "
+          f"-> {stats['n_trees_merged']} (merged); "
+          f"{stats['n_conds_in']} -> {stats['n_conds_out']} split conditions")
+
+    meta = {"source": XGB_JOBLIB.name, "n_keep": n_keep, "threshold": threshold}
+    save_compressed(OUT_NPZ, trees, xgb_c.schema, leaf_bits=args.leaf_bits, meta=meta)
+    compressed_c = load_compressed(OUT_NPZ)
+    onnx.save(trees_to_onnx(compressed_c.trees, xgb_c.schema.n_outputs), OUT_ONNX)
+    print(f"  Saved -> {OUT_NPZ}")
+    print(f"  Saved -> {OUT_ONNX}")
+
+    # The ONNX graph must agree with the NumPy bundle it was built from
+    sess = ort.InferenceSession(str(OUT_ONNX), providers=["CPUExecutionProvider"])
+    onnx_prob = sess.run(None, {"float_input": E_test})[1][:, 1]
+    comp_prob = compressed_c.predict_proba(E_test)[:, 1]
+    n_flips   = int(((onnx_prob >= threshold) != (comp_prob >= threshold)).sum())
+    max_diff  = float(np.abs(onnx_prob - comp_prob).max())
+    print(f"  ONNX vs compiled: max |diff| {max_diff:.3g}, label flips at {threshold}: {n_flips}")
+    if n_flips:
+        sys.exit("[ERROR] Compressed ONNX graph disagrees with the compressed bundle.")
+
+    variants = {
+        "sklearn pipeline":     {"runtime": "sklearn",     "path": XGB_JOBLIB,
+                                 "n_trees": xgb_c.trees.n_trees},
+        "onnx flat (mobile)":   {"runtime": "onnxruntime", "path": XGB_FLAT_ONNX,
+                                 "n_trees": xgb_c.trees.n_trees},
+        "compiled":             {"runtime": "numpy",       "path": MODEL_DIR / "hybrid_compiled.npz",
+                                 "n_trees": xgb_c.trees.n_trees, "model": xgb_c},
+        "compressed":           {"runtime": "numpy",       "path": OUT_NPZ,
+                                 "n_trees": compressed_c.trees.n_trees, "model": compressed_c},
+        "compressed onnx flat": {"runtime": "onnxruntime", "path": OUT_ONNX,
+                                 "n_trees": compressed_c.trees.n_trees},
+    }
+    dt_test = dt_pipeline.predict(X_test)
+    formats = compare_formats(xgb_pipeline, variants, X_test, y_test, dt_test, threshold, conf_margin)
+    print_table(formats)
+    print("\n  Note: hybrid_compiled.npz also holds the Decision Tree; "
+          "onnx latencies stand in for the mobile runtime.")
+
+    report = {
+        "version":          VERSION,
+        "threshold":        threshold,
+        "conf_margin":      conf_margin,
+        "leaf_bits":        args.leaf_bits,
+        "n_keep":           n_keep,
+        "compression":      stats,
+        "selection":        {"validation_size": VALIDATION_SIZE, "recall_tolerance": RECALL_TOLERANCE,
+                             "auc_tolerance": AUC_TOLERANCE, "candidates": selection},
+        "test_sweep":       sweep,
+        "onnx_parity":      {"max_abs_diff": max_diff, "label_flips": n_flips},
+        "formats":          formats,
+    }
+    with open(OUT_REPORT, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n  Report saved to {OUT_REPORT}")
+
+
+if __name__ == "__main__":
+    main()
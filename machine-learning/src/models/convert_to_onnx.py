@@ -40,6 +40,9 @@ OUTPUT_DIR = MODEL_DIR  # Save ONNX files alongside joblib files
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 TEST_DATA_PATH = PROJECT_ROOT / "mobile-app" / "backend" / "test_data.json"
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))   # machine-learning/src/
+from inference.hybrid import HybridEngine, hybrid_row  # noqa: E402
+
 # ============================================================================
 # STEP 1: Register XGBoost converter for skl2onnx
 # ============================================================================
@@ -213,14 +216,8 @@ def validate_hybrid(xgb_pipeline, dt_pipeline, xgb_onnx_path, dt_onnx_path, test
         X_float = df.values.astype(np.float32)
         
         # --- Joblib hybrid ---
-        jl_xgb_probs = xgb_pipeline.predict_proba(df)[:, 1]
-        jl_xgb_pred = (jl_xgb_probs >= THRESH).astype(int)
-        jl_dt_pred = dt_pipeline.predict(df)
-        jl_hybrid = jl_xgb_pred.copy()
-        low_conf = np.abs(jl_xgb_probs - THRESH) < MARGIN
-        upgrade = low_conf & (jl_dt_pred == 1)
-        jl_hybrid[upgrade] = 1
-        jl_risk = "HIGH" if jl_hybrid[0] == 1 else "LOW"
+        jl = HybridEngine(xgb_pipeline, dt_pipeline, THRESH, MARGIN).predict(df)
+        jl_risk = "HIGH" if jl["predictions"][0] == 1 else "LOW"
         
         # --- ONNX hybrid ---
         ox_xgb_out = xgb_session.run(None, {xgb_input: X_float})
@@ -235,14 +232,9 @@ def validate_hybrid(xgb_pipeline, dt_pipeline, xgb_onnx_path, dt_onnx_path, test
         else:
             ox_xgb_prob = float(ox_probs_raw[0])
         
-        ox_xgb_pred = 1 if ox_xgb_prob >= THRESH else 0
         ox_dt_pred = int(ox_dt_out[0][0])
-        
-        ox_hybrid = ox_xgb_pred
-        ox_low_conf = abs(ox_xgb_prob - THRESH) < MARGIN
-        if ox_low_conf and ox_dt_pred == 1:
-            ox_hybrid = 1
-        ox_risk = "HIGH" if ox_hybrid == 1 else "LOW"
+        ox = hybrid_row(ox_xgb_prob, ox_dt_pred, THRESH, MARGIN)
+        ox_risk = "HIGH" if ox["prediction"] == 1 else "LOW"
         
         match = jl_risk == ox_risk
         status = "✅" if match else "❌"
@@ -250,7 +242,7 @@ def validate_hybrid(xgb_pipeline, dt_pipeline, xgb_onnx_path, dt_onnx_path, test
             all_passed = False
         
         print(f"  {status} {sample['name']}: "
-              f"joblib={jl_risk}(p={float(jl_xgb_probs[0]):.4f}) "
+              f"joblib={jl_risk}(p={float(jl['xgb_probabilities'][0]):.4f}) "
               f"onnx={ox_risk}(p={ox_xgb_prob:.4f}) "
               f"expected={sample['expected_risk']}")
     
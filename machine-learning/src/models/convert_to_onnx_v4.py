@@ -12,8 +12,10 @@ Output:
     src/models/models_high_risk_v4/dt_high_recall.onnx
 
 Validation:
-    Runs a spot-check: converts a handful of test-set rows, compares
-    joblib vs ONNX predictions.  Exits with code 1 on any mismatch.
+    Batched parity check (onnx_parity.py): the whole test split plus
+    synthetic rows over the full category space, joblib vs ONNX, one
+    session.run per model.  Exits with code 1 on any hybrid-label mismatch
+    or probability drift above tolerance.
 
 After this script succeeds, copy the two .onnx files to:
     mobile-app/assets/models/
@@ -24,9 +26,6 @@ import sys
 from pathlib import Path
 
 import joblib
-import numpy as np
-import pandas as pd
-import onnxruntime as ort
 from skl2onnx import convert_sklearn, update_registered_converter
 from skl2onnx.common.data_types import FloatTensorType, StringTensorType
 from skl2onnx.common.shape_calculator import calculate_linear_classifier_output_shapes
@@ -48,6 +47,8 @@ DATA_PKL   = _ML / "data" / "processed" / "discontinuation_design1_data_v2.pkl"
 # Preprocessor
 sys.path.insert(0, str(_SRC))
 
+from onnx_parity import check_parity, print_report  # noqa: E402
+
 # ============================================================================
 # FEATURE SET  (must match train_v4.py)
 # ============================================================================
@@ -152,82 +153,14 @@ def convert_pipeline_to_onnx(pipeline, output_path: Path, model_name: str) -> No
 
 
 # ============================================================================
-# STEP 3: Validate ONNX against joblib on test data
+# STEP 3: Validate ONNX against joblib (batched parity check)
 # ============================================================================
 
-def _extract_prob(onnx_probs) -> float:
-    """Extract P(class=1) from whatever tensor shape the ONNX model returns."""
-    if isinstance(onnx_probs, list):
-        return float(onnx_probs[0].get(1, onnx_probs[0].get("1", 0)))
-    if hasattr(onnx_probs, "shape") and len(onnx_probs.shape) == 2:
-        return float(onnx_probs[0, 1])
-    return float(onnx_probs[0])
-
-
 def validate(xgb_pipeline, dt_pipeline, xgb_onnx: Path, dt_onnx: Path) -> bool:
-    """Compare joblib hybrid vs ONNX hybrid on 20 test samples."""
-    print(f"\n{'='*60}")
-    print("Validating hybrid logic: ONNX vs joblib (20 test samples)")
-    print(f"{'='*60}")
-
-    # Load data and select feature subset
-    X_train_full, X_test_full, y_train, y_test = joblib.load(DATA_PKL)
-    X_test = X_test_full[FEATURES].copy()
-
-    # Sample 20 rows (first 10 + last 10 to cover both classes)
-    sample_idx = list(range(10)) + list(range(len(X_test) - 10, len(X_test)))
-    X_sample = X_test.iloc[sample_idx].reset_index(drop=True)
-    y_sample = y_test.iloc[sample_idx].reset_index(drop=True)
-
-    # ONNX sessions
-    xgb_sess = ort.InferenceSession(str(xgb_onnx))
-    dt_sess  = ort.InferenceSession(str(dt_onnx))
-
-    all_passed = True
-
-    for i in range(len(X_sample)):
-        row_df = X_sample.iloc[[i]]
-
-        # Build per-column ONNX feed dict (each column as a [1,1] array)
-        def make_feed(sess) -> dict:
-            feed = {}
-            for feat in FEATURES:
-                dtype = FEATURE_DTYPES[feat]
-                val = row_df[feat].values
-                if dtype in ("int64", "float64"):
-                    feed[feat] = val.reshape(1, 1).astype(np.float32)
-                else:
-                    feed[feat] = val.reshape(1, 1).astype(str)
-            return feed
-
-        # --- Joblib hybrid ---
-        jl_prob   = float(xgb_pipeline.predict_proba(row_df)[0, 1])
-        jl_pred   = int(jl_prob >= THRESHOLD)
-        jl_dt     = int(dt_pipeline.predict(row_df)[0])
-        jl_low    = abs(jl_prob - THRESHOLD) < CONF_MARGIN
-        jl_hybrid = 1 if (jl_pred == 1 or (jl_low and jl_dt == 1)) else 0
-
-        # --- ONNX hybrid ---
-        ox_xgb_out = xgb_sess.run(None, make_feed(xgb_sess))
-        ox_prob    = _extract_prob(ox_xgb_out[1] if len(ox_xgb_out) > 1 else ox_xgb_out[0])
-        ox_pred    = int(ox_prob >= THRESHOLD)
-        ox_dt_out  = dt_sess.run(None, make_feed(dt_sess))
-        ox_dt      = int(ox_dt_out[0][0])
-        ox_low     = abs(ox_prob - THRESHOLD) < CONF_MARGIN
-        ox_hybrid  = 1 if (ox_pred == 1 or (ox_low and ox_dt == 1)) else 0
-
-        match  = jl_hybrid == ox_hybrid
-        pdiff  = abs(jl_prob - ox_prob)
-        status = "PASS" if match else "FAIL"
-        if not match:
-            all_passed = False
-
-        true_label = int(y_sample.iloc[i])
-        print(f"  [{status}] row {i:02d}: "
-              f"true={true_label}  jl={jl_hybrid}(p={jl_prob:.4f})  "
-              f"onnx={ox_hybrid}(p={ox_prob:.4f})  pdiff={pdiff:.6f}")
-
-    return all_passed
+    """Batched joblib vs ONNX parity on the full test split + synthetic rows."""
+    report = check_parity(xgb_pipeline, dt_pipeline, string_models=(xgb_onnx, dt_onnx))
+    print_report(report)
+    return report["passed"]
 
 
 # ============================================================================
@@ -17,19 +17,33 @@ the pipeline and re-exported with FloatTensorType([None, 133]).
 Usage:
     cd machine-learning
     python src/models/convert_to_onnx_v4_flat.py
+    python src/models/convert_to_onnx_v4_flat.py --skip-benchmark
 
 Output (also copies to mobile-app/assets/models/):
     src/models/models_high_risk_v4/xgb_high_recall_flat.onnx
     src/models/models_high_risk_v4/dt_high_recall_flat.onnx
+    src/models/models_high_risk_v4/xgb_high_recall_flat.ort
+    src/models/models_high_risk_v4/dt_high_recall_flat.ort
+    src/models/models_high_risk_v4/onnx_session_config.json
+
+The .ort files and the session config come from the ONNX Runtime benchmark
+matrix (onnx_benchmark.py: batch size x threads x optimization level) on
+THIS machine.  The backend (MODEL_BACKEND=onnx) applies them only on hosts
+with the same CPU count; the mobile app is not benchmarked, so only the
+.onnx models are copied there and it uses ONNX Runtime's defaults.
+
+Validation:
+    Batched parity check (onnx_parity.py) on the whole test split plus
+    synthetic rows over the full OHE category space; exits with code 1 on
+    any mismatch.
 """
 
+import argparse
 import sys
 import shutil
 from pathlib import Path
 
 import joblib
-import numpy as np
-import onnxruntime as ort
 from skl2onnx import convert_sklearn, update_registered_converter
 from skl2onnx.common.data_types import FloatTensorType
 from skl2onnx.common.shape_calculator import calculate_linear_classifier_output_shapes
@@ -48,6 +62,12 @@ MODEL_DIR   = _HERE / "models_high_risk_v4"
 MOBILE_DIR  = _PROJ / "mobile-app" / "assets" / "models"
 DATA_PKL    = _ML / "data" / "processed" / "discontinuation_design1_data_v2.pkl"
 
+from onnx_benchmark import benchmark_models  # noqa: E402
+from onnx_parity import check_parity, print_report  # noqa: E402
+
+sys.path.insert(0, str(_HERE.parent))
+from inference.encoding import FeatureSchema  # noqa: E402
+
 FEATURES = [
     "PATTERN_USE", "HUSBAND_AGE", "AGE", "ETHNICITY", "HOUSEHOLD_HEAD_SEX",
     "CONTRACEPTIVE_METHOD", "SMOKE_CIGAR", "DESIRE_FOR_MORE_CHILDREN", "PARITY",
@@ -165,78 +185,14 @@ def convert_classifier_to_flat_onnx(pipeline, output_path: Path, n_features: int
 
 
 # ============================================================================
-# STEP 4: Validate flat ONNX against joblib pipeline on 20 test rows
+# STEP 4: Validate flat ONNX against joblib (batched parity check)
 # ============================================================================
 
-def build_ohe_vector(row_series, schema) -> np.ndarray:
-    """Build the 133-dim float32 vector from one row using the OHE schema."""
-    parts = []
-    for kind, feat, cats in schema:
-        val = row_series[feat]
-        if kind == "ohe":
-            vec = np.zeros(len(cats), dtype=np.float32)
-            val_str = str(val) if not isinstance(val, float) or not np.isnan(val) else ""
-            if val_str in cats:
-                vec[cats.index(val_str)] = 1.0
-            # unknown category → all zeros (handle_unknown='ignore' behaviour)
-            parts.append(vec)
-        else:
-            # numeric — cast to float32
-            try:
-                parts.append(np.array([float(val)], dtype=np.float32))
-            except (ValueError, TypeError):
-                parts.append(np.array([0.0], dtype=np.float32))
-    return np.concatenate(parts)
-
-
-def validate(xgb_pipeline, dt_pipeline, xgb_flat_onnx: Path, dt_flat_onnx: Path, schema) -> bool:
-    print(f"\n{'='*60}")
-    print("Validating flat ONNX vs joblib on 20 test samples")
-    print(f"{'='*60}")
-
-    X_train, X_test, y_train, y_test = joblib.load(DATA_PKL)
-    X_test = X_test[FEATURES].copy()
-
-    sample_idx = list(range(10)) + list(range(len(X_test) - 10, len(X_test)))
-    X_sample = X_test.iloc[sample_idx].reset_index(drop=True)
-    y_sample = y_test.iloc[sample_idx].reset_index(drop=True)
-
-    xgb_sess = ort.InferenceSession(str(xgb_flat_onnx))
-    dt_sess  = ort.InferenceSession(str(dt_flat_onnx))
-
-    all_passed = True
-
-    for i in range(len(X_sample)):
-        row = X_sample.iloc[i]
-        vec = build_ohe_vector(row, schema).reshape(1, -1)
-
-        # Joblib hybrid
-        jl_prob   = float(xgb_pipeline.predict_proba(row.to_frame().T)[0, 1])
-        jl_pred   = int(jl_prob >= THRESHOLD)
-        jl_dt     = int(dt_pipeline.predict(row.to_frame().T)[0])
-        jl_low    = abs(jl_prob - THRESHOLD) < CONF_MARGIN
-        jl_hybrid = 1 if (jl_pred == 1 or (jl_low and jl_dt == 1)) else 0
-
-        # Flat ONNX hybrid
-        xgb_out  = xgb_sess.run(None, {"float_input": vec})
-        ox_prob  = float(xgb_out[1][0, 1]) if xgb_out[1].shape[1] == 2 else float(xgb_out[1][0, 0])
-        ox_pred  = int(ox_prob >= THRESHOLD)
-        dt_out   = dt_sess.run(None, {"float_input": vec})
-        ox_dt    = int(dt_out[0][0])
-        ox_low   = abs(ox_prob - THRESHOLD) < CONF_MARGIN
-        ox_hybrid = 1 if (ox_pred == 1 or (ox_low and ox_dt == 1)) else 0
-
-        match  = jl_hybrid == ox_hybrid
-        pdiff  = abs(jl_prob - ox_prob)
-        status = "PASS" if match else "FAIL"
-        if not match:
-            all_passed = False
-
-        true_label = int(y_sample.iloc[i])
-        print(f"  [{status}] row {i:02d}: true={true_label}  "
-              f"jl={jl_hybrid}(p={jl_prob:.4f})  onnx={ox_hybrid}(p={ox_prob:.4f})  pdiff={pdiff:.6f}")
-
-    return all_passed
+def validate(xgb_pipeline, dt_pipeline, xgb_flat_onnx: Path, dt_flat_onnx: Path) -> bool:
+    """Batched joblib vs flat ONNX parity on the full test split + synthetic rows."""
+    report = check_parity(xgb_pipeline, dt_pipeline, flat_models=(xgb_flat_onnx, dt_flat_onnx))
+    print_report(report)
+    return report["passed"]
 
 
 # ============================================================================
@@ -263,6 +219,11 @@ def print_ts_schema(schema):
 # ============================================================================
 
 def main():
+    parser = argparse.ArgumentParser(description="Flat (float32) ONNX export of the v4 models.")
+    parser.add_argument("--skip-benchmark", action="store_true",
+                        help="do not rebuild the .ort models / onnx_session_config.json")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("ContraceptIQ — ONNX Flat Conversion v4 (133 float32 inputs)")
     print("=" * 60)
@@ -288,7 +249,17 @@ def main():
     convert_classifier_to_flat_onnx(dt_pipeline,  dt_flat,  n_features, "Decision Tree")
 
     # Validate
-    passed = validate(xgb_pipeline, dt_pipeline, xgb_flat, dt_flat, schema)
+    passed = validate(xgb_pipeline, dt_pipeline, xgb_flat, dt_flat)
+
+    # Benchmark matrix -> .ort models + recommended session config
+    if passed and not args.skip_benchmark:
+        print(f"\n{'='*60}")
+        print("ONNX Runtime benchmark (batch size x threads x optimization level)")
+        print(f"{'='*60}")
+        benchmark_models(
+            {"xgb": xgb_flat, "dt": dt_flat}, n_features, MODEL_DIR,
+            feature_schema=FeatureSchema.from_pipeline(xgb_pipeline).to_dict(),
+        )
 
     # Print TypeScript schema
     print_ts_schema(schema)
@@ -0,0 +1,168 @@
+"""
+convert_to_onnx_v4_indexed.py
+
+Export the v4 XGBoost + Decision Tree classifiers as ONNX models whose input
+is the compact *index* layout instead of the 133-wide one-hot vector:
+
+    input   index_input    float32 [N, 9]
+            one column per raw feature, in ColumnTransformer order:
+              categorical  -> category index in the fitted OneHotEncoder
+                              categories (-1 for unknown values)
+              numeric      -> the value itself (AGE, PARITY)
+
+The one-hot expansion never happens: every tree split on a one-hot column
+(``CONTRACEPTIVE_METHOD == "Pills"``) is rewritten as an index comparison
+(BRANCH_EQ / BRANCH_NEQ), see tree_onnx.trees_to_indexed_onnx.  Outputs are
+unchanged (label, probabilities), so the hybrid rule is applied as for the
+flat models.  The Decision Tree's probabilities are its 0/1 leaf label.
+
+Usage:
+    cd machine-learning
+    python src/models/convert_to_onnx_v4_indexed.py
+
+Output:
+    src/models/models_high_risk_v4/xgb_high_recall_indexed.onnx
+    src/models/models_high_risk_v4/dt_high_recall_indexed.onnx
+    src/models/models_high_risk_v4/indexed_input_schema.json
+        column order, categories and numeric fills, for clients that build
+        the index vector (featureEncoder.ts: buildIndexVector)
+
+Validation:
+    Batched parity check (onnx_parity.py, "indexed" flavour) on the whole
+    test split plus synthetic rows; exits with code 1 on any mismatch.
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import onnx
+import onnxruntime as ort
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+_HERE      = Path(__file__).resolve().parent          # machine-learning/src/models/
+_SRC       = _HERE.parent                             # machine-learning/src/
+
+MODEL_DIR       = _HERE / "models_high_risk_v4"
+XGB_INDEXED     = MODEL_DIR / "xgb_high_recall_indexed.onnx"
+DT_INDEXED      = MODEL_DIR / "dt_high_recall_indexed.onnx"
+XGB_FLAT        = MODEL_DIR / "xgb_high_recall_flat.onnx"
+INDEX_SCHEMA    = MODEL_DIR / "indexed_input_schema.json"
+
+sys.path.insert(0, str(_SRC))
+sys.path.insert(0, str(_HERE))
+
+from inference.compiled_trees import KIND_DT, KIND_XGB, CompiledPipeline  # noqa: E402
+from onnx_parity import check_parity, print_report  # noqa: E402
+from tree_onnx import INDEX_INPUT_NAME, trees_to_indexed_onnx  # noqa: E402
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+LATENCY_ROWS    = 1000
+LATENCY_REPEAT  = 50
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def index_schema_json(schema) -> dict:
+    """Client-facing description of the index layout."""
+    columns = []
+    for i, col in enumerate(schema.columns):
+        entry = {"index": i, "name": col["name"], "kind": col["kind"], "fill": col["fill"]}
+        if col["kind"] == "cat":
+            entry["categories"] = [str(c) for c in col["categories"]]
+        columns.append(entry)
+    return {
+        "input_name":   INDEX_INPUT_NAME,
+        "n_columns":    schema.n_columns,
+        "unknown_index": -1,
+        "columns":      columns,
+    }
+
+
+def payload_and_latency(schema, xgb_indexed: Path) -> dict:
+    """Input size per row and batched XGBoost latency, flat vs indexed."""
+    rng = np.random.default_rng(42)
+    index = np.empty((LATENCY_ROWS, schema.n_columns), dtype=np.float32)
+    for i, col in enumerate(schema.columns):
+        if col["kind"] == "cat":
+            index[:, i] = rng.integers(-1, len(col["categories"]), size=LATENCY_ROWS)
+        else:
+            index[:, i] = rng.integers(15, 50, size=LATENCY_ROWS)
+    flat = schema.expand_indices(index)
+
+    def bench(path: Path, name: str, X: np.ndarray) -> float:
+        sess = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+        sess.run(None, {name: X})
+        t0 = time.perf_counter()
+        for _ in range(LATENCY_REPEAT):
+            sess.run(None, {name: X})
+        return (time.perf_counter() - t0) / LATENCY_REPEAT * 1e3
+
+    return {
+        "flat_bytes_per_row":    int(schema.n_outputs * 4),
+        "indexed_bytes_per_row": int(schema.n_columns * 4),
+        "flat_ms_per_1k":        round(bench(XGB_FLAT, "float_input", flat), 3),
+        "indexed_ms_per_1k":     round(bench(xgb_indexed, INDEX_INPUT_NAME, index), 3),
+    }
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main() -> None:
+    print("=" * 60)
+    print("ContraceptIQ — ONNX Indexed Conversion v4 (category-index inputs)")
+    print("=" * 60)
+
+    xgb_pipeline = joblib.load(MODEL_DIR / "xgb_high_recall.joblib")
+    dt_pipeline  = joblib.load(MODEL_DIR / "dt_high_recall.joblib")
+
+    xgb_compiled = CompiledPipeline.from_pipeline(xgb_pipeline)
+    dt_compiled  = CompiledPipeline.from_pipeline(dt_pipeline)
+    schema = xgb_compiled.schema
+    if dt_compiled.schema != schema:
+        sys.exit("[ERROR] XGBoost and Decision Tree pipelines use different preprocessors")
+    print(f"\n  {schema.n_outputs} one-hot columns -> {schema.n_columns} index columns")
+
+    for trees, path, kind in (
+        (xgb_compiled.trees, XGB_INDEXED, KIND_XGB),
+        (dt_compiled.trees,  DT_INDEXED,  KIND_DT),
+    ):
+        onnx.save(trees_to_indexed_onnx(trees, schema, name=path.stem, kind=kind), str(path))
+        print(f"  Saved: {path}  ({path.stat().st_size / 1024:.1f} KB)")
+
+    with open(INDEX_SCHEMA, "w") as f:
+        json.dump(index_schema_json(schema), f, indent=2)
+    print(f"  Saved: {INDEX_SCHEMA}")
+
+    report = check_parity(xgb_pipeline, dt_pipeline, indexed_models=(XGB_INDEXED, DT_INDEXED))
+    print_report(report)
+
+    if XGB_FLAT.exists():
+        stats = payload_and_latency(schema, XGB_INDEXED)
+        print(f"\n  Input per row:   {stats['flat_bytes_per_row']} B flat  ->  "
+              f"{stats['indexed_bytes_per_row']} B indexed")
+        print(f"  XGBoost, {LATENCY_ROWS} rows: {stats['flat_ms_per_1k']:.3f} ms flat  ->  "
+              f"{stats['indexed_ms_per_1k']:.3f} ms indexed")
+
+    print(f"\n{'='*60}")
+    print(f"DONE  —  validation: {'PASS' if report['passed'] else 'FAIL'}")
+    print(f"{'='*60}")
+    if not report["passed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+export_split_index.py
+
+Extract the split-point discretization index of a model version
+(src/inference/split_index.py): every split threshold the XGBoost and
+Decision Tree models use on the numeric columns, and the categories their
+splits test, as the buckets the models can tell apart.
+
+For v4, AGE and PARITY are numeric and bucket by split point.  HUSBAND_AGE
+is one-hot encoded by the fitted preprocessor (its values are categories),
+so its buckets are the husband ages some split tests plus one bucket for
+every other age / missing answer.
+
+Validation:
+    Dataset rows and --probes random records: the bucket tuple from
+    SplitIndex.key (pure Python, used by the API cache) must equal the
+    vectorised buckets, and every input sharing a bucket tuple must get
+    bit-identical model outputs.  Exits with code 1 otherwise.
+
+Cache simulation:
+    Distinct raw records vs distinct bucket tuples over the dataset, and the
+    hit rate of an LRU cache of --cache-size entries keyed either way.
+
+Usage:
+    python src/models/export_split_index.py                 # v4, copies to the app
+    python src/models/export_split_index.py --version v3 --no-mobile
+
+Output:
+    src/models/models_high_risk_<version>/split_index_<version>.json
+    mobile-app/assets/models/split_index_v4.json  (v4)
+"""
+
+import argparse
+import json
+import shutil
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+_HERE      = Path(__file__).resolve().parent          # machine-learning/src/models/
+_PROJ      = _HERE.parent.parent.parent               # project root
+MOBILE_DIR = _PROJ / "mobile-app" / "assets" / "models"
+
+sys.path.insert(0, str(_HERE))
+
+from build_risk_table import _dataset, probe_frame  # noqa: E402
+from export_compiled import OUTPUT_NAME as COMPILED_NAME, VERSIONS, _model_dir  # noqa: E402
+from inference.compiled_trees import load_hybrid  # noqa: E402
+from inference.split_index import DEFAULT_CACHE_SIZE, SplitIndex  # noqa: E402
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+MOBILE_VERSION = "v4"
+DEFAULT_PROBES = 50_000
+
+
+def output_name(version: str) -> str:
+    return f"split_index_{version}.json"
+
+
+# ============================================================================
+# VALIDATION
+# ============================================================================
+
+def _constant_within_buckets(keys: np.ndarray, *outputs: np.ndarray) -> int:
+    """Number of bucket tuples whose rows do not all share the same outputs."""
+    _, first, group = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    differs = np.zeros(len(keys), dtype=bool)
+    for out in outputs:
+        out = np.asarray(out)
+        differs |= out != out[first][group]
+    return len(np.unique(group[differs]))
+
+
+def validate(index: SplitIndex, xgb_c, dt_c, frames: dict[str, pd.DataFrame]) -> bool:
+    ok = True
+    for name, X in frames.items():
+        buckets  = index.buckets_frame(X)
+        records  = X.to_dict("records")
+        n_keys   = sum(tuple(int(b) for b in row) != index.key(rec) for row, rec in zip(buckets, records))
+        n_groups = _constant_within_buckets(buckets, xgb_c.predict_proba(X)[:, 1], dt_c.predict(X))
+        print(f"  {name:<16} rows {len(X):>7}   distinct bucket tuples {len(np.unique(buckets, axis=0)):>6}   "
+              f"key mismatches {n_keys}   inconsistent buckets {n_groups}")
+        ok &= n_keys == 0 and n_groups == 0
+    return ok
+
+
+# ============================================================================
+# CACHE SIMULATION
+# ============================================================================
+
+def lru_hit_rate(keys, maxsize: int) -> float:
+    cache: OrderedDict = OrderedDict()
+    hits = 0
+    for key in keys:
+        if key in cache:
+            cache.move_to_end(key)
+            hits += 1
+        else:
+            cache[key] = None
+            if len(cache) > maxsize:
+                cache.popitem(last=False)
+    return hits / len(keys) if keys else 0.0
+
+
+def cache_report(index: SplitIndex, X: pd.DataFrame, maxsize: int) -> dict:
+    records = X.to_dict("records")
+    raw     = [tuple(r.values()) for r in records]
+    bucket  = [index.key(r) for r in records]
+    report = {
+        "rows":                len(records),
+        "distinct_records":    len(set(raw)),
+        "distinct_buckets":    len(set(bucket)),
+        "cache_size":          maxsize,
+        "hit_rate_raw_key":    round(lru_hit_rate(raw, maxsize), 4),
+        "hit_rate_bucket_key": round(lru_hit_rate(bucket, maxsize), 4),
+    }
+    print(f"\n  Cache simulation over {report['rows']} dataset rows (LRU {maxsize}):")
+    print(f"    distinct raw records   : {report['distinct_records']:>6}   hit rate {report['hit_rate_raw_key']:.2%}")
+    print(f"    distinct bucket tuples : {report['distinct_buckets']:>6}   hit rate {report['hit_rate_bucket_key']:.2%}")
+    return report
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export the split-point discretization index.")
+    parser.add_argument("--version", choices=VERSIONS, default="v4")
+    parser.add_argument("--probes", type=int, default=DEFAULT_PROBES, help="random validation records")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE)
+    parser.add_argument("--no-mobile", action="store_true", help=f"do not copy to {MOBILE_DIR}")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"ContraceptIQ -- Split-point index ({args.version})")
+    print("=" * 60)
+
+    bundle = _model_dir(args.version) / COMPILED_NAME
+    if not bundle.exists():
+        sys.exit(f"[ERROR] {bundle} not found -- run src/models/export_compiled.py first")
+    xgb_c, dt_c, _ = load_hybrid(bundle)
+    index = SplitIndex.from_models(xgb_c, dt_c)
+
+    print("\n  Buckets per column:")
+    for i, col in enumerate(index.schema.columns):
+        if col["kind"] == "num":
+            cuts = index.split_points[col["name"]]
+            shown = ", ".join(f"{c:g}" for c in cuts)
+            print(f"    {col['name']:<26} {index.sizes[i]:>3} bins     cuts [{shown}]")
+        else:
+            tested = [cat for cat, b in zip(col["categories"], index.class_of[i]) if b]
+            print(f"    {col['name']:<26} {index.sizes[i]:>3} buckets  "
+                  f"({len(tested)} of {len(col['categories'])} categories tested)")
+    print(f"\n  Distinct bucket tuples: {index.n_combinations:,}")
+
+    print("\n  Validating ...")
+    X = _dataset(index.schema.feature_names)
+    frames = {"dataset": X, "random probes": probe_frame(index, X, args.probes)}
+    if not validate(index, xgb_c, dt_c, frames):
+        print("\n[FAIL] Bucket tuples do not determine the model outputs.")
+        sys.exit(1)
+    print("\n[PASS] Inputs sharing a bucket tuple get bit-identical outputs.")
+
+    report = cache_report(index, X, args.cache_size)
+
+    out_path = _model_dir(args.version) / output_name(args.version)
+    with open(out_path, "w") as f:
+        json.dump({"model_version": args.version, **index.to_dict(), "cache_simulation": report}, f, indent=2)
+    print(f"\n  Saved to {out_path}")
+
+    if args.version == MOBILE_VERSION and not args.no_mobile:
+        MOBILE_DIR.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(out_path, MOBILE_DIR / output_name(args.version))
+        print(f"  Copied to {MOBILE_DIR / output_name(args.version)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+onnx_benchmark.py
+
+ONNX Runtime benchmark matrix for the flat (dynamic-batch) v4 models, plus
+the two artefacts derived from it:
+
+    <model>.ort                  optimized ORT-format model (loads without
+                                 graph optimization at startup)
+    onnx_session_config.json     recommended SessionOptions per model, read by
+                                 the backend (MODEL_BACKEND=onnx)
+
+Matrix: batch size (1 .. 10k) x intra_op_num_threads x graph optimization
+level.  Thread counts above the host's CPU count are skipped, so the
+recommendation is for the machine the script runs on; the JSON records the
+host CPU count next to it, and the backend only applies the recommendation
+on hosts with that CPU count (ONNX Runtime defaults otherwise).  Run it on
+the serving hardware.  On a single-CPU host only one thread count is
+measured, so the thread setting it records is not a measured choice (the
+committed config came from such a host: host_cpu_count 1).
+
+Recommendation per model:
+    * threads / optimization level with the lowest single-row latency
+      ("latency", what the API and the app use), and
+    * the best configuration for the largest batch ("throughput", bulk
+      scoring).
+
+The .ort file is serialised at min(recommended level, "extended"): the
+"all" level adds layout transforms specific to the exporting CPU, which
+must not be shipped to other devices.
+
+Usage:
+    python src/models/onnx_benchmark.py                   # v4 flat models
+    python src/models/onnx_benchmark.py --quick           # batch sizes 1 / 100 only
+
+Normally run by convert_to_onnx_v4_flat.py right after export.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+_HERE      = Path(__file__).resolve().parent          # machine-learning/src/models/
+MODEL_DIR  = _HERE / "models_high_risk_v4"
+
+SESSION_CONFIG_NAME = "onnx_session_config.json"
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+BATCH_SIZES   = (1, 10, 100, 1000, 10000)
+THREAD_COUNTS = (1, 2, 4, 8)
+OPT_LEVELS = {
+    "disable":  ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic":    ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all":      ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+# Highest level whose serialized model is portable across CPUs
+PORTABLE_OPT_LEVEL = "extended"
+
+INPUT_NAME      = "float_input"
+RANDOM_STATE    = 42
+MIN_REPEAT      = 5
+TARGET_SECONDS  = 0.2            # per cell: repeat until at least this much time is measured
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def session_options(threads: int, opt_level: str) -> ort.SessionOptions:
+    so = ort.SessionOptions()
+    so.intra_op_num_threads     = threads
+    so.inter_op_num_threads     = 1
+    so.execution_mode           = ort.ExecutionMode.ORT_SEQUENTIAL
+    so.graph_optimization_level = OPT_LEVELS[opt_level]
+    so.log_severity_level       = 3
+    return so
+
+
+def _bench_inputs(n_features: int, max_batch: int) -> np.ndarray:
+    """Sparse 0/1 rows shaped like the OHE vectors (7 hot indicators + 2 numerics)."""
+    rng = np.random.default_rng(RANDOM_STATE)
+    X = np.zeros((max_batch, n_features), dtype=np.float32)
+    hot = rng.integers(0, n_features - 2, size=(max_batch, 7))
+    np.put_along_axis(X, hot, 1.0, axis=1)
+    X[:, -2] = rng.integers(15, 50, size=max_batch)
+    X[:, -1] = rng.integers(0, 10, size=max_batch)
+    return X
+
+
+def _time_run(session: ort.InferenceSession, X: np.ndarray) -> list[float]:
+    feed = {INPUT_NAME: X}
+    session.run(None, feed)                          # warm-up
+    times, total = [], 0.0
+    while len(times) < MIN_REPEAT or total < TARGET_SECONDS:
+        t0 = time.perf_counter()
+        session.run(None, feed)
+        dt = time.perf_counter() - t0
+        times.append(dt)
+        total += dt
+    return times
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def run_matrix(
+    model_path: Path,
+    n_features: int,
+    batch_sizes: tuple = BATCH_SIZES,
+    thread_counts: tuple = THREAD_COUNTS,
+    opt_levels: tuple = tuple(OPT_LEVELS),
+) -> list[dict]:
+    """Latency of every (batch size, threads, optimization level) cell."""
+    cpu_count = os.cpu_count() or 1
+    threads   = [t for t in thread_counts if t <= cpu_count] or [1]
+    X_all     = _bench_inputs(n_features, max(batch_sizes))
+    if len(threads) == 1:
+        print(f"  WARNING: {cpu_count} CPU(s): only {threads[0]} intra-op thread(s) measured, "
+              f"the thread recommendation is not tuned")
+
+    rows = []
+    for n_threads in threads:
+        for level in opt_levels:
+            session = ort.InferenceSession(
+                str(model_path), session_options(n_threads, level), providers=["CPUExecutionProvider"],
+            )
+            for batch in batch_sizes:
+                times = np.array(_time_run(session, X_all[:batch])) * 1e3
+                rows.append({
+                    "batch_size":  batch,
+                    "threads":     n_threads,
+                    "opt_level":   level,
+                    "mean_ms":     round(float(times.mean()), 4),
+                    "p50_ms":      round(float(np.percentile(times, 50)), 4),
+                    "p95_ms":      round(float(np.percentile(times, 95)), 4),
+                    "rows_per_s":  round(batch / (times.mean() / 1e3), 1),
+                })
+    return rows
+
+
+def recommend(rows: list[dict]) -> dict:
+    """Best (threads, opt_level) for single-row latency and for the largest batch."""
+    def best(batch: int) -> dict:
+        cells = [r for r in rows if r["batch_size"] == batch]
+        top = min(cells, key=lambda r: (r["p50_ms"], r["threads"]))
+        return {"threads": top["threads"], "opt_level": top["opt_level"],
+                "batch_size": batch, "p50_ms": top["p50_ms"]}
+
+    return {
+        "latency":    best(min(r["batch_size"] for r in rows)),
+        "throughput": best(max(r["batch_size"] for r in rows)),
+    }
+
+
+def save_ort_model(onnx_path: Path, ort_path: Path, opt_level: str) -> Path:
+    """Serialise the optimized graph in ORT format (portable level at most)."""
+    levels = list(OPT_LEVELS)
+    level  = levels[min(levels.index(opt_level), levels.index(PORTABLE_OPT_LEVEL))]
+    so = session_options(1, level)
+    so.optimized_model_filepath = str(ort_path)
+    so.add_session_config_entry("session.save_model_format", "ORT")
+    ort.InferenceSession(str(onnx_path), so, providers=["CPUExecutionProvider"])
+    return ort_path
+
+
+def print_matrix(name: str, rows: list[dict]) -> None:
+    print(f"\n  {name}")
+    print(f"  {'batch':>6} {'thr':>4} {'opt':<9} {'p50 ms':>9} {'p95 ms':>9} {'rows/s':>12}")
+    print(f"  {'-'*6} {'-'*4} {'-'*9} {'-'*9} {'-'*9} {'-'*12}")
+    for r in rows:
+        print(f"  {r['batch_size']:>6} {r['threads']:>4} {r['opt_level']:<9} "
+              f"{r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['rows_per_s']:>12,.0f}")
+
+
+def benchmark_models(
+    models: dict[str, Path],
+    n_features: int,
+    out_dir: Path,
+    feature_schema: dict | None = None,
+    batch_sizes: tuple = BATCH_SIZES,
+) -> Path:
+    """
+    Benchmark each flat model, write its .ort file and the session config.
+
+    Parameters
+    ----------
+    models : {"xgb": path, "dt": path}  flat .onnx files
+    feature_schema : FeatureSchema.to_dict() of the pipelines' preprocessor,
+        stored in the config so runtimes can encode raw records without sklearn
+
+    Returns
+    -------
+    Path of the written onnx_session_config.json
+    """
+    config = {
+        "created_utc":    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "onnxruntime":    ort.__version__,
+        "host_cpu_count": os.cpu_count() or 1,
+        "input_name":     INPUT_NAME,
+        "n_features":     n_features,
+        "models":         {},
+    }
+    if feature_schema is not None:
+        config["feature_schema"] = feature_schema
+
+    for key, onnx_path in models.items():
+        rows = run_matrix(onnx_path, n_features, batch_sizes=batch_sizes)
+        print_matrix(onnx_path.name, rows)
+        rec = recommend(rows)
+
+        ort_path = save_ort_model(onnx_path, onnx_path.with_suffix(".ort"), rec["latency"]["opt_level"])
+        print(f"  recommended: latency {rec['latency']}  throughput {rec['throughput']}")
+        print(f"  Saved -> {ort_path}  ({ort_path.stat().st_size / 1024:.1f} KB)")
+
+        config["models"][key] = {
+            "onnx_file":  onnx_path.name,
+            "ort_file":   ort_path.name,
+            "session_options": {
+                "intra_op_num_threads":     rec["latency"]["threads"],
+                "inter_op_num_threads":     1,
+                "execution_mode":           "sequential",
+                "graph_optimization_level": rec["latency"]["opt_level"],
+            },
+            "throughput_session_options": {
+                "intra_op_num_threads":     rec["throughput"]["threads"],
+                "graph_optimization_level": rec["throughput"]["opt_level"],
+            },
+            "recommendation": rec,
+            "matrix":         rows,
+        }
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    config_path = out_dir / SESSION_CONFIG_NAME
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=2)
+    print(f"\n  Session config saved to {config_path}")
+    return config_path
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ONNX Runtime benchmark matrix for the flat v4 models.")
+    parser.add_argument("--quick", action="store_true", help="batch sizes 1 and 100 only")
+    args = parser.parse_args()
+
+    import joblib
+
+    sys.path.insert(0, str(_HERE.parent))
+    from inference.encoding import FeatureSchema
+
+    models = {
+        "xgb": MODEL_DIR / "xgb_high_recall_flat.onnx",
+        "dt":  MODEL_DIR / "dt_high_recall_flat.onnx",
+    }
+    missing = [str(p) for p in models.values() if not p.exists()]
+    if missing:
+        sys.exit(f"[ERROR] Missing flat ONNX models: {missing} -- run convert_to_onnx_v4_flat.py first")
+
+    schema = FeatureSchema.from_pipeline(joblib.load(MODEL_DIR / "xgb_high_recall.joblib"))
+    benchmark_models(
+        models, schema.n_outputs, MODEL_DIR,
+        feature_schema=schema.to_dict(),
+        batch_sizes=(1, 100) if args.quick else BATCH_SIZES,
+    )
+
+
+if __name__ == "__main__":
+    main()
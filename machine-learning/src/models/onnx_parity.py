@@ -0,0 +1,283 @@
+"""
+onnx_parity.py
+
+Batched parity check between the v4 joblib pipelines and their ONNX exports:
+
+    string ONNX  xgb_high_recall.onnx / dt_high_recall.onnx
+                 (whole pipeline; one [N, 1] tensor per raw feature)
+    flat ONNX    xgb_high_recall_flat.onnx / dt_high_recall_flat.onnx
+                 (classifier only; one [N, 133] float32 OHE tensor)
+    indexed ONNX xgb_high_recall_indexed.onnx / dt_high_recall_indexed.onnx
+                 (classifier only; one [N, 9] float32 category-index tensor)
+
+Rows checked:
+    * the whole held-out test split, and
+    * N_SYNTHETIC synthetic rows sampled uniformly over the fitted OHE
+      category space (every category of every column, plus a share of
+      unseen values for the handle_unknown="ignore" path) and the observed
+      integer range of the numeric columns.
+
+Every model is scored with ONE batched call over all rows (one predict /
+session.run per model), so a full check runs in well under a second and
+can gate every export.
+
+Reported per flavour: max |P(y=1)| drift against joblib, and the number of
+XGBoost-label, DT-label and hybrid-label mismatches at the deployed
+operating point.  A flavour passes when all label mismatches are zero and
+the drift is below PROB_TOLERANCE.
+
+Usage:
+    python src/models/onnx_parity.py                     # every exported flavour
+    python src/models/onnx_parity.py --n-synthetic 50000
+
+    from onnx_parity import check_parity, print_report
+    report = check_parity(xgb_pipeline, dt_pipeline, string_models=(xgb_onnx, dt_onnx))
+
+Exits with code 1 (CLI) when any present flavour fails.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import onnxruntime as ort
+import pandas as pd
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+_HERE      = Path(__file__).resolve().parent          # machine-learning/src/models/
+_SRC       = _HERE.parent                             # machine-learning/src/
+_ML        = _SRC.parent                              # machine-learning/
+
+MODEL_DIR  = _HERE / "models_high_risk_v4"
+DATA_PKL   = _ML / "data" / "processed" / "discontinuation_design1_data_v2.pkl"
+
+sys.path.insert(0, str(_SRC))
+
+from inference.encoding import FeatureSchema  # noqa: E402
+from inference.hybrid import hybrid_labels  # noqa: E402
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+THRESHOLD   = 0.25
+CONF_MARGIN = 0.05
+
+N_SYNTHETIC     = 10000
+UNKNOWN_SHARE   = 0.05           # share of synthetic categorical values never seen in training
+UNKNOWN_VALUE   = "__unseen__"
+RANDOM_STATE    = 42
+
+# float32 tree thresholds + float32 sigmoid: ONNX and XGBoost agree to ~1e-7
+PROB_TOLERANCE  = 1e-5
+
+
+# ============================================================================
+# INPUTS
+# ============================================================================
+
+def synthetic_rows(schema: FeatureSchema, X_ref: pd.DataFrame, n: int, seed: int = RANDOM_STATE) -> pd.DataFrame:
+    """Uniform samples over the fitted category space / observed numeric ranges."""
+    rng  = np.random.default_rng(seed)
+    data = {}
+    for col in schema.columns:
+        name = col["name"]
+        if col["kind"] == "cat":
+            values = np.array(col["categories"] + [UNKNOWN_VALUE], dtype=object)
+            probs  = np.full(len(values), (1 - UNKNOWN_SHARE) / (len(values) - 1))
+            probs[-1] = UNKNOWN_SHARE
+            data[name] = rng.choice(values, size=n, p=probs)
+        else:
+            lo, hi = int(X_ref[name].min()), int(X_ref[name].max())
+            data[name] = rng.integers(lo, hi + 1, size=n)
+    return pd.DataFrame(data)[list(X_ref.columns)]
+
+
+def string_feed(X: pd.DataFrame, session: ort.InferenceSession) -> dict:
+    """Per-column [N, 1] tensors for the string ONNX graph, built once per batch."""
+    feed = {}
+    for inp in session.get_inputs():
+        values = X[inp.name]
+        if inp.type == "tensor(string)":
+            # The exported cat imputer treats "" as missing (see _patch_cat_imputer)
+            feed[inp.name] = values.fillna("").astype(str).to_numpy().reshape(-1, 1)
+        else:
+            feed[inp.name] = values.to_numpy(dtype=np.float32).reshape(-1, 1)
+    return feed
+
+
+# ============================================================================
+# CHECK
+# ============================================================================
+
+def _compare(name: str, ref: dict, prob: np.ndarray, dt_pred: np.ndarray, sources: np.ndarray, seconds: float) -> dict:
+    prob    = np.asarray(prob, dtype=np.float64)
+    dt_pred = np.asarray(dt_pred).astype(np.int64).ravel()
+    drift   = np.abs(prob - ref["prob"])
+    hybrid  = hybrid_labels(prob, dt_pred, THRESHOLD, CONF_MARGIN)
+
+    mismatch = {
+        "xgb_label_mismatches":    (prob >= THRESHOLD) != (ref["prob"] >= THRESHOLD),
+        "dt_label_mismatches":     dt_pred != ref["dt"],
+        "hybrid_label_mismatches": hybrid != ref["hybrid"],
+    }
+    result = {
+        "flavour":        name,
+        "max_prob_drift": float(drift.max()),
+        "run_seconds":    round(seconds, 4),
+    }
+    for key, mask in mismatch.items():
+        result[key] = int(mask.sum())
+        result[f"{key}_by_source"] = {
+            src: int(mask[sources == src].sum()) for src in np.unique(sources)
+        }
+    result["passed"] = (
+        result["max_prob_drift"] <= PROB_TOLERANCE
+        and result["xgb_label_mismatches"] == 0
+        and result["dt_label_mismatches"] == 0
+        and result["hybrid_label_mismatches"] == 0
+    )
+    return result
+
+
+def check_parity(
+    xgb_pipeline,
+    dt_pipeline,
+    string_models: tuple[Path, Path] | None = None,
+    flat_models: tuple[Path, Path] | None = None,
+    indexed_models: tuple[Path, Path] | None = None,
+    n_synthetic: int = N_SYNTHETIC,
+) -> dict:
+    """
+    Score the test split + synthetic rows with joblib and each given ONNX
+    flavour (one batched call per model) and compare.
+
+    Returns
+    -------
+    dict with ``n_rows`` per source, ``flavours`` (one result per flavour),
+    ``passed`` and the total wall time.
+    """
+    t_start = time.perf_counter()
+    schema  = FeatureSchema.from_pipeline(xgb_pipeline)
+    features = schema.feature_names
+
+    X_train, X_test, _, _ = joblib.load(DATA_PKL)
+    X_test  = X_test[features].reset_index(drop=True)
+    X_synth = synthetic_rows(schema, X_train[features], n_synthetic)
+    X       = pd.concat([X_test, X_synth], ignore_index=True)
+    sources = np.array(["test"] * len(X_test) + ["synthetic"] * len(X_synth))
+
+    if FeatureSchema.from_pipeline(dt_pipeline) != schema:
+        raise ValueError("XGBoost and Decision Tree pipelines use different preprocessors")
+
+    # Pipeline.predict_proba == model.predict_proba(preprocess.transform(X)); the
+    # fitted preprocessors are identical, so transform once and reuse the matrix
+    # (densified) as the flat ONNX input too.
+    t0 = time.perf_counter()
+    encoded  = xgb_pipeline.named_steps["preprocess"].transform(X)
+    ref_prob = xgb_pipeline.named_steps["model"].predict_proba(encoded)[:, 1].astype(np.float64)
+    ref_dt   = dt_pipeline.named_steps["model"].predict(encoded).astype(np.int64)
+    ref = {"prob": ref_prob, "dt": ref_dt, "hybrid": hybrid_labels(ref_prob, ref_dt, THRESHOLD, CONF_MARGIN)}
+    t_ref = time.perf_counter() - t0
+    flat  = np.ascontiguousarray(
+        encoded.toarray() if hasattr(encoded, "toarray") else encoded, dtype=np.float32,
+    )
+
+    flavours = []
+    if string_models is not None:
+        xgb_sess, dt_sess = (ort.InferenceSession(str(p), providers=["CPUExecutionProvider"])
+                             for p in string_models)
+        t0 = time.perf_counter()
+        feed = string_feed(X, xgb_sess)
+        prob = xgb_sess.run(None, feed)[1][:, 1]
+        dt   = dt_sess.run(None, {i.name: feed[i.name] for i in dt_sess.get_inputs()})[0]
+        flavours.append(_compare("string", ref, prob, dt, sources, time.perf_counter() - t0))
+
+    if flat_models is not None:
+        xgb_sess, dt_sess = (ort.InferenceSession(str(p), providers=["CPUExecutionProvider"])
+                             for p in flat_models)
+        t0 = time.perf_counter()
+        prob = xgb_sess.run(None, {"float_input": flat})[1][:, 1]
+        dt   = dt_sess.run(None, {"float_input": flat})[0]
+        flavours.append(_compare("flat", ref, prob, dt, sources, time.perf_counter() - t0))
+
+    if indexed_models is not None:
+        xgb_sess, dt_sess = (ort.InferenceSession(str(p), providers=["CPUExecutionProvider"])
+                             for p in indexed_models)
+        t0 = time.perf_counter()
+        # Encoded by the schema (not the sklearn transformer), as clients do
+        index = schema.encode_index_frame(X)
+        prob  = xgb_sess.run(None, {"index_input": index})[1][:, 1]
+        dt    = dt_sess.run(None, {"index_input": index})[0]
+        flavours.append(_compare("indexed", ref, prob, dt, sources, time.perf_counter() - t0))
+
+    return {
+        "n_rows":          {"test": len(X_test), "synthetic": len(X_synth)},
+        "threshold":       THRESHOLD,
+        "conf_margin":     CONF_MARGIN,
+        "joblib_seconds":  round(t_ref, 4),
+        "flavours":        flavours,
+        "passed":          all(f["passed"] for f in flavours),
+        "total_seconds":   round(time.perf_counter() - t_start, 4),
+    }
+
+
+def print_report(report: dict) -> None:
+    n = report["n_rows"]
+    print(f"\n{'='*60}")
+    print(f"ONNX parity: {n['test']} test + {n['synthetic']} synthetic rows "
+          f"(threshold={report['threshold']}, conf_margin={report['conf_margin']})")
+    print(f"{'='*60}")
+    print(f"  {'Flavour':<8} {'max |dp|':>10} {'XGB lbl':>8} {'DT lbl':>7} {'hybrid':>7} {'run s':>7}  status")
+    print(f"  {'-'*8} {'-'*10} {'-'*8} {'-'*7} {'-'*7} {'-'*7}  ------")
+    for f in report["flavours"]:
+        print(f"  {f['flavour']:<8} {f['max_prob_drift']:>10.2e} {f['xgb_label_mismatches']:>8} "
+              f"{f['dt_label_mismatches']:>7} {f['hybrid_label_mismatches']:>7} "
+              f"{f['run_seconds']:>7.3f}  {'PASS' if f['passed'] else 'FAIL'}")
+        if f["hybrid_label_mismatches"]:
+            print(f"           hybrid mismatches by source: {f['hybrid_label_mismatches_by_source']}")
+    print(f"  joblib scoring: {report['joblib_seconds']:.3f} s   "
+          f"total check: {report['total_seconds']:.3f} s")
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batched joblib vs ONNX parity check (v4).")
+    parser.add_argument("--n-synthetic", type=int, default=N_SYNTHETIC)
+    args = parser.parse_args()
+
+    xgb_pipeline = joblib.load(MODEL_DIR / "xgb_high_recall.joblib")
+    dt_pipeline  = joblib.load(MODEL_DIR / "dt_high_recall.joblib")
+
+    string_models = (MODEL_DIR / "xgb_high_recall.onnx", MODEL_DIR / "dt_high_recall.onnx")
+    flat_models   = (MODEL_DIR / "xgb_high_recall_flat.onnx", MODEL_DIR / "dt_high_recall_flat.onnx")
+    indexed_models = (MODEL_DIR / "xgb_high_recall_indexed.onnx", MODEL_DIR / "dt_high_recall_indexed.onnx")
+
+    report = check_parity(
+        xgb_pipeline, dt_pipeline,
+        string_models=string_models if all(p.exists() for p in string_models) else None,
+        flat_models=flat_models if all(p.exists() for p in flat_models) else None,
+        indexed_models=indexed_models if all(p.exists() for p in indexed_models) else None,
+        n_synthetic=args.n_synthetic,
+    )
+    print_report(report)
+
+    if not report["flavours"]:
+        sys.exit("[ERROR] No ONNX models found in " + str(MODEL_DIR))
+    if not report["passed"]:
+        print("\n[FAIL] ONNX exports do not reproduce the joblib pipelines.")
+        sys.exit(1)
+    print("\n[PASS] ONNX exports reproduce the joblib pipelines.")
+
+
+if __name__ == "__main__":
+    main()
@@ -29,6 +29,10 @@ OUTPUT_DIR = _HERE / "models_high_risk_v4"
 XGB_MODEL  = OUTPUT_DIR / "xgb_high_recall.joblib"
 DT_MODEL   = OUTPUT_DIR / "dt_high_recall.joblib"
 
+sys.path.insert(0, str(_SRC))
+
+from inference.hybrid import HybridEngine  # noqa: E402
+
 # ============================================================================
 # FEATURE SET  (reduced_C — must match train_v4.py exactly)
 # ============================================================================
@@ -99,24 +103,6 @@ def decode_row(row: pd.Series) -> dict:
     return decoded
 
 
-# ============================================================================
-# INFERENCE HELPERS
-# ============================================================================
-
-def hybrid_predict(xgb_pipe, dt_pipe, X: pd.DataFrame):
-    """Return (xgb_prob, hybrid_prediction) arrays."""
-    xgb_probs = xgb_pipe.predict_proba(X)[:, 1]
-    xgb_preds = (xgb_probs >= THRESHOLD).astype(int)
-    dt_preds  = dt_pipe.predict(X)
-
-    hybrid = xgb_preds.copy()
-    low_conf = np.abs(xgb_probs - THRESHOLD) < CONF_MARGIN
-    upgrade  = low_conf & (dt_preds == 1)
-    hybrid[upgrade] = 1
-
-    return xgb_probs, hybrid
-
-
 # ============================================================================
 # FORMATTING
 # ============================================================================
@@ -166,7 +152,7 @@ def main() -> None:
     print(f"  Class dist: {dict(y_test.value_counts().sort_index())}")
 
     # --- Run inference on entire test set ---
-    xgb_probs, hybrid_preds = hybrid_predict(xgb_pipe, dt_pipe, X_test)
+    hybrid_preds, xgb_probs = HybridEngine(xgb_pipe, dt_pipe, THRESHOLD, CONF_MARGIN).labels(X_test)
     y_test_arr = np.array(y_test)
 
     # True Positive: actually high-risk AND predicted HIGH RISK
@@ -0,0 +1,320 @@
+"""
+train_incremental_v4.py
+
+Incremental (warm-start) refresh of the v4 hybrid with newly labelled
+assessments, e.g. the Manggahan clinic export, without retraining from the
+NDHS pickles:
+
+    * the fitted v4 preprocessor is reused UNCHANGED, so the one-hot
+      categories (and the ONNX / compiled / mobile input layouts derived from
+      them) stay stable.  Values not seen by the base encoder are counted and
+      reported; they encode as all-zeros like at serving time;
+    * XGBoost continues boosting the existing booster: at most
+      ``--max-new-trees`` trees are added on the new rows, early-stopped on a
+      validation split of them (src/training/xgb_fit.py, warm start);
+    * the Decision Tree is cheap and is refitted from scratch on the base
+      training rows plus the new rows;
+    * a share of the new rows (``--holdout``) is kept out of both fits and
+      used, together with the NDHS test split, to compare the base and the
+      refreshed hybrid.
+
+Labels: a HIGH_RISK_DISCONTINUE column is used as is; otherwise the label is
+derived from CONTRACEPTIVE_USE_AND_INTENTION for current users, exactly as in
+discontinuation_preprocess_v2.ipynb.  Files without the 9 v4 features (e.g.
+app-respondents.csv, a usability survey) are rejected.
+
+The result is written to a NEW versioned directory next to the base one
+(models_high_risk_v4_r1, _r2, ...); the base models are never modified.
+Files are staged and published in one rename (train_parallel_v4.publish).
+Point the backend at it with MODEL_DIR=...; ONNX / compiled exports have to
+be regenerated from the new joblibs (train_parallel_v4.REGENERATE).
+
+Usage:
+    python src/models/train_incremental_v4.py
+    python src/models/train_incremental_v4.py --data data/raw/new_assessments.csv --max-new-trees 50
+    python src/models/train_incremental_v4.py --base-dir src/models/models_high_risk_v4_r1
+
+Output:
+    src/models/models_high_risk_v4_r<N>/
+        xgb_high_recall.joblib       base trees + new trees
+        dt_high_recall.joblib        refitted on base + new rows
+        hybrid_v4_config.json        (+ "incremental": base model, data,
+                                        unseen categories, timings and
+                                        base-vs-refreshed metrics)
+"""
+
+import argparse
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.tree import DecisionTreeClassifier
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+_HERE = Path(__file__).resolve().parent          # machine-learning/src/models/
+_ML   = _HERE.parent.parent                      # machine-learning/
+
+DEFAULT_DATA = [_ML / "data" / "raw" / "manggahan_clinic_dataset.csv"]
+
+sys.path.insert(0, str(_HERE))
+
+from train_parallel_v4 import DT_FILE, XGB_FILE, publish, report_published  # noqa: E402
+from train_v4 import (  # noqa: E402
+    DT_PARAMS, OUTPUT_DIR, REDUCED_C_FEATURES,
+    evaluate_hybrid, load_data, save_config, xgb_training_config,
+)
+from preprocessing.preprocessor import compact_frame  # noqa: E402
+from training.xgb_fit import fit_xgb_early_stopping  # noqa: E402
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+TARGET = "HIGH_RISK_DISCONTINUE"
+
+# Label rule of discontinuation_preprocess_v2.ipynb (Design 1: current users,
+# intention-based target)
+CURRENT_USER_VALUES   = {"3", "Current user"}
+HIGH_RISK_INTENTIONS  = {"3", "Using but intends to stop", "Using but unsure"}
+LOW_RISK_INTENTIONS   = {"1", "Using and intends to continue"}
+
+MAX_NEW_TREES   = 100
+HOLDOUT         = 0.20
+RANDOM_STATE    = 42
+
+
+# ============================================================================
+# DATA
+# ============================================================================
+
+def derive_target(df: pd.DataFrame) -> pd.Series:
+    """HIGH_RISK_DISCONTINUE for current users (NaN where undefined)."""
+    current   = df["CURRENT_USE_TYPE"].astype(str).isin(CURRENT_USER_VALUES)
+    intention = df["CONTRACEPTIVE_USE_AND_INTENTION"].astype(str)
+    target = np.where(intention.isin(HIGH_RISK_INTENTIONS), 1.0,
+                      np.where(intention.isin(LOW_RISK_INTENTIONS), 0.0, np.nan))
+    return pd.Series(np.where(current, target, np.nan), index=df.index, name=TARGET)
+
+
+def load_assessments(paths: list[Path], preprocessor) -> tuple[pd.DataFrame, pd.Series]:
+    """
+    Read labelled assessments and align them with the base training frame:
+    the 9 v4 features, categorical columns as strings (NaN kept) in compact
+    dtypes, labels 0/1.
+    """
+    categorical = list(preprocessor.transformers_[0][2])
+    frames, labels = [], []
+    for path in paths:
+        df = pd.read_csv(path, low_memory=False)
+        missing = [f for f in REDUCED_C_FEATURES if f not in df.columns]
+        if missing:
+            sys.exit(f"[ERROR] {path.name} has no v4 features {missing} -- not an assessment export")
+        if TARGET in df.columns:
+            y = df[TARGET]
+        elif {"CURRENT_USE_TYPE", "CONTRACEPTIVE_USE_AND_INTENTION"} <= set(df.columns):
+            y = derive_target(df)
+        else:
+            sys.exit(f"[ERROR] {path.name} has neither {TARGET} nor the columns to derive it")
+
+        keep = y.notna()
+        X = df.loc[keep, REDUCED_C_FEATURES].copy()
+        for col in categorical:
+            X[col] = X[col].astype(object).where(X[col].isna(), X[col].astype(str))
+        print(f"  {path.name}: {len(df)} rows -> {int(keep.sum())} labelled")
+        frames.append(X)
+        labels.append(y[keep].astype(int))
+
+    X_new = compact_frame(pd.concat(frames, ignore_index=True))
+    y_new = pd.concat(labels, ignore_index=True).rename(TARGET)
+    print(f"  New rows: {len(X_new)}   class dist: {dict(y_new.value_counts().sort_index())}")
+    return X_new, y_new
+
+
+def unseen_categories(preprocessor, X: pd.DataFrame) -> dict:
+    """Values per categorical column that the base encoder does not know."""
+    _, encoder_pipeline, columns = preprocessor.transformers_[0]
+    categories = encoder_pipeline.named_steps["onehot"].categories_
+    unseen = {}
+    for col, known in zip(columns, categories):
+        values = X[col].dropna()
+        new = sorted(set(values) - set(known))
+        if new:
+            unseen[col] = {"values": new[:20], "rows": int(values.isin(new).sum())}
+    return unseen
+
+
+def next_version_dir(base_dir: Path) -> Path:
+    """models_high_risk_v4 / models_high_risk_v4_r1 -> the next free _r<N> sibling."""
+    stem = re.sub(r"_r\d+$", "", base_dir.name)
+    taken = [int(m.group(1)) for p in base_dir.parent.glob(f"{stem}_r*")
+             if (m := re.fullmatch(rf"{re.escape(stem)}_r(\d+)", p.name))]
+    return base_dir.parent / f"{stem}_r{max(taken, default=0) + 1}"
+
+
+# ============================================================================
+# FIT
+# ============================================================================
+
+def refresh_members(
+    xgb_base: Pipeline,
+    X_base: pd.DataFrame,
+    y_base: pd.Series,
+    X_new: pd.DataFrame,
+    y_new: pd.Series,
+    max_new_trees: int = MAX_NEW_TREES,
+) -> tuple[Pipeline, Pipeline, dict, dict]:
+    """
+    Continue boosting the base XGBoost on the new rows and refit the DT on
+    base + new rows, both on the base (unchanged) preprocessor.
+
+    Returns
+    -------
+    (xgb_pipeline, dt_pipeline, timings in seconds, XGBoost fit telemetry)
+    """
+    preprocessor = xgb_base.named_steps["preprocess"]
+    base_model   = xgb_base.named_steps["model"]
+
+    t0 = time.perf_counter()
+    X_new_matrix  = preprocessor.transform(X_new)
+    X_base_matrix = preprocessor.transform(X_base)
+    t_pre = time.perf_counter() - t0
+
+    n_pos = int((y_new == 1).sum())
+    n_neg = int((y_new == 0).sum())
+    xgb = clone(base_model).set_params(n_estimators=max_new_trees, scale_pos_weight=n_neg / n_pos)
+    t0 = time.perf_counter()
+    xgb, telemetry = fit_xgb_early_stopping(xgb, X_new_matrix, y_new, base_booster=base_model.get_booster())
+    t_xgb = time.perf_counter() - t0
+    print(f"  XGBoost: {telemetry['base_rounds']} base trees + {telemetry['new_trees']} new "
+          f"(of max {max_new_trees}; best val {telemetry['metric']} = {telemetry['best_score']:.5f})  "
+          f"{t_xgb:.2f}s")
+
+    t0 = time.perf_counter()
+    dt = DecisionTreeClassifier(**DT_PARAMS).fit(
+        np.vstack([X_base_matrix, X_new_matrix]), pd.concat([y_base, y_new], ignore_index=True),
+    )
+    t_dt = time.perf_counter() - t0
+    print(f"  Decision Tree: refitted on {len(X_base) + len(X_new)} rows  {t_dt:.2f}s")
+
+    timings = {
+        "preprocess_seconds": round(t_pre, 3),
+        "xgb_fit_seconds":    round(t_xgb, 3),
+        "dt_fit_seconds":     round(t_dt, 3),
+    }
+    xgb_pipeline = Pipeline(steps=[("preprocess", preprocessor), ("model", xgb)])
+    dt_pipeline  = Pipeline(steps=[("preprocess", preprocessor), ("model", dt)])
+    return xgb_pipeline, dt_pipeline, timings, telemetry
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Warm-start refresh of the v4 hybrid with new assessments.")
+    parser.add_argument("--data", type=Path, nargs="+", default=DEFAULT_DATA, help="labelled assessment CSVs")
+    parser.add_argument("--base-dir", type=Path, default=OUTPUT_DIR, help="model directory to continue from")
+    parser.add_argument("--output-dir", type=Path, default=None, help="default: next <base>_r<N> directory")
+    parser.add_argument("--max-new-trees", type=int, default=MAX_NEW_TREES)
+    parser.add_argument("--holdout", type=float, default=HOLDOUT, help="share of new rows kept for evaluation")
+    args = parser.parse_args()
+
+    base_dir   = args.base_dir.resolve()
+    output_dir = (args.output_dir or next_version_dir(base_dir)).resolve()
+    if output_dir.exists():
+        sys.exit(f"[ERROR] {output_dir} already exists -- refreshes never overwrite a model version")
+
+    print("=" * 60)
+    print("ContraceptIQ -- Incremental Train v4 (warm start)")
+    print("=" * 60)
+
+    print(f"\nLoading base models from {base_dir} ...")
+    xgb_base = joblib.load(base_dir / XGB_FILE)
+    dt_base  = joblib.load(base_dir / DT_FILE)
+    preprocessor = xgb_base.named_steps["preprocess"]
+
+    X_base, X_test, y_base, y_test = load_data()
+
+    print("\nLoading new assessments ...")
+    X_new, y_new = load_assessments(args.data, preprocessor)
+    unseen = unseen_categories(preprocessor, X_new)
+    for col, info in unseen.items():
+        print(f"  [WARN] {col}: {info['rows']} row(s) with categories unknown to the base encoder "
+              f"{info['values']} (encoded as all-zeros)")
+    X_fit, X_hold, y_fit, y_hold = train_test_split(
+        X_new, y_new, test_size=args.holdout, stratify=y_new, random_state=RANDOM_STATE,
+    )
+    print(f"  Fit rows: {len(X_fit)}   holdout rows: {len(X_hold)}")
+
+    print("\nRefreshing hybrid members ...")
+    t_start = time.perf_counter()
+    xgb_pipeline, dt_pipeline, timings, xgb_telemetry = refresh_members(
+        xgb_base, X_base, y_base, X_fit, y_fit, args.max_new_trees,
+    )
+    timings["wall_seconds"] = round(time.perf_counter() - t_start, 3)
+
+    evaluation = {}
+    for name, X_eval, y_eval in (("ndhs_test", X_test, y_test), ("new_holdout", X_hold, y_hold)):
+        print(f"\nEvaluating on {name} ({len(X_eval)} rows) ...")
+        print("  -- base --")
+        before = evaluate_hybrid(xgb_base, dt_base, X_eval, y_eval)
+        print("  -- refreshed --")
+        after  = evaluate_hybrid(xgb_pipeline, dt_pipeline, X_eval, y_eval)
+        evaluation[name] = {"base": before, "refreshed": after}
+
+    output_dir.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{output_dir.name}.staging-", dir=output_dir.parent))
+    try:
+        joblib.dump(xgb_pipeline, staging / XGB_FILE)
+        joblib.dump(dt_pipeline, staging / DT_FILE)
+        save_config(evaluation["ndhs_test"]["refreshed"], staging, extra={
+            **xgb_training_config(xgb_telemetry),
+            "incremental": {
+                "driver":             Path(__file__).name,
+                "base_model_dir":     base_dir.name,
+                "data":               [p.name for p in args.data],
+                "new_rows":           len(X_new),
+                "fit_rows":           len(X_fit),
+                "holdout_rows":       len(X_hold),
+                "unseen_categories":  unseen,
+                "evaluation":         evaluation,
+                **timings,
+            },
+        })
+        dropped, carried = publish(staging, output_dir)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    print(f"  Published -> {output_dir}")
+    report_published(dropped, carried, output_dir)
+
+    metrics = evaluation["ndhs_test"]["refreshed"]
+    print("\n" + "=" * 60)
+    status = "PASS" if metrics["meets_target"] else "FAIL"
+    print(f"  Recall target (>90%): {status}  ({metrics['recall']*100:.2f}%)")
+    for name, result in evaluation.items():
+        print(f"  {name:<12} recall {result['base']['recall']:.4f} -> {result['refreshed']['recall']:.4f}   "
+              f"ROC-AUC {result['base']['roc_auc']:.4f} -> {result['refreshed']['roc_auc']:.4f}")
+    print(f"  Refresh wall time: {timings['wall_seconds']:.2f}s "
+          f"(XGBoost {timings['xgb_fit_seconds']:.2f}s + DT {timings['dt_fit_seconds']:.2f}s)")
+    print("=" * 60)
+
+    if not metrics["meets_target"]:
+        print("WARNING: recall target not met.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+train_native_v4.py
+
+Native-categorical variant of the v4 hybrid: same data, 9 features,
+hyperparameters, early stopping and operating point as train_v4.py, but
+without the 133-column one-hot expansion.
+
+    preprocess   build_index_preprocessor: each categorical column becomes
+                 ONE integer-coded column (category index in the sorted
+                 training categories, -1 for unseen values), numerics are
+                 median-imputed as before  ->  9 columns instead of 133
+    XGBoost      enable_categorical=True with feature_types "c" on the coded
+                 columns and max_cat_to_onehot=1, so every categorical split
+                 is a set-membership (partition) split
+    DT           the same DecisionTreeClassifier on the coded columns
+
+Serving: the joblib pipelines work with the backend as they are
+(MODEL_DIR=.../models_high_risk_v4_native).  The compiled bundle
+(hybrid_compiled.npz, MODEL_BACKEND=compiled) evaluates the categorical
+splits natively and is validated bit-exact against the pipelines.  There is
+no ONNX export: TreeEnsembleClassifier has no set-membership split mode.
+
+Benchmark (native_benchmark.json): the one-hot v4 pipeline is retrained in
+the same process and both are compared on training time, trees / split
+conditions, encoded width, inference latency (joblib and compiled, single
+row and the whole test split) and recall / precision / F1 / ROC-AUC of the
+hybrid at the production threshold.
+
+Usage:
+    python src/models/train_native_v4.py
+    python src/models/train_native_v4.py --no-bench
+
+Output:
+    src/models/models_high_risk_v4_native/
+        xgb_high_recall.joblib
+        dt_high_recall.joblib
+        hybrid_v4_config.json
+        hybrid_compiled.npz
+        native_benchmark.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from sklearn.tree import DecisionTreeClassifier
+from xgboost import XGBClassifier
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+_HERE      = Path(__file__).resolve().parent          # machine-learning/src/models/
+OUTPUT_DIR = _HERE / "models_high_risk_v4_native"
+
+sys.path.insert(0, str(_HERE))
+
+from export_compiled import OUTPUT_NAME, _time_ms, validate  # noqa: E402
+from train_v4 import (  # noqa: E402
+    CONF_MARGIN, DT_PARAMS, THRESHOLD, XGB_PARAMS,
+    build_and_fit_dt, build_and_fit_xgb, evaluate_hybrid, load_data, save_config,
+    xgb_training_config,
+)
+from inference.compiled_trees import CompiledPipeline, load_hybrid, save_hybrid  # noqa: E402
+from inference.single_row import HybridRowScorer  # noqa: E402
+from preprocessing.preprocessor import build_index_preprocessor, feature_types  # noqa: E402
+from training.xgb_fit import fit_xgb_pipeline  # noqa: E402
+
+BENCHMARK_NAME = "native_benchmark.json"
+
+
+# ============================================================================
+# TRAINING
+# ============================================================================
+
+def build_and_fit_native_xgb(X_train: pd.DataFrame, y_train: pd.Series) -> tuple[Pipeline, dict]:
+    """Early-stopped XGBoost with native categorical splits; returns (pipeline, telemetry)."""
+    n_pos = int((y_train == 1).sum())
+    n_neg = int((y_train == 0).sum())
+    preprocessor = build_index_preprocessor(X_train)
+    xgb = XGBClassifier(
+        **XGB_PARAMS,
+        scale_pos_weight=n_neg / n_pos,
+        enable_categorical=True,
+        feature_types=feature_types(preprocessor),
+        max_cat_to_onehot=1,
+    )
+    # Refit on all rows like train_v4.py, so the one-hot / native comparison is like for like
+    pipeline, telemetry = fit_xgb_pipeline(preprocessor, xgb, X_train, y_train, refit=True)
+    print(f"  early stopping: {telemetry['n_estimators']} of {telemetry['max_rounds']} trees "
+          f"(best val {telemetry['metric']} = {telemetry['best_score']:.5f})")
+    return pipeline, telemetry
+
+
+def build_and_fit_native_dt(X_train: pd.DataFrame, y_train: pd.Series) -> Pipeline:
+    pipeline = Pipeline(steps=[
+        ("preprocess", build_index_preprocessor(X_train)),
+        ("model", DecisionTreeClassifier(**DT_PARAMS)),
+    ])
+    pipeline.fit(X_train, y_train)
+    return pipeline
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def latency(xgb_pipeline: Pipeline, dt_pipeline: Pipeline, X: pd.DataFrame) -> dict:
+    """Hybrid scoring latency in ms: joblib pipelines vs compiled, 1 row and len(X) rows."""
+    xgb_c  = CompiledPipeline.from_pipeline(xgb_pipeline)
+    dt_c   = CompiledPipeline.from_pipeline(dt_pipeline)
+    scorer = HybridRowScorer(xgb_c, dt_c, THRESHOLD, CONF_MARGIN)
+    row_df = X.iloc[:1]
+    record = row_df.iloc[0].to_dict()
+
+    def joblib_batch(df):
+        xgb_pipeline.predict_proba(df)
+        dt_pipeline.predict(df)
+
+    def compiled_batch(df):
+        xgb_c.predict_proba(df)
+        dt_c.predict(df)
+
+    return {
+        "joblib_single_ms":   round(_time_ms(lambda: joblib_batch(row_df)), 4),
+        "compiled_single_ms": round(_time_ms(lambda: scorer.score(record)), 4),
+        "joblib_batch_ms":    round(_time_ms(lambda: joblib_batch(X)), 4),
+        "compiled_batch_ms":  round(_time_ms(lambda: compiled_batch(X)), 4),
+        "batch_rows":         len(X),
+    }
+
+
+def describe(name: str, xgb_pipeline, dt_pipeline, telemetry, fit_seconds, metrics, lat) -> dict:
+    xgb_c = CompiledPipeline.from_pipeline(xgb_pipeline)
+    return {
+        "variant":          name,
+        "encoded_columns":  xgb_c.schema.n_outputs,
+        "xgb_trees":        telemetry["n_estimators"],
+        "xgb_conditions":   xgb_c.trees.n_conds,
+        "xgb_fit_seconds":  round(fit_seconds["xgb"], 3),
+        "dt_fit_seconds":   round(fit_seconds["dt"], 3),
+        "mean_round_ms":    telemetry["mean_round_ms"],
+        "metrics":          metrics,
+        "latency":          lat,
+    }
+
+
+def print_comparison(rows: list[dict]) -> None:
+    fields = [
+        ("encoded columns",        lambda r: f"{r['encoded_columns']}"),
+        ("XGB trees",              lambda r: f"{r['xgb_trees']}"),
+        ("XGB split conditions",   lambda r: f"{r['xgb_conditions']}"),
+        ("XGB fit s",              lambda r: f"{r['xgb_fit_seconds']:.3f}"),
+        ("XGB ms / round",         lambda r: f"{r['mean_round_ms']:.3f}"),
+        ("DT fit s",               lambda r: f"{r['dt_fit_seconds']:.3f}"),
+        ("joblib 1 row ms",        lambda r: f"{r['latency']['joblib_single_ms']:.3f}"),
+        ("compiled 1 row ms",      lambda r: f"{r['latency']['compiled_single_ms']:.3f}"),
+        ("joblib batch ms",        lambda r: f"{r['latency']['joblib_batch_ms']:.3f}"),
+        ("compiled batch ms",      lambda r: f"{r['latency']['compiled_batch_ms']:.3f}"),
+        (f"recall @ {THRESHOLD}",  lambda r: f"{r['metrics']['recall']:.4f}"),
+        ("precision",              lambda r: f"{r['metrics']['precision']:.4f}"),
+        ("F1",                     lambda r: f"{r['metrics']['f1']:.4f}"),
+        ("ROC-AUC (XGB)",          lambda r: f"{r['metrics']['roc_auc']:.4f}"),
+    ]
+    print(f"\n  {'':<22} " + " ".join(f"{r['variant']:>12}" for r in rows))
+    print(f"  {'-'*22} " + " ".join("-" * 12 for _ in rows))
+    for label, fmt in fields:
+        print(f"  {label:<22} " + " ".join(f"{fmt(r):>12}" for r in rows))
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the native-categorical v4 variant.")
+    parser.add_argument("--no-bench", action="store_true", help="skip the one-hot comparison")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ContraceptIQ -- Train v4 native categorical (9 features, no one-hot)")
+    print("=" * 60)
+
+    X_train, X_test, y_train, y_test = load_data()
+
+    print("\nTraining native-categorical XGBoost ...")
+    (xgb_pipeline, telemetry), t_xgb = _timed(build_and_fit_native_xgb, X_train, y_train)
+    print("\nTraining Decision Tree on coded columns ...")
+    dt_pipeline, t_dt = _timed(build_and_fit_native_dt, X_train, y_train)
+
+    print("\nEvaluating hybrid model on test set ...")
+    print(f"  threshold={THRESHOLD}, conf_margin={CONF_MARGIN}")
+    metrics = evaluate_hybrid(xgb_pipeline, dt_pipeline, X_test, y_test)
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    joblib.dump(xgb_pipeline, OUTPUT_DIR / "xgb_high_recall.joblib")
+    joblib.dump(dt_pipeline, OUTPUT_DIR / "dt_high_recall.joblib")
+    config_path = save_config(metrics, OUTPUT_DIR, extra={
+        **xgb_training_config(telemetry),
+        "description":    "Hybrid v4 native categorical: reduced_C 9 features, integer-coded "
+                          "categoricals, XGBoost native categorical splits",
+        "onnx_xgb_file":  None,
+        "onnx_dt_file":   None,
+        "preprocessor":   "ordinal (build_index_preprocessor)",
+        "xgb_categorical": {"enable_categorical": True, "max_cat_to_onehot": 1},
+    })
+    with open(config_path) as f:
+        config = json.load(f)
+
+    # --- Compiled bundle (validated against the pipelines) ---
+    print("\nExporting compiled bundle ...")
+    bundle = save_hybrid(
+        OUTPUT_DIR / OUTPUT_NAME,
+        CompiledPipeline.from_pipeline(xgb_pipeline),
+        CompiledPipeline.from_pipeline(dt_pipeline),
+        config,
+    )
+    xgb_c, dt_c, _ = load_hybrid(bundle)
+    if not validate(xgb_pipeline, dt_pipeline, xgb_c, dt_c):
+        sys.exit("[ERROR] Compiled bundle does not reproduce the native pipelines")
+    print(f"  Saved -> {bundle}  ({bundle.stat().st_size / 1024:.1f} KB, bit-identical)")
+
+    if not args.no_bench:
+        print("\nRetraining one-hot v4 for comparison ...")
+        (ohe_xgb, ohe_telemetry), t_ohe_xgb = _timed(build_and_fit_xgb, X_train, y_train)
+        ohe_dt, t_ohe_dt = _timed(build_and_fit_dt, X_train, y_train)
+        print("\nEvaluating one-hot hybrid on test set ...")
+        ohe_metrics = evaluate_hybrid(ohe_xgb, ohe_dt, X_test, y_test)
+
+        print("\nMeasuring latency ...")
+        rows = [
+            describe("one-hot", ohe_xgb, ohe_dt, ohe_telemetry,
+                     {"xgb": t_ohe_xgb, "dt": t_ohe_dt}, ohe_metrics, latency(ohe_xgb, ohe_dt, X_test)),
+            describe("native", xgb_pipeline, dt_pipeline, telemetry,
+                     {"xgb": t_xgb, "dt": t_dt}, metrics, latency(xgb_pipeline, dt_pipeline, X_test)),
+        ]
+        print_comparison(rows)
+        bench_path = OUTPUT_DIR / BENCHMARK_NAME
+        with open(bench_path, "w") as f:
+            json.dump({"threshold": THRESHOLD, "conf_margin": CONF_MARGIN,
+                       "test_rows": len(X_test), "variants": rows}, f, indent=2)
+        print(f"\n  Benchmark saved to {bench_path}")
+
+    print("\n" + "=" * 60)
+    status = "PASS" if metrics["meets_target"] else "FAIL"
+    print(f"  Recall target (>90%): {status}  ({metrics['recall']*100:.2f}%)")
+    print("=" * 60)
+
+    if not metrics["meets_target"]:
+        print("WARNING: recall target not met.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+train_parallel_v4.py
+
+Parallel training driver for the v4 hybrid (same data, features,
+hyperparameters and outputs as train_v4.py).
+
+Differences from train_v4.py:
+    * the preprocessor is fitted ONCE and the training matrix transformed
+      ONCE; both member models are fitted on that shared matrix and wrapped
+      into pipelines around the same fitted preprocessor (Pipeline.fit would
+      refit an identical preprocessor per model);
+    * XGBoost (early-stopped, src/training/xgb_fit.py) and the Decision
+      Tree are fitted CONCURRENTLY in two threads (both release the GIL
+      while fitting), with the CPU budget split between them: the Decision
+      Tree builder is single-threaded, so it gets one CPU and XGBoost gets
+      the rest (``n_jobs``);
+    * artifacts are written to a staging directory next to OUTPUT_DIR and
+      published with a directory swap, so OUTPUT_DIR never holds a mix of
+      old and new models.  The serving artifacts built from the models
+      (compiled bundle, risk table, flat / indexed ONNX and .ort exports,
+      session config, split index, compressed XGBoost; REGENERATE lists
+      them with the commands that rebuild them) are dropped: the backends
+      that load them fail at startup until they are regenerated, instead
+      of silently serving the old model.  Every other file (reports, SHAP
+      and feature importance outputs, pipeline ONNX exports) is carried
+      over unchanged, and the mobile app's copies are reported as stale.
+
+Wall time is roughly that of the slowest single fit instead of the sum.
+
+Usage:
+    python src/models/train_parallel_v4.py
+    python src/models/train_parallel_v4.py --n-jobs 8
+    python src/models/train_parallel_v4.py --sequential     # timing baseline
+
+Output:
+    src/models/models_high_risk_v4/
+        xgb_high_recall.joblib
+        dt_high_recall.joblib
+        hybrid_v4_config.json        (+ "xgb_training": early stopping telemetry,
+                                        "training": CPU budget and fit timings)
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from pathlib import Path
+
+import joblib
+from sklearn.pipeline import Pipeline
+from sklearn.tree import DecisionTreeClassifier
+from xgboost import XGBClassifier
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+_HERE = Path(__file__).resolve().parent          # machine-learning/src/models/
+
+sys.path.insert(0, str(_HERE))
+
+from train_v4 import (  # noqa: E402
+    CONF_MARGIN, DT_PARAMS, OUTPUT_DIR, THRESHOLD, XGB_PARAMS,
+    build_preprocessor, evaluate_hybrid, load_data, save_config, xgb_training_config,
+)
+from training.xgb_fit import fit_xgb_early_stopping  # noqa: E402
+
+XGB_FILE = "xgb_high_recall.joblib"
+DT_FILE  = "dt_high_recall.joblib"
+
+# Serving artifacts built from the joblib models: (file patterns, command that
+# rebuilds them), in the order to run them (from machine-learning/).  publish()
+# drops these after a retrain; every other file of the previous directory
+# (reports, SHAP / feature importance outputs, the pipeline ONNX exports) is
+# carried over as it is.
+REGENERATE = (
+    (("hybrid_compiled.npz",),
+     "python src/models/export_compiled.py --version v4"),
+    (("risk_table.npz",),
+     "python src/models/build_risk_table.py --version v4"),
+    (("xgb_high_recall_flat.*", "dt_high_recall_flat.*", "onnx_session_config.json"),
+     "python src/models/convert_to_onnx_v4_flat.py"),
+    (("*_indexed.onnx", "indexed_input_schema.json"),
+     "python src/models/convert_to_onnx_v4_indexed.py"),
+    (("split_index_v4.json",),
+     "python src/models/export_split_index.py"),
+    (("xgb_compressed*",),
+     "python src/models/compress_v4.py"),
+)
+
+# Copies of OUTPUT_DIR's artifacts bundled with the mobile app, and what
+# refreshes them
+MOBILE_DIR    = _HERE.parents[2] / "mobile-app" / "assets" / "models"
+MOBILE_COPIES = (
+    ("xgb_high_recall.onnx, dt_high_recall.onnx", "python src/models/convert_to_onnx_v4_flat.py"),
+    ("split_index_v4.json",                       "python src/models/export_split_index.py"),
+    ("risk_factors_v4_signed.json",               "python src/models/generate_signed_shap.py"),
+)
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def cpu_budget(n_jobs: int | None) -> dict:
+    """Split the CPU budget: 1 for the (single-threaded) DT, the rest for XGBoost."""
+    total = max(1, n_jobs or os.cpu_count() or 1)
+    return {"total": total, "xgb": max(1, total - 1), "dt": 1}
+
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def fit_members(X_train, y_train, budget: dict, sequential: bool = False) -> tuple[Pipeline, Pipeline, dict, dict]:
+    """
+    Fit the shared preprocessor once, then XGBoost and the Decision Tree
+    (concurrently unless ``sequential``).
+
+    Returns
+    -------
+    (xgb_pipeline, dt_pipeline, timings in seconds, XGBoost fit telemetry)
+    """
+    t_start = time.perf_counter()
+
+    preprocessor = build_preprocessor(X_train)
+    X_matrix, t_pre = _timed(preprocessor.fit_transform, X_train)
+    print(f"  Preprocessed once: {X_matrix.shape[0]} x {X_matrix.shape[1]}  ({t_pre:.2f}s)")
+
+    n_pos = int((y_train == 1).sum())
+    n_neg = int((y_train == 0).sum())
+    xgb = XGBClassifier(**XGB_PARAMS, scale_pos_weight=n_neg / n_pos, n_jobs=budget["xgb"])
+    dt  = DecisionTreeClassifier(**DT_PARAMS)
+
+    if sequential:
+        ((xgb, telemetry), t_xgb) = _timed(fit_xgb_early_stopping, xgb, X_matrix, y_train, refit=True)
+        (_, t_dt) = _timed(dt.fit, X_matrix, y_train)
+    else:
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="fit") as pool:
+            xgb_future = pool.submit(_timed, fit_xgb_early_stopping, xgb, X_matrix, y_train, refit=True)
+            dt_future  = pool.submit(_timed, dt.fit, X_matrix, y_train)
+            ((xgb, telemetry), t_xgb), (_, t_dt) = xgb_future.result(), dt_future.result()
+
+    timings = {
+        "preprocess_seconds": round(t_pre, 3),
+        "xgb_fit_seconds":    round(t_xgb, 3),
+        "dt_fit_seconds":     round(t_dt, 3),
+        "wall_seconds":       round(time.perf_counter() - t_start, 3),
+    }
+    print(f"  XGBoost fit: {t_xgb:.2f}s ({budget['xgb']} thread(s))   "
+          f"Decision Tree fit: {t_dt:.2f}s   wall: {timings['wall_seconds']:.2f}s")
+
+    xgb_pipeline = Pipeline(steps=[("preprocess", preprocessor), ("model", xgb)])
+    dt_pipeline  = Pipeline(steps=[("preprocess", preprocessor), ("model", dt)])
+    return xgb_pipeline, dt_pipeline, timings, telemetry
+
+
+def regenerate_command(name: str) -> str | None:
+    """REGENERATE command rebuilding the file ``name`` (None: not a derived serving artifact)."""
+    for patterns, command in REGENERATE:
+        if any(fnmatch(name, pattern) for pattern in patterns):
+            return command
+    return None
+
+
+def publish(staging: Path, output_dir: Path) -> tuple[list[str], list[str]]:
+    """
+    Replace ``output_dir`` with ``staging`` (two renames).
+
+    Files only present in ``output_dir`` are either serving artifacts built
+    from the models being replaced (REGENERATE), which are dropped, or
+    anything else (reports, SHAP outputs, ...), which is copied into
+    ``staging`` first and carried over.
+
+    Returns
+    -------
+    (names of the dropped files, names of the carried-over files), sorted
+    """
+    if not output_dir.exists():
+        os.rename(staging, output_dir)
+        return [], []
+
+    dropped, carried = [], []
+    for path in sorted(output_dir.iterdir()):
+        if (staging / path.name).exists():
+            continue
+        if regenerate_command(path.name) is not None:
+            dropped.append(path.name)
+        elif path.is_dir():
+            shutil.copytree(path, staging / path.name)
+            carried.append(path.name)
+        else:
+            shutil.copy2(path, staging / path.name)
+            carried.append(path.name)
+
+    backup = output_dir.with_name(output_dir.name + ".previous")
+    if backup.exists():
+        shutil.rmtree(backup)
+    os.rename(output_dir, backup)
+    os.rename(staging, output_dir)
+    shutil.rmtree(backup)
+    return dropped, carried
+
+
+def report_published(dropped: list[str], carried: list[str], output_dir: Path) -> None:
+    """Warn about what publish() dropped / carried over and how to rebuild it."""
+    if dropped:
+        print(f"\n  WARNING: {len(dropped)} serving artifact(s) of the previous models were removed:")
+        for name in dropped:
+            print(f"    {name}")
+        print("  MODEL_BACKEND=compiled / table / onnx will not start until they are regenerated:")
+        needed = {regenerate_command(name) for name in dropped}
+        for _, command in REGENERATE:
+            if command in needed:
+                print(f"    {command}")
+    if carried:
+        print(f"\n  Carried over from the previous directory (not rebuilt, describe the OLD models): "
+              f"{', '.join(carried)}")
+    if output_dir.resolve() == OUTPUT_DIR.resolve():
+        print(f"\n  WARNING: the mobile app's copies in {MOBILE_DIR} are now stale; refresh them with:")
+        for names, command in MOBILE_COPIES:
+            print(f"    {command:<48} # {names}")
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fit the v4 hybrid members concurrently.")
+    parser.add_argument("--n-jobs", type=int, default=None, help="total CPU budget (default: all CPUs)")
+    parser.add_argument("--sequential", action="store_true", help="fit one model after the other")
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ContraceptIQ -- Parallel Train v4 (reduced_C, 9 features)")
+    print("=" * 60)
+
+    X_train, X_test, y_train, y_test = load_data()
+
+    budget = cpu_budget(args.n_jobs)
+    mode   = "sequential" if args.sequential else "concurrent"
+    print(f"\nFitting hybrid members ({mode}, CPU budget {budget}) ...")
+    xgb_pipeline, dt_pipeline, timings, xgb_telemetry = fit_members(X_train, y_train, budget, args.sequential)
+
+    print("\nEvaluating hybrid model on test set ...")
+    print(f"  threshold={THRESHOLD}, conf_margin={CONF_MARGIN}")
+    metrics = evaluate_hybrid(xgb_pipeline, dt_pipeline, X_test, y_test)
+
+    # --- Stage every artifact, then publish in one step ---
+    output_dir = args.output_dir.resolve()
+    output_dir.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{output_dir.name}.staging-", dir=output_dir.parent))
+    try:
+        joblib.dump(xgb_pipeline, staging / XGB_FILE)
+        joblib.dump(dt_pipeline, staging / DT_FILE)
+        save_config(metrics, staging, extra={
+            **xgb_training_config(xgb_telemetry),
+            "training": {"driver": Path(__file__).name, "mode": mode, "cpu_budget": budget, **timings},
+        })
+        dropped, carried = publish(staging, output_dir)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    print(f"  Published -> {output_dir}")
+    report_published(dropped, carried, output_dir)
+
+    print("\n" + "=" * 60)
+    status = "PASS" if metrics["meets_target"] else "FAIL"
+    print(f"  Recall target (>90%): {status}  ({metrics['recall']*100:.2f}%)")
+    print(f"  Fit wall time: {timings['wall_seconds']:.2f}s  "
+          f"(XGBoost {timings['xgb_fit_seconds']:.2f}s + DT {timings['dt_fit_seconds']:.2f}s)")
+    print("=" * 60)
+
+    if not metrics["meets_target"]:
+        print("WARNING: recall target not met.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
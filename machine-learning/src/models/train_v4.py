@@ -14,6 +14,10 @@ Usage:
     python src/models/train_v4.py
 
 Hyperparameters are identical to v3; only the feature set changes.
+n_estimators is an upper bound: boosting early-stops on an internal
+validation split (src/training/xgb_fit.py) and the model is refit on all
+training rows (refit=True) with the number of trees actually needed, which hybrid_v4_config.json records
+together with the fit telemetry ("xgb_training").
 The winning config (threshold=0.50, conf_margin=0.05) is taken directly
 from the validated experiment output at:
     machine-learning/experiments/feature-reduction-validation/results/validated_feature_reduction_config.json
@@ -24,7 +28,6 @@ import sys
 from pathlib import Path
 
 import joblib
-import numpy as np
 import pandas as pd
 from sklearn.pipeline import Pipeline
 from sklearn.tree import DecisionTreeClassifier
@@ -45,7 +48,9 @@ OUTPUT_DIR      = _HERE / "models_high_risk_v4"
 
 # Preprocessor lives in machine-learning/src/preprocessing/
 sys.path.insert(0, str(_SRC))
-from preprocessing.preprocessor import build_preprocessor  # noqa: E402
+from inference.hybrid import HybridEngine  # noqa: E402
+from preprocessing.preprocessor import build_preprocessor, compact_frame  # noqa: E402
+from training.xgb_fit import fit_xgb_pipeline  # noqa: E402
 
 # ============================================================================
 # WINNING FEATURE SET  (reduced_C — 9 features)
@@ -100,7 +105,10 @@ CONF_MARGIN = 0.05
 # ============================================================================
 
 def load_data() -> tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]:
-    """Load the v2 processed data pickle and select the 10-feature subset."""
+    """
+    Load the v2 processed data pickle and select the 9-feature subset
+    (compact dtypes: categoricals + float32, see preprocessor.compact_frame).
+    """
     print(f"Loading data from {DATA_PKL} ...")
     X_train_full, X_test_full, y_train, y_test = joblib.load(DATA_PKL)
 
@@ -109,8 +117,8 @@ def load_data() -> tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]:
     if missing:
         raise ValueError(f"Features missing from data pickle: {missing}")
 
-    X_train = X_train_full[REDUCED_C_FEATURES].copy()
-    X_test  = X_test_full[REDUCED_C_FEATURES].copy()
+    X_train = compact_frame(X_train_full[REDUCED_C_FEATURES])
+    X_test  = compact_frame(X_test_full[REDUCED_C_FEATURES])
 
     print(f"  X_train shape : {X_train.shape}")
     print(f"  X_test shape  : {X_test.shape}")
@@ -119,7 +127,8 @@ def load_data() -> tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]:
     return X_train, X_test, y_train, y_test
 
 
-def build_and_fit_xgb(X_train: pd.DataFrame, y_train: pd.Series) -> Pipeline:
+def build_and_fit_xgb(X_train: pd.DataFrame, y_train: pd.Series) -> tuple[Pipeline, dict]:
+    """Fit the XGBoost pipeline with early stopping; returns (pipeline, telemetry)."""
     n_pos = int((y_train == 1).sum())
     n_neg = int((y_train == 0).sum())
     scale_pos_weight = n_neg / n_pos
@@ -127,10 +136,18 @@ def build_and_fit_xgb(X_train: pd.DataFrame, y_train: pd.Series) -> Pipeline:
           f"(n_neg={n_neg}, n_pos={n_pos})")
 
     xgb = XGBClassifier(**XGB_PARAMS, scale_pos_weight=scale_pos_weight)
-    preprocessor = build_preprocessor(X_train)
-    pipeline = Pipeline(steps=[("preprocess", preprocessor), ("model", xgb)])
-    pipeline.fit(X_train, y_train)
-    return pipeline
+    pipeline, telemetry = fit_xgb_pipeline(build_preprocessor(X_train), xgb, X_train, y_train, refit=True)
+    print(f"  early stopping: {telemetry['n_estimators']} of {telemetry['max_rounds']} trees "
+          f"(best val {telemetry['metric']} = {telemetry['best_score']:.5f})")
+    return pipeline, telemetry
+
+
+def xgb_training_config(telemetry: dict) -> dict:
+    """Config entries describing the early-stopped XGBoost fit."""
+    return {
+        "xgb_params":   {**XGB_PARAMS, "n_estimators": telemetry["n_estimators"]},
+        "xgb_training": telemetry,
+    }
 
 
 def build_and_fit_dt(X_train: pd.DataFrame, y_train: pd.Series) -> Pipeline:
@@ -153,14 +170,7 @@ def evaluate_hybrid(
         classification_report,
     )
 
-    xgb_probs = xgb_pipeline.predict_proba(X_test)[:, 1]
-    xgb_preds = (xgb_probs >= THRESHOLD).astype(int)
-    dt_preds  = dt_pipeline.predict(X_test)
-
-    hybrid = xgb_preds.copy()
-    low_conf = np.abs(xgb_probs - THRESHOLD) < CONF_MARGIN
-    upgrade  = low_conf & (dt_preds == 1)
-    hybrid[upgrade] = 1
+    hybrid, xgb_probs = HybridEngine(xgb_pipeline, dt_pipeline, THRESHOLD, CONF_MARGIN).labels(X_test)
 
     recall    = recall_score(y_test, hybrid)
     precision = precision_score(y_test, hybrid, zero_division=0)
@@ -183,7 +193,7 @@ def evaluate_hybrid(
     }
 
 
-def save_config(metrics: dict) -> None:
+def save_config(metrics: dict, output_dir: Path = OUTPUT_DIR, extra: dict | None = None) -> Path:
     """Write hybrid_v4_config.json alongside the saved models."""
     config = {
         "description": "Hybrid v4: reduced_C 9-feature high-recall model",
@@ -207,11 +217,14 @@ def save_config(metrics: dict) -> None:
             "corrected validation pipeline (fixes degenerate-band and look-ahead-bias bugs)."
         ),
     }
+    if extra:
+        config.update(extra)
 
-    config_path = OUTPUT_DIR / "hybrid_v4_config.json"
+    config_path = output_dir / "hybrid_v4_config.json"
     with open(config_path, "w") as f:
         json.dump(config, f, indent=2)
     print(f"\n  Config saved to {config_path}")
+    return config_path
 
 
 # ============================================================================
@@ -230,7 +243,7 @@ def main() -> None:
 
     # --- Train XGBoost ---
     print("\nTraining XGBoost pipeline ...")
-    xgb_pipeline = build_and_fit_xgb(X_train, y_train)
+    xgb_pipeline, xgb_telemetry = build_and_fit_xgb(X_train, y_train)
     xgb_path = OUTPUT_DIR / "xgb_high_recall.joblib"
     joblib.dump(xgb_pipeline, xgb_path)
     print(f"  Saved -> {xgb_path}")
@@ -248,7 +261,7 @@ def main() -> None:
     metrics = evaluate_hybrid(xgb_pipeline, dt_pipeline, X_test, y_test)
 
     # --- Save config ---
-    save_config(metrics)
+    save_config(metrics, extra=xgb_training_config(xgb_telemetry))
 
     # --- Summary ---
     print("\n" + "=" * 60)
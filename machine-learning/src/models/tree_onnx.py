@@ -0,0 +1,216 @@
+"""
+tree_onnx.py
+
+Build an ONNX ``TreeEnsembleClassifier`` directly from a CompiledTrees
+ensemble (src/inference/compiled_trees.py), for models that no longer have
+an XGBClassifier behind them (e.g. the pruned / quantized ensemble written
+by compress_v4.py) or whose splits are rewritten (the indexed variant).
+
+Flat graph -- same interface as the models from convert_to_onnx_v4_flat.py,
+so the mobile app can load either:
+
+    input   float_input    float32 [N, n_features]   (133-dim OHE vector)
+    output  label          int64   [N]
+    output  probabilities  float32 [N, 2]
+
+Indexed graph -- one input column per raw feature (FeatureSchema index
+layout: category index, -1 for unknown, or the numeric value):
+
+    input   index_input    float32 [N, n_columns]    (9 values for v4)
+
+Every split on a one-hot column ``cat == k`` is rewritten as an index
+comparison (BRANCH_EQ / BRANCH_NEQ against k), and splits on numeric
+columns keep their threshold, so the ensemble evaluates exactly as on the
+one-hot vector without expanding it.
+
+XGBoost ensembles (kind "xgb") get a LOGISTIC post-transform; Decision
+Trees (kind "dt") output their leaf label, with probabilities [1 - y, y].
+
+Usage:
+    from tree_onnx import trees_to_indexed_onnx, trees_to_onnx
+    model = trees_to_onnx(trees, n_features=133)
+    onnx.save(model, "xgb_compressed_flat.onnx")
+    model = trees_to_indexed_onnx(trees, schema, kind="xgb")
+"""
+
+import sys
+from pathlib import Path
+
+import onnx
+from onnx import TensorProto, helper
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from inference.compiled_trees import KIND_DT, KIND_XGB  # noqa: E402
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+INPUT_NAME        = "float_input"
+INDEX_INPUT_NAME  = "index_input"
+OPSET       = {"": 15, "ai.onnx.ml": 3}
+
+_NEVER = 0   # reserved "always go left" condition id (padding)
+
+
+# ============================================================================
+# BUILDER
+# ============================================================================
+
+def _tree_nodes(trees, t: int) -> tuple[list[tuple], dict[int, int]]:
+    """
+    Unpad tree ``t`` of the heap layout into ONNX nodes.
+
+    Returns the nodes as (node_id, heap_index, level, is_leaf, value) in
+    node-id order, and the heap index -> node id map.  Padding chains
+    collapse back into the leaf they replaced.
+    """
+    depth   = trees.depth
+    n_inner = 2 ** depth - 1
+    nodes   = []
+    ids: dict[int, int] = {}
+
+    def leftmost_leaf(h: int, level: int) -> float:
+        slot = (h + 1) * 2 ** (depth - level) - 1 - n_inner
+        return float(trees.leaf_value[t, slot])
+
+    stack = [(0, 0)]                                # (heap index, level)
+    while stack:
+        h, level = stack.pop()
+        ids[h] = len(nodes)
+        if level == depth:
+            nodes.append((h, level, True, float(trees.leaf_value[t, h - n_inner])))
+        elif trees.node_cond[t, h] == _NEVER:
+            nodes.append((h, level, True, leftmost_leaf(h, level)))
+        else:
+            nodes.append((h, level, False, None))
+            stack.append((2 * h + 2, level + 1))
+            stack.append((2 * h + 1, level + 1))
+    return [(ids[h], h, level, is_leaf, value) for h, level, is_leaf, value in nodes], ids
+
+
+def _ensemble(trees, split, n_inputs: int, input_name: str, name: str, kind: str) -> onnx.ModelProto:
+    """
+    TreeEnsembleClassifier over ``trees``; ``split(c)`` maps condition id c
+    to its (feature id, mode, value) in the graph's input layout.
+    """
+    if trees.zero_as_missing:
+        raise ValueError("zero-as-missing ensembles (sparse preprocessors) cannot be exported")
+    if trees.has_categorical:
+        raise ValueError("native categorical splits (set membership) cannot be exported to "
+                         "TreeEnsembleClassifier; use the compiled bundle (export_compiled.py)")
+    if kind not in (KIND_XGB, KIND_DT):
+        raise ValueError(f"Unknown model kind '{kind}'")
+
+    attrs = {k: [] for k in (
+        "nodes_treeids", "nodes_nodeids", "nodes_featureids", "nodes_modes",
+        "nodes_values", "nodes_truenodeids", "nodes_falsenodeids",
+        "nodes_missing_value_tracks_true",
+        "class_treeids", "class_nodeids", "class_ids", "class_weights",
+    )}
+
+    def add_weight(t: int, node_id: int, class_id: int, weight: float) -> None:
+        attrs["class_treeids"].append(t)
+        attrs["class_nodeids"].append(node_id)
+        attrs["class_ids"].append(class_id)
+        attrs["class_weights"].append(weight)
+
+    for t in range(trees.n_trees):
+        nodes, ids = _tree_nodes(trees, t)
+        for node_id, h, _level, is_leaf, value in nodes:
+            attrs["nodes_treeids"].append(t)
+            attrs["nodes_nodeids"].append(node_id)
+            if is_leaf:
+                attrs["nodes_featureids"].append(0)
+                attrs["nodes_modes"].append("LEAF")
+                attrs["nodes_values"].append(0.0)
+                attrs["nodes_truenodeids"].append(0)
+                attrs["nodes_falsenodeids"].append(0)
+                attrs["nodes_missing_value_tracks_true"].append(0)
+                if kind == KIND_XGB:
+                    add_weight(t, node_id, 0, value)
+                else:
+                    # One weight per class, so label = argmax is the leaf label
+                    add_weight(t, node_id, 0, 1.0 - value)
+                    add_weight(t, node_id, 1, value)
+            else:
+                c = trees.node_cond[t, h]
+                feature, mode, threshold = split(c)
+                attrs["nodes_featureids"].append(feature)
+                attrs["nodes_modes"].append(mode)
+                attrs["nodes_values"].append(threshold)
+                attrs["nodes_truenodeids"].append(ids[2 * h + 1])
+                attrs["nodes_falsenodeids"].append(ids[2 * h + 2])
+                # cond_default is "missing goes right"; ONNX tracks the true (left) branch
+                attrs["nodes_missing_value_tracks_true"].append(int(not trees.cond_default[c]))
+
+    transform = {"post_transform": "LOGISTIC", "base_values": [float(trees.base_margin)]} \
+        if kind == KIND_XGB else {"post_transform": "NONE"}
+    node = helper.make_node(
+        "TreeEnsembleClassifier",
+        inputs=[input_name],
+        outputs=["label", "probabilities"],
+        domain="ai.onnx.ml",
+        name=name,
+        classlabels_int64s=[0, 1],
+        **transform,
+        **attrs,
+    )
+    graph = helper.make_graph(
+        [node],
+        name,
+        inputs=[helper.make_tensor_value_info(input_name, TensorProto.FLOAT, [None, n_inputs])],
+        outputs=[
+            helper.make_tensor_value_info("label", TensorProto.INT64, [None]),
+            helper.make_tensor_value_info("probabilities", TensorProto.FLOAT, [None, 2]),
+        ],
+    )
+    model = helper.make_model(
+        graph,
+        opset_imports=[helper.make_opsetid(domain, version) for domain, version in OPSET.items()],
+        producer_name="contraceptiq-tree-onnx",
+    )
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+    return model
+
+
+def trees_to_onnx(trees, n_features: int, name: str = "xgb_compressed", kind: str = KIND_XGB) -> onnx.ModelProto:
+    """Flat-input TreeEnsembleClassifier equivalent to ``trees``."""
+    mode = "BRANCH_LT" if trees.strict else "BRANCH_LEQ"
+
+    def split(c: int) -> tuple[int, str, float]:
+        return int(trees.cond_feature[c]), mode, float(trees.cond_threshold[c])
+
+    return _ensemble(trees, split, n_features, INPUT_NAME, name, kind)
+
+
+def trees_to_indexed_onnx(trees, schema, name: str = "xgb_indexed", kind: str = KIND_XGB) -> onnx.ModelProto:
+    """
+    Index-input TreeEnsembleClassifier equivalent to ``trees`` on the
+    one-hot layout of ``schema`` (a FeatureSchema).
+    """
+    if trees.zero_as_missing:
+        raise ValueError("zero-as-missing ensembles (sparse preprocessors) cannot be exported")
+    mode = "BRANCH_LT" if trees.strict else "BRANCH_LEQ"
+
+    def goes_left(x: float, threshold: float) -> bool:
+        return x < threshold if trees.strict else x <= threshold
+
+    def split(c: int) -> tuple[int, str, float]:
+        column, category = schema.output_source[int(trees.cond_feature[c])]
+        threshold = float(trees.cond_threshold[c])
+        if category < 0:
+            return column, mode, threshold
+
+        # One-hot value is 0 unless the row's category index equals k
+        off, on = goes_left(0.0, threshold), goes_left(1.0, threshold)
+        if off and not on:
+            return column, "BRANCH_NEQ", float(category)
+        if on and not off:
+            return column, "BRANCH_EQ", float(category)
+        # Constant split: indices are >= -1, so this is always true / always false
+        return column, ("BRANCH_GEQ" if off else "BRANCH_LT"), -1.0
+
+    return _ensemble(trees, split, schema.n_columns, INDEX_INPUT_NAME, name, kind)
@@ -1,15 +1,69 @@
+import numpy as np
+import pandas as pd
 from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 
+EXCLUDED_COLS = ['CASEID', 'HIGH_RISK_DISCONTINUE', 'CONTRACEPTIVE_USE_AND_INTENTION', 'INTENTION_USE']
+
+
+def compact_frame(X):
+    # Compact training frame: coded answers as pandas categoricals (integer
+    # codes instead of one Python str per cell) and numeric columns as float32,
+    # so with the float32 one-hot output below the whole encoded matrix is
+    # float32.  Encoded values, fitted categories and therefore the fitted
+    # models are identical to those from the object / int64 frame (XGBoost and
+    # sklearn trees both split on float32 internally).
+    return pd.DataFrame({
+        col: (X[col] if col in EXCLUDED_COLS
+              else X[col].astype(np.float32) if X[col].dtype.kind in "iuf"
+              else X[col].astype("category"))
+        for col in X.columns
+    }, index=X.index)
+
+
 def build_preprocessor(X):
-    numeric_cols = ['AGE', 'HUSBAND_AGE', 'MONTH_USE_CURRENT_METHOD', 'PARITY', 'EDUC', 'AGE_GRP']
-    categorical_cols = [col for col in X.columns if col not in numeric_cols and col not in ['CASEID', 'HIGH_RISK_DISCONTINUE', 'CONTRACEPTIVE_USE_AND_INTENTION', 'INTENTION_USE']]
+    # Layout of the deployed v3 / v4 pipelines: numeric dtypes (AGE, PARITY) are
+    # median-imputed, every other column (coded survey answers stored as
+    # strings, incl. HUSBAND_AGE) is one-hot encoded.
+    columns = [col for col in X.columns if col not in EXCLUDED_COLS]
+    numeric_cols = [col for col in columns if X[col].dtype.kind in "iuf"]
+    categorical_cols = [col for col in columns if col not in numeric_cols]
+
+    categorical_transformer = Pipeline(steps=[
+        ("imputer", SimpleImputer(strategy="most_frequent")),
+        ("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=False, dtype=np.float32))
+    ])
+
+    numeric_transformer = Pipeline(steps=[
+        ("imputer", SimpleImputer(strategy="median"))
+    ])
+
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("cat", categorical_transformer, categorical_cols),
+            ("num", numeric_transformer, numeric_cols),
+        ]
+    )
+
+    return preprocessor
+
+
+def build_index_preprocessor(X):
+    # Same columns, imputation and category order as build_preprocessor, but
+    # each categorical column becomes ONE column holding its category index
+    # (-1 for categories not seen in fit) -- the input of XGBoost's native
+    # categorical splits (see feature_types) and of FeatureSchema's "index"
+    # layout.
+    columns = [col for col in X.columns if col not in EXCLUDED_COLS]
+    numeric_cols = [col for col in columns if X[col].dtype.kind in "iuf"]
+    categorical_cols = [col for col in columns if col not in numeric_cols]
 
     categorical_transformer = Pipeline(steps=[
-        ("imputer", SimpleImputer(strategy="constant", fill_value=-1.0)),
-        ("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=False))
+        ("imputer", SimpleImputer(strategy="most_frequent")),
+        ("ordinal", OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1,
+                                   dtype=np.float32))
     ])
 
     numeric_transformer = Pipeline(steps=[
@@ -24,3 +78,12 @@ def build_preprocessor(X):
     )
 
     return preprocessor
+
+
+def feature_types(preprocessor):
+    # XGBoost feature_types for the output of build_index_preprocessor:
+    # "c" (categorical) per encoded column, "q" (quantitative) per numeric one.
+    types = []
+    for name, _, cols in preprocessor.transformers:
+        types += ["c" if name == "cat" else "q"] * len(cols)
+    return types
@@ -0,0 +1,189 @@
+"""
+memory_report.py
+
+Per-stage memory report of the training pipeline on the full 25-feature set,
+for the two frame / matrix representations:
+
+    legacy   object-dtype coded answers, int64 numerics, float64 one-hot matrix
+             (the pipelines before preprocessor.compact_frame)
+    compact  pandas categoricals, float32 numerics, float32 one-hot matrix
+             (what train_v4.py and the experiments now use)
+
+Each representation runs in its own interpreter so that peak RSS (which
+only ever grows within a process) is comparable.  Stages:
+
+    load        data pickle loaded, 25 features selected
+    frame       training frame in its final dtypes
+    preprocess  preprocessor fitted, training matrix encoded
+    fit_xgb     XGBoost fitted (train_v4 hyperparameters)
+    fit_dt      Decision Tree fitted
+
+For every stage: bytes held by the frame / matrix, the peak of Python-tracked
+allocations during the stage (tracemalloc, includes NumPy buffers) and the
+process peak RSS after it.  ``--scale N`` repeats the training rows N times
+to approximate larger datasets (the NDHS split alone is only ~2.5k rows).
+
+Usage:
+    python src/training/memory_report.py
+    python src/training/memory_report.py --scale 20 --output memory_report.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+_HERE = Path(__file__).resolve().parent          # machine-learning/src/training/
+_SRC  = _HERE.parent                             # machine-learning/src/
+_ML   = _SRC.parent                              # machine-learning/
+
+DATA_PKL = _ML / "data" / "processed" / "discontinuation_design1_data_v2.pkl"
+
+sys.path.insert(0, str(_SRC))
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+MODES  = ("legacy", "compact")
+STAGES = ("load", "frame", "preprocess", "fit_xgb", "fit_dt")
+
+
+# ============================================================================
+# MEASUREMENT  (runs inside the per-mode subprocess)
+# ============================================================================
+
+def _frame_bytes(X) -> int:
+    return int(X.memory_usage(deep=True, index=False).sum())
+
+
+def measure(mode: str, scale: int = 1) -> list[dict]:
+    """Run the training stages in ``mode`` and return one row per stage."""
+    import joblib
+    import pandas as pd
+    from sklearn.tree import DecisionTreeClassifier
+    from xgboost import XGBClassifier
+
+    from preprocessing.preprocessor import build_preprocessor, compact_frame
+    from training.xgb_fit import peak_rss_mb
+
+    sys.path.insert(0, str(_SRC / "models"))
+    from train_v4 import DT_PARAMS, XGB_PARAMS
+
+    rows = []
+
+    def stage(name: str, fn):
+        tracemalloc.reset_peak()
+        result, held = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        rows.append({
+            "stage":          name,
+            "held_mb":        round(held / 2**20, 3),
+            "alloc_peak_mb":  round(peak / 2**20, 3),
+            "peak_rss_mb":    peak_rss_mb(),
+        })
+        return result
+
+    tracemalloc.start()
+
+    def load():
+        X_train, _, y_train, _ = joblib.load(DATA_PKL)
+        if scale > 1:
+            X_train = pd.concat([X_train] * scale, ignore_index=True)
+            y_train = pd.concat([y_train] * scale, ignore_index=True)
+        return (X_train, y_train), _frame_bytes(X_train)
+
+    X, y = stage("load", load)
+
+    def frame():
+        X_frame = compact_frame(X) if mode == "compact" else X
+        return X_frame, _frame_bytes(X_frame)
+
+    X = stage("frame", frame)
+
+    def preprocess():
+        preprocessor = build_preprocessor(X)
+        if mode == "legacy":
+            preprocessor.set_params(cat__onehot__dtype=np.float64)
+        matrix = preprocessor.fit_transform(X)
+        return matrix, matrix.nbytes
+
+    matrix = stage("preprocess", preprocess)
+    rows[-1]["matrix_dtype"] = str(matrix.dtype)
+    rows[-1]["matrix_shape"] = list(matrix.shape)
+
+    n_pos = int((y == 1).sum())
+    n_neg = int((y == 0).sum())
+    stage("fit_xgb", lambda: (
+        XGBClassifier(**XGB_PARAMS, scale_pos_weight=n_neg / n_pos).fit(matrix, y), matrix.nbytes))
+    stage("fit_dt", lambda: (DecisionTreeClassifier(**DT_PARAMS).fit(matrix, y), matrix.nbytes))
+
+    tracemalloc.stop()
+    return rows
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def run_mode(mode: str, scale: int) -> list[dict]:
+    """Measure ``mode`` in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, __file__, "--measure", mode, "--scale", str(scale)],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"[ERROR] {mode} run failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def print_report(results: dict) -> None:
+    legacy, compact = results["legacy"], results["compact"]
+    print(f"\n  {'stage':<11} {'held MB':>19} {'alloc peak MB':>19} {'peak RSS MB':>19}")
+    print(f"  {'':<11} {'legacy -> compact':>19} {'legacy -> compact':>19} {'legacy -> compact':>19}")
+    print(f"  {'-'*11} {'-'*19} {'-'*19} {'-'*19}")
+    for before, after in zip(legacy, compact):
+        cells = [f"{before[k]:>8.2f} -> {after[k]:<7.2f}" for k in ("held_mb", "alloc_peak_mb")]
+        rss = (f"{before['peak_rss_mb']:>8.1f} -> {after['peak_rss_mb']:<7.1f}"
+               if before["peak_rss_mb"] is not None else f"{'n/a':>19}")
+        print(f"  {before['stage']:<11} {cells[0]:>19} {cells[1]:>19} {rss:>19}")
+
+    pre = {mode: next(r for r in rows if r["stage"] == "preprocess") for mode, rows in results.items()}
+    print(f"\n  training matrix: {pre['legacy']['matrix_shape']} "
+          f"{pre['legacy']['matrix_dtype']} -> {pre['compact']['matrix_dtype']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-stage training memory, legacy vs compact dtypes.")
+    parser.add_argument("--scale", type=int, default=1, help="repeat the training rows N times")
+    parser.add_argument("--output", type=Path, default=None, help="write the report as JSON")
+    parser.add_argument("--measure", choices=MODES, help=argparse.SUPPRESS)   # subprocess entry point
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.scale)))
+        return
+
+    print("=" * 60)
+    print(f"ContraceptIQ -- Training memory report (25 features, scale x{args.scale})")
+    print("=" * 60)
+
+    results = {mode: run_mode(mode, args.scale) for mode in MODES}
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"data": DATA_PKL.name, "scale": args.scale, **results}, f, indent=2)
+        print(f"\n  Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
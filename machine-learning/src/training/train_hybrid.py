@@ -1,6 +1,7 @@
 import json
+import sys
+
 import joblib
-import numpy as np
 from sklearn.metrics import (
     classification_report,
     confusion_matrix,
@@ -10,6 +11,10 @@ from sklearn.metrics import (
     roc_auc_score
 )
 
+# Shared hybrid rule (machine-learning/src/inference/hybrid.py)
+sys.path.insert(0, "src")
+from inference.hybrid import HybridEngine
+
 # --------------------------------------------------
 # CONFIG (match documentation defaults)
 # --------------------------------------------------
@@ -41,26 +46,11 @@ dt_pipeline = joblib.load(
 # --------------------------------------------------
 # PREDICTIONS
 # --------------------------------------------------
-# XGBoost probabilities
-xgb_probs = xgb_pipeline.predict_proba(X_test)[:, 1]
-
-# Base XGB prediction (thresholded)
-xgb_pred = (xgb_probs >= THRESH_XGB).astype(int)
-
-# Decision Tree prediction
-dt_pred = dt_pipeline.predict(X_test)
-
-# --------------------------------------------------
-# HYBRID LOGIC (UPGRADE-ONLY RULE)
-# --------------------------------------------------
-hybrid_pred = xgb_pred.copy()
-
-low_conf_mask = np.abs(xgb_probs - THRESH_XGB) < CONF_MARGIN
-
-# Upgrade-only: DT can only flip 0 -> 1
-upgrade_mask = (low_conf_mask) & (dt_pred == 1)
-
-hybrid_pred[upgrade_mask] = 1
+# XGBoost probabilities, base XGB prediction (thresholded), Decision Tree
+# prediction and the upgrade-only rule (DT can only flip 0 -> 1)
+hybrid = HybridEngine(xgb_pipeline, dt_pipeline, THRESH_XGB, CONF_MARGIN).predict(X_test)
+xgb_probs   = hybrid["xgb_probabilities"]
+hybrid_pred = hybrid["predictions"]
 
 # --------------------------------------------------
 # EVALUATION
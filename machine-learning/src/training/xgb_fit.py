@@ -0,0 +1,189 @@
+"""
+xgb_fit.py
+
+Shared XGBoost fit helper: early stopping on an internal validation split,
+plus training-time telemetry.
+
+    1. carve a stratified validation split (VALIDATION_FRACTION) out of the
+       training rows;
+    2. boost up to the model's n_estimators, stopping once the validation
+       metric ("logloss" or "aucpr") has not improved for
+       EARLY_STOPPING_ROUNDS rounds;
+    3. cut the booster to its best_iteration + 1 trees, so the returned
+       model holds exactly the trees it needs (no best_iteration cut-off for
+       exporters to honour) -- or, with refit=True, refit on ALL training
+       rows with n_estimators = best_iteration + 1 instead.  The refit
+       costs a second fit; only the production drivers (train_v4.py,
+       train_parallel_v4.py) pay it, for the 20% of rows it adds.
+
+Warm start: with ``base_booster`` the rounds are added on top of an already
+trained booster (xgb_model=...), so n_estimators bounds the number of NEW
+trees; the cut (or refit) keeps the base trees plus the new ones that helped.
+
+Telemetry returned with the model (JSON-serialisable, stored in the saved
+configs): best iteration / score, rounds run, final n_estimators, per-round
+wall time, fit and refit seconds and the process peak RSS.
+
+Usage
+-----
+    import sys; sys.path.insert(0, "<machine-learning>/src")
+    from training.xgb_fit import fit_xgb_pipeline, fit_xgb_early_stopping
+
+    pipeline, telemetry = fit_xgb_pipeline(build_preprocessor(X), XGBClassifier(**params), X, y)
+    model, telemetry    = fit_xgb_early_stopping(XGBClassifier(**params), X_matrix, y)
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from xgboost.callback import TrainingCallback
+
+try:                                  # not available on Windows
+    import resource
+except ImportError:                   # pragma: no cover
+    resource = None
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+METRICS               = ("logloss", "aucpr")
+DEFAULT_METRIC        = "logloss"
+VALIDATION_FRACTION   = 0.20
+EARLY_STOPPING_ROUNDS = 30
+RANDOM_STATE          = 42
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+class RoundTimer(TrainingCallback):
+    """Records the wall time of every boosting round."""
+
+    def __init__(self):
+        super().__init__()
+        self.seconds: list[float] = []
+        self._t0 = 0.0
+
+    def before_iteration(self, model, epoch, evals_log) -> bool:
+        self._t0 = time.perf_counter()
+        return False
+
+    def after_iteration(self, model, epoch, evals_log) -> bool:
+        self.seconds.append(time.perf_counter() - self._t0)
+        return False
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process so far (None if unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# ============================================================================
+# FIT
+# ============================================================================
+
+def fit_xgb_early_stopping(
+    model,
+    X,
+    y,
+    metric: str = DEFAULT_METRIC,
+    validation_fraction: float = VALIDATION_FRACTION,
+    early_stopping_rounds: int = EARLY_STOPPING_ROUNDS,
+    refit: bool = False,
+    random_state: int = RANDOM_STATE,
+    base_booster=None,
+):
+    """
+    Fit an (unfitted) XGBClassifier with early stopping on an internal split.
+
+    Parameters
+    ----------
+    model : XGBClassifier
+        n_estimators is the upper bound on boosting rounds.
+    X, y : encoded training matrix and binary labels
+    metric : "logloss" or "aucpr"
+    refit : refit on all rows with the early-stopped number of trees
+        (default: keep the early-stopped model, cut to best_iteration + 1 trees)
+    base_booster : xgboost.Booster to continue boosting from (warm start);
+        its trees are kept and n_estimators new ones are added at most
+
+    Returns
+    -------
+    (fitted model, telemetry dict)
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {METRICS}, got '{metric}'")
+
+    y = np.asarray(y)
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X, y, test_size=validation_fraction, stratify=y, random_state=random_state,
+    )
+
+    max_rounds  = int(model.get_params()["n_estimators"] or 100)
+    base_rounds = base_booster.num_boosted_rounds() if base_booster is not None else 0
+    timer = RoundTimer()
+    model.set_params(
+        eval_metric=metric, early_stopping_rounds=early_stopping_rounds, callbacks=[timer],
+    )
+
+    t0 = time.perf_counter()
+    model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], xgb_model=base_booster, verbose=False)
+    fit_seconds = time.perf_counter() - t0
+
+    best_iteration = int(model.best_iteration)          # counts the base rounds too
+    best_score     = float(model.best_score)
+    new_trees      = max(1, best_iteration + 1 - base_rounds)
+    model.set_params(callbacks=None)
+
+    refit_seconds = 0.0
+    model.set_params(n_estimators=new_trees, early_stopping_rounds=None)
+    if refit:
+        t0 = time.perf_counter()
+        model.fit(X, y, xgb_model=base_booster, verbose=False)
+        refit_seconds = time.perf_counter() - t0
+    else:
+        # No public setter for the fitted booster; the sliced one predicts
+        # exactly like the early-stopped model at its best iteration
+        model._Booster = model.get_booster()[:best_iteration + 1]
+
+    rounds = np.array(timer.seconds)
+    telemetry = {
+        "metric":                metric,
+        "validation_fraction":   validation_fraction,
+        "early_stopping_rounds": early_stopping_rounds,
+        "max_rounds":            max_rounds,
+        "rounds_run":            len(rounds),
+        "best_iteration":        best_iteration,
+        "best_score":            round(best_score, 6),
+        "n_estimators":          base_rounds + new_trees,
+        "base_rounds":           base_rounds,
+        "new_trees":             new_trees,
+        "refit":                 refit,
+        "fit_seconds":           round(fit_seconds, 3),
+        "refit_seconds":         round(refit_seconds, 3),
+        "mean_round_ms":         round(float(rounds.mean()) * 1e3, 3) if len(rounds) else 0.0,
+        "round_seconds":         [round(float(s), 5) for s in rounds],
+        "peak_rss_mb":           peak_rss_mb(),
+    }
+    return model, telemetry
+
+
+def fit_xgb_pipeline(preprocessor, model, X, y, **kwargs) -> tuple[Pipeline, dict]:
+    """
+    Fit ``preprocessor`` on X, early-stop ``model`` on the encoded matrix
+    (see fit_xgb_early_stopping) and wrap both into a fitted Pipeline.
+    """
+    X_matrix = preprocessor.fit_transform(X, y)
+    model, telemetry = fit_xgb_early_stopping(model, X_matrix, y, **kwargs)
+    return Pipeline(steps=[("preprocess", preprocessor), ("model", model)]), telemetry
@@ -6,23 +6,41 @@ users are at risk of discontinuing their method using a high-recall hybrid
 ML model (XGBoost + Decision Tree).
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import pandas as pd
+import hmac
+import threading
+import time
 import traceback
 from typing import Dict, Any
 
+import numpy as np
+
 # Local imports
 from config import (
     FLASK_HOST, FLASK_PORT, FLASK_DEBUG,
-    CORS_ORIGINS, MODEL_DIR, REQUIRED_FEATURES
+    CORS_ORIGINS, MODEL_DIR, MODEL_BACKEND, REQUIRED_FEATURES, FEATURE_GROUPS,
+    SINGLE_ROW_FAST_PATH, MICRO_BATCHING, MICRO_BATCH_WINDOW_MS,
+    MICRO_BATCH_MAX_ROWS, PREDICTION_CACHE_SIZE, METRICS_ENABLED,
+    PROFILING_SAMPLE_RATE, ADMIN_TOKEN, FAST_STARTUP, UNKNOWN_CATEGORIES,
+    BATCH_MAX_ROWS, JSON_BACKEND
+)
+from models.model_loader import load_hybrid_model, build_row_scorer, feature_schema
+from models.predictor import predict_columns, predict_discontinuation_risk, predict_single_record
+from models.batcher import MicroBatcher, BATCH_SIZE_BUCKETS
+from utils.columnar import CONTENT_TYPES as COLUMNAR_CONTENT_TYPES, decode_columns, take_rows
+from utils.json_codec import dumps_bytes, make_json_provider
+from utils.metrics import MetricsRegistry, process_rss_bytes
+from utils.profiler import StageProfiler
+from utils.responses import (
+    BATCH_FORMATS, RECOMMENDATIONS, batch_columns, json_object, risk_assessment, rows_json
 )
-from models.model_loader import load_hybrid_model
-from models.predictor import predict_discontinuation_risk
-from utils.validators import validate_input_features, validate_feature_types
+from utils.validators import RequestValidator
 
 # Initialize Flask app
 app = Flask(__name__)
+# Request parsing and response writing (orjson when installed, see config.py)
+app.json = make_json_provider(app, JSON_BACKEND)
 
 # Configure CORS
 CORS(app, resources={r"/api/*": {"origins": CORS_ORIGINS}})
@@ -31,19 +49,131 @@ CORS(app, resources={r"/api/*": {"origins": CORS_ORIGINS}})
 xgb_model = None
 dt_model = None
 config = None
+row_scorer = None
+batcher = None
 models_loaded = False
+# 'loading' until load_models() finishes, then 'ready' or 'failed'
+model_state = 'loading'
+model_load_seconds = None
+# The loaded model's input features (config 'features'); payloads are
+# projected to these before validation and encoding
+required_features = list(REQUIRED_FEATURES)
+# Replaced in load_models() by one for required_features that also knows
+# the encoder categories
+request_validator = RequestValidator(unknown_policy=UNKNOWN_CATEGORIES)
+
+
+# ==============================================================================
+# METRICS
+# ==============================================================================
+
+metrics = MetricsRegistry()
+
+REQUEST_COUNT = metrics.counter(
+    'contraceptiq_http_requests_total',
+    'HTTP requests by route, method and status code.',
+    ('endpoint', 'method', 'status')
+)
+REQUEST_LATENCY = metrics.histogram(
+    'contraceptiq_http_request_duration_seconds',
+    'HTTP request latency by route.',
+    ('endpoint',)
+)
+STAGE_LATENCY = metrics.histogram(
+    'contraceptiq_prediction_stage_seconds',
+    'Prediction time per stage: validation, encoding, xgb, dt '
+    '(DataFrame / micro-batch paths: xgb and dt include preprocessing).',
+    ('stage',)
+)
+BATCH_ROWS = metrics.histogram(
+    'contraceptiq_micro_batch_rows',
+    'Rows per micro-batch scored.',
+    buckets=BATCH_SIZE_BUCKETS
+)
+
+
+# Sampled per-stage profiling (utils/profiler.py), see GET /admin/profile
+profiler = StageProfiler(PROFILING_SAMPLE_RATE)
+
+
+def observe_stages(stages: Dict[str, float]) -> None:
+    """Record {stage: seconds} timings reported by the hybrid scorers."""
+    if METRICS_ENABLED:
+        for stage, seconds in stages.items():
+            STAGE_LATENCY.observe(seconds, (stage,))
+    profiler.record(stages)
+
+
+def observe_stage(stage: str, start: float) -> None:
+    """Record the time since perf_counter() value ``start`` for one stage."""
+    if METRICS_ENABLED:
+        STAGE_LATENCY.observe(time.perf_counter() - start, (stage,))
+
+
+# Always installed: profiling can be switched on at runtime
+stage_observer = observe_stages
+
+
+def score_batch(X):
+    """Micro-batch predict function: the DataFrame path plus batch size metrics."""
+    if METRICS_ENABLED:
+        BATCH_ROWS.observe(len(X))
+    return predict_discontinuation_risk(X, xgb_model, dt_model, config, stage_observer)
 
 
 def load_models():
     """Load ML models at startup."""
-    global xgb_model, dt_model, config, models_loaded
+    global xgb_model, dt_model, config, row_scorer, batcher, models_loaded
+    global model_state, model_load_seconds, request_validator, required_features
     
+    start = time.perf_counter()
     try:
         print("=" * 70)
         print("LOADING ML MODELS")
         print("=" * 70)
         xgb_model, dt_model, config = load_hybrid_model(MODEL_DIR)
+        required_features = config['features']
+        
+        try:
+            request_validator = RequestValidator.from_feature_schema(
+                feature_schema(xgb_model), required_features, unknown_policy=UNKNOWN_CATEGORIES
+            )
+            print(f"   - Unknown categories: {UNKNOWN_CATEGORIES}")
+        except Exception as e:
+            # Types and ranges are still checked; only the category check is lost
+            request_validator = RequestValidator(required_features, unknown_policy=UNKNOWN_CATEGORIES)
+            print(f"⚠️  Category validation unavailable: {str(e)}")
+        
+        if SINGLE_ROW_FAST_PATH:
+            try:
+                row_scorer = build_row_scorer(
+                    xgb_model, dt_model, config, cache_size=PREDICTION_CACHE_SIZE,
+                    stage_observer=stage_observer
+                )
+                print("   - Single-row fast path: enabled")
+                if PREDICTION_CACHE_SIZE > 0:
+                    print(f"   - Prediction cache: {PREDICTION_CACHE_SIZE} bucket combinations")
+            except Exception as e:
+                # The DataFrame path still works; only the fast path is lost
+                row_scorer = None
+                print(f"⚠️  Single-row fast path unavailable: {str(e)}")
+        
+        if MICRO_BATCHING:
+            batcher = MicroBatcher(
+                score_batch,
+                window_ms=MICRO_BATCH_WINDOW_MS,
+                max_rows=MICRO_BATCH_MAX_ROWS
+            )
+            print(f"   - Micro-batching: {MICRO_BATCH_WINDOW_MS} ms window, "
+                  f"up to {MICRO_BATCH_MAX_ROWS} rows")
+        print(f"   - JSON: {app.json.name}")
+        if METRICS_ENABLED:
+            print("   - Metrics: /metrics")
+        # Set last: requests see either no models or the complete setup
+        model_load_seconds = round(time.perf_counter() - start, 3)
         models_loaded = True
+        model_state = 'ready'
+        print(f"   - Loaded in {model_load_seconds:.2f}s")
         print("=" * 70)
         print("✅ SERVER READY")
         print("=" * 70)
@@ -55,10 +185,95 @@ def load_models():
         print(traceback.format_exc())
         print("=" * 70)
         models_loaded = False
+        model_state = 'failed'
+
+
+# Load models when app starts.  With FAST_STARTUP they load in the
+# background and requests are answered (503 until ready) in the meantime.
+if FAST_STARTUP:
+    threading.Thread(target=load_models, name='model-loader', daemon=True).start()
+else:
+    load_models()
+
+
+# Scrape-time gauges (read the globals above when /metrics is requested)
+def _metric_model_info() -> Dict:
+    if config is None:
+        return {}
+    return {(config['model_version'], MODEL_BACKEND): 1}
+
+
+def _metric_cache(field: str):
+    def collect() -> Dict:
+        stats = row_scorer.stats() if hasattr(row_scorer, 'stats') else None
+        return {(): stats[field]} if stats else {}
+    return collect
+
+
+def _metric_queue_depth() -> Dict:
+    return {(): batcher.stats()['queue_depth']} if batcher is not None else {}
+
+
+metrics.gauge('contraceptiq_model_info', 'Loaded model version and backend.',
+              _metric_model_info, ('model_version', 'backend'))
+metrics.gauge('contraceptiq_models_loaded', '1 if the models loaded at startup.',
+              lambda: {(): 1 if models_loaded else 0})
+metrics.gauge('contraceptiq_model_load_seconds', 'Time taken to load the models at startup.',
+              lambda: {(): model_load_seconds})
+metrics.gauge('contraceptiq_prediction_cache_hits_total', 'Prediction cache hits.',
+              _metric_cache('hits'), kind='counter')
+metrics.gauge('contraceptiq_prediction_cache_misses_total', 'Prediction cache misses.',
+              _metric_cache('misses'), kind='counter')
+metrics.gauge('contraceptiq_prediction_cache_hit_ratio', 'Prediction cache hits / lookups.',
+              _metric_cache('hit_rate'))
+metrics.gauge('contraceptiq_prediction_cache_entries', 'Entries in the prediction cache.',
+              _metric_cache('size'))
+metrics.gauge('contraceptiq_micro_batch_queue_depth', 'Records waiting for a micro-batch.',
+              _metric_queue_depth)
+metrics.gauge('contraceptiq_patient_store_size', 'Patient intake records held in memory.',
+              lambda: {(): len(PATIENT_DB)})
+metrics.gauge('contraceptiq_process_resident_memory_bytes', 'Resident memory of the API process.',
+              lambda: {(): process_rss_bytes()})
+
+
+if METRICS_ENABLED:
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.get('request_start')
+        if start is not None:
+            # Route template, not the raw path: bounded label cardinality
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUEST_LATENCY.observe(time.perf_counter() - start, (endpoint,))
+            REQUEST_COUNT.inc((endpoint, request.method, str(response.status_code)))
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def get_metrics():
+        """
+        Prometheus scrape endpoint.
+
+        Returns:
+            All metrics in the Prometheus text exposition format
+        """
+        return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
+@app.before_request
+def start_request_profile():
+    if request.path.startswith('/admin/'):
+        return
+    rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    profiler.begin(f"{request.method} {rule}")
 
-# Load models when app starts
-load_models()
+
+@app.teardown_request
+def finish_request_profile(exc):
+    # teardown also runs after unhandled errors, so no trace leaks into the next request
+    profiler.end()
 
 
 @app.route('/api/health', methods=['GET'])
@@ -69,21 +284,88 @@ def health_check():
     Returns:
         JSON response with server status and model loading status
     """
+    if models_loaded:
+        status = 'healthy'
+    else:
+        status = 'starting' if model_state == 'loading' else 'degraded'
     return jsonify({
-        'status': 'healthy' if models_loaded else 'degraded',
+        'status': status,
         'models_loaded': models_loaded,
+        'model_state': model_state,
         'model_directory': MODEL_DIR,
+        'model_backend': MODEL_BACKEND,
+        'single_row_fast_path': row_scorer is not None,
+        'micro_batching': batcher is not None,
+        'prediction_cache': row_scorer.stats() if hasattr(row_scorer, 'stats') else None,
+        'json_backend': app.json.name,
         'message': 'Server is running' if models_loaded else 'Models not loaded'
     }), 200 if models_loaded else 503
 
 
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """
+    Liveness probe: the process is up and answering requests.
+    
+    Returns:
+        200 JSON response, also while the models are still loading
+    """
+    return jsonify({'status': 'alive', 'model_state': model_state}), 200
+
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness probe: predictions can be served.
+    
+    Returns:
+        JSON response with the model state, backend and load time;
+        200 once the models are loaded, 503 while loading or after a failure
+    """
+    return jsonify({
+        'ready': models_loaded,
+        'model_state': model_state,
+        'model_backend': MODEL_BACKEND,
+        'fast_startup': FAST_STARTUP,
+        'model_load_seconds': model_load_seconds
+    }), 200 if models_loaded else 503
+
+
+def model_metadata() -> Dict[str, Any]:
+    """Model version, threshold and margin included in prediction responses."""
+    return {
+        'model_version': config['model_version'],
+        'threshold': config['threshold'],
+        'confidence_margin': config['conf_margin']
+    }
+
+
+def models_unavailable():
+    """503 response while the models are loading or after they failed, else None."""
+    if not models_loaded and model_state == 'loading':
+        return jsonify({
+            'error': 'Models loading',
+            'message': 'The server is starting up. Retry shortly.',
+            'status': 503
+        }), 503, {'Retry-After': '1'}
+    
+    if not models_loaded:
+        return jsonify({
+            'error': 'Models not loaded',
+            'message': 'ML models failed to load at startup. Check server logs.',
+            'status': 503
+        }), 503
+    return None
+
+
 @app.route('/api/v1/discontinuation-risk', methods=['POST'])
 def assess_discontinuation_risk():
     """
     Predict discontinuation risk for a contraceptive user.
     
     Request Body (JSON):
-        Dictionary with 26 required features (see REQUIRED_FEATURES in config.py)
+        Dictionary with the model's required features (GET /api/v1/features;
+        REQUIRED_FEATURES for v3, 9 for v4). Other keys are ignored.
         
     Returns:
         JSON response with:
@@ -92,6 +374,8 @@ def assess_discontinuation_risk():
             - recommendation: string recommendation
             - xgb_probability: float between 0 and 1
             - upgraded_by_dt: boolean
+            - warnings: unknown categories (only when there are any and
+              UNKNOWN_CATEGORIES is 'warn')
             
     Error Response:
         - 400: Missing or invalid features
@@ -99,18 +383,16 @@ def assess_discontinuation_risk():
         - 503: Models not loaded
     """
     # Check if models are loaded
-    if not models_loaded:
-        return jsonify({
-            'error': 'Models not loaded',
-            'message': 'ML models failed to load at startup. Check server logs.',
-            'status': 503
-        }), 503
+    unavailable = models_unavailable()
+    if unavailable is not None:
+        return unavailable
     
     try:
         # Get request data
-        data = request.get_json()
+        with profiler.stage('request.get_json'):
+            data = request.get_json()
         
-        if not data:
+        if not data or not isinstance(data, dict):
             return jsonify({
                 'error': 'No data provided',
                 'message': 'Request body must contain JSON data',
@@ -118,75 +400,210 @@ def assess_discontinuation_risk():
             }), 400
         
         # Validate required features
-        is_valid, missing_features = validate_input_features(data)
+        validation_start = time.perf_counter()
+        with profiler.stage('validate_input_features'):
+            missing_features = request_validator.missing(data)
         
-        if not is_valid:
+        if missing_features:
+            observe_stage('validation', validation_start)
             return jsonify({
                 'error': 'Missing required features',
                 'missing_features': missing_features,
-                'required_features_count': len(REQUIRED_FEATURES),
+                'required_features_count': len(required_features),
                 'provided_features_count': len(data.keys()),
                 'status': 400
             }), 400
         
+        # Only the features the model uses are validated and encoded
+        data = {name: data[name] for name in required_features}
+        
         # Validate feature types
-        types_valid, type_errors = validate_feature_types(data)
+        with profiler.stage('validate_feature_types'):
+            type_errors, warnings = request_validator.validate(data)
+        observe_stage('validation', validation_start)
         
-        if not types_valid:
+        if type_errors:
             return jsonify({
                 'error': 'Invalid feature types or values',
                 'validation_errors': type_errors,
                 'status': 400
             }), 400
         
-        # Convert to pandas DataFrame (single row)
-        X = pd.DataFrame([data])
-        
         # Debug: Print received input data
-        print("\n" + "=" * 70)
-        print("📥 RECEIVED INPUT DATA:")
-        for key, val in data.items():
-            print(f"  {key}: {val}")
+        with profiler.stage('log_input'):
+            print("\n" + "=" * 70)
+            print("📥 RECEIVED INPUT DATA:")
+            for key, val in data.items():
+                print(f"  {key}: {val}")
+            print("=" * 70)
+        
+        # Make prediction (micro-batched or pandas-free fast path when enabled)
+        with profiler.stage('predict'):
+            result = predict_single_record(
+                data, xgb_model, dt_model, config, row_scorer, batcher,
+                stage_observer, profiler
+            )
+        
+        # Build response
+        response = risk_assessment(
+            result['prediction'], result['xgb_probability'], result['upgraded_by_dt'],
+            config['threshold']
+        )
+        response['metadata'] = model_metadata()
+        if warnings:
+            response['warnings'] = warnings
+        
+        with profiler.stage('jsonify'):
+            return jsonify(response), 200
+        
+    except ValueError as e:
+        return jsonify({
+            'error': 'Validation error',
+            'message': str(e),
+            'status': 400
+        }), 400
+        
+    except Exception as e:
+        print("=" * 70)
+        print("ERROR IN PREDICTION")
+        print("=" * 70)
+        print(traceback.format_exc())
         print("=" * 70)
         
-        # Make prediction
-        results = predict_discontinuation_risk(X, xgb_model, dt_model, config)
+        return jsonify({
+            'error': 'Internal server error',
+            'message': 'An unexpected error occurred during prediction',
+            'details': str(e) if FLASK_DEBUG else None,
+            'status': 500
+        }), 500
+
+
+@app.route('/api/v1/discontinuation-risk/batch', methods=['POST'])
+def assess_discontinuation_risk_batch():
+    """
+    Predict discontinuation risk for several contraceptive users at once.
+    
+    Request Body (JSON):
+        {"records": [ {required features}, ... ]}, at most BATCH_MAX_ROWS records
+    
+    Request Body (binary, by Content-Type; see utils/columnar.py):
+        application/vnd.contraceptiq.columns: NumPy structured rows
+        application/vnd.apache.arrow.stream: Arrow IPC stream (pyarrow)
+        with one column per feature
+    
+    Query parameters:
+        format: 'rows' (default) or 'columnar'
         
-        # Extract single-row results
-        prediction = int(results['predictions'][0])
-        xgb_probability = float(results['xgb_probabilities'][0])
-        upgraded_by_dt = bool(results['upgrade_flags'][0])
+    Returns:
+        JSON response with:
+            - results ('rows'): one entry per record, in order (the
+              single-record response fields, or null for records that
+              failed validation)
+            - columns ('columnar'): index (request positions of the scored
+              records), risk_level, confidence, xgb_probability and
+              upgraded_by_dt arrays over the scored records, with the
+              recommendation per risk level under 'recommendations'
+            - errors: [{"index": i, "validation_errors": [...]}] for the
+              records that failed validation
+            - warnings: [{"message": ..., "rows": [i, ...]}] per unknown
+              category value (UNKNOWN_CATEGORIES='warn')
+            - metadata: model version, threshold and confidence margin
+            
+    Error Response:
+        - 400: No records, too many records, no valid record, unknown format
+          or malformed binary body
+        - 500: Server error
+        - 503: Models not loaded
+    """
+    unavailable = models_unavailable()
+    if unavailable is not None:
+        return unavailable
+    
+    fmt = request.args.get('format', 'rows')
+    if fmt not in BATCH_FORMATS:
+        return jsonify({'error': f"Unknown format '{fmt}'", 'status': 400}), 400
+    
+    try:
+        # Binary columns (utils/columnar.py) or JSON records
+        columns = records = None
+        if request.mimetype in COLUMNAR_CONTENT_TYPES:
+            with profiler.stage('decode_columns'):
+                columns, n_records = decode_columns(request.get_data(), request.mimetype)
+        else:
+            with profiler.stage('request.get_json'):
+                body = request.get_json(silent=True)
+            records = body.get('records') if isinstance(body, dict) else None
+            n_records = len(records) if isinstance(records, list) else 0
         
-        # Determine risk level and recommendation
-        risk_level = "HIGH" if prediction == 1 else "LOW"
+        if not n_records:
+            return jsonify({
+                'error': 'No records provided',
+                'message': 'Request body must be {"records": [...]} with at least one record, '
+                           'or a binary columnar body with at least one row',
+                'status': 400
+            }), 400
+        
+        if n_records > BATCH_MAX_ROWS:
+            return jsonify({
+                'error': 'Too many records',
+                'message': f'At most {BATCH_MAX_ROWS} records per request, got {n_records}',
+                'status': 400
+            }), 400
         
-        if risk_level == "HIGH":
-            recommendation = "Schedule follow-up counseling session"
+        validation_start = time.perf_counter()
+        if columns is not None:
+            with profiler.stage('validate_columns'):
+                columns = {name: columns[name] for name in required_features if name in columns}
+                errors, warnings = request_validator.validate_columns(columns, n_records)
         else:
-            recommendation = "Continue monitoring contraceptive use"
+            with profiler.stage('validate_batch'):
+                not_objects = {i: ['record must be a JSON object'] for i, r in enumerate(records)
+                               if not isinstance(r, dict)}
+                errors, warnings = request_validator.validate_batch(
+                    [r if isinstance(r, dict) else {} for r in records]
+                )
+                errors.update(not_objects)
+        observe_stage('validation', validation_start)
         
-        # Confidence: threshold-relative distance, normalised to [0, 1].
-        # Mirrors onDeviceRiskService.ts formula: 0 = borderline, 1 = maximally certain.
-        threshold = config.get('threshold_v3', 0.25)
-        dist = abs(xgb_probability - threshold)
-        max_dist = (1 - threshold) if prediction == 1 else threshold
-        confidence = round(dist / max_dist, 4) if max_dist > 0 else 0.0
-
-        # Build response
-        response = {
-            'risk_level': risk_level,
-            'confidence': confidence,
-            'recommendation': recommendation,
-            'xgb_probability': round(xgb_probability, 4),
-            'upgraded_by_dt': upgraded_by_dt,
-            'metadata': {
-                'model_version': 'v3',
-                'threshold': config['threshold_v3'],
-                'confidence_margin': config['conf_margin_v3']
-            }
-        }
+        error_list = [{'index': i, 'validation_errors': errors[i]} for i in sorted(errors)]
+        valid = [i for i in range(n_records) if i not in errors]
+        if not valid:
+            return jsonify({
+                'error': 'Invalid feature types or values',
+                'errors': error_list,
+                'status': 400
+            }), 400
+        
+        if columns is not None:
+            if errors:
+                with profiler.stage('take_rows'):
+                    columns = take_rows(columns, np.asarray(valid))
+            # Encoded once for both models, no DataFrame
+            with profiler.stage('predict'):
+                result = predict_columns(columns, len(valid), xgb_model, dt_model, config, stage_observer)
+        else:
+            with profiler.stage('pd.DataFrame'):
+                import pandas as pd
+                X = pd.DataFrame([records[i] for i in valid], columns=required_features)
+            
+            with profiler.stage('predict'):
+                result = predict_discontinuation_risk(X, xgb_model, dt_model, config, stage_observer)
         
-        return jsonify(response), 200
+        # Written from the result arrays, no per-record dicts
+        with profiler.stage('jsonify'):
+            fields = {
+                'errors': dumps_bytes(error_list),
+                'warnings': dumps_bytes(warnings),
+                'metadata': dumps_bytes(model_metadata()),
+            }
+            if fmt == 'columnar':
+                columns = batch_columns(result, config['threshold'])
+                columns['index'] = valid
+                fields['columns'] = dumps_bytes(columns)
+                fields['recommendations'] = dumps_bytes(RECOMMENDATIONS)
+            else:
+                fields['results'] = rows_json(result, config['threshold'], valid, n_records)
+            return Response(json_object(fields) + b'\n', mimetype='application/json'), 200
         
     except ValueError as e:
         return jsonify({
@@ -197,7 +614,7 @@ def assess_discontinuation_risk():
         
     except Exception as e:
         print("=" * 70)
-        print("ERROR IN PREDICTION")
+        print("ERROR IN BATCH PREDICTION")
         print("=" * 70)
         print(traceback.format_exc())
         print("=" * 70)
@@ -210,21 +627,93 @@ def assess_discontinuation_risk():
         }), 500
 
 
+@app.route('/api/v1/batching/metrics', methods=['GET'])
+def get_batching_metrics():
+    """
+    Micro-batching metrics.
+    
+    Returns:
+        JSON response with 'enabled' and, when enabled, current queue depth,
+        batch counts, batch size statistics and mean queue wait
+    """
+    if batcher is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify({'enabled': True, **batcher.stats()}), 200
+
+
+def _admin_authorized() -> bool:
+    """
+    X-Admin-Token must match ADMIN_TOKEN.  Without ADMIN_TOKEN the /admin
+    endpoints are disabled: behind a local reverse proxy every client comes
+    from localhost, so the remote address cannot stand in for a token.
+    """
+    if not ADMIN_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    """
+    Per-stage profile of sampled requests.
+    
+    GET query parameters:
+        format: 'folded' (default) - aggregated self time per stack in ns,
+                one "frame;frame;frame <ns>" line each, for flamegraph.pl /
+                speedscope; 'json' - per-stack totals and means plus the
+                latest per-request breakdowns
+    
+    POST Body (JSON, all optional):
+        sample_rate: new fraction of requests to profile (0 disables)
+        reset: true to clear the aggregated profile
+        
+    Returns:
+        The profile (GET) or the current sample rate (POST)
+        
+    Error Response:
+        - 400: Invalid sample rate or format
+        - 403: Missing or wrong admin token, or ADMIN_TOKEN is not set
+    """
+    if not _admin_authorized():
+        message = ('Missing or wrong X-Admin-Token' if ADMIN_TOKEN
+                   else 'Admin endpoints are disabled: set ADMIN_TOKEN to enable them')
+        return jsonify({'error': 'Forbidden', 'message': message, 'status': 403}), 403
+    
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        if 'sample_rate' in body:
+            try:
+                profiler.set_sample_rate(body['sample_rate'])
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': 'Invalid sample rate', 'message': str(e), 'status': 400}), 400
+        if body.get('reset'):
+            profiler.reset()
+        return jsonify({'sample_rate': profiler.sample_rate}), 200
+    
+    fmt = request.args.get('format', 'folded')
+    if fmt == 'json':
+        return jsonify(profiler.summary()), 200
+    if fmt == 'folded':
+        return Response(profiler.folded(), content_type='text/plain; charset=utf-8')
+    return jsonify({'error': f"Unknown format '{fmt}'", 'status': 400}), 400
+
+
 @app.route('/api/v1/features', methods=['GET'])
 def get_required_features():
     """
     Get list of required features for prediction.
     
     Returns:
-        JSON response with list of 26 required feature names
+        JSON response with the loaded model's required feature names
+        (config 'features', REQUIRED_FEATURES for v3) and their count per group
     """
     return jsonify({
-        'required_features': REQUIRED_FEATURES,
-        'total_count': len(REQUIRED_FEATURES),
+        'required_features': required_features,
+        'total_count': len(required_features),
+        'model_version': config['model_version'] if config else None,
         'categories': {
-            'demographic': 13,
-            'fertility': 4,
-            'method_history': 9
+            group: sum(name in required_features for name in names)
+            for group, names in FEATURE_GROUPS.items()
         }
     }), 200
 
@@ -311,6 +800,7 @@ if __name__ == '__main__':
     print(f"Port: {FLASK_PORT}")
     print(f"Debug: {FLASK_DEBUG}")
     print(f"Model Directory: {MODEL_DIR}")
+    print(f"Model Backend: {MODEL_BACKEND}")
     print("=" * 70)
     print("\nStarting server...\n")
     
@@ -0,0 +1,103 @@
+"""
+Benchmark batch request formats.
+
+Posts the same test_data.json records to the batch endpoint (Flask test
+client, models loaded from MODEL_DIR / MODEL_BACKEND) as
+    json         {"records": [...]} objects
+    numpy        the structured-array body, categories dictionary-encoded
+    arrow        an Arrow IPC stream (skipped if pyarrow is not installed)
+(utils/columnar.py) and reports the body size, the time to parse the body
+into what the predictor receives (records / columns), and the full request.
+
+Usage:
+    python benchmark_columnar.py
+    python benchmark_columnar.py --rows 100 1000
+"""
+
+import argparse
+import json
+import os
+import timeit
+
+import numpy as np
+
+from config import BASE_DIR, BATCH_MAX_ROWS
+from utils.columnar import CONTENT_TYPE_ARROW, CONTENT_TYPE_NUMPY, decode_columns, encode_numpy
+
+
+def best_ms(fn, number, repeat=5):
+    """Best time per call in milliseconds."""
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e3
+
+
+def numpy_body(columns):
+    """Numbers as arrays, everything else dictionary-encoded."""
+    arrays, dictionaries = {}, {}
+    for name, values in columns.items():
+        if all(isinstance(v, (int, float)) for v in values):
+            arrays[name] = np.asarray(values)
+        else:
+            dictionary = sorted(set(values), key=repr)
+            code_of = {v: i for i, v in enumerate(dictionary)}
+            arrays[name] = np.array([code_of[v] for v in values], dtype=np.int16)
+            dictionaries[name] = dictionary
+    return encode_numpy(arrays, dictionaries)
+
+
+def arrow_body(columns):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    table = pa.table({name: pa.array(values) for name, values in columns.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batch request formats.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, BATCH_MAX_ROWS],
+                        help='batch sizes (at most BATCH_MAX_ROWS)')
+    args = parser.parse_args()
+
+    import app as server
+
+    server.load_models()
+    client = server.app.test_client()
+    url = '/api/v1/discontinuation-risk/batch'
+
+    with open(os.path.join(BASE_DIR, 'test_data.json')) as f:
+        records = [sample['data'] for sample in json.load(f).values()]
+
+    print("=" * 70)
+    print("BATCH REQUEST FORMAT BENCHMARK")
+    print("=" * 70)
+    print(f"{'Batch':<8} {'format':<8} {'body KB':>9} {'parse ms':>9} {'request ms':>11}")
+    print(f"{'-' * 8} {'-' * 8} {'-' * 9} {'-' * 9} {'-' * 11}")
+    for n_rows in args.rows:
+        batch = (records * (n_rows // len(records) + 1))[:n_rows]
+        columns = {name: [r[name] for r in batch] for name in batch[0]}
+        bodies = [
+            ('json', json.dumps({'records': batch}).encode('utf-8'), 'application/json'),
+            ('numpy', numpy_body(columns), CONTENT_TYPE_NUMPY),
+            ('arrow', arrow_body(columns), CONTENT_TYPE_ARROW),
+        ]
+        number = max(1, 2000 // n_rows)
+        for name, body, content_type in bodies:
+            if body is None:
+                print(f"{n_rows:<8} {name:<8} {'(pyarrow not installed)':>31}")
+                continue
+            if name == 'json':
+                parse = lambda: server.app.json.loads(body)
+            else:
+                parse = lambda: decode_columns(body, content_type)
+            post = lambda: client.post(url, data=body, content_type=content_type)
+            assert post().status_code == 200
+            print(f"{n_rows:<8} {name:<8} {len(body) / 1024:>9.1f} "
+                  f"{best_ms(parse, number):>9.3f} {best_ms(post, number):>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark backend cold start.
+
+Starts a fresh interpreter per run and measures, from process launch:
+    import     time until `import app` returns (Flask app importable, and
+               with FAST_STARTUP answering liveness probes)
+    ready      time until the models are loaded (readiness probe 200)
+    first      latency of the first prediction request
+for the standard joblib startup and the startup-optimised modes, plus which
+heavy packages each mode imported.  Then prints the slowest top-level
+imports of each mode from `python -X importtime`.
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --runs 5
+    MODEL_DIR=../../machine-learning/src/models/models_high_risk_v4 python benchmark_startup.py
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from config import BASE_DIR
+
+# (name, environment overrides)
+MODES = [
+    ('joblib', {'MODEL_BACKEND': 'joblib', 'FAST_STARTUP': 'false'}),
+    ('compiled', {'MODEL_BACKEND': 'compiled', 'FAST_STARTUP': 'false'}),
+    ('fast startup (compiled)', {'MODEL_BACKEND': 'compiled', 'FAST_STARTUP': 'true'}),
+    ('fast startup (table)', {'MODEL_BACKEND': 'table', 'FAST_STARTUP': 'true'}),
+]
+
+HEAVY_MODULES = ('pandas', 'sklearn', 'xgboost', 'joblib', 'scipy', 'onnxruntime')
+
+# Child process: reports times relative to the launch time passed in argv
+CHILD = r'''
+import contextlib, io, json, sys, time
+launched = float(sys.argv[1])
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+imported = time.time()
+client = app.app.test_client()
+while client.get('/api/health/ready').status_code != 200:
+    if app.model_state == 'failed':
+        sys.exit('models failed to load')
+    time.sleep(0.005)
+ready = time.time()
+with open('test_data.json') as f:
+    record = next(iter(json.load(f).values()))['data']
+with contextlib.redirect_stdout(io.StringIO()):
+    t0 = time.perf_counter()
+    status = client.post('/api/v1/discontinuation-risk', json=record).status_code
+    first = time.perf_counter() - t0
+print(json.dumps({
+    'import': imported - launched,
+    'ready': ready - launched,
+    'first': first,
+    'status': status,
+    'heavy': [m for m in %r if m in sys.modules],
+}))
+''' % (HEAVY_MODULES,)
+
+
+def _env(overrides):
+    env = dict(os.environ)
+    env.update(overrides)
+    env['FLASK_DEBUG'] = 'false'
+    env['METRICS_ENABLED'] = env.get('METRICS_ENABLED', 'true')
+    return env
+
+
+def run_once(overrides):
+    launched = time.time()
+    proc = subprocess.run(
+        [sys.executable, '-c', CHILD, repr(launched)],
+        cwd=BASE_DIR, env=_env(overrides), capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def import_breakdown(overrides, top):
+    """Slowest top-level imports (cumulative ms) of `import app`."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=BASE_DIR, env=_env(overrides), capture_output=True, text=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # ' ' + two spaces per nesting level: keep the direct imports of app
+        if name.startswith('   ') and not name.startswith('    '):
+            rows.append((int(cumulative) / 1000.0, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark backend cold start.')
+    parser.add_argument('--runs', type=int, default=3, help='cold starts per mode')
+    parser.add_argument('--top', type=int, default=6, help='imports listed per mode')
+    args = parser.parse_args()
+
+    print("=" * 78)
+    print("BACKEND COLD START BENCHMARK")
+    print("=" * 78)
+    print(f"Median of {args.runs} cold starts per mode (seconds from process launch)\n")
+    print(f"{'Mode':<26} {'import':>8} {'ready':>8} {'1st req ms':>11}  heavy imports")
+    print(f"{'-' * 26} {'-' * 8} {'-' * 8} {'-' * 11}  {'-' * 18}")
+
+    for name, overrides in MODES:
+        try:
+            runs = [run_once(overrides) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:<26} unavailable: {e}")
+            continue
+        median = {key: statistics.median(r[key] for r in runs) for key in ('import', 'ready', 'first')}
+        heavy = ', '.join(runs[-1]['heavy']) or '-'
+        print(f"{name:<26} {median['import']:>8.2f} {median['ready']:>8.2f} "
+              f"{median['first'] * 1e3:>11.1f}  {heavy}")
+
+    print("\nSlowest imports of `import app` (cumulative ms):")
+    for name, overrides in MODES:
+        print(f"\n  {name}")
+        for ms, module in import_breakdown(overrides, args.top):
+            print(f"    {ms:>8.1f}  {module}")
+
+
+if __name__ == '__main__':
+    main()
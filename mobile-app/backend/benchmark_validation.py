@@ -0,0 +1,71 @@
+"""
+Benchmark request validation.
+
+Times the schema-compiled RequestValidator (utils/validators.py) on the
+test_data.json records:
+    single     missing() + validate() of one record, as the prediction
+               endpoint runs them
+    batch      validate_batch() of N records (column-wise) against a
+               per-record validate() loop over the same records
+with the types / ranges only (no model loaded) and with the unknown
+category check compiled from the loaded model's encoder categories.
+
+Usage:
+    python benchmark_validation.py
+    python benchmark_validation.py --rows 100 1000 10000
+"""
+
+import argparse
+import json
+import os
+import timeit
+
+from config import BASE_DIR, MODEL_DIR
+from models.model_loader import feature_schema, load_hybrid_model
+from utils.validators import RequestValidator
+
+
+def best_us(fn, number, repeat=5):
+    """Best time per call in microseconds."""
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark request validation.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='batch sizes')
+    args = parser.parse_args()
+
+    with open(os.path.join(BASE_DIR, 'test_data.json')) as f:
+        records = [sample['data'] for sample in json.load(f).values()]
+
+    xgb_model, _, config = load_hybrid_model(MODEL_DIR)
+    features = config['features']
+    validators = [
+        ('types / ranges', RequestValidator(features)),
+        ('+ categories', RequestValidator.from_feature_schema(feature_schema(xgb_model), features)),
+    ]
+
+    print("=" * 70)
+    print("REQUEST VALIDATION BENCHMARK")
+    print("=" * 70)
+    record = records[0]
+    for name, validator in validators:
+        errors, warnings = validator.validate(record)
+        us = best_us(lambda: (validator.missing(record), validator.validate(record)), 20000)
+        print(f"single record, {name:<15} {us:>8.2f} us  "
+              f"({len(errors)} errors, {len(warnings)} unknown categories)")
+
+    print(f"\n{'Batch':<8} {'checks':<16} {'per-record ms':>14} {'column-wise ms':>15} {'speedup':>8}")
+    print(f"{'-' * 8} {'-' * 16} {'-' * 14} {'-' * 15} {'-' * 8}")
+    for n_rows in args.rows:
+        batch = (records * (n_rows // len(records) + 1))[:n_rows]
+        number = max(1, 2000 // n_rows)
+        for name, validator in validators:
+            loop_ms = best_us(lambda: [validator.validate(r) for r in batch], number) / 1e3
+            batch_ms = best_us(lambda: validator.validate_batch(batch), number) / 1e3
+            print(f"{n_rows:<8} {name:<16} {loop_ms:>14.2f} {batch_ms:>15.2f} {loop_ms / batch_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,82 @@ MODEL_DIR = os.getenv(
     str(BASE_DIR.parent.parent / 'machine-learning' / 'src' / 'models' / 'models_high_risk_v3')
 )
 
+# Shared inference package (machine-learning/src/inference/)
+ML_SRC_DIR = os.getenv(
+    'ML_SRC_DIR',
+    str(BASE_DIR.parent.parent / 'machine-learning' / 'src')
+)
+
+# Startup-optimised mode (autoscaling, container restarts): the server starts
+# answering immediately and loads the models in a background thread --
+# GET /api/health/live is up at once, GET /api/health/ready turns 200 when
+# the models are loaded -- and the default backend becomes 'compiled', whose
+# pre-serialised tree arrays load without pandas / sklearn / xgboost.
+FAST_STARTUP = os.getenv('FAST_STARTUP', 'False').lower() == 'true'
+
+# Inference backend for the hybrid model:
+#   'joblib'   - sklearn / XGBoost pipelines (default; 'compiled' with
+#                FAST_STARTUP)
+#   'compiled' - NumPy tree evaluator loaded from hybrid_compiled.npz
+#                (build with machine-learning/src/models/export_compiled.py)
+#   'onnx'     - ONNX Runtime sessions of the flat models, configured from
+#                onnx_session_config.json (v4; written by
+#                machine-learning/src/models/convert_to_onnx_v4_flat.py)
+#   'table'    - precomputed risk lookup table (risk_table.npz, built with
+#                machine-learning/src/models/build_risk_table.py), with the
+#                compiled bundle scoring inputs outside the table
+MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'compiled' if FAST_STARTUP else 'joblib').lower()
+
+# Score single-record requests with the pandas-free row scorer
+# (machine-learning/src/inference/single_row.py) instead of building a
+# one-row DataFrame.  Works with both backends; set to 'false' to disable.
+SINGLE_ROW_FAST_PATH = os.getenv('SINGLE_ROW_FAST_PATH', 'True').lower() == 'true'
+
+# Memoize fast-path predictions per split-point bucket combination
+# (machine-learning/src/inference/split_index.py): records falling between
+# the same tree split thresholds on every feature get identical outputs, so
+# a hit returns exactly what the model would.  LRU of this many entries;
+# 0 disables the cache.
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 4096))
+
+# Micro-batching of concurrent prediction requests (models/batcher.py).
+# When enabled it takes precedence over the single-row fast path: records
+# wait up to MICRO_BATCH_WINDOW_MS for others and are scored together, at
+# most MICRO_BATCH_MAX_ROWS at a time.
+MICRO_BATCHING = os.getenv('MICRO_BATCHING', 'False').lower() == 'true'
+MICRO_BATCH_WINDOW_MS = float(os.getenv('MICRO_BATCH_WINDOW_MS', 2.0))
+MICRO_BATCH_MAX_ROWS = int(os.getenv('MICRO_BATCH_MAX_ROWS', 64))
+
+# Prometheus-style /metrics endpoint (utils/metrics.py): request counts,
+# per-endpoint latency histograms, prediction stage timings, cache and
+# batching statistics.  Recording is lock-free (~1-2 us per request).
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+
+# Per-stage request profiling (utils/profiler.py): this fraction of requests
+# records nanosecond timings per stage, aggregated as flame-graph stacks at
+# GET /admin/profile.  0 disables (the rate can also be changed at runtime
+# with POST /admin/profile).
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0.0))
+
+# Token required in the X-Admin-Token header by the /admin endpoints.  When
+# unset, they are disabled (403): behind a reverse proxy on the same host
+# every request comes from localhost, so the address proves nothing.
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+# Categorical values the fitted encoder does not know are silently encoded
+# as all zeros (e.g. the number 1 where the model was fitted on '1').
+# 'warn' scores them and lists them under "warnings" in the response,
+# 'reject' returns a validation error, 'ignore' skips the check.
+UNKNOWN_CATEGORIES = os.getenv('UNKNOWN_CATEGORIES', 'warn').lower()
+
+# Most records accepted by one batch prediction request
+BATCH_MAX_ROWS = int(os.getenv('BATCH_MAX_ROWS', 1000))
+
+# JSON parsing / encoding of requests and responses (utils/json_codec.py):
+# 'auto' uses orjson when it is installed, else the json module;
+# 'orjson' or 'stdlib' force one.
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto').lower()
+
 # Flask configuration
 FLASK_HOST = os.getenv('FLASK_HOST', '0.0.0.0')
 FLASK_PORT = int(os.getenv('FLASK_PORT', 5000))
@@ -27,7 +103,8 @@ CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*')
 API_TIMEOUT = int(os.getenv('API_TIMEOUT', 30))
 MAX_RETRIES = int(os.getenv('MAX_RETRIES', 3))
 
-# Required input features (26 total)
+# Required input features (26 total): the v3 feature set, used for model
+# configs without a 'features' list (see model_loader.normalize_config)
 REQUIRED_FEATURES = [
     # Demographic features (13)
     'AGE',
@@ -58,3 +135,10 @@ REQUIRED_FEATURES = [
     'REASON_DISCONTINUED',
     'HSBND_DESIRE_FOR_MORE_CHILDREN',
 ]
+
+# Feature groups reported by GET /api/v1/features
+FEATURE_GROUPS = {
+    'demographic': REQUIRED_FEATURES[:13],
+    'fertility': REQUIRED_FEATURES[13:17],
+    'method_history': REQUIRED_FEATURES[17:],
+}
@@ -0,0 +1,194 @@
+"""
+Micro-batching scheduler for concurrent single-record predictions.
+
+Each Flask request thread submits its record and blocks on a Future. A
+single worker thread collects queued records until either the batching
+window (measured from the oldest queued record) elapses or the batch is
+full, scores them as one DataFrame through predict_discontinuation_risk,
+and resolves every waiting request with its own row of the result.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from models.predictor import row_result
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Upper bounds of the batch-size histogram buckets (last bucket is open)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-record predictions into batches.
+
+    Args:
+        predict_fn: Callable taking a DataFrame and returning the
+            predict_discontinuation_risk result dict (per-row arrays)
+        window_ms: Longest time a record waits for others to join its batch
+        max_rows: Batch size that triggers an immediate run
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[['pd.DataFrame'], Dict],
+        window_ms: float = 2.0,
+        max_rows: int = 64
+    ):
+        if window_ms < 0:
+            raise ValueError(f"window_ms must be >= 0, got {window_ms}")
+        if max_rows < 1:
+            raise ValueError(f"max_rows must be >= 1, got {max_rows}")
+
+        self.predict_fn = predict_fn
+        self.window_s = window_ms / 1000.0
+        self.max_rows = int(max_rows)
+
+        self._queue = deque()          # (record, future, enqueue time)
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Metrics (guarded by self._cond)
+        self._batches = 0
+        self._rows = 0
+        self._failed_batches = 0
+        self._max_queue_depth = 0
+        self._max_batch_size = 0
+        self._total_wait_s = 0.0
+        self._total_batch_s = 0.0
+        self._histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+        self._worker = threading.Thread(
+            target=self._run, name='micro-batcher', daemon=True
+        )
+        self._worker.start()
+
+    # ------------------------------------------------------------------
+    # Request side
+    # ------------------------------------------------------------------
+
+    def submit(self, record: Dict[str, Any]) -> Future:
+        """
+        Queue one validated record for the next batch.
+
+        Returns:
+            Future resolving to the same dict as predict_single_record
+
+        Raises:
+            RuntimeError: If the batcher has been closed
+        """
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Micro-batcher is closed")
+            self._queue.append((record, future, time.monotonic()))
+            self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+            self._cond.notify()
+        return future
+
+    def predict(self, record: Dict[str, Any], timeout: Optional[float] = None) -> Dict:
+        """Submit a record and wait for its result (re-raises batch errors)."""
+        return self.submit(record).result(timeout=timeout)
+
+    def close(self) -> None:
+        """Stop accepting records; queued records are still scored."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join()
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+
+    def _next_batch(self) -> List:
+        """Block until a batch is due; returns [] once closed and drained."""
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return []
+                self._cond.wait()
+
+            deadline = self._queue[0][2] + self.window_s
+            while len(self._queue) < self.max_rows and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            n = min(len(self._queue), self.max_rows)
+            return [self._queue.popleft() for _ in range(n)]
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List) -> None:
+        started = time.monotonic()
+        try:
+            import pandas as pd
+            results = self.predict_fn(pd.DataFrame([record for record, _, _ in batch]))
+            rows = [row_result(results, i) for i in range(len(batch))]
+        except Exception as e:
+            with self._cond:
+                self._failed_batches += 1
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        finished = time.monotonic()
+        with self._cond:
+            self._batches += 1
+            self._rows += len(batch)
+            self._max_batch_size = max(self._max_batch_size, len(batch))
+            self._total_wait_s += sum(started - enqueued for _, _, enqueued in batch)
+            self._total_batch_s += finished - started
+            self._histogram[_bucket(len(batch))] += 1
+
+        for (_, future, _), row in zip(batch, rows):
+            future.set_result(row)
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the batching metrics.
+
+        Returns:
+            Dictionary with current queue depth, batch counts, batch size
+            (mean / max / histogram), mean queue wait and mean batch time
+        """
+        with self._cond:
+            labels = [f"<={b}" for b in BATCH_SIZE_BUCKETS] + [f">{BATCH_SIZE_BUCKETS[-1]}"]
+            return {
+                'window_ms': self.window_s * 1000.0,
+                'max_rows': self.max_rows,
+                'queue_depth': len(self._queue),
+                'max_queue_depth': self._max_queue_depth,
+                'batches': self._batches,
+                'failed_batches': self._failed_batches,
+                'rows': self._rows,
+                'mean_batch_size': round(self._rows / self._batches, 3) if self._batches else 0.0,
+                'max_batch_size': self._max_batch_size,
+                'batch_size_histogram': dict(zip(labels, self._histogram)),
+                'mean_queue_wait_ms': round(self._total_wait_s / self._rows * 1e3, 3) if self._rows else 0.0,
+                'mean_batch_ms': round(self._total_batch_s / self._batches * 1e3, 3) if self._batches else 0.0,
+            }
+
+
+def _bucket(size: int) -> int:
+    for i, upper in enumerate(BATCH_SIZE_BUCKETS):
+        if size <= upper:
+            return i
+    return len(BATCH_SIZE_BUCKETS)
+
@@ -3,72 +3,284 @@ ML model loader for high-recall hybrid discontinuation risk model.
 """
 
 import json
-import joblib
+import re
+import sys
 from pathlib import Path
-from typing import Dict, Tuple, Any
+from typing import Any, Callable, Dict, Optional, Tuple
 
+from config import ML_SRC_DIR, MODEL_BACKEND, REQUIRED_FEATURES
+from models.onnx_model import ONNX_SESSION_CONFIG_FILE
 
-def load_hybrid_model(model_dir: str) -> Tuple[Any, Any, Dict]:
+# Compiled bundle written by machine-learning/src/models/export_compiled.py
+COMPILED_MODEL_FILE = 'hybrid_compiled.npz'
+
+# Lookup table written by machine-learning/src/models/build_risk_table.py
+RISK_TABLE_FILE = 'risk_table.npz'
+
+SUPPORTED_BACKENDS = ('joblib', 'compiled', 'onnx', 'table')
+
+
+def _find_config(model_path: Path) -> Tuple[Path, str]:
+    """
+    Locate the hybrid config JSON (hybrid_<version>_config.json).
+
+    Returns:
+        Tuple of (config_path, model_version)
+    """
+    for config_path in sorted(model_path.glob('hybrid_v*_config.json')):
+        match = re.fullmatch(r'hybrid_(v\d+)_config\.json', config_path.name)
+        if match:
+            return config_path, match.group(1)
+    return model_path / 'hybrid_v3_config.json', 'v3'
+
+
+def normalize_config(config: Dict, model_version: str) -> Dict:
+    """
+    Add version-independent keys to a hybrid config.
+
+    Each model version stores its operating point under versioned keys
+    (threshold_v3 / conf_margin_v3, threshold_v4 / conf_margin_v4, ...).
+    The rest of the backend reads 'threshold', 'conf_margin' and
+    'model_version' instead, and 'features': the input features the model
+    uses (the config's 'features' list, REQUIRED_FEATURES for configs
+    without one, such as v3's).
+
+    Raises:
+        ValueError: If the versioned keys are missing, or 'features' does
+            not match 'n_features'
+    """
+    required_keys = [f'threshold_{model_version}', f'conf_margin_{model_version}']
+    missing_keys = [key for key in required_keys if key not in config]
+    if missing_keys:
+        raise ValueError(f"Configuration missing required keys: {missing_keys}")
+
+    features = list(config.get('features') or REQUIRED_FEATURES)
+    if len(set(features)) != len(features):
+        raise ValueError("Configuration 'features' lists a feature more than once")
+    if 'n_features' in config and config['n_features'] != len(features):
+        raise ValueError(
+            f"Configuration lists {len(features)} features, n_features is {config['n_features']}"
+        )
+
+    normalized = dict(config)
+    normalized['threshold'] = float(config[f'threshold_{model_version}'])
+    normalized['conf_margin'] = float(config[f'conf_margin_{model_version}'])
+    normalized['model_version'] = model_version
+    normalized['features'] = features
+    return normalized
+
+
+def ensure_ml_src() -> None:
+    """Make machine-learning/src importable (for the shared 'inference' package)."""
+    if ML_SRC_DIR not in sys.path:
+        # Appended (not prepended) so the backend's own 'models' package wins
+        sys.path.append(ML_SRC_DIR)
+
+
+def _load_compiled(bundle_path: Path) -> Tuple[Any, Any]:
+    """Load the NumPy-only compiled XGBoost + Decision Tree evaluators."""
+    ensure_ml_src()
+    from inference import load_hybrid
+
+    xgb_model, dt_model, _ = load_hybrid(bundle_path)
+    return xgb_model, dt_model
+
+
+def _load_table(table_path: Path, bundle_path: Path) -> Tuple[Any, Any]:
+    """
+    Load the precomputed risk table, with the compiled models as fallback
+    for inputs outside the table.
+    """
+    ensure_ml_src()
+    from inference import load_hybrid
+    from inference.risk_table import RiskTable
+
+    fallback = load_hybrid(bundle_path)[:2]
+    return RiskTable.load(table_path).members(fallback=fallback)
+
+
+def _load_onnx(config_path: Path) -> Tuple[Any, Any]:
+    """Load the flat ONNX models with their benchmarked session options."""
+    ensure_ml_src()
+    from models.onnx_model import load_onnx_models
+
+    return load_onnx_models(config_path)
+
+
+def load_hybrid_model(model_dir: str, backend: str = MODEL_BACKEND) -> Tuple[Any, Any, Dict]:
     """
     Load XGBoost, Decision Tree models and configuration.
-    
+
     Args:
         model_dir: Path to directory containing model files
-        
+        backend: 'joblib' for the sklearn pipelines, 'compiled' for the
+            NumPy tree evaluator, 'onnx' for ONNX Runtime sessions of the
+            flat models, 'table' for the precomputed risk lookup table
+            (same predict_proba / predict interface)
+
     Returns:
         Tuple of (xgb_model, dt_model, config)
-        
+
     Raises:
         FileNotFoundError: If model files are missing
         ValueError: If model files are corrupted or invalid
     """
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(
+            f"Unknown MODEL_BACKEND '{backend}'. Expected one of {SUPPORTED_BACKENDS}"
+        )
+
     model_path = Path(model_dir)
-    
+
     # Define expected file paths
-    xgb_path = model_path / 'xgb_high_recall.joblib'
-    dt_path = model_path / 'dt_high_recall.joblib'
-    config_path = model_path / 'hybrid_v3_config.json'
-    
+    config_path, model_version = _find_config(model_path)
+    if backend == 'compiled':
+        model_files = [model_path / COMPILED_MODEL_FILE]
+    elif backend == 'onnx':
+        model_files = [model_path / ONNX_SESSION_CONFIG_FILE]
+    elif backend == 'table':
+        model_files = [model_path / RISK_TABLE_FILE, model_path / COMPILED_MODEL_FILE]
+    else:
+        model_files = [
+            model_path / 'xgb_high_recall.joblib',
+            model_path / 'dt_high_recall.joblib',
+        ]
+
     # Validate all files exist
-    missing_files = []
-    if not xgb_path.exists():
-        missing_files.append(str(xgb_path))
-    if not dt_path.exists():
-        missing_files.append(str(dt_path))
-    if not config_path.exists():
-        missing_files.append(str(config_path))
-    
+    missing_files = [
+        str(path) for path in model_files + [config_path]
+        if not path.exists()
+    ]
+
     if missing_files:
         raise FileNotFoundError(
             f"Missing model files: {', '.join(missing_files)}\n"
             f"Expected directory: {model_dir}"
         )
-    
+
     try:
         # Load models
-        print(f"Loading XGBoost model from {xgb_path}...")
-        xgb_model = joblib.load(xgb_path)
-        
-        print(f"Loading Decision Tree model from {dt_path}...")
-        dt_model = joblib.load(dt_path)
-        
+        if backend == 'compiled':
+            print(f"Loading compiled XGBoost + Decision Tree from {model_files[0]}...")
+            xgb_model, dt_model = _load_compiled(model_files[0])
+        elif backend == 'onnx':
+            print(f"Loading ONNX session config from {model_files[0]}...")
+            xgb_model, dt_model = _load_onnx(model_files[0])
+        elif backend == 'table':
+            print(f"Loading risk lookup table from {model_files[0]}...")
+            xgb_model, dt_model = _load_table(*model_files)
+        else:
+            # Imported here: joblib (and the sklearn / xgboost modules the
+            # pickles pull in) is only needed by this backend
+            import joblib
+
+            xgb_path, dt_path = model_files
+            print(f"Loading XGBoost model from {xgb_path}...")
+            xgb_model = joblib.load(xgb_path)
+
+            print(f"Loading Decision Tree model from {dt_path}...")
+            dt_model = joblib.load(dt_path)
+
         print(f"Loading configuration from {config_path}...")
         with open(config_path, 'r') as f:
-            config = json.load(f)
-        
-        # Validate config has required keys
-        required_keys = ['threshold_v3', 'conf_margin_v3']
-        missing_keys = [key for key in required_keys if key not in config]
-        if missing_keys:
-            raise ValueError(f"Configuration missing required keys: {missing_keys}")
-        
+            config = normalize_config(json.load(f), model_version)
+
         print("✅ Models loaded successfully!")
-        print(f"   - XGBoost threshold: {config['threshold_v3']}")
-        print(f"   - Confidence margin: {config['conf_margin_v3']}")
-        
+        print(f"   - Model version: {config['model_version']} ({backend} backend)")
+        print(f"   - XGBoost threshold: {config['threshold']}")
+        print(f"   - Confidence margin: {config['conf_margin']}")
+        print(f"   - Input features: {len(config['features'])}")
+
         return xgb_model, dt_model, config
-        
+
     except Exception as e:
         if isinstance(e, (FileNotFoundError, ValueError)):
             raise
         raise ValueError(f"Error loading model files: {str(e)}")
+
+
+def build_row_scorer(
+    xgb_model: Any,
+    dt_model: Any,
+    config: Dict,
+    cache_size: int = 0,
+    stage_observer: Optional[Callable[[Dict], None]] = None
+) -> Any:
+    """
+    Build the single-record fast path for the loaded models.
+
+    Joblib pipelines are compiled to the NumPy evaluator here; compiled
+    models are used as-is; the table backend looks records up in its table
+    (compiled row scorer for records outside it). ONNX sessions cannot be
+    compiled, so the onnx backend scores single records through its own
+    session instead.
+
+    Args:
+        xgb_model: Loaded XGBoost pipeline (or its compiled equivalent)
+        dt_model: Loaded Decision Tree pipeline (or its compiled equivalent)
+        config: Normalized configuration dict
+        cache_size: If > 0, memoize results per split-point bucket
+            combination in an LRU cache of this many entries
+        stage_observer: Optional callable receiving the encoding / XGBoost /
+            DT timings of every record the compiled row scorer evaluates
+
+    Returns:
+        HybridRowScorer (or TableRowScorer, wrapped in a MemoizedRowScorer
+        when cached) with a score(record) method
+
+    Raises:
+        ValueError: If the models are ONNX sessions
+    """
+    from models.onnx_model import OnnxModel
+
+    if isinstance(xgb_model, OnnxModel):
+        raise ValueError("not available with the onnx backend")
+
+    ensure_ml_src()
+    from inference.compiled_trees import CompiledPipeline
+    from inference.risk_table import TableMember, TableRowScorer
+    from inference.single_row import HybridRowScorer
+    from inference.split_index import MemoizedRowScorer, SplitIndex
+
+    threshold, conf_margin = config['threshold'], config['conf_margin']
+    if isinstance(xgb_model, TableMember):
+        fallback = HybridRowScorer(*xgb_model.fallback, threshold, conf_margin)
+        fallback.stage_observer = stage_observer
+        scorer = TableRowScorer(xgb_model.table, threshold, conf_margin, fallback=fallback)
+        index = xgb_model.table.index
+    else:
+        if not isinstance(xgb_model, CompiledPipeline):
+            xgb_model = CompiledPipeline.from_pipeline(xgb_model)
+        if not isinstance(dt_model, CompiledPipeline):
+            dt_model = CompiledPipeline.from_pipeline(dt_model)
+        scorer = HybridRowScorer(xgb_model, dt_model, threshold, conf_margin)
+        scorer.stage_observer = stage_observer
+        index = None if cache_size <= 0 else SplitIndex.from_models(xgb_model, dt_model)
+
+    if cache_size > 0:
+        scorer = MemoizedRowScorer(scorer, index, maxsize=cache_size)
+    return scorer
+
+
+def feature_schema(xgb_model: Any) -> Any:
+    """
+    FeatureSchema (fitted encoder categories) of the loaded XGBoost member,
+    whichever backend loaded it.
+
+    Args:
+        xgb_model: Loaded XGBoost pipeline, compiled model, ONNX model or
+            table member
+
+    Returns:
+        inference.encoding.FeatureSchema
+    """
+    ensure_ml_src()
+    from inference.encoding import FeatureSchema
+    from inference.risk_table import TableMember
+
+    if isinstance(xgb_model, TableMember):
+        return xgb_model.table.schema
+    schema = getattr(xgb_model, 'schema', None)
+    if schema is not None:
+        return schema
+    return FeatureSchema.from_pipeline(xgb_model)
@@ -0,0 +1,173 @@
+"""
+ONNX Runtime backend for the flat (float32 OHE input) hybrid models.
+
+Loads xgb_high_recall_flat / dt_high_recall_flat with the SessionOptions
+recommended by the benchmark matrix in onnx_session_config.json
+(machine-learning/src/models/onnx_benchmark.py).  Raw records are encoded
+with the FeatureSchema stored in the same file, so neither sklearn nor
+XGBoost is needed at serving time.
+
+The recommendation is specific to the benchmark host (thread counts,
+optimization level, and the .ort files saved at that level).  It is used
+only when this host has the same number of CPUs (``host_cpu_count``);
+otherwise the .onnx files are loaded with ONNX Runtime's default options.
+ORT-format files are tied to the ONNX Runtime version that wrote them, so
+the .onnx file is also used when the installed version differs from the
+config's ``onnxruntime`` or the .ort file fails to load.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+# Written by machine-learning/src/models/onnx_benchmark.py
+ONNX_SESSION_CONFIG_FILE = 'onnx_session_config.json'
+
+_EXECUTION_MODES = ('sequential', 'parallel')
+
+
+def session_options(options: Dict[str, Any]) -> Any:
+    """
+    Build onnxruntime.SessionOptions from a session config entry.
+
+    Args:
+        options: Dict with intra_op_num_threads, inter_op_num_threads,
+            execution_mode ('sequential' / 'parallel') and
+            graph_optimization_level ('disable' / 'basic' / 'extended' / 'all')
+
+    Returns:
+        onnxruntime.SessionOptions
+    """
+    import onnxruntime as ort
+
+    levels = {
+        'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+    }
+    level = options.get('graph_optimization_level', 'all')
+    mode = options.get('execution_mode', 'sequential')
+    if level not in levels:
+        raise ValueError(f"Unknown graph_optimization_level '{level}'")
+    if mode not in _EXECUTION_MODES:
+        raise ValueError(f"Unknown execution_mode '{mode}'")
+
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = int(options.get('intra_op_num_threads', 0))
+    so.inter_op_num_threads = int(options.get('inter_op_num_threads', 0))
+    so.execution_mode = (
+        ort.ExecutionMode.ORT_SEQUENTIAL if mode == 'sequential'
+        else ort.ExecutionMode.ORT_PARALLEL
+    )
+    so.graph_optimization_level = levels[level]
+    return so
+
+
+class OnnxModel:
+    """
+    Flat ONNX classifier with the sklearn predict_proba / predict interface.
+
+    Args:
+        session: onnxruntime.InferenceSession of a flat model
+        schema: FeatureSchema used to encode DataFrames into the input tensor
+        input_name: Name of the float32 input tensor
+    """
+
+    def __init__(self, session: Any, schema: Any, input_name: str = 'float_input'):
+        self.session = session
+        self.schema = schema
+        self.input_name = input_name
+        self.classes_ = np.array([0, 1])
+
+    def _run(self, X) -> list:
+        if not isinstance(X, np.ndarray):
+            X = self.schema.encode_frame(X)
+        return self.session.run(None, {self.input_name: np.asarray(X, dtype=np.float32)})
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities, shape (n, 2)."""
+        return np.asarray(self._run(X)[1], dtype=np.float32)
+
+    def predict(self, X) -> np.ndarray:
+        """Predicted class labels, shape (n,)."""
+        return np.asarray(self._run(X)[0]).astype(np.int64).ravel()
+
+
+def load_onnx_models(config_path: Path) -> Tuple[OnnxModel, OnnxModel]:
+    """
+    Load the XGBoost and Decision Tree ONNX sessions named in the config.
+
+    Args:
+        config_path: Path to onnx_session_config.json next to the models;
+            its session options are used only if host_cpu_count matches
+            this host
+
+    Returns:
+        Tuple of (xgb_model, dt_model)
+
+    Raises:
+        FileNotFoundError: If an .onnx file named in the config is missing
+        ValueError: If the config has no feature schema or model entry
+    """
+    import onnxruntime as ort
+    from inference.encoding import FeatureSchema
+
+    with open(config_path, 'r') as f:
+        session_config = json.load(f)
+
+    if 'feature_schema' not in session_config:
+        raise ValueError(f"{config_path.name} has no feature_schema")
+    schema = FeatureSchema.from_dict(session_config['feature_schema'])
+    input_name = session_config.get('input_name', 'float_input')
+
+    # Benchmarked options only apply to a host like the benchmark host
+    benchmarked_cpus = session_config.get('host_cpu_count')
+    host_cpus = os.cpu_count() or 1
+    use_benchmark = benchmarked_cpus == host_cpus
+    if not use_benchmark:
+        print(f"⚠️  {config_path.name} was benchmarked on {benchmarked_cpus} CPU(s), "
+              f"this host has {host_cpus}: using ONNX Runtime defaults")
+
+    # .ort files only load reliably in the ONNX Runtime version that wrote them
+    exported_with = session_config.get('onnxruntime')
+    use_ort = exported_with == ort.__version__
+    if use_benchmark and not use_ort:
+        print(f"⚠️  .ort models were written by onnxruntime {exported_with}, "
+              f"{ort.__version__} is installed: loading the .onnx files")
+
+    models = []
+    for key in ('xgb', 'dt'):
+        entry = session_config.get('models', {}).get(key)
+        if entry is None:
+            raise ValueError(f"{config_path.name} has no '{key}' model entry")
+
+        options = entry.get('session_options', {}) if use_benchmark else {}
+        onnx_file = config_path.parent / entry['onnx_file']
+        ort_file = config_path.parent / entry['ort_file']
+        # Prefer the ORT-format file, optimized at the benchmarked level
+        prefer_ort = use_benchmark and use_ort and ort_file.exists()
+        print(f"Loading {key.upper()} ONNX model from {ort_file if prefer_ort else onnx_file} "
+              f"({options.get('intra_op_num_threads', 0)} thread(s), "
+              f"opt level '{options.get('graph_optimization_level', 'all')}')...")
+
+        session = None
+        if prefer_ort:
+            try:
+                session = ort.InferenceSession(
+                    str(ort_file), session_options(options), providers=['CPUExecutionProvider']
+                )
+            except Exception as e:
+                print(f"⚠️  Could not load {ort_file.name} ({e}): using {onnx_file.name}")
+        if session is None:
+            if not onnx_file.exists():
+                raise FileNotFoundError(f"Missing ONNX model file: {onnx_file}")
+            session = ort.InferenceSession(
+                str(onnx_file), session_options(options), providers=['CPUExecutionProvider']
+            )
+        models.append(OnnxModel(session, schema, input_name))
+
+    return models[0], models[1]
@@ -1,17 +1,32 @@
 """
 Prediction logic for high-recall hybrid discontinuation risk model.
+
+The hybrid rule itself lives in the shared inference package
+(machine-learning/src/inference/hybrid.py), which the training and
+evaluation scripts use as well.
+
+pandas is imported on first use: the single-row fast path never builds a
+DataFrame, so a compiled / table backend starts without it.
 """
 
-import numpy as np
-import pandas as pd
-from typing import Dict, Any
+import time
+from typing import TYPE_CHECKING, Dict, Any, Optional, Callable, Mapping
+
+from models.model_loader import ensure_ml_src
+
+ensure_ml_src()
+from inference.hybrid import HybridEngine, risk_confidence, row_result  # noqa: E402
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def predict_discontinuation_risk(
-    X: pd.DataFrame,
+    X: 'pd.DataFrame',
     xgb_model: Any,
     dt_model: Any,
-    config: Dict
+    config: Dict,
+    stage_observer: Optional[Callable[[Dict], None]] = None
 ) -> Dict:
     """
     Predict discontinuation risk using hybrid model.
@@ -22,10 +37,12 @@ def predict_discontinuation_risk(
     3. Never downgrade a positive prediction
     
     Args:
-        X: pandas DataFrame with 26 required features
-        xgb_model: Trained XGBoost pipeline
-        dt_model: Trained Decision Tree pipeline
-        config: Configuration dict with threshold_v3 and conf_margin_v3
+        X: pandas DataFrame with the required features
+        xgb_model: Trained XGBoost pipeline (or its compiled equivalent)
+        dt_model: Trained Decision Tree pipeline (or its compiled equivalent)
+        config: Normalized configuration dict with threshold and conf_margin
+        stage_observer: Optional callable receiving the XGBoost / DT
+            inference timings ({'xgb': s, 'dt': s})
         
     Returns:
         Dictionary with keys:
@@ -38,9 +55,7 @@ def predict_discontinuation_risk(
     Raises:
         ValueError: If input validation fails
     """
-    # Extract configuration parameters
-    THRESH_XGB = config["threshold_v3"]
-    CONF_MARGIN = config["conf_margin_v3"]
+    import pandas as pd
     
     # Validate input
     if not isinstance(X, pd.DataFrame):
@@ -49,29 +64,135 @@ def predict_discontinuation_risk(
     if X.empty:
         raise ValueError("Input DataFrame is empty")
     
-    # Get XGBoost probabilities and base prediction
-    xgb_probs = xgb_model.predict_proba(X)[:, 1]
-    xgb_pred = (xgb_probs >= THRESH_XGB).astype(int)
+    return HybridEngine.from_config(xgb_model, dt_model, config, stage_observer).predict(X)
+
+
+def predict_single_record(
+    record: Dict[str, Any],
+    xgb_model: Any,
+    dt_model: Any,
+    config: Dict,
+    row_scorer: Optional[Any] = None,
+    batcher: Optional[Any] = None,
+    stage_observer: Optional[Callable[[Dict], None]] = None,
+    profiler: Optional[Any] = None
+) -> Dict:
+    """
+    Predict discontinuation risk for one validated request record.
+    
+    Routing, in order of preference:
+    1. batcher: queue the record with other concurrent requests and score
+       them as one batch (see models/batcher.py)
+    2. row_scorer: the pandas-free single-row evaluator
+       (see model_loader.build_row_scorer)
+    3. a one-row DataFrame through predict_discontinuation_risk
+    All three give identical results.
+    
+    Args:
+        record: Validated request dict (feature name -> value)
+        xgb_model: Trained XGBoost pipeline (or its compiled equivalent)
+        dt_model: Trained Decision Tree pipeline (or its compiled equivalent)
+        config: Normalized configuration dict with threshold and conf_margin
+        row_scorer: Optional HybridRowScorer for the same models
+        batcher: Optional MicroBatcher wrapping the same models
+        stage_observer: Optional callable receiving the inference timings
+            of the DataFrame path (the batcher and row scorer report their
+            own)
+        profiler: Optional StageProfiler; when the current request is
+            sampled, the DataFrame path times DataFrame construction and
+            every pipeline step (see utils/profiler.py)
+        
+    Returns:
+        Dictionary of Python scalars with keys:
+            - prediction: 0 or 1
+            - xgb_probability: float in [0, 1]
+            - xgb_prediction: 0 or 1
+            - dt_prediction: 0 or 1
+            - upgraded_by_dt: bool
+    """
+    if batcher is not None:
+        return batcher.predict(record)
+    
+    if row_scorer is not None:
+        return row_scorer.score(record)
+    
+    import pandas as pd
     
-    # Get Decision Tree prediction
-    dt_pred = dt_model.predict(X)
+    if profiler is not None and profiler.sampling:
+        with profiler.stage('pd.DataFrame'):
+            X = pd.DataFrame([record])
+        xgb_model = profiler.member(xgb_model, 'xgb')
+        dt_model = profiler.member(dt_model, 'dt')
+    else:
+        X = pd.DataFrame([record])
     
-    # Apply upgrade-only hybrid rule
-    hybrid_pred = xgb_pred.copy()
+    results = predict_discontinuation_risk(X, xgb_model, dt_model, config, stage_observer)
+    return row_result(results, 0)
+
+
+def _column_encoder(xgb_model: Any, dt_model: Any) -> Optional[Callable]:
+    """
+    encode(columns, n_rows) producing the matrix both members accept, or
+    None when they need a DataFrame (joblib pipelines).
+    """
+    from inference.risk_table import TableMember
+
+    if isinstance(xgb_model, TableMember) and isinstance(dt_model, TableMember) \
+            and xgb_model.table is dt_model.table:
+        return xgb_model.table.schema.encode_index_columns
+    schema = getattr(xgb_model, 'schema', None)
+    if schema is not None and schema == getattr(dt_model, 'schema', None):
+        return schema.encode_columns
+    return None
+
+
+def predict_columns(
+    columns: Mapping[str, Any],
+    n_rows: int,
+    xgb_model: Any,
+    dt_model: Any,
+    config: Dict,
+    stage_observer: Optional[Callable[[Dict], None]] = None
+) -> Dict:
+    """
+    Predict discontinuation risk for validated column-oriented input.
+    
+    The columns are encoded once into the design matrix both models share
+    (compiled, ONNX and table backends), instead of once per model from a
+    DataFrame.  Joblib pipelines get a DataFrame of the decoded columns.
+    
+    Args:
+        columns: Feature name -> n_rows values (NumPy arrays, lists or
+            inference.encoding.DictionaryColumn)
+        n_rows: Number of rows
+        xgb_model: Trained XGBoost pipeline (or its compiled equivalent)
+        dt_model: Trained Decision Tree pipeline (or its compiled equivalent)
+        config: Normalized configuration dict with threshold and conf_margin
+        stage_observer: Optional callable receiving the encoding timing
+            ({'encoding': s}) and the XGBoost / DT inference timings
+        
+    Returns:
+        Dictionary of arrays as for predict_discontinuation_risk()
+        
+    Raises:
+        ValueError: If there are no rows
+    """
+    from inference.encoding import DictionaryColumn
     
-    # Identify low-confidence predictions
-    # (when XGBoost probability is close to the threshold)
-    low_conf_mask = np.abs(xgb_probs - THRESH_XGB) < CONF_MARGIN
+    if n_rows == 0:
+        raise ValueError("Input columns are empty")
     
-    # Upgrade only: if low-confidence AND DT predicts 1, set hybrid to 1
-    # This increases recall by trusting DT on uncertain XGB cases
-    upgrade_mask = (low_conf_mask) & (dt_pred == 1)
-    hybrid_pred[upgrade_mask] = 1
+    start = time.perf_counter()
+    encode = _column_encoder(xgb_model, dt_model)
+    if encode is not None:
+        X = encode(columns, n_rows)
+    else:
+        import pandas as pd
+        X = pd.DataFrame({
+            name: values.decode() if isinstance(values, DictionaryColumn) else values
+            for name, values in columns.items()
+        })
+    if stage_observer is not None:
+        stage_observer({'encoding': time.perf_counter() - start})
     
-    return {
-        'predictions': hybrid_pred,
-        'xgb_probabilities': xgb_probs,
-        'xgb_predictions': xgb_pred,
-        'dt_predictions': dt_pred,
-        'upgrade_flags': upgrade_mask
-    }
+    return HybridEngine.from_config(xgb_model, dt_model, config, stage_observer).predict(X)
@@ -0,0 +1,349 @@
+"""
+API tests with the Flask test client (no running server needed).
+
+Models are loaded in-process from machine-learning/src/models for each
+model version and unknown-category policy under test.
+
+Usage:
+    cd mobile-app/backend
+    python -m pytest -q test_app.py
+    MODEL_BACKEND=compiled python -m pytest -q test_app.py
+"""
+
+import json
+import os
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+
+import app as server
+from config import BASE_DIR, ML_SRC_DIR
+from utils.columnar import CONTENT_TYPE_ARROW, CONTENT_TYPE_NUMPY, encode_numpy
+
+MODELS_DIR = Path(ML_SRC_DIR) / 'models'
+# Train / test split the v4 models were fitted and evaluated on
+DATA_PKL = Path(ML_SRC_DIR).parent / 'data' / 'processed' / 'discontinuation_design1_data_v2.pkl'
+MODEL_DIRS = {
+    'v3': MODELS_DIR / 'models_high_risk_v3',
+    'v4': MODELS_DIR / 'models_high_risk_v4',
+}
+
+SINGLE_URL = '/api/v1/discontinuation-risk'
+BATCH_URL = '/api/v1/discontinuation-risk/batch'
+
+# A v4 record as the app sends it (string categories, numeric AGE / PARITY)
+V4_RECORD = {
+    'PATTERN_USE': 'Intermittent',
+    'HUSBAND_AGE': '43',
+    'AGE': 35,
+    'ETHNICITY': 'Ilocano',
+    'HOUSEHOLD_HEAD_SEX': 'Male',
+    'CONTRACEPTIVE_METHOD': 'Pills',
+    'SMOKE_CIGAR': 'No',
+    'DESIRE_FOR_MORE_CHILDREN': 'No',
+    'PARITY': 2,
+}
+
+
+@pytest.fixture
+def load(monkeypatch):
+    """Load a model version with an unknown-category policy; returns a test client."""
+    def _load(version, unknown_policy='warn'):
+        if server.MODEL_BACKEND == 'onnx' and version != 'v4':
+            pytest.skip('the ONNX backend has v4 models only')
+        monkeypatch.setattr(server, 'MODEL_DIR', str(MODEL_DIRS[version]))
+        monkeypatch.setattr(server, 'UNKNOWN_CATEGORIES', unknown_policy)
+        server.load_models()
+        assert server.models_loaded, f"{version} models failed to load"
+        assert server.config['model_version'] == version
+        return server.app.test_client()
+    return _load
+
+
+def v3_records():
+    """The test_data.json samples (v3 payloads, integer-coded answers)."""
+    with open(os.path.join(BASE_DIR, 'test_data.json')) as f:
+        return [sample['data'] for sample in json.load(f).values()]
+
+
+def v4_test_rows(config, n_rows=200):
+    """
+    The first rows of the v4 test split, as (JSON records with all their
+    columns, the joblib pipelines' hybrid result on the same rows).
+
+    Args:
+        config: The loaded v4 model config (normalized)
+    """
+    from inference.hybrid import HybridEngine
+
+    _, X_test, _, _ = joblib.load(DATA_PKL)
+    X = X_test.iloc[:n_rows]
+    engine = HybridEngine(
+        joblib.load(MODEL_DIRS['v4'] / 'xgb_high_recall.joblib'),
+        joblib.load(MODEL_DIRS['v4'] / 'dt_high_recall.joblib'),
+        config['threshold'], config['conf_margin'],
+    )
+    return json.loads(X.to_json(orient='records')), engine.predict(X[config['features']])
+
+
+def numpy_body(records):
+    """CONTENT_TYPE_NUMPY body: numbers as arrays, strings dictionary-encoded."""
+    arrays, dictionaries = {}, {}
+    for name in records[0]:
+        values = [r[name] for r in records]
+        if all(isinstance(v, (int, float)) for v in values):
+            arrays[name] = np.asarray(values)
+        else:
+            dictionary = sorted(set(values))
+            arrays[name] = np.array([dictionary.index(v) for v in values], dtype=np.int16)
+            dictionaries[name] = dictionary
+    return encode_numpy(arrays, dictionaries)
+
+
+def arrow_body(records):
+    """CONTENT_TYPE_ARROW body of the records' columns."""
+    pa = pytest.importorskip('pyarrow')
+    table = pa.table({name: [r[name] for r in records] for name in records[0]})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+# ----------------------------------------------------------------------
+# Single record
+# ----------------------------------------------------------------------
+
+def test_v4_record_scores_without_warnings(load):
+    client = load('v4')
+    response = client.post(SINGLE_URL, json=V4_RECORD)
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['risk_level'] in ('LOW', 'HIGH')
+    assert 0.0 <= body['xgb_probability'] <= 1.0
+    assert body['metadata']['model_version'] == 'v4'
+    assert 'warnings' not in body
+
+
+def test_v4_numeric_feature_must_be_a_number(load):
+    client = load('v4')
+    response = client.post(SINGLE_URL, json={**V4_RECORD, 'AGE': '35'})
+    assert response.status_code == 400
+    assert response.get_json()['validation_errors'] == ['AGE must be a number, got str']
+
+
+def test_v4_number_for_string_category_warns(load):
+    client = load('v4', 'warn')
+    response = client.post(SINGLE_URL, json={**V4_RECORD, 'HUSBAND_AGE': 43})
+    assert response.status_code == 200
+    assert response.get_json()['warnings'] == [
+        "HUSBAND_AGE: unknown category 43, encoded as all zeros (the model knows '43')"
+    ]
+
+
+def test_v4_number_for_string_category_rejected(load):
+    client = load('v4', 'reject')
+    response = client.post(SINGLE_URL, json={**V4_RECORD, 'HUSBAND_AGE': 43})
+    assert response.status_code == 400
+    assert response.get_json()['validation_errors'] == [
+        "HUSBAND_AGE: unknown category 43, encoded as all zeros (the model knows '43')"
+    ]
+
+
+def test_v3_payload_warns_on_integer_categories(load):
+    client = load('v3', 'warn')
+    response = client.post(SINGLE_URL, json=v3_records()[0])
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['metadata']['model_version'] == 'v3'
+    assert body['warnings']
+    assert all('unknown category' in message for message in body['warnings'])
+
+
+def test_v3_payload_rejected_on_integer_categories(load):
+    client = load('v3', 'reject')
+    response = client.post(SINGLE_URL, json=v3_records()[0])
+    assert response.status_code == 400
+    errors = response.get_json()['validation_errors']
+    assert errors and all('unknown category' in message for message in errors)
+
+
+def test_v3_unknown_categories_ignored(load):
+    client = load('v3', 'ignore')
+    response = client.post(SINGLE_URL, json=v3_records()[0])
+    assert response.status_code == 200
+    assert 'warnings' not in response.get_json()
+
+
+def test_missing_features(load):
+    client = load('v4')
+    record = {k: v for k, v in V4_RECORD.items() if k != 'PARITY'}
+    response = client.post(SINGLE_URL, json=record)
+    assert response.status_code == 400
+    assert response.get_json()['missing_features'] == ['PARITY']
+
+
+@pytest.mark.parametrize('body', [[V4_RECORD], [], 'text', 42])
+def test_non_object_body_is_rejected(load, body):
+    client = load('v4')
+    response = client.post(SINGLE_URL, json=body)
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Request body must contain JSON data'
+
+
+# ----------------------------------------------------------------------
+# Batches: JSON records vs binary columns
+# ----------------------------------------------------------------------
+
+@pytest.mark.parametrize('version', ['v3', 'v4'])
+@pytest.mark.parametrize('encode, content_type', [
+    (numpy_body, CONTENT_TYPE_NUMPY),
+    (arrow_body, CONTENT_TYPE_ARROW),
+])
+def test_binary_batch_matches_json(load, version, encode, content_type):
+    client = load(version, 'warn')
+    if version == 'v4':
+        records = [V4_RECORD, {**V4_RECORD, 'HUSBAND_AGE': '  ', 'PARITY': 0},
+                   {**V4_RECORD, 'AGE': 22, 'ETHNICITY': 'Tagalog'}]
+    else:
+        records = v3_records()
+    records = records * 3
+
+    as_json = client.post(BATCH_URL, json={'records': records})
+    as_binary = client.post(BATCH_URL, data=encode(records), content_type=content_type)
+    assert as_json.status_code == 200, as_json.get_json()
+    assert as_binary.status_code == 200, as_binary.get_json()
+    assert as_binary.get_json() == as_json.get_json()
+
+
+def test_batch_reports_invalid_rows(load):
+    client = load('v4', 'reject')
+    records = [V4_RECORD, {**V4_RECORD, 'AGE': 70}, {**V4_RECORD, 'SMOKE_CIGAR': 'Sometimes'}]
+    response = client.post(BATCH_URL, json={'records': records})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['results'][0] is not None
+    assert body['results'][1] is None and body['results'][2] is None
+    assert body['errors'] == [
+        {'index': 1, 'validation_errors': ['AGE must be between 15 and 55, got 70']},
+        {'index': 2, 'validation_errors': ["SMOKE_CIGAR: unknown category 'Sometimes', encoded as all zeros"]},
+    ]
+
+
+# ----------------------------------------------------------------------
+# Missing numbers
+# ----------------------------------------------------------------------
+
+def test_missing_number_is_rejected(load):
+    client = load('v4')
+    response = client.post(SINGLE_URL, json={**V4_RECORD, 'AGE': None})
+    assert response.status_code == 400
+    assert response.get_json()['validation_errors'] == ['AGE must be a number, got a missing value']
+    # NaN is not JSON, but reaches validate() from other callers
+    errors, _ = server.request_validator.validate({**V4_RECORD, 'AGE': float('nan')})
+    assert errors == ['AGE must be a number, got a missing value']
+
+
+@pytest.mark.parametrize('encode, content_type', [
+    (numpy_body, CONTENT_TYPE_NUMPY),
+    (arrow_body, CONTENT_TYPE_ARROW),
+])
+def test_missing_number_in_binary_batch_matches_json(load, encode, content_type):
+    client = load('v4')
+    records = [V4_RECORD, {**V4_RECORD, 'AGE': None}, {**V4_RECORD, 'PARITY': None}]
+    if content_type == CONTENT_TYPE_NUMPY:
+        # No nulls in a NumPy body: missing numbers are NaN
+        body = encode([{k: np.nan if v is None else v for k, v in r.items()} for r in records])
+    else:
+        body = encode(records)
+
+    as_json = client.post(BATCH_URL, json={'records': records})
+    as_binary = client.post(BATCH_URL, data=body, content_type=content_type)
+    assert as_json.status_code == 200
+    assert as_binary.get_json() == as_json.get_json()
+    assert as_json.get_json()['errors'] == [
+        {'index': 1, 'validation_errors': ['AGE must be a number, got a missing value']},
+        {'index': 2, 'validation_errors': ['PARITY must be a number, got a missing value']},
+    ]
+
+
+# ----------------------------------------------------------------------
+# v4 parity with the fitted pipelines
+# ----------------------------------------------------------------------
+
+def test_v4_test_split_matches_joblib_pipeline(load):
+    """Real test-split rows (all their columns, as a client would send them) score as the pipelines do."""
+    # 'warn': a few test rows have answers the encoder was not fitted on,
+    # which the pipelines encode as all zeros too
+    client = load('v4', 'warn')
+    records, expected = v4_test_rows(server.config)
+    expected_level = np.where(expected['predictions'] == 1, 'HIGH', 'LOW')
+
+    for i in range(0, len(records), 20):
+        response = client.post(SINGLE_URL, json=records[i])
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        assert body['xgb_probability'] == pytest.approx(expected['xgb_probabilities'][i], abs=1e-4)
+        assert body['risk_level'] == expected_level[i]
+
+    response = client.post(BATCH_URL, json={'records': records})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['errors'] == []
+    probabilities = [result['xgb_probability'] for result in body['results']]
+    assert probabilities == pytest.approx(list(expected['xgb_probabilities']), abs=1e-4)
+    assert [result['risk_level'] for result in body['results']] == list(expected_level)
+
+
+# ----------------------------------------------------------------------
+# ONNX backend
+# ----------------------------------------------------------------------
+
+@pytest.mark.parametrize('ort_problem', ['corrupt', 'other_version'])
+def test_onnx_falls_back_to_onnx_files(tmp_path, ort_problem):
+    ort = pytest.importorskip('onnxruntime')
+    from models.onnx_model import ONNX_SESSION_CONFIG_FILE, load_onnx_models
+
+    source = MODEL_DIRS['v4']
+    with open(source / ONNX_SESSION_CONFIG_FILE) as f:
+        session_config = json.load(f)
+    # Benchmarked on this host, so the .ort files would be preferred
+    session_config['host_cpu_count'] = os.cpu_count() or 1
+    session_config['onnxruntime'] = ort.__version__ if ort_problem == 'corrupt' else '0.0.0'
+    for entry in session_config['models'].values():
+        (tmp_path / entry['onnx_file']).write_bytes((source / entry['onnx_file']).read_bytes())
+        (tmp_path / entry['ort_file']).write_bytes(b'not an ORT model')
+    with open(tmp_path / ONNX_SESSION_CONFIG_FILE, 'w') as f:
+        json.dump(session_config, f)
+
+    xgb_model, dt_model = load_onnx_models(tmp_path / ONNX_SESSION_CONFIG_FILE)
+    X = np.zeros((3, session_config['n_features']), dtype=np.float32)
+    for model, key in ((xgb_model, 'xgb'), (dt_model, 'dt')):
+        reference = ort.InferenceSession(
+            str(source / session_config['models'][key]['onnx_file']), providers=['CPUExecutionProvider']
+        )
+        expected = reference.run(None, {reference.get_inputs()[0].name: X})[1]
+        assert model.predict_proba(X) == pytest.approx(np.asarray(expected), abs=1e-6)
+
+
+# ----------------------------------------------------------------------
+# Admin endpoints
+# ----------------------------------------------------------------------
+
+def test_admin_disabled_without_token(monkeypatch):
+    monkeypatch.setattr(server, 'ADMIN_TOKEN', '')
+    client = server.app.test_client()
+    # Localhost is not trusted (a local reverse proxy makes every client localhost)
+    assert client.get('/admin/profile').status_code == 403
+    assert client.post('/admin/profile', json={'sample_rate': 1.0}).status_code == 403
+
+
+def test_admin_requires_matching_token(monkeypatch):
+    monkeypatch.setattr(server, 'ADMIN_TOKEN', 'secret')
+    client = server.app.test_client()
+    assert client.get('/admin/profile', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    response = client.post('/admin/profile', json={}, headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    assert 'sample_rate' in response.get_json()
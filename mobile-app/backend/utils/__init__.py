@@ -2,6 +2,6 @@
 Utilities package for validation and helpers.
 """
 
-from .validators import validate_input_features
+from .validators import RequestValidator, validate_input_features
 
-__all__ = ['validate_input_features']
+__all__ = ['RequestValidator', 'validate_input_features']
@@ -0,0 +1,110 @@
+"""
+Pluggable JSON encoding for the API.
+
+Flask parses request bodies (request.get_json) and writes responses
+(jsonify) through ``app.json``, a JSONProvider.  make_json_provider()
+returns one for the configured JSON_BACKEND:
+
+- 'orjson': orjson (optional dependency) - parses and encodes several times
+  faster than the standard library and writes NumPy arrays natively
+- 'stdlib': Flask's default provider (json module)
+- 'auto': orjson when it is installed, else stdlib
+
+Both produce the same documents: keys sorted, compact unless the app runs
+in debug mode.  dumps_bytes() encodes with the active provider, NumPy
+arrays included, for responses assembled by hand (utils/responses.py).
+"""
+
+import json
+from typing import Any
+
+import numpy as np
+from flask import Flask, current_app
+from flask.json.provider import DefaultJSONProvider
+
+JSON_BACKENDS = ('auto', 'orjson', 'stdlib')
+
+
+def _numpy_default(obj: Any) -> Any:
+    """NumPy arrays and scalars for the json module; anything else as Flask does."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return DefaultJSONProvider.default(obj)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's default provider, plus NumPy arrays and scalars."""
+
+    name = 'stdlib'
+    default = staticmethod(_numpy_default)
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """Compact encoding (sorted keys) as UTF-8 bytes."""
+        return json.dumps(
+            obj, default=self.default, sort_keys=self.sort_keys,
+            ensure_ascii=self.ensure_ascii, separators=(',', ':')
+        ).encode('utf-8')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson.
+
+    Raises:
+        ImportError: If orjson is not installed
+    """
+
+    name = 'orjson'
+
+    def __init__(self, app: Flask):
+        import orjson
+
+        super().__init__(app)
+        self._orjson = orjson
+        self._options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def dumps_bytes(self, obj: Any, indent: bool = False) -> bytes:
+        """Compact encoding (sorted keys) as UTF-8 bytes."""
+        options = (self._options | self._orjson.OPT_INDENT_2) if indent else self._options
+        return self._orjson.dumps(obj, default=_numpy_default, option=options)
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        # orjson.JSONDecodeError is a ValueError, as Flask expects
+        return self._orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        """Like jsonify(), without going through str."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = self.dumps_bytes(obj, indent=indent)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+def make_json_provider(app: Flask, backend: str = 'auto') -> DefaultJSONProvider:
+    """
+    JSON provider for ``backend`` (see JSON_BACKENDS).
+
+    Raises:
+        ValueError: If backend is unknown
+        ImportError: If backend is 'orjson' and orjson is not installed
+    """
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f"Unknown JSON_BACKEND '{backend}'. Expected one of {JSON_BACKENDS}")
+    if backend == 'stdlib':
+        return StdlibJSONProvider(app)
+    try:
+        return OrjsonProvider(app)
+    except ImportError:
+        if backend == 'orjson':
+            raise
+        return StdlibJSONProvider(app)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Compact JSON of ``obj`` (NumPy arrays allowed) with the app's provider."""
+    return current_app.json.dumps_bytes(obj)
@@ -0,0 +1,268 @@
+"""
+Prometheus-style metrics for the backend API (text exposition format 0.0.4).
+
+Counters and histograms are recorded lock-free on the hot path: every
+request thread writes to its own shard (a dict of plain lists, registered
+once per thread under a lock), and a scrape sums the shards. Readings can
+lag an in-flight request by one observation, never more. When a thread
+exits (Werkzeug serves every request on a new one) its shard is folded into
+a shared base shard, so the number of shards stays bounded by the number
+of live threads.
+
+Gauges whose value lives elsewhere (process RSS, patient store size, cache
+and batching statistics, model info) are collected at scrape time through
+callbacks, so they cost nothing per request.
+"""
+
+import os
+import threading
+import weakref
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds: 50 us .. 5 s
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+# Process memory: /proc/self/statm reports pages
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Name, help text and label names shared by counters and histograms."""
+
+    kind = ''
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, help_text: str,
+                 labelnames: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _merged(self) -> Dict[LabelValues, List[float]]:
+        merged: Dict[LabelValues, List[float]] = {}
+        for shard in self.registry._shards():
+            for labels, cell in list(shard.get(self.name, {}).items()):
+                acc = merged.get(labels)
+                if acc is None:
+                    merged[labels] = list(cell)
+                else:
+                    for i, v in enumerate(cell):
+                        acc[i] += v
+        return merged
+
+
+class Counter(_Metric):
+    """Monotonic counter; inc() is lock-free."""
+
+    kind = 'counter'
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        cells = self.registry._shard_for(self.name)
+        cell = cells.get(labels)
+        if cell is None:
+            cells[labels] = [amount]
+        else:
+            cell[0] += amount
+
+    def collect(self) -> Iterable[str]:
+        for labels, (value,) in sorted(self._merged().items()):
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; observe() is lock-free."""
+
+    kind = 'histogram'
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, help_text: str,
+                 labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._width = len(self.buckets) + 3          # buckets, +Inf, sum, count
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        cells = self.registry._shard_for(self.name)
+        cell = cells.get(labels)
+        if cell is None:
+            cell = cells[labels] = [0.0] * self._width
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def collect(self) -> Iterable[str]:
+        for labels, cell in sorted(self._merged().items()):
+            cumulative = 0.0
+            for upper, n in zip(self.buckets + (float('inf'),), cell):
+                cumulative += n
+                le = f'le="{_format_value(upper)}"'
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {_format_value(cumulative)}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(cell[-2])}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {_format_value(cell[-1])}'
+
+
+class Gauge:
+    """
+    Metric read at scrape time from a callback returning {label values: value}.
+
+    ``kind`` is 'gauge', or 'counter' for totals kept elsewhere (e.g. cache hits).
+    """
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str],
+                 fn: Callable[[], Dict[LabelValues, float]], kind: str = 'gauge'):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def collect(self) -> Iterable[str]:
+        for labels, value in sorted(self.fn().items()):
+            if value is not None:
+                yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class _ShardHolder:
+    """Thread-local owner of a shard; its finalizer retires the shard when the thread exits."""
+
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self):
+        self.shard: Dict = {}
+
+
+class MetricsRegistry:
+    """
+    Holds the backend's metrics and renders them for /metrics.
+
+    Counters and histograms keep one shard per live thread plus a base shard
+    holding the totals of exited threads; gauges are callbacks.
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+        self._local = threading.local()
+        self._live_shards: Dict[int, Dict] = {}
+        self._base_shard: Dict = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Registration
+    # ------------------------------------------------------------------
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(self, name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(self, name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, fn: Callable[[], Dict[LabelValues, float]],
+              labelnames: Sequence[str] = (), kind: str = 'gauge') -> Gauge:
+        metric = Gauge(name, help_text, labelnames, fn, kind)
+        self._metrics.append(metric)
+        return metric
+
+    # ------------------------------------------------------------------
+    # Per-thread shards
+    # ------------------------------------------------------------------
+
+    def _shard_for(self, name: str) -> Dict[LabelValues, List[float]]:
+        try:
+            shard = self._local.holder.shard
+        except AttributeError:
+            holder = self._local.holder = _ShardHolder()
+            shard = holder.shard
+            with self._lock:
+                self._live_shards[id(shard)] = shard
+            # Runs when the thread's locals are cleared, i.e. when it exits
+            weakref.finalize(holder, self._retire, shard)
+        cells = shard.get(name)
+        if cells is None:
+            cells = shard[name] = {}
+        return cells
+
+    def _retire(self, shard: Dict) -> None:
+        """Fold an exited thread's shard into the base shard."""
+        with self._lock:
+            self._live_shards.pop(id(shard), None)
+            for name, cells in shard.items():
+                base = self._base_shard.setdefault(name, {})
+                for labels, cell in cells.items():
+                    acc = base.get(labels)
+                    if acc is None:
+                        base[labels] = list(cell)
+                    else:
+                        for i, v in enumerate(cell):
+                            acc[i] += v
+
+    def _shards(self) -> List[Dict]:
+        # The base is copied under the lock, so a shard retired mid-scrape is
+        # counted exactly once (either still live or already in the base)
+        with self._lock:
+            base = {name: {labels: list(cell) for labels, cell in cells.items()}
+                    for name, cells in self._base_shard.items()}
+            return [base] + list(self._live_shards.values())
+
+    # ------------------------------------------------------------------
+    # Exposition
+    # ------------------------------------------------------------------
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = list(metric.collect())
+            except Exception as e:
+                # A failing gauge callback must not take down the scrape
+                lines.append(f'# {metric.name} unavailable: {_escape(e)}')
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+def process_rss_bytes() -> Optional[float]:
+    """Resident set size of this process (Linux /proc; peak RSS elsewhere)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return float(int(f.read().split()[1]) * _PAGE_SIZE)
+    except (OSError, IndexError, ValueError):
+        pass
+    try:
+        import resource
+        import sys
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return float(rss if sys.platform == 'darwin' else rss * 1024)
+    except (ImportError, OSError):
+        return None
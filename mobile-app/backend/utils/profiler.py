@@ -0,0 +1,269 @@
+"""
+Sampled per-stage profiler for API requests.
+
+For a sampled request every stage it passes through (request.get_json,
+validation, DataFrame construction, each pipeline step, XGBoost, DT ...) is
+timed with time.perf_counter_ns().  Stages nest, so a request becomes a set
+of stacks such as
+
+    POST /api/v1/discontinuation-risk;predict;xgb;ColumnTransformer
+
+Sampled requests are aggregated as self time per stack and can be dumped in
+the folded ("collapsed") stack format, one ``frame;frame;frame <ns>`` line
+per stack, which flamegraph.pl, inferno and speedscope render directly.
+
+With profiling off a stage costs one attribute check; requests that are not
+sampled pay one random() call at the start and a thread-local lookup per
+stage.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+Stack = Tuple[str, ...]
+
+# Per-request breakdowns kept for the JSON view
+DEFAULT_RECENT = 50
+
+
+class _NullStage:
+    """Stage context for requests that are not sampled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Trace:
+    """Stage timings of one sampled request."""
+
+    __slots__ = ('stack', 'totals', 'start')
+
+    def __init__(self, root: str):
+        self.stack: List[str] = [root]
+        self.totals: Dict[Stack, int] = {}
+        self.start = time.perf_counter_ns()
+
+    def add(self, path: Stack, ns: int) -> None:
+        self.totals[path] = self.totals.get(path, 0) + ns
+
+    def self_times(self) -> Dict[Stack, int]:
+        """Time spent in each stack excluding its child stages."""
+        self_ns = dict(self.totals)
+        for path, ns in self.totals.items():
+            parent = path[:-1]
+            if parent in self_ns:
+                self_ns[parent] -= ns
+        return self_ns
+
+
+class _Stage:
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace: _Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.trace.stack.append(self.name)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter_ns() - self.start
+        self.trace.add(tuple(self.trace.stack), elapsed)
+        self.trace.stack.pop()
+        return False
+
+
+class StageProfiler:
+    """
+    Samples requests and aggregates their stage timings.
+
+    Usage (one request per thread at a time, as Flask serves them):
+
+        profiler.begin('POST /api/v1/discontinuation-risk')
+        with profiler.stage('validate_input_features'):
+            ...
+        profiler.end()
+
+    Args:
+        sample_rate: Fraction of requests to profile (0 disables)
+        max_recent: Number of per-request breakdowns kept for summary()
+    """
+
+    def __init__(self, sample_rate: float = 0.0, max_recent: int = DEFAULT_RECENT):
+        self.sample_rate = 0.0
+        self.set_sample_rate(sample_rate)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stacks: Dict[Stack, List[int]] = {}        # stack -> [self ns, count]
+        self._sampled = 0
+        self._recent = deque(maxlen=max_recent)
+
+    def set_sample_rate(self, sample_rate: float) -> None:
+        """
+        Raises:
+            ValueError: If sample_rate is outside [0, 1]
+        """
+        sample_rate = float(sample_rate)
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be in [0, 1], got {sample_rate}")
+        self.sample_rate = sample_rate
+
+    # ------------------------------------------------------------------
+    # Recording (request threads)
+    # ------------------------------------------------------------------
+
+    def begin(self, root: str) -> bool:
+        """Start a request; returns True if it is sampled."""
+        if self.sample_rate <= 0.0 or random.random() >= self.sample_rate:
+            self._local.trace = None
+            return False
+        self._local.trace = _Trace(root)
+        return True
+
+    @property
+    def sampling(self) -> bool:
+        """True while the current thread's request is being profiled."""
+        return getattr(self._local, 'trace', None) is not None
+
+    def stage(self, name: str):
+        """Context manager timing one stage (a no-op when not sampling)."""
+        if self.sample_rate <= 0.0:
+            return _NULL_STAGE
+        trace = getattr(self._local, 'trace', None)
+        return _NULL_STAGE if trace is None else _Stage(trace, name)
+
+    def record(self, stages: Mapping[str, float]) -> None:
+        """
+        Add {stage: seconds} timings measured elsewhere (the hybrid scorers'
+        stage_observer) as children of the current stage.  Stages already
+        timed explicitly at the same place are kept as they are.
+        """
+        trace = getattr(self._local, 'trace', None)
+        if trace is None:
+            return
+        parent = tuple(trace.stack)
+        for name, seconds in stages.items():
+            path = parent + (name,)
+            if path not in trace.totals:
+                trace.totals[path] = int(seconds * 1e9)
+
+    def member(self, model: Any, name: str) -> 'ProfiledMember':
+        """Wrap a hybrid member so each of its pipeline steps is a stage."""
+        return ProfiledMember(model, name, self)
+
+    def end(self) -> Optional[Dict]:
+        """Finish the current request; returns its breakdown if sampled."""
+        trace = getattr(self._local, 'trace', None)
+        if trace is None:
+            return None
+        self._local.trace = None
+        root = trace.stack[0]
+        total_ns = time.perf_counter_ns() - trace.start
+        trace.totals[(root,)] = total_ns
+        self_ns = trace.self_times()
+
+        breakdown = {
+            'request': root,
+            'total_ns': total_ns,
+            'stages_ns': {';'.join(path[1:]): ns for path, ns in trace.totals.items() if len(path) > 1},
+        }
+        with self._lock:
+            self._sampled += 1
+            for path, ns in self_ns.items():
+                cell = self._stacks.get(path)
+                if cell is None:
+                    self._stacks[path] = [ns, 1]
+                else:
+                    cell[0] += ns
+                    cell[1] += 1
+            self._recent.append(breakdown)
+        return breakdown
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def folded(self) -> str:
+        """Aggregated self time per stack in the folded stack format (ns)."""
+        with self._lock:
+            items = sorted(self._stacks.items())
+        return ''.join(f"{';'.join(path)} {max(ns, 0)}\n" for path, (ns, _) in items)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dictionary with the sample rate, number of sampled requests,
+            per-stack self time (total / mean ns) and the latest per-request
+            breakdowns
+        """
+        with self._lock:
+            stacks = [
+                {
+                    'stack': ';'.join(path),
+                    'count': count,
+                    'self_ns_total': max(ns, 0),
+                    'self_ns_mean': max(ns, 0) // count,
+                }
+                for path, (ns, count) in sorted(self._stacks.items())
+            ]
+            return {
+                'sample_rate': self.sample_rate,
+                'sampled_requests': self._sampled,
+                'stacks': stacks,
+                'recent': list(self._recent),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self._sampled = 0
+            self._recent.clear()
+
+
+class ProfiledMember:
+    """
+    Hybrid member whose predict / predict_proba run as a profiler stage.
+
+    For sklearn Pipelines each step becomes a child stage named after its
+    class (ColumnTransformer, XGBClassifier, ...); the steps are applied
+    exactly as Pipeline.predict_proba / predict would.  Other models
+    (compiled, ONNX) are timed as a whole.
+    """
+
+    def __init__(self, model: Any, name: str, profiler: StageProfiler):
+        self.model = model
+        self.name = name
+        self.profiler = profiler
+
+    def _run(self, X: Any, method: str) -> Any:
+        with self.profiler.stage(self.name):
+            steps = getattr(self.model, 'steps', None)
+            if not steps:
+                return getattr(self.model, method)(X)
+            for _, step in steps[:-1]:
+                if step is None or step == 'passthrough':
+                    continue
+                with self.profiler.stage(type(step).__name__):
+                    X = step.transform(X)
+            final = steps[-1][1]
+            with self.profiler.stage(type(final).__name__):
+                return getattr(final, method)(X)
+
+    def predict_proba(self, X: Any) -> Any:
+        return self._run(X, 'predict_proba')
+
+    def predict(self, X: Any) -> Any:
+        return self._run(X, 'predict')
@@ -0,0 +1,112 @@
+"""
+Prediction response bodies.
+
+risk_assessment() builds the per-record fields of the single-record
+response.  Batch responses are written straight from the hybrid result
+arrays instead of one dict per record:
+
+- rows (default): the single-record fields per record, in request order.
+  Every row is one of four pre-encoded templates (HIGH / LOW, upgraded or
+  not) with the two rounded numbers filled in, so the document is the same
+  jsonify would produce from the dicts.
+- columnar: one array per field over the scored records, plus their request
+  indices.  NumPy arrays go to the JSON encoder as they are.
+"""
+
+import json
+from typing import Any, Dict, List, Mapping, Sequence
+
+import numpy as np
+
+from models.predictor import risk_confidence
+
+RECOMMENDATIONS = {
+    'HIGH': "Schedule follow-up counseling session",
+    'LOW': "Continue monitoring contraceptive use",
+}
+
+BATCH_FORMATS = ('rows', 'columnar')
+
+# Decimals of confidence / xgb_probability in responses
+DECIMALS = 4
+
+
+def risk_assessment(prediction: int, xgb_probability: float, upgraded_by_dt: bool,
+                    threshold: float) -> Dict[str, Any]:
+    """Risk level, confidence and recommendation for one hybrid prediction."""
+    risk_level = "HIGH" if prediction == 1 else "LOW"
+    # Confidence: threshold-relative distance, normalised to [0, 1].
+    # Mirrors onDeviceRiskService.ts formula: 0 = borderline, 1 = maximally certain.
+    confidence = round(float(risk_confidence(xgb_probability, prediction, threshold)), DECIMALS)
+    return {
+        'risk_level': risk_level,
+        'confidence': confidence,
+        'recommendation': RECOMMENDATIONS[risk_level],
+        'xgb_probability': round(float(xgb_probability), DECIMALS),
+        'upgraded_by_dt': bool(upgraded_by_dt),
+    }
+
+
+def _row_template(risk_level: str, upgraded_by_dt: bool) -> str:
+    """JSON of one row with %r slots for confidence and xgb_probability (keys sorted)."""
+    slots = {'confidence': '\x00confidence\x00', 'xgb_probability': '\x00xgb_probability\x00'}
+    row = {
+        'risk_level': risk_level,
+        'recommendation': RECOMMENDATIONS[risk_level],
+        'upgraded_by_dt': upgraded_by_dt,
+        **slots,
+    }
+    text = json.dumps(row, sort_keys=True, separators=(',', ':')).replace('%', '%%')
+    for slot in slots.values():
+        text = text.replace(json.dumps(slot), '%r')
+    return text
+
+
+# Indexed by prediction * 2 + upgraded_by_dt
+_ROW_TEMPLATES = [
+    _row_template(risk_level, upgraded)
+    for risk_level in ('LOW', 'HIGH') for upgraded in (False, True)
+]
+
+
+def _rounded(values: np.ndarray) -> List[float]:
+    # Python floats: repr() gives the same digits as round(float(v), 4)
+    return np.round(np.asarray(values, dtype=np.float64), DECIMALS).tolist()
+
+
+def batch_columns(result: Mapping[str, np.ndarray], threshold: float) -> Dict[str, Any]:
+    """Response fields of every scored record as arrays / lists."""
+    predictions = np.asarray(result['predictions'])
+    probabilities = np.asarray(result['xgb_probabilities'], dtype=np.float64)
+    return {
+        'risk_level': np.where(predictions == 1, 'HIGH', 'LOW').tolist(),
+        'confidence': np.round(risk_confidence(probabilities, predictions, threshold), DECIMALS),
+        'xgb_probability': np.round(probabilities, DECIMALS),
+        'upgraded_by_dt': np.asarray(result['upgrade_flags'], dtype=bool),
+    }
+
+
+def rows_json(result: Mapping[str, np.ndarray], threshold: float,
+              scored: Sequence[int], n_records: int) -> bytes:
+    """
+    JSON array with one entry per request record: the fields of row i of
+    ``result`` at position scored[i], null for records not scored.
+    """
+    predictions = np.asarray(result['predictions'])
+    probabilities = np.asarray(result['xgb_probabilities'], dtype=np.float64)
+    kinds = (predictions.astype(np.int64) * 2 + np.asarray(result['upgrade_flags'], dtype=np.int64)).tolist()
+    confidence = _rounded(risk_confidence(probabilities, predictions, threshold))
+    probabilities = _rounded(probabilities)
+
+    rows = ['null'] * n_records
+    templates = _ROW_TEMPLATES
+    for i, kind, c, p in zip(scored, kinds, confidence, probabilities):
+        rows[i] = templates[kind] % (c, p)
+    return ('[' + ','.join(rows) + ']').encode('utf-8')
+
+
+def json_object(fields: Mapping[str, bytes]) -> bytes:
+    """JSON object from already-encoded values, keys sorted as jsonify sorts them."""
+    return b'{' + b','.join(
+        json.dumps(key).encode('utf-8') + b':' + fields[key] for key in sorted(fields)
+    ) + b'}'
@@ -1,23 +1,412 @@
 """
 Input validation utilities for API requests.
+
+Validation rules are declarative: the loaded model's fitted encoder (its
+FeatureSchema) decides each feature's type -- categorical features must be
+one of its fitted categories, numeric ones numbers -- FEATURE_RULES adds the
+ranges of the numeric features, and the required feature list comes from
+config.  RequestValidator compiles them once into lookup tables:
+
+- validate(record) checks one request dict (the single-record endpoint)
+- validate_batch(records) / validate_columns(columns) check a whole batch
+  column by column with NumPy and report errors per row
+
+Unknown categories are values the fitted OneHotEncoder does not know
+(handle_unknown='ignore' silently encodes them as all zeros), e.g. the
+number 1 where the encoder was fitted on the string '1'.  They are reported
+as warnings or rejected, depending on the validator's unknown_policy.
 """
 
-from typing import Dict, List, Tuple, Any
+from itertools import repeat
+from operator import itemgetter
+from typing import Dict, List, Tuple, Any, Iterable, Mapping, Optional, Sequence
+
+import numpy as np
+
 from config import REQUIRED_FEATURES
+from models.model_loader import ensure_ml_src
+
+ensure_ml_src()
+from inference.encoding import DictionaryColumn, factorize  # noqa: E402
+
+# Range constraints of the numeric features ('min' and 'max' go together;
+# 'values' lists the allowed numbers).  Only numeric features have rules:
+# categorical ones are checked against the encoder's fitted categories.
+FEATURE_RULES = {
+    'AGE': {'type': 'number', 'min': 15, 'max': 55},
+    'PARITY': {'type': 'number', 'min': 0, 'max': 20},
+}
+
+# What to do with categories the fitted encoder does not know
+UNKNOWN_POLICIES = ('warn', 'reject', 'ignore')
+
+# Unknown-category messages kept per validator (clients tend to repeat them)
+MESSAGE_CACHE_SIZE = 4096
+
+_NUMBER_TYPES = (int, float)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, _NUMBER_TYPES)
+
+
+def _is_missing(value: Any) -> bool:
+    """
+    Float NaN: imputed by the encoder, never an unknown category.  (None is
+    not imputed: the encoder treats it as an unknown category.)
+    """
+    return isinstance(value, float) and value != value
+
+
+def _describe(value: Any) -> str:
+    """How a value that is not a number is reported: None / NaN as missing, anything else by type."""
+    if value is None or _is_missing(value):
+        return 'a missing value'
+    return type(value).__name__
+
+
+_is_number_ufunc = np.frompyfunc(_is_number, 1, 1)
+
+# Python types of a column that need no per-value type check
+_NUMERIC_TYPES = frozenset({int, float})
+
+
+class RequestValidator:
+    """
+    Request validator compiled from a declarative schema.
+
+    Args:
+        required: Required feature names
+        rules: Numeric feature name -> {'type': 'number', 'min', 'max', 'values'}
+        categories: Feature name -> fitted categories of its encoder
+            (None: categories are not checked)
+        unknown_policy: 'warn' (report, still score), 'reject' (validation
+            error) or 'ignore' unknown categories
+
+    Raises:
+        ValueError: If unknown_policy is not one of UNKNOWN_POLICIES
+    """
+
+    def __init__(
+        self,
+        required: Sequence[str] = REQUIRED_FEATURES,
+        rules: Mapping[str, Mapping] = FEATURE_RULES,
+        categories: Optional[Mapping[str, Sequence]] = None,
+        unknown_policy: str = 'warn'
+    ):
+        if unknown_policy not in UNKNOWN_POLICIES:
+            raise ValueError(
+                f"Unknown category policy '{unknown_policy}'. Expected one of {UNKNOWN_POLICIES}"
+            )
+        self.required = tuple(required)
+        self.unknown_policy = unknown_policy
+        self._required_set = frozenset(self.required)
+
+        # (name, min, max, allowed values) for every number rule on a
+        # required feature, in rule order
+        self._numbers = tuple(
+            (name, rule.get('min'), rule.get('max'), rule.get('values'))
+            for name, rule in rules.items()
+            if rule.get('type') == 'number' and name in self._required_set
+        )
+        self._categories: Dict[str, frozenset] = {}
+        if categories is not None and unknown_policy != 'ignore':
+            self._categories = {
+                name: frozenset(cats) for name, cats in categories.items()
+                if name in self._required_set
+            }
+        self._checked = frozenset(name for name, *_ in self._numbers) | frozenset(self._categories)
+        # (name, value) pairs of every known category: a record is clean if
+        # its pairs are a subset, checked in one C call
+        self._category_names = tuple(self._categories)
+        self._category_order = {name: i for i, name in enumerate(self._category_names)}
+        self._known_pairs = frozenset(
+            (name, value) for name, cats in self._categories.items() for value in cats
+        )
+        self._messages: Dict[Tuple, str] = {}
+
+    @classmethod
+    def from_feature_schema(
+        cls,
+        schema: Any,
+        required: Sequence[str] = REQUIRED_FEATURES,
+        rules: Mapping[str, Mapping] = FEATURE_RULES,
+        unknown_policy: str = 'warn'
+    ) -> 'RequestValidator':
+        """
+        Build from the loaded model's FeatureSchema (inference/encoding.py).
+
+        The schema decides each feature's type: its categorical ('cat')
+        features are checked against their categories only, its numeric
+        ('num') features must be numbers, within their range in ``rules``
+        if they have one.  Rules for features the schema does not treat as
+        numeric are dropped.
+        """
+        categories = {
+            col['name']: col['categories'] for col in schema.columns if col['kind'] == 'cat'
+        }
+        numeric = [col['name'] for col in schema.columns if col['kind'] == 'num']
+        rules = {name: rules.get(name, {'type': 'number'}) for name in numeric}
+        return cls(required, rules, categories, unknown_policy)
+
+    # ------------------------------------------------------------------
+    # Single record
+    # ------------------------------------------------------------------
+
+    def missing(self, data: Mapping[str, Any]) -> List[str]:
+        """Required features absent from ``data``, in required order."""
+        if data.keys() >= self._required_set:
+            return []
+        return [feature for feature in self.required if feature not in data]
+
+    def validate(self, data: Mapping[str, Any]) -> Tuple[List[str], List[str]]:
+        """
+        Type, range and category checks of one record.
+
+        Returns:
+            Tuple of (errors, warnings); unknown categories are errors with
+            the 'reject' policy and warnings with 'warn'
+        """
+        errors = []
+        for name, lo, hi, values in self._numbers:
+            if name not in data:
+                continue
+            value = data[name]
+            if not isinstance(value, _NUMBER_TYPES) or _is_missing(value):
+                errors.append(f"{name} must be a number, got {_describe(value)}")
+                continue
+            if lo is not None and (value < lo or value > hi):
+                errors.append(f"{name} must be between {lo} and {hi}, got {value}")
+            if values is not None and value not in values:
+                errors.append(f"{name} must be {' or '.join(map(str, values))}, got {value}")
+
+        names = self._category_names
+        try:
+            # Set difference in C; only the unknown pairs reach Python code
+            pairs = set(zip(names, map(data.get, names))) - self._known_pairs
+        except TypeError:
+            # An unhashable value (list, dict)
+            pairs = [(name, data.get(name)) for name in names
+                     if not _safe_contains(self._known_pairs, (name, data.get(name)))]
+        unknown = [
+            self._unknown_message(name, value)
+            for name, value in sorted(pairs, key=lambda pair: self._category_order[pair[0]])
+            if not _is_missing(value)
+        ] if pairs else []
+
+        if self.unknown_policy == 'reject':
+            return errors + unknown, []
+        return errors, unknown
+
+    def _unknown_message(self, name: str, value: Any) -> str:
+        # Keyed by type too: 1, 1.0 and True are equal but print differently
+        key = (name, type(value), value)
+        try:
+            return self._messages[key]
+        except (KeyError, TypeError):
+            pass
+        message = f"{name}: unknown category {value!r}, encoded as all zeros"
+        if _is_number(value) and not isinstance(value, bool) and float(value).is_integer():
+            as_text = str(int(value))
+            if as_text in self._categories[name]:
+                message += f" (the model knows {as_text!r})"
+        if len(self._messages) < MESSAGE_CACHE_SIZE:
+            try:
+                self._messages[key] = message
+            except TypeError:
+                pass
+        return message
+
+    # ------------------------------------------------------------------
+    # Batches
+    # ------------------------------------------------------------------
+
+    def validate_batch(self, records: Sequence[Mapping[str, Any]]) -> Tuple[Dict[int, List[str]], List[Dict]]:
+        """
+        Validate a list of records column by column.
+
+        Returns:
+            Tuple of (errors, warnings): errors maps row index -> messages
+            for the rows that have any (missing features are errors);
+            warnings lists {'message', 'rows'} per unknown category value
+        """
+        n_rows = len(records)
+        errors: Dict[int, List[str]] = {}
+        required = self._required_set
+        if all(r.keys() >= required for r in records):
+            # Common case: every record is complete, columns are plain lookups
+            columns = {name: list(map(itemgetter(name), records))
+                       for name in self.required if name in self._checked}
+            col_errors, warnings = self.validate_columns(columns, n_rows, present={})
+        else:
+            columns, present = {}, {}
+            for name in self.required:
+                given = np.fromiter((name in r for r in records), dtype=bool, count=n_rows)
+                for i in np.flatnonzero(~given):
+                    errors.setdefault(int(i), []).append(f"missing feature {name}")
+                if name in self._checked:
+                    columns[name] = [r.get(name) for r in records]
+                    present[name] = given
+            col_errors, warnings = self.validate_columns(columns, n_rows, present)
+        for i, messages in col_errors.items():
+            errors.setdefault(i, []).extend(messages)
+        return dict(sorted(errors.items())), warnings
+
+    def validate_columns(
+        self,
+        columns: Mapping[str, Iterable],
+        n_rows: int,
+        present: Optional[Mapping[str, np.ndarray]] = None
+    ) -> Tuple[Dict[int, List[str]], List[Dict]]:
+        """
+        Validate a batch given as feature name -> column of values (lists,
+        NumPy arrays or DictionaryColumns).  Numeric NumPy columns skip the
+        per-value type check; typed and dictionary columns are checked for
+        unknown categories on their distinct values only.  Missing numbers
+        (None, NaN, Arrow nulls) are errors, as in validate().
+
+        Args:
+            columns: Feature name -> n_rows values
+            n_rows: Number of rows
+            present: Optional feature name -> boolean mask of the rows that
+                have the feature; other rows are not checked.  When given,
+                missing features are not reported (the caller does)
+
+        Returns:
+            Tuple of (errors, warnings) as for validate_batch()
+        """
+        errors: Dict[int, List[str]] = {}
+        warnings: List[Dict] = []
+
+        def report(target, rows, messages):
+            for i, message in zip(rows, messages):
+                row = target.get(i)
+                if row is None:
+                    target[i] = [message]
+                else:
+                    row.append(message)
+
+        def failing(name, ok):
+            """Rows (Python ints) failing a check, among those that have the feature."""
+            bad = ~ok
+            if present is not None and name in present:
+                bad &= present[name]
+            return np.flatnonzero(bad).tolist()
+
+        if present is None:
+            absent = [name for name in self.required if name not in columns]
+            for name in absent:
+                report(errors, range(n_rows), [f"missing feature {name}"] * n_rows)
+
+        for name, lo, hi, values in self._numbers:
+            if name not in columns:
+                continue
+            col = _column(columns[name], n_rows)
+            if col.dtype.kind in 'biuf' or (
+                col.dtype == object and _NUMERIC_TYPES.issuperset(map(type, col))
+            ):
+                numeric = col.astype(np.float64)
+                is_number = np.ones(n_rows, dtype=bool)
+            else:
+                is_number = _is_number_ufunc(col).astype(bool)
+                numeric = np.where(is_number, col, np.nan).astype(np.float64)
+            # NaN (an Arrow null, a NaN float) is an error, as None is
+            is_number &= ~np.isnan(numeric)
+            bad = failing(name, is_number)
+            report(errors, bad, [f"{name} must be a number, got {_describe(col[i])}" for i in bad])
+            if lo is not None:
+                # NaN compares false, as in validate()
+                bad = failing(name, ~(is_number & ((numeric < lo) | (numeric > hi))))
+                report(errors, bad, [f"{name} must be between {lo} and {hi}, got {col[i]}" for i in bad])
+            if values is not None:
+                bad = failing(name, ~is_number | np.isin(numeric, values))
+                allowed = ' or '.join(map(str, values))
+                report(errors, bad, [f"{name} must be {allowed}, got {col[i]}" for i in bad])
+
+        for name, cats in self._categories.items():
+            if name not in columns:
+                continue
+            values = columns[name]
+            factorized = factorize(values)
+            if factorized is not None:
+                # Distinct values come with the column (or one np.unique):
+                # only those are looked up, rows are mapped by code
+                uniques, row_codes = factorized
+                unknown = [v for v in uniques if v not in cats and not _is_missing(v)]
+                if not unknown:
+                    continue
+                code_of = {v: k for k, v in enumerate(unknown)}
+                codes = np.array([code_of.get(v, -1) for v in uniques] + [-1], dtype=np.int64)[row_codes]
+                groups = None
+            else:
+                values = values.tolist() if isinstance(values, np.ndarray) else list(values)
+                try:
+                    # Hash each value once; the few distinct unknown values get
+                    # codes 0..k-1, known and missing values -1
+                    unknown = [v for v in set(values) - cats if not _is_missing(v)]
+                    if not unknown:
+                        continue
+                    code_of = {v: k for k, v in enumerate(unknown)}
+                    codes = np.fromiter(map(code_of.get, values, repeat(-1, n_rows)),
+                                        dtype=np.int64, count=n_rows)
+                    groups = None
+                except TypeError:
+                    # An unhashable value (list, dict): one group per bad row
+                    known = np.array([_safe_contains(cats, v) or _is_missing(v) for v in values], dtype=bool)
+                    groups = [(values[i], [i]) for i in failing(name, known)]
+            if groups is None:
+                if present is not None and name in present:
+                    codes[~present[name]] = -1
+                # Rows per distinct unknown value (equal values such as 1
+                # and 1.0 share a group, reported as one of them)
+                order = np.argsort(codes, kind='stable')
+                bounds = np.cumsum(np.bincount(codes + 1, minlength=len(unknown) + 1))
+                groups = [(unknown[k], order[lo:hi].tolist())
+                          for k, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])) if hi > lo]
+                # In order of first occurrence, whatever the input kind
+                groups.sort(key=lambda group: group[1][0])
+            for value, rows in groups:
+                message = self._unknown_message(name, value)
+                if self.unknown_policy == 'reject':
+                    report(errors, rows, [message] * len(rows))
+                else:
+                    warnings.append({'message': message, 'rows': rows})
+
+        return dict(sorted(errors.items())), warnings
+
+
+def _column(values: Iterable, n_rows: int) -> np.ndarray:
+    """NumPy arrays as they are; anything else as an object array (no coercion of 1 to '1')."""
+    if isinstance(values, np.ndarray):
+        return values
+    if isinstance(values, DictionaryColumn):
+        return values.decode()
+    return np.fromiter(values, dtype=object, count=n_rows)
+
+
+def _safe_contains(cats: frozenset, value: Any) -> bool:
+    try:
+        return value in cats
+    except TypeError:
+        return False
+
+
+# Compiled once from the config feature list (no encoder categories)
+_DEFAULT_VALIDATOR = RequestValidator()
 
 
 def validate_input_features(data: Dict[str, Any]) -> Tuple[bool, List[str]]:
     """
     Validate that all required features are present in the input data.
-    
+
     Args:
         data: Dictionary containing user assessment data
-        
+
     Returns:
         Tuple of (is_valid, missing_features)
         - is_valid: True if all required features are present
         - missing_features: List of missing feature names (empty if valid)
-        
+
     Example:
         >>> data = {'AGE': 28, 'REGION': 1}
         >>> is_valid, missing = validate_input_features(data)
@@ -26,67 +415,21 @@ def validate_input_features(data: Dict[str, Any]) -> Tuple[bool, List[str]]:
         >>> print(missing)
         ['EDUC_LEVEL', 'RELIGION', ...]
     """
-    missing_features = [
-        feature for feature in REQUIRED_FEATURES
-        if feature not in data
-    ]
-    
-    is_valid = len(missing_features) == 0
-    
-    return is_valid, missing_features
+    missing_features = _DEFAULT_VALIDATOR.missing(data)
+    return len(missing_features) == 0, missing_features
 
 
 def validate_feature_types(data: Dict[str, Any]) -> Tuple[bool, List[str]]:
     """
     Validate that feature values have acceptable types.
-    
+
     Args:
         data: Dictionary containing user assessment data
-        
+
     Returns:
         Tuple of (is_valid, error_messages)
         - is_valid: True if all features have valid types
         - error_messages: List of validation error messages
     """
-    errors = []
-    
-    # Numeric features that must be numbers
-    numeric_features = [
-        'AGE', 'PARITY', 'HUSBAND_AGE', 'RESIDING_WITH_PARTNER',
-        'HOUSEHOLD_HEAD_SEX', 'SMOKE_CIGAR', 'TOLD_ABT_SIDE_EFFECTS'
-    ]
-    
-    for feature in numeric_features:
-        if feature in data:
-            value = data[feature]
-            if not isinstance(value, (int, float)):
-                errors.append(f"{feature} must be a number, got {type(value).__name__}")
-    
-    # Age validation
-    if 'AGE' in data:
-        age = data['AGE']
-        if isinstance(age, (int, float)):
-            if age < 15 or age > 55:
-                errors.append(f"AGE must be between 15 and 55, got {age}")
-    
-    # Parity validation
-    if 'PARITY' in data:
-        parity = data['PARITY']
-        if isinstance(parity, (int, float)):
-            if parity < 0 or parity > 20:
-                errors.append(f"PARITY must be between 0 and 20, got {parity}")
-    
-    # Binary features (0 or 1)
-    binary_features = [
-        'RESIDING_WITH_PARTNER', 'SMOKE_CIGAR', 'TOLD_ABT_SIDE_EFFECTS'
-    ]
-    
-    for feature in binary_features:
-        if feature in data:
-            value = data[feature]
-            if isinstance(value, (int, float)) and value not in [0, 1]:
-                errors.append(f"{feature} must be 0 or 1, got {value}")
-    
-    is_valid = len(errors) == 0
-    
-    return is_valid, errors
+    errors, _ = _DEFAULT_VALIDATOR.validate(data)
+    return len(errors) == 0, errors
@@ -0,0 +1,79 @@
+"""
+Verify the single-record fast path against the DataFrame path.
+
+Scores every row of the held-out test split one record at a time, once
+through a one-row DataFrame and the joblib pipelines and once through the
+pandas-free HybridRowScorer, and requires identical results (XGBoost
+probability bit for bit, DT label, upgrade flag and final prediction).
+
+Usage:
+    python verify_fast_path.py
+    MODEL_DIR=../../machine-learning/src/models/models_high_risk_v4 python verify_fast_path.py
+
+Exits with code 1 on any mismatch.
+"""
+
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from config import BASE_DIR, MODEL_DIR
+from models.model_loader import load_hybrid_model, build_row_scorer
+from models.predictor import predict_single_record
+
+DATA_PKL = (
+    BASE_DIR.parent.parent / 'machine-learning' / 'data' / 'processed'
+    / 'discontinuation_design1_data_v2.pkl'
+)
+
+
+def main():
+    print("=" * 70)
+    print("SINGLE-ROW FAST PATH VERIFICATION")
+    print("=" * 70)
+
+    xgb_model, dt_model, config = load_hybrid_model(MODEL_DIR, backend='joblib')
+    row_scorer = build_row_scorer(xgb_model, dt_model, config)
+
+    _, X_test, _, _ = joblib.load(DATA_PKL)
+    records = X_test.to_dict(orient='records')
+    print(f"\nScoring {len(records)} test records one at a time...")
+
+    mismatches = 0
+    t_frame = t_fast = 0.0
+    for i, record in enumerate(records):
+        t0 = time.perf_counter()
+        expected = predict_single_record(record, xgb_model, dt_model, config)
+        t1 = time.perf_counter()
+        actual = predict_single_record(record, xgb_model, dt_model, config, row_scorer)
+        t2 = time.perf_counter()
+        t_frame += t1 - t0
+        t_fast += t2 - t1
+
+        same_prob = np.float32(expected['xgb_probability']) == np.float32(actual['xgb_probability'])
+        if not same_prob or any(
+            expected[key] != actual[key]
+            for key in ('prediction', 'xgb_prediction', 'dt_prediction', 'upgraded_by_dt')
+        ):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"❌ Row {i}: DataFrame path {expected} != fast path {actual}")
+
+    n = len(records)
+    print(f"\nModel version     : {config['model_version']}")
+    print(f"Records checked   : {n}")
+    print(f"Mismatches        : {mismatches}")
+    print(f"DataFrame path    : {t_frame / n * 1e3:.3f} ms / record")
+    print(f"Fast path         : {t_fast / n * 1e3:.3f} ms / record")
+    print(f"Speed-up          : {t_frame / t_fast:.1f}x")
+
+    if mismatches:
+        print("\n❌ FAST PATH DOES NOT MATCH THE DATAFRAME PATH")
+        sys.exit(1)
+    print("\n✅ Fast path is identical to the DataFrame path")
+
+
+if __name__ == '__main__':
+    main()
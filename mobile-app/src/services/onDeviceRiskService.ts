@@ -13,11 +13,14 @@
  *
  * The flat models accept a single FloatTensorType input "float_input" [1, 133],
  * bypassing the onnxruntime-react-native string tensor bug.
+ *
+ * Results are memoized per split-point bucket key (bucketKey()): answers that
+ * fall between the same tree thresholds skip both ONNX sessions.
  */
 
 import { NativeModules } from 'react-native';
 import { Asset } from 'expo-asset';
-import { buildOHEVector, validateFeaturesV4 } from '../utils/featureEncoder';
+import { bucketKey, buildOHEVector, validateFeaturesV4 } from '../utils/featureEncoder';
 import { createModuleLogger } from '../utils/loggerUtils';
 import type { InferenceSession as OrtInferenceSession } from 'onnxruntime-react-native';
 import type { RiskAssessmentResponse } from './discontinuationRiskService';
@@ -40,6 +43,37 @@ const HYBRID_CONFIG = {
     model_version: 'v4-offline',
 };
 
+// ONNX Runtime's default session options: the backend's benchmarked options
+// (onnx_session_config.json) were measured on a server, not on a phone.
+function sessionOptions(): OrtInferenceSession.SessionOptions {
+    return { executionProviders: ['cpu'] };
+}
+
+// Memoized assessments by bucket key (insertion-ordered Map used as an LRU)
+const RESULT_CACHE_SIZE = 256;
+const resultCache = new Map<string, RiskAssessmentResponse>();
+
+function copyResult(result: RiskAssessmentResponse): RiskAssessmentResponse {
+    return { ...result, metadata: result.metadata && { ...result.metadata } };
+}
+
+function cachedResult(key: string): RiskAssessmentResponse | undefined {
+    const hit = resultCache.get(key);
+    if (hit) {
+        resultCache.delete(key);
+        resultCache.set(key, hit);
+        return copyResult(hit);
+    }
+    return undefined;
+}
+
+function storeResult(key: string, result: RiskAssessmentResponse): void {
+    resultCache.set(key, copyResult(result));
+    if (resultCache.size > RESULT_CACHE_SIZE) {
+        resultCache.delete(resultCache.keys().next().value as string);
+    }
+}
+
 // ============================================================================
 // MODEL MANAGEMENT
 // ============================================================================
@@ -73,13 +107,8 @@ async function loadModels(): Promise<void> {
                 throw new Error('Failed to download model assets to local storage');
             }
 
-            xgbSession = await InferenceSession.create(xgbAsset.localUri, {
-                executionProviders: ['cpu'],
-            });
-
-            dtSession = await InferenceSession.create(dtAsset.localUri, {
-                executionProviders: ['cpu'],
-            });
+            xgbSession = await InferenceSession.create(xgbAsset.localUri, sessionOptions());
+            dtSession = await InferenceSession.create(dtAsset.localUri, sessionOptions());
 
             modelsLoaded = true;
             logger.info('Flat ONNX v4 models loaded successfully');
@@ -126,6 +155,13 @@ export async function assessOffline(
         logger.warn('Some v4 features missing, using defaults', { missing });
     }
 
+    const key = bucketKey(formData);
+    const cached = cachedResult(key);
+    if (cached) {
+        logger.debug('On-device v4 assessment served from bucket cache', { key });
+        return cached;
+    }
+
     // Build 133-dim float32 OHE vector
     const oheVec = buildOHEVector(formData);
     logger.debug('OHE vector built', { length: oheVec.length });
@@ -187,7 +223,7 @@ export async function assessOffline(
         : HYBRID_CONFIG.threshold;         // LOW:  max distance = 0.25 − 0.0 = 0.25
     const confidence = Math.round((distFromThreshold / maxDist) * 10000) / 10000;
 
-    return {
+    const result: RiskAssessmentResponse = {
         risk_level: riskLevel as 'LOW' | 'HIGH',
         confidence,
         recommendation,
@@ -199,6 +235,8 @@ export async function assessOffline(
             confidence_margin: HYBRID_CONFIG.conf_margin,
         },
     };
+    storeResult(key, result);
+    return result;
 }
 
 /**
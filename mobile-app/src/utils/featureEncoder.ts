@@ -16,8 +16,17 @@
  *   [132]      PARITY     (float32)
  *
  * Unknown categories encode as all-zeros (sklearn handle_unknown='ignore').
+ *
+ * buildIndexVector() builds the compact 9-value input of the indexed models
+ * instead (one category index per OHE block, -1 = unknown, then AGE, PARITY).
+ *
+ * bucketKey() maps the same input to its split-point buckets
+ * (split_index_v4.json): form answers with the same key get identical model
+ * outputs, so it is an exact memoization key for on-device predictions.
  */
 
+import SPLIT_INDEX from '../../assets/models/split_index_v4.json';
+
 // ============================================================================
 // OHE SCHEMA — exact categories from the fitted OneHotEncoder (sorted)
 // Any value not in a category list → all-zero block (unknown → ignore)
@@ -42,6 +51,9 @@ const OHE_SCHEMA: SchemaEntry[] = [
 // Total OHE output length (must equal 133)
 const N_OHE_FEATURES = OHE_SCHEMA.reduce((acc, e) => acc + ("isNum" in e ? 1 : e.cats.length), 0);
 
+// Index vector length (one value per raw feature, must equal 9)
+export const N_INDEX_FEATURES = OHE_SCHEMA.length;
+
 // ============================================================================
 // DISPLAY → TRAINING CATEGORY MAPS
 // Maps form display strings to the exact string values the model was trained on.
@@ -198,43 +210,68 @@ export function buildOHEVector(formData: Record<string, any>): Float32Array {
 
     for (const entry of OHE_SCHEMA) {
         if ("isNum" in entry) {
-            const raw = formData[entry.feat];
-            const n = (raw === undefined || raw === null || raw === "")
-                ? 0.0
-                : parseFloat(String(raw));
-            vec[offset] = isNaN(n) ? 0.0 : n;
+            vec[offset] = numericValue(formData, entry.feat);
             offset += 1;
         } else {
-            const { feat, cats } = entry;
-            const raw = formData[feat];
-
-            // Resolve display string → training category
-            let trainingVal: string | undefined;
-
-            if (feat === "HUSBAND_AGE") {
-                trainingVal = encodeHusbandAge(raw);
-            } else {
-                const displayMap = DISPLAY_MAPS[feat];
-                const rawStr = raw === undefined || raw === null ? "" : String(raw);
-                trainingVal = displayMap ? displayMap[rawStr] : rawStr;
+            // One-hot encode; unknown → all zeros (handle_unknown='ignore')
+            const idx = categoryIndex(formData, entry);
+            if (idx >= 0) {
+                vec[offset + idx] = 1.0;
             }
-
-            // One-hot encode
-            if (trainingVal !== undefined && trainingVal !== "") {
-                const idx = cats.indexOf(trainingVal);
-                if (idx >= 0) {
-                    vec[offset + idx] = 1.0;
-                }
-                // unknown → all zeros (handle_unknown='ignore')
-            }
-
-            offset += cats.length;
+            offset += entry.cats.length;
         }
     }
 
     return vec;
 }
 
+/**
+ * Build the 9-value index vector for the indexed ONNX models
+ * (xgb_high_recall_indexed.onnx / dt_high_recall_indexed.onnx, input
+ * "index_input" [1, 9]) — same column order as OHE_SCHEMA, each categorical
+ * column holding its category index (-1 = unknown) instead of a one-hot block.
+ */
+export function buildIndexVector(formData: Record<string, any>): Float32Array {
+    const vec = new Float32Array(OHE_SCHEMA.length);
+    OHE_SCHEMA.forEach((entry, i) => {
+        vec[i] = "isNum" in entry
+            ? numericValue(formData, entry.feat)
+            : categoryIndex(formData, entry);
+    });
+    return vec;
+}
+
+/** Numeric column value (missing / unparsable → 0). */
+function numericValue(formData: Record<string, any>, feat: string): number {
+    const raw = formData[feat];
+    const n = (raw === undefined || raw === null || raw === "")
+        ? 0.0
+        : parseFloat(String(raw));
+    return isNaN(n) ? 0.0 : n;
+}
+
+/** Index of the form value in the column's training categories (-1 = unknown). */
+function categoryIndex(formData: Record<string, any>, entry: OheCol): number {
+    const { feat, cats } = entry;
+    const raw = formData[feat];
+
+    // Resolve display string → training category
+    let trainingVal: string | undefined;
+
+    if (feat === "HUSBAND_AGE") {
+        trainingVal = encodeHusbandAge(raw);
+    } else {
+        const displayMap = DISPLAY_MAPS[feat];
+        const rawStr = raw === undefined || raw === null ? "" : String(raw);
+        trainingVal = displayMap ? displayMap[rawStr] : rawStr;
+    }
+
+    if (trainingVal === undefined || trainingVal === "") {
+        return -1;
+    }
+    return cats.indexOf(trainingVal);
+}
+
 // Map from feature name → display-to-training map
 const DISPLAY_MAPS: Record<string, Record<string, string>> = {
     PATTERN_USE:              PATTERN_USE_MAP,
@@ -245,6 +282,44 @@ const DISPLAY_MAPS: Record<string, Record<string, string>> = {
     DESIRE_FOR_MORE_CHILDREN: DESIRE_FOR_MORE_CHILDREN_MAP,
 };
 
+// ============================================================================
+// SPLIT-POINT BUCKETS
+// Written by machine-learning/src/models/export_split_index.py: per column,
+// the split thresholds of both models (numeric) or category index → bucket
+// (categorical, last entry = unknown).  Same column order as OHE_SCHEMA.
+// ============================================================================
+
+interface SplitIndexColumn { name: string; kind: string; class_of?: number[]; cuts?: number[] }
+
+const SPLIT_COLUMNS = SPLIT_INDEX.columns as SplitIndexColumn[];
+
+/** Number of cuts <= x (cuts sorted ascending). */
+function bucketOf(cuts: number[], x: number): number {
+    let lo = 0;
+    let hi = cuts.length;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (cuts[mid] <= x) lo = mid + 1; else hi = mid;
+    }
+    return lo;
+}
+
+/**
+ * Split-point bucket key of the form data: two inputs with the same key fall
+ * between the same tree thresholds on every feature, so the models give them
+ * bit-identical outputs.
+ */
+export function bucketKey(formData: Record<string, any>): string {
+    const vec = buildIndexVector(formData);   // float32, as the models see it
+    return SPLIT_COLUMNS.map((col, i) => {
+        if (col.class_of) {
+            const idx = vec[i];
+            return col.class_of[idx < 0 ? col.class_of.length - 1 : idx];
+        }
+        return bucketOf(col.cuts ?? [], vec[i]);
+    }).join(",");
+}
+
 // ============================================================================
 // VALIDATION HELPER
 // ============================================================================